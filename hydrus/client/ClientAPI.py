@@ -1,6 +1,9 @@
 import collections.abc
+import struct
 import threading
 
+import numpy
+
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusNumbers
@@ -62,6 +65,41 @@ basic_permission_to_str_lookup = {
 
 SEARCH_RESULTS_CACHE_TIMEOUT = 4 * 3600
 
+# a search cursor is a search result held here so a client can page through it. each page fetch pushes the timeout back
+SEARCH_CURSOR_TIMEOUT = 900
+MAX_NUM_SEARCH_CURSORS = 8
+
+SEARCH_CURSOR_KEY_LENGTH = 32
+SEARCH_CURSOR_OFFSET_STRUCT = struct.Struct( '>Q' )
+
+def ConvertSearchCursorToToken( cursor_key: bytes, offset: int ) -> str:
+    
+    return ( cursor_key + SEARCH_CURSOR_OFFSET_STRUCT.pack( offset ) ).hex()
+    
+
+def ParseSearchCursorToken( token: str ) -> tuple[ bytes, int ]:
+    
+    try:
+        
+        token_bytes = bytes.fromhex( token )
+        
+    except ValueError:
+        
+        raise HydrusExceptions.BadRequestException( 'Sorry, that search cursor was not valid hex!' )
+        
+    
+    if len( token_bytes ) != SEARCH_CURSOR_KEY_LENGTH + SEARCH_CURSOR_OFFSET_STRUCT.size:
+        
+        raise HydrusExceptions.BadRequestException( 'Sorry, that search cursor was the wrong length!' )
+        
+    
+    cursor_key = token_bytes[ : SEARCH_CURSOR_KEY_LENGTH ]
+    
+    ( offset, ) = SEARCH_CURSOR_OFFSET_STRUCT.unpack( token_bytes[ SEARCH_CURSOR_KEY_LENGTH : ] )
+    
+    return ( cursor_key, offset )
+    
+
 SESSION_EXPIRY = 86400
 
 api_request_dialog_open = False
@@ -286,9 +324,23 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
         self._last_search_results = None
         self._search_results_timeout = 0
         
+        # cursor_key : ( hash_ids array, timeout )
+        self._search_cursors = {}
+        
         self._lock = threading.Lock()
         
     
+    def _CullSearchCursors( self ):
+        
+        for ( cursor_key, ( hash_ids, timeout ) ) in list( self._search_cursors.items() ):
+            
+            if HydrusTime.TimeHasPassed( timeout ):
+                
+                del self._search_cursors[ cursor_key ]
+                
+            
+        
+    
     def _GetSerialisableInfo( self ):
         
         serialisable_access_key = self._access_key.hex()
@@ -433,6 +485,31 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
             
         
     
+    def CreateSearchCursor( self, hash_ids: collections.abc.Collection[ int ] ) -> bytes:
+        
+        # an int64 array is eight bytes an id and keeps the search sort order
+        hash_ids_array = numpy.fromiter( hash_ids, dtype = numpy.int64, count = len( hash_ids ) )
+        
+        cursor_key = HydrusData.GenerateKey()
+        
+        with self._lock:
+            
+            self._CullSearchCursors()
+            
+            while len( self._search_cursors ) >= MAX_NUM_SEARCH_CURSORS:
+                
+                # dicts keep insertion order, and a page fetch re-inserts, so the first is the least recently used
+                oldest_cursor_key = next( iter( self._search_cursors ) )
+                
+                del self._search_cursors[ oldest_cursor_key ]
+                
+            
+            self._search_cursors[ cursor_key ] = ( hash_ids_array, HydrusTime.GetNow() + SEARCH_CURSOR_TIMEOUT )
+            
+        
+        return cursor_key
+        
+    
     def FilterTagPredicateResponse( self, predicates: list[ ClientSearchPredicate.Predicate ] ):
         
         with self._lock:
@@ -505,6 +582,28 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
             
         
     
+    def GetSearchCursorPage( self, cursor_key: bytes, offset: int, limit: int ) -> tuple[ list[ int ], int ]:
+        
+        with self._lock:
+            
+            if cursor_key not in self._search_cursors:
+                
+                raise HydrusExceptions.NotFoundException( 'It looks like that search cursor is no longer available--please run the search again!' )
+                
+            
+            ( hash_ids_array, timeout ) = self._search_cursors.pop( cursor_key )
+            
+            if HydrusTime.TimeHasPassed( timeout ):
+                
+                raise HydrusExceptions.NotFoundException( 'It looks like that search cursor is no longer available--please run the search again!' )
+                
+            
+            self._search_cursors[ cursor_key ] = ( hash_ids_array, HydrusTime.GetNow() + SEARCH_CURSOR_TIMEOUT )
+            
+        
+        return ( hash_ids_array[ offset : offset + limit ].tolist(), len( hash_ids_array ) )
+        
+    
     def GetSearchTagFilter( self ):
         
         with self._lock:
@@ -530,6 +629,8 @@ class APIPermissions( HydrusSerialisable.SerialisableBaseNamed ):
                 self._last_search_results = None
                 
             
+            self._CullSearchCursors()
+            
         
     
     def PermitsEverything( self ):
@@ -1084,6 +1084,15 @@ class Controller( HydrusController.HydrusController ):
         HydrusProfiling.FlipQueryPlannerMode()
         
     
+    def GetCacheStats( self ) -> dict:
+        
+        return {
+            'image_cache' : self.images_cache.GetCacheStats(),
+            'image_tile_cache' : self.image_tiles_cache.GetCacheStats(),
+            'thumbnail_cache' : self.thumbnails_cache.GetCacheStats()
+        }
+        
+    
     def GetClipboardImage( self ):
         
         clipboard_image = QW.QApplication.clipboard().image()
@@ -13,6 +13,7 @@ from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientDefaults
 from hydrus.client import ClientGlobals as CG
 from hydrus.client import ClientApplicationCommand as CAC
+from hydrus.client.caches import ClientCachesBase
 from hydrus.client.duplicates import ClientDuplicates
 from hydrus.client.importing.options import FileFilteringImportOptions
 from hydrus.client.importing.options import FileImportOptionsLegacy
@@ -165,12 +166,14 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'elide_page_tab_names' : True,
             'maintain_similar_files_duplicate_pairs_during_active' : True,
             'maintain_similar_files_duplicate_pairs_during_idle' : True,
+            'similar_files_use_in_memory_perceptual_hash_index' : True,
             'show_namespaces' : True,
             'show_number_namespaces' : True,
             'show_subtag_number_namespaces' : True,
             'replace_tag_underscores_with_spaces' : False,
             'replace_tag_emojis_with_boxes' : False,
             'verify_regular_https' : True,
+            'use_http2' : False,
             'page_drop_chase_normally' : True,
             'page_drop_chase_with_shift' : False,
             'page_drag_change_tab_normally' : True,
@@ -193,6 +196,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'duplicates_auto_resolution_during_active' : True,
             'file_maintenance_during_idle' : True,
             'file_maintenance_during_active' : True,
+            'file_migration_verify_hashes' : False,
             'tag_display_maintenance_during_idle' : True,
             'tag_display_maintenance_during_active' : True,
             'save_page_sort_on_change' : False,
@@ -297,6 +301,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'media_viewer_recenter_media_on_window_resize': True,
             'allow_blurhash_fallback' : True,
             'fade_thumbnails' : True,
+            'use_thumbnail_pack_store' : False,
             'slideshow_always_play_duration_media_once_through' : False,
             'enable_truncated_images_pil' : True,
             'do_icc_profile_normalisation' : True,
@@ -502,6 +507,8 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'shutdown_work_period' : 86400,
             'max_network_jobs' : 15,
             'max_network_jobs_per_domain' : 3,
+            'max_pooled_connections_per_domain' : 10,
+            'pooled_connection_idle_timeout' : 300,
             'max_connection_attempts_allowed' : 5,
             'max_request_attempts_allowed_get' : 5,
             'thumbnail_scale_type' : HydrusImageHandling.THUMBNAIL_SCALE_DOWN_ONLY,
@@ -526,6 +533,12 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'duplicate_comparison_score_nicer_ratio' : 10,
             'duplicate_comparison_score_has_audio' : 20,
             'thumbnail_cache_size' : 1024 * 1024 * 32,
+            'thumbnail_cache_eviction_policy' : ClientCachesBase.CACHE_EVICTION_POLICY_SEGMENTED_LRU,
+            'thumbnail_decode_workers' : 4,
+            'client_api_light_workers' : 10,
+            'client_api_light_max_queued' : 64,
+            'client_api_heavy_workers' : 10,
+            'client_api_heavy_max_queued' : 64,
             'image_cache_size' : 1024 * 1024 * 1024,
             'image_tile_cache_size' : 1024 * 1024 * 256,
             'thumbnail_cache_timeout' : 86400,
@@ -544,6 +557,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'file_maintenance_idle_throttle_time_delta' : 2,
             'file_maintenance_active_throttle_files' : 1,
             'file_maintenance_active_throttle_time_delta' : 20,
+            'file_maintenance_num_threads' : 2,
             'subscription_network_error_delay' : 12 * 3600,
             'subscription_other_error_delay' : 36 * 3600,
             'downloader_network_error_delay' : 90 * 60,
@@ -573,6 +587,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'repository_processing_rest_percentage_idle' : 5,
             'repository_processing_work_time_ms_normal' : 500,
             'repository_processing_rest_percentage_normal' : 10,
+            'repository_processing_num_updates_to_prefetch' : 2,
             'tag_display_processing_work_time_ms_idle' : 15000,
             'tag_display_processing_rest_percentage_idle' : 3,
             'tag_display_processing_work_time_ms_normal' : 100,
@@ -603,6 +618,7 @@ class ClientOptions( HydrusSerialisable.SerialisableBase ):
             'thread_slots_gallery_search' : 5,
             'thread_slots_watcher_files' : 15,
             'thread_slots_watcher_check' : 5,
+            'local_import_workers' : 1,
             'ffmpeg_subprocess_timeout' : 15,
             'media_viewer_tags_scrolling_behaviour' : CC.MEDIA_VIEWER_TAGS_SCROLLING_BEHAVIOUR_ONLY_PROPAGATE_AFTER_DELAY,
             'zoom_switch_command' : CAC.SIMPLE_SWITCH_BETWEEN_100_PERCENT_AND_CANVAS_ZOOM,
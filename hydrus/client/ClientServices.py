@@ -1431,6 +1431,11 @@ class ServiceRestricted( ServiceRemote ):
                 network_job.AddAdditionalHeader( 'Content-Type', HC.mime_mimetype_string_lookup[ content_type ] )
                 
             
+            for ( key, value ) in request_headers.items():
+                
+                network_job.AddAdditionalHeader( key, value )
+                
+            
             CG.client_controller.network_engine.AddJob( network_job )
             
             network_job.WaitUntilDone()
@@ -1703,6 +1708,122 @@ class ServiceRestricted( ServiceRemote ):
         
     
 
+class RepositoryUpdateLoader( object ):
+    
+    def __init__( self, update_hashes_and_mimes, num_to_prefetch: int ):
+        
+        # reading and parsing an update is all CPU, so we do the next few on other threads while the db is busy writing the current one
+        
+        self._update_hashes_and_mimes = list( update_hashes_and_mimes )
+        self._num_to_prefetch = max( 1, num_to_prefetch )
+        
+        self._lock = threading.Lock()
+        
+        self._next_index_to_start = 0
+        self._num_consumed = 0
+        
+        self._update_hashes_to_events = {}
+        self._update_hashes_to_results = {}
+        
+    
+    def _LoadUpdate( self, update_hash, mime ):
+        
+        try:
+            
+            update_path = CG.client_controller.client_files_manager.GetFilePath( update_hash, mime )
+            
+            with open( update_path, 'rb' ) as f:
+                
+                update_network_bytes = f.read()
+                
+            
+            update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
+            
+            if isinstance( update, HydrusNetwork.ContentUpdate ):
+                
+                # the db looks these up in service_hash_id order, so it helps to hand them over sorted
+                
+                for ( tag_id, hash_ids ) in update.GetNewMappings():
+                    
+                    hash_ids.sort()
+                    
+                
+                for ( tag_id, hash_ids ) in update.GetDeletedMappings():
+                    
+                    hash_ids.sort()
+                    
+                
+            
+            result = ( update, None )
+            
+        except Exception as e:
+            
+            result = ( None, e )
+            
+        
+        with self._lock:
+            
+            self._update_hashes_to_results[ update_hash ] = result
+            
+            self._update_hashes_to_events[ update_hash ].set()
+            
+        
+    
+    def _StartMoreWork( self ):
+        
+        while self._next_index_to_start < len( self._update_hashes_and_mimes ) and self._next_index_to_start < self._num_consumed + self._num_to_prefetch:
+            
+            ( update_hash, mime ) = self._update_hashes_and_mimes[ self._next_index_to_start ]
+            
+            self._update_hashes_to_events[ update_hash ] = threading.Event()
+            
+            CG.client_controller.CallToThread( self._LoadUpdate, update_hash, mime )
+            
+            self._next_index_to_start += 1
+            
+        
+    
+    def GetUpdate( self, update_hash ):
+        
+        # raises FileMissingException if the file is missing, or whatever the parse raised if it was broken
+        
+        with self._lock:
+            
+            if update_hash not in self._update_hashes_to_events:
+                
+                self._StartMoreWork()
+                
+            
+            if update_hash not in self._update_hashes_to_events:
+                
+                raise Exception( 'Repository update loader was asked for an update it was not expecting!' )
+                
+            
+            event = self._update_hashes_to_events[ update_hash ]
+            
+        
+        event.wait()
+        
+        with self._lock:
+            
+            del self._update_hashes_to_events[ update_hash ]
+            
+            ( update, e ) = self._update_hashes_to_results.pop( update_hash )
+            
+            self._num_consumed += 1
+            
+            self._StartMoreWork()
+            
+        
+        if e is not None:
+            
+            raise e
+            
+        
+        return update
+        
+    
+
 class ServiceRepository( ServiceRestricted ):
     
     def __init__( self, service_key, service_type, name, dictionary = None ):
@@ -1981,7 +2102,9 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update_network_string = self.Request( HC.GET, 'update', { 'update_hash' : update_hash } )
+                        update_encodings_header_value = ','.join( HydrusNetwork.update_encoding_str_lookup.values() )
+                        
+                        update_network_string = self.Request( HC.GET, 'update', { 'update_hash' : update_hash }, request_headers = { HydrusNetwork.UPDATE_ENCODINGS_HEADER : update_encodings_header_value } )
                         
                     except HydrusExceptions.CancelledException as e:
                         
@@ -2017,7 +2140,7 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update = HydrusSerialisable.CreateFromNetworkBytes( update_network_string )
+                        update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_string )
                         
                     except Exception as e:
                         
@@ -2133,6 +2256,11 @@ class ServiceRepository( ServiceRestricted ):
             
             HydrusData.Print( title )
             
+            update_hashes_and_mimes = [ ( definition_hash, HC.APPLICATION_HYDRUS_UPDATE_DEFINITIONS ) for ( definition_hash, content_types ) in definition_hashes_and_content_types ]
+            update_hashes_and_mimes.extend( ( ( content_hash, HC.APPLICATION_HYDRUS_UPDATE_CONTENT ) for ( content_hash, content_types ) in content_hashes_and_content_types ) )
+            
+            update_loader = RepositoryUpdateLoader( update_hashes_and_mimes, CG.client_controller.new_options.GetInteger( 'repository_processing_num_updates_to_prefetch' ) )
+            
             num_updates_done = 0
             num_updates_to_do = len( definition_hashes_and_content_types ) + len( content_hashes_and_content_types )
             
@@ -2164,7 +2292,7 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update_path = CG.client_controller.client_files_manager.GetFilePath( definition_hash, HC.APPLICATION_HYDRUS_UPDATE_DEFINITIONS )
+                        definition_update = update_loader.GetUpdate( definition_hash )
                         
                     except HydrusExceptions.FileMissingException:
                         
@@ -2172,16 +2300,6 @@ class ServiceRepository( ServiceRestricted ):
                         
                         raise Exception( 'An unusual error has occured during repository processing: a definition update file ({}) was missing. Your repository should be paused, and all update files have been scheduled for a presence check. I recommend you run _database->maintenance->clear/fix orphan file records_ too. Please then permit file maintenance under _database->file maintenance->manage scheduled jobs_ to finish its new work, which should fix this, before unpausing your repository.'.format( definition_hash.hex() ) )
                         
-                    
-                    with open( update_path, 'rb' ) as f:
-                        
-                        update_network_bytes = f.read()
-                        
-                    
-                    try:
-                        
-                        definition_update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
-                        
                     except Exception as e:
                         
                         CG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD )
@@ -2293,7 +2411,7 @@ class ServiceRepository( ServiceRestricted ):
                     
                     try:
                         
-                        update_path = CG.client_controller.client_files_manager.GetFilePath( content_hash, HC.APPLICATION_HYDRUS_UPDATE_CONTENT )
+                        content_update = update_loader.GetUpdate( content_hash )
                         
                     except HydrusExceptions.FileMissingException:
                         
@@ -2301,16 +2419,6 @@ class ServiceRepository( ServiceRestricted ):
                         
                         raise Exception( 'An unusual error has occured during repository processing: a content update file ({}) was missing. Your repository should be paused, and all update files have been scheduled for a presence check. I recommend you run _database->maintenance->clear/fix orphan file records_ too. Please then permit file maintenance under _database->file maintenance->manage scheduled jobs_ to finish its new work, which should fix this, before unpausing your repository.'.format( content_hash.hex() ) )
                         
-                    
-                    with open( update_path, 'rb' ) as f:
-                        
-                        update_network_bytes = f.read()
-                        
-                    
-                    try:
-                        
-                        content_update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
-                        
                     except Exception as e:
                         
                         CG.client_controller.WriteSynchronous( 'schedule_repository_update_file_maintenance', self._service_key, ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD )
@@ -2615,6 +2723,16 @@ class ServiceRepository( ServiceRestricted ):
             
         
     
+    def GetUpdateEncoding( self ) -> int:
+        
+        with self._lock:
+            
+            # older servers do not report this and only ever make json updates
+            
+            return self._service_options.get( 'update_encoding', HydrusNetwork.UPDATE_ENCODING_JSON )
+            
+        
+    
     def GetUpdatePeriod( self ) -> int:
         
         with self._lock:
@@ -763,50 +763,11 @@ class StringMatch( StringProcessingStep ):
         return self._example_string
         
     
-    def MakesChanges( self ) -> bool:
-        
-        if self._min_chars is not None or self._max_chars is not None:
-            
-            return True
-            
-        
-        if self._match_type != STRING_MATCH_ANY:
-            
-            return True
-            
-        
-        return False
-        
-    
-    def Matches( self, text ):
-        
-        try:
-            
-            self.Test( text )
-            
-            return True
-            
-        except HydrusExceptions.StringMatchException:
-            
-            return False
-            
-        
-    
-    def SetMaxChars( self, max_chars ):
-        
-        self._max_chars = max_chars
-        
-    
-    def SetMinChars( self, min_chars ):
-        
-        self._min_chars = min_chars
-        
-    
-    def Test( self, text ):
+    def GetMismatchReason( self, text ) -> str | None:
         
         if isinstance( text, bytes ):
             
-            raise HydrusExceptions.StringMatchException( 'Got a bytes value in a string match!' )
+            return 'Got a bytes value in a string match!'
             
         
         text_len = len( text )
@@ -815,19 +776,19 @@ class StringMatch( StringProcessingStep ):
         
         if self._min_chars is not None and text_len < self._min_chars:
             
-            raise HydrusExceptions.StringMatchException( presentation_text + ' had fewer than ' + HydrusNumbers.ToHumanInt( self._min_chars ) + ' characters' )
+            return presentation_text + ' had fewer than ' + HydrusNumbers.ToHumanInt( self._min_chars ) + ' characters'
             
         
         if self._max_chars is not None and text_len > self._max_chars:
             
-            raise HydrusExceptions.StringMatchException( presentation_text + ' had more than ' + HydrusNumbers.ToHumanInt( self._max_chars ) + ' characters' )
+            return presentation_text + ' had more than ' + HydrusNumbers.ToHumanInt( self._max_chars ) + ' characters'
             
         
         if self._match_type == STRING_MATCH_FIXED:
             
             if text != self._match_value:
                 
-                raise HydrusExceptions.StringMatchException( presentation_text + ' did not exactly match "' + self._match_value + '"' )
+                return presentation_text + ' did not exactly match "' + self._match_value + '"'
                 
             
         elif self._match_type in ( STRING_MATCH_FLEXIBLE, STRING_MATCH_REGEX ):
@@ -888,12 +849,12 @@ class StringMatch( StringProcessingStep ):
                 
             except Exception as e:
                 
-                raise HydrusExceptions.StringMatchException( 'That regex did not work! ' + str( e ) )
+                return 'That regex did not work! ' + str( e )
                 
             
             if result is None:
                 
-                raise HydrusExceptions.StringMatchException( presentation_text + fail_reason )
+                return presentation_text + fail_reason
                 
             
         elif self._match_type == STRING_MATCH_ANY:
@@ -901,6 +862,48 @@ class StringMatch( StringProcessingStep ):
             pass
             
         
+        return None
+        
+    
+    def MakesChanges( self ) -> bool:
+        
+        if self._min_chars is not None or self._max_chars is not None:
+            
+            return True
+            
+        
+        if self._match_type != STRING_MATCH_ANY:
+            
+            return True
+            
+        
+        return False
+        
+    
+    def Matches( self, text ):
+        
+        return self.GetMismatchReason( text ) is None
+        
+    
+    def SetMaxChars( self, max_chars ):
+        
+        self._max_chars = max_chars
+        
+    
+    def SetMinChars( self, min_chars ):
+        
+        self._min_chars = min_chars
+        
+    
+    def Test( self, text ):
+        
+        reason = self.GetMismatchReason( text )
+        
+        if reason is not None:
+            
+            raise HydrusExceptions.StringMatchException( reason )
+            
+        
     
     def ToTuple( self ):
         
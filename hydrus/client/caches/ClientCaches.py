@@ -1,6 +1,7 @@
 import collections
 import collections.abc
 import json
+import os
 import threading
 import time
 import typing
@@ -21,6 +22,7 @@ from hydrus.client import ClientRendering
 from hydrus.client import ClientSVGHandling
 from hydrus.client import ClientThreading
 from hydrus.client.caches import ClientCachesBase
+from hydrus.client.caches import ClientThumbnailPacks
 from hydrus.client.files import ClientFilesMaintenance
 from hydrus.client.parsing import ClientParsing
 from hydrus.client.media import ClientMediaResult
@@ -155,6 +157,11 @@ class ImageRendererCache( object ):
         self._data_cache.Clear()
         
     
+    def GetCacheStats( self ) -> dict:
+        
+        return self._data_cache.GetStats()
+        
+    
     def ClearSpecificFiles( self, hashes ):
         
         for hash in hashes:
@@ -297,6 +304,11 @@ class ImageTileCache( object ):
         self._data_cache.Clear()
         
     
+    def GetCacheStats( self ) -> dict:
+        
+        return self._data_cache.GetStats()
+        
+    
     def ClearSpecificFiles( self, hashes ):
         
         for hash in hashes:
@@ -364,8 +376,9 @@ class ThumbnailCache( object ):
         
         cache_size = self._controller.new_options.GetInteger( 'thumbnail_cache_size' )
         cache_timeout = self._controller.new_options.GetInteger( 'thumbnail_cache_timeout' )
+        eviction_policy = self._controller.new_options.GetInteger( 'thumbnail_cache_eviction_policy' )
         
-        self._data_cache = ClientCachesBase.DataCache( self._controller, 'thumbnail cache', cache_size, timeout = cache_timeout )
+        self._data_cache = ClientCachesBase.DataCache( self._controller, 'thumbnail cache', cache_size, timeout = cache_timeout, eviction_policy = eviction_policy )
         
         self._magic_mime_thumbnail_ease_score_lookup = {}
         
@@ -378,8 +391,16 @@ class ThumbnailCache( object ):
         self._waterfall_queue_quick = set()
         self._waterfall_queue = []
         
+        # the queue is sorted for fast decoding, but we want to hand results back in the order the page asked for them
+        self._waterfall_items_to_page_order = {}
+        self._next_waterfall_page_order = 0
+        
+        self._waterfall_in_flight = set()
+        
         self._waterfall_queue_empty_event = threading.Event()
         
+        self._num_decode_workers = self._controller.new_options.GetInteger( 'thumbnail_decode_workers' )
+        
         self._delayed_regeneration_queue_quick = set()
         self._delayed_regeneration_queue = []
         
@@ -389,6 +410,10 @@ class ThumbnailCache( object ):
         
         self._special_thumbs = {}
         
+        self._thumbnail_pack_store = None
+        
+        self._UpdateThumbnailPackStore()
+        
         self.Clear()
         
         self._controller.CallToThreadLongRunning( self.MainLoop )
@@ -432,6 +457,59 @@ class ThumbnailCache( object ):
         return self._special_thumbs[ HC.APPLICATION_UNKNOWN ]
         
     
+    def _GetExpectedThumbnailResolution( self, media_result: ClientMediaResult.MediaResult ):
+        
+        ( media_width, media_height ) = media_result.GetResolution()
+        
+        bounding_dimensions = self._controller.options[ 'thumbnail_dimensions' ]
+        thumbnail_scale_type = self._controller.new_options.GetInteger( 'thumbnail_scale_type' )
+        thumbnail_dpr_percent = CG.client_controller.new_options.GetInteger( 'thumbnail_dpr_percent' )
+        
+        return HydrusImageHandling.GetThumbnailResolution( ( media_width, media_height ), bounding_dimensions, thumbnail_scale_type, thumbnail_dpr_percent )
+        
+    
+    def _GetPackedThumbnailNumPy( self, thumbnail_pack_store: ClientThumbnailPacks.ThumbnailPackStore, media_result: ClientMediaResult.MediaResult ):
+        
+        hash = media_result.GetHash()
+        
+        thumbnail_bytes = thumbnail_pack_store.GetThumbnailBytes( hash )
+        
+        if thumbnail_bytes is None:
+            
+            return None
+            
+        
+        try:
+            
+            numpy_image = HydrusImageHandling.GenerateNumPyImageFromThumbnailBytes( thumbnail_bytes )
+            
+        except Exception as e:
+            
+            thumbnail_pack_store.DeleteThumbnails( ( hash, ) )
+            
+            return None
+            
+        
+        ( current_width, current_height ) = HydrusImageHandling.GetResolutionNumPy( numpy_image )
+        
+        ( expected_width, expected_height ) = self._GetExpectedThumbnailResolution( media_result )
+        
+        exactly_as_expected = current_width == expected_width and current_height == expected_height
+        
+        rotation_exception = current_width == expected_height and current_height == expected_width
+        
+        if not ( exactly_as_expected or rotation_exception ):
+            
+            # the thumbnail settings changed. let the loose file handle it, regen and all
+            
+            thumbnail_pack_store.DeleteThumbnails( ( hash, ) )
+            
+            return None
+            
+        
+        return numpy_image
+        
+    
     def _GetThumbnailHydrusBitmap( self, media_result: ClientMediaResult.MediaResult ):
         
         if HG.blurhash_mode:
@@ -443,6 +521,18 @@ class ThumbnailCache( object ):
         
         locations_manager = media_result.GetLocationsManager()
         
+        thumbnail_pack_store = self._thumbnail_pack_store
+        
+        if thumbnail_pack_store is not None:
+            
+            numpy_image = self._GetPackedThumbnailNumPy( thumbnail_pack_store, media_result )
+            
+            if numpy_image is not None:
+                
+                return ClientRendering.GenerateHydrusBitmapFromNumPyImage( numpy_image )
+                
+            
+        
         try:
             
             thumbnail_path = self._controller.client_files_manager.GetThumbnailPath( media_result )
@@ -499,13 +589,7 @@ class ThumbnailCache( object ):
         
         ( current_width, current_height ) = HydrusImageHandling.GetResolutionNumPy( numpy_image )
         
-        ( media_width, media_height ) = media_result.GetResolution()
-        
-        bounding_dimensions = self._controller.options[ 'thumbnail_dimensions' ]
-        thumbnail_scale_type = self._controller.new_options.GetInteger( 'thumbnail_scale_type' )
-        thumbnail_dpr_percent = CG.client_controller.new_options.GetInteger( 'thumbnail_dpr_percent' )
-        
-        ( expected_width, expected_height ) = HydrusImageHandling.GetThumbnailResolution( ( media_width, media_height ), bounding_dimensions, thumbnail_scale_type, thumbnail_dpr_percent )
+        ( expected_width, expected_height ) = self._GetExpectedThumbnailResolution( media_result )
         
         exactly_as_expected = current_width == expected_width and current_height == expected_height
         
@@ -546,6 +630,23 @@ class ThumbnailCache( object ):
                     
                 
             
+        elif thumbnail_pack_store is not None:
+            
+            try:
+                
+                with open( thumbnail_path, 'rb' ) as f:
+                    
+                    thumbnail_bytes = f.read()
+                    
+                
+                thumbnail_pack_store.AddThumbnailBytes( hash, thumbnail_bytes )
+                
+            except Exception as e:
+                
+                HydrusData.Print( 'Could not add the thumbnail for file {} to the thumbnail pack store:'.format( hash.hex() ) )
+                HydrusData.PrintException( e, do_wait = False )
+                
+            
         
         hydrus_bitmap = ClientRendering.GenerateHydrusBitmapFromNumPyImage( numpy_image )
         
@@ -619,10 +720,48 @@ class ThumbnailCache( object ):
             
         
     
+    def _PublishWaterfallResults( self, items ):
+        
+        with self._lock:
+            
+            # anything cancelled while we were working on it is no longer in flight
+            delivered_items = [ item for item in items if item in self._waterfall_in_flight ]
+            
+            delivered_items.sort( key = lambda item: self._waterfall_items_to_page_order.get( item, 0 ) )
+            
+            self._waterfall_in_flight.difference_update( items )
+            
+            for item in items:
+                
+                if item not in self._waterfall_queue_quick and item in self._waterfall_items_to_page_order:
+                    
+                    del self._waterfall_items_to_page_order[ item ]
+                    
+                
+            
+        
+        page_keys_to_rendered_medias = collections.defaultdict( list )
+        
+        for ( page_key, media ) in delivered_items:
+            
+            if media.GetDisplayMediaResult() is not None:
+                
+                page_keys_to_rendered_medias[ page_key ].append( media )
+                
+            
+        
+        for ( page_key, rendered_medias ) in page_keys_to_rendered_medias.items():
+            
+            self._controller.pub( 'waterfall_thumbnails', page_key, rendered_medias )
+            
+        
+        return len( page_keys_to_rendered_medias ) > 0
+        
+    
     def _RecalcQueues( self ):
         
-        # here we sort by the hash since this is both breddy random and more likely to access faster on a well defragged hard drive!
-        # and now with the magic mime order
+        # the waterfall goes in page order, so the thumbs fill in top to bottom and no batch can overtake an earlier one
+        # anything without a page order falls back to the old magic mime order and then the hash, which is both breddy random and more likely to access faster on a well defragged hard drive
         
         def sort_waterfall( item ):
             
@@ -641,7 +780,7 @@ class ThumbnailCache( object ):
                 hash = display_media_result.GetHash()
                 
             
-            return ( magic_score, hash )
+            return ( self._waterfall_items_to_page_order.get( item, 0 ), magic_score, hash )
             
         
         self._waterfall_queue = list( self._waterfall_queue_quick )
@@ -687,11 +826,91 @@ class ThumbnailCache( object ):
         return we_have_file or we_should_have_thumb or we_have_blurhash
         
     
+    def _UpdateThumbnailPackStore( self ):
+        
+        use_thumbnail_pack_store = self._controller.new_options.GetBoolean( 'use_thumbnail_pack_store' )
+        
+        thumbnail_pack_store_dir = os.path.join( self._controller.GetDBDir(), 'client_thumbnail_packs' )
+        
+        if use_thumbnail_pack_store and self._thumbnail_pack_store is None:
+            
+            try:
+                
+                self._thumbnail_pack_store = ClientThumbnailPacks.ThumbnailPackStore( thumbnail_pack_store_dir )
+                
+            except Exception as e:
+                
+                HydrusData.ShowText( 'Could not load the thumbnail pack store! It will be off for this session. Full error follows:' )
+                HydrusData.ShowException( e )
+                
+            
+        elif not use_thumbnail_pack_store:
+            
+            if self._thumbnail_pack_store is not None:
+                
+                self._thumbnail_pack_store.Close()
+                
+                self._thumbnail_pack_store = None
+                
+            
+            # anything that changes while we are off will not be forgotten, so we cannot keep it around
+            ClientThumbnailPacks.DeleteThumbnailPackStore( thumbnail_pack_store_dir )
+            
+        
+    
+    def _WaterfallDecode( self, item ):
+        
+        with self._lock:
+            
+            if item not in self._waterfall_in_flight:
+                
+                # cancelled before we got to it
+                
+                return
+                
+            
+        
+        ( page_key, media ) = item
+        
+        display_media_result = media.GetDisplayMediaResult()
+        
+        if display_media_result is not None:
+            
+            self.GetThumbnail( display_media_result )
+            
+        
+    
+    def _WaterfallDecodeWork( self, items, done_event: threading.Event ):
+        
+        try:
+            
+            for item in items:
+                
+                self._WaterfallDecode( item )
+                
+            
+        finally:
+            
+            done_event.set()
+            
+        
+    
     def CancelWaterfall( self, page_key: bytes, medias: list ):
         
         with self._lock:
             
-            self._waterfall_queue_quick.difference_update( ( ( page_key, media ) for media in medias ) )
+            cancelled_items = [ ( page_key, media ) for media in medias ]
+            
+            self._waterfall_queue_quick.difference_update( cancelled_items )
+            self._waterfall_in_flight.difference_update( cancelled_items )
+            
+            for item in cancelled_items:
+                
+                if item in self._waterfall_items_to_page_order:
+                    
+                    del self._waterfall_items_to_page_order[ item ]
+                    
+                
             
             cancelled_media_results = { media.GetDisplayMediaResult() for media in medias }
             
@@ -768,10 +987,27 @@ class ThumbnailCache( object ):
             self._waterfall_queue_quick = set()
             self._delayed_regeneration_queue_quick = set()
             
+            self._waterfall_items_to_page_order = {}
+            self._waterfall_in_flight = set()
+            
             self._RecalcQueues()
             
         
     
+    def GetCacheStats( self ) -> dict:
+        
+        stats = self._data_cache.GetStats()
+        
+        thumbnail_pack_store = self._thumbnail_pack_store
+        
+        if thumbnail_pack_store is not None:
+            
+            stats[ 'thumbnail_pack_store' ] = thumbnail_pack_store.GetStats()
+            
+        
+        return stats
+        
+    
     def ClearThumbnails( self, hashes ):
         
         with self._lock:
@@ -782,6 +1018,13 @@ class ThumbnailCache( object ):
                 
             
         
+        thumbnail_pack_store = self._thumbnail_pack_store
+        
+        if thumbnail_pack_store is not None:
+            
+            thumbnail_pack_store.DeleteThumbnails( hashes )
+            
+        
     
     def WaitUntilFree( self ):
         
@@ -897,6 +1140,10 @@ class ThumbnailCache( object ):
         
         self._data_cache.SetCacheSizeAndTimeout( cache_size, cache_timeout )
         
+        self._data_cache.SetEvictionPolicy( self._controller.new_options.GetInteger( 'thumbnail_cache_eviction_policy' ) )
+        
+        self._num_decode_workers = self._controller.new_options.GetInteger( 'thumbnail_decode_workers' )
+        
         allow_blurhash_fallback = self._controller.new_options.GetBoolean( 'allow_blurhash_fallback' )
         
         if allow_blurhash_fallback != self._allow_blurhash_fallback:
@@ -906,12 +1153,23 @@ class ThumbnailCache( object ):
             self.Clear()
             
         
+        self._UpdateThumbnailPackStore()
+        
     
     def Waterfall( self, page_key, medias ):
         
         with self._lock:
             
-            self._waterfall_queue_quick.update( ( ( page_key, media ) for media in medias ) )
+            for media in medias:
+                
+                item = ( page_key, media )
+                
+                self._waterfall_queue_quick.add( item )
+                
+                self._waterfall_items_to_page_order[ item ] = self._next_waterfall_page_order
+                
+                self._next_waterfall_page_order += 1
+                
             
             self._RecalcQueues()
             
@@ -942,52 +1200,119 @@ class ThumbnailCache( object ):
             start_time = HydrusTime.GetNowPrecise()
             stop_time = start_time + 0.005 # a bit of a typical frame
             
-            page_keys_to_rendered_medias = collections.defaultdict( list )
+            num_decode_workers = self._num_decode_workers
             
-            num_done = 0
-            max_at_once = 16
+            if num_decode_workers > 1:
+                
+                max_at_once = num_decode_workers * 4
+                
+            else:
+                
+                max_at_once = 16
+                
             
-            while not HydrusTime.TimeHasPassedPrecise( stop_time ) and num_done <= max_at_once:
+            thumbnail_pack_store = self._thumbnail_pack_store
+            
+            if thumbnail_pack_store is not None:
                 
                 with self._lock:
                     
-                    if len( self._waterfall_queue ) == 0:
+                    # we pop off the end
+                    upcoming_media_results = [ media.GetDisplayMediaResult() for ( page_key, media ) in self._waterfall_queue[ - max_at_once : ] ]
+                    
+                
+                thumbnail_pack_store.WillNeed( [ media_result.GetHash() for media_result in upcoming_media_results if media_result is not None ] )
+                
+            
+            items = []
+            
+            if num_decode_workers > 1:
+                
+                with self._lock:
+                    
+                    while len( self._waterfall_queue ) > 0 and len( items ) < max_at_once:
                         
-                        break
+                        item = self._waterfall_queue.pop()
+                        
+                        self._waterfall_queue_quick.discard( item )
+                        
+                        items.append( item )
                         
-                    
-                    result = self._waterfall_queue.pop()
                     
                     if len( self._waterfall_queue ) == 0:
                         
                         self._waterfall_queue_empty_event.set()
                         
                     
-                    self._waterfall_queue_quick.discard( result )
+                    self._waterfall_in_flight.update( items )
                     
                 
-                ( page_key, media ) = result
-                
-                display_media_result = media.GetDisplayMediaResult()
+                done_events = []
                 
-                if display_media_result is not None:
+                for i in range( num_decode_workers ):
                     
-                    self.GetThumbnail( display_media_result )
+                    worker_items = items[ i : : num_decode_workers ]
                     
-                    page_keys_to_rendered_medias[ page_key ].append( media )
+                    if len( worker_items ) == 0:
+                        
+                        break
+                        
+                    
+                    done_event = threading.Event()
+                    
+                    self._controller.CallToThread( self._WaterfallDecodeWork, worker_items, done_event )
+                    
+                    done_events.append( done_event )
                     
                 
-                num_done += 1
+                for done_event in done_events:
+                    
+                    while not done_event.wait( 1 ):
+                        
+                        if HydrusThreading.IsThreadShuttingDown():
+                            
+                            return
+                            
+                        
+                    
                 
-            
-            if len( page_keys_to_rendered_medias ) > 0:
+            else:
                 
-                for ( page_key, rendered_medias ) in page_keys_to_rendered_medias.items():
+                while not HydrusTime.TimeHasPassedPrecise( stop_time ) and len( items ) <= max_at_once:
                     
-                    self._controller.pub( 'waterfall_thumbnails', page_key, rendered_medias )
+                    with self._lock:
+                        
+                        if len( self._waterfall_queue ) == 0:
+                            
+                            break
+                            
+                        
+                        item = self._waterfall_queue.pop()
+                        
+                        if len( self._waterfall_queue ) == 0:
+                            
+                            self._waterfall_queue_empty_event.set()
+                            
+                        
+                        self._waterfall_queue_quick.discard( item )
+                        
+                        self._waterfall_in_flight.add( item )
+                        
+                    
+                    items.append( item )
+                    
+                    self._WaterfallDecode( item )
                     
                 
-                time.sleep( 0.00001 )
+            
+            if len( items ) > 0:
+                
+                published_something = self._PublishWaterfallResults( items )
+                
+                if published_something:
+                    
+                    time.sleep( 0.00001 )
+                    
                 
             
             # now we will do regen if appropriate
@@ -9,6 +9,14 @@ from hydrus.core import HydrusGlobals as HG
 
 from hydrus.client import ClientGlobals as CG
 
+CACHE_EVICTION_POLICY_LRU = 0
+CACHE_EVICTION_POLICY_SEGMENTED_LRU = 1
+
+cache_eviction_policy_str_lookup = {
+    CACHE_EVICTION_POLICY_LRU : 'least recently used',
+    CACHE_EVICTION_POLICY_SEGMENTED_LRU : 'segmented least recently used (scan resistant)'
+}
+
 class CacheableObject( object ):
     
     def GetEstimatedMemoryFootprint( self ) -> int:
@@ -37,19 +45,244 @@ class DataCacheEntry( object ):
         
     
 
+class DataCacheEvictionPolicyLRU( object ):
+    
+    def __init__( self ):
+        
+        self._keys_to_sizes: collections.OrderedDict[ typing.Any, int ] = collections.OrderedDict()
+        
+    
+    def Add( self, key, size: int ):
+        
+        self._keys_to_sizes[ key ] = size
+        
+    
+    def Clear( self ):
+        
+        self._keys_to_sizes.clear()
+        
+    
+    def Delete( self, key ):
+        
+        if key in self._keys_to_sizes:
+            
+            del self._keys_to_sizes[ key ]
+            
+        
+    
+    def GetSegments( self ) -> list[ collections.OrderedDict ]:
+        
+        # each segment is oldest first, and the segments are in eviction order
+        
+        return [ self._keys_to_sizes ]
+        
+    
+    def GetStats( self ) -> dict:
+        
+        return {}
+        
+    
+    def NotifySizeChanged( self, key, size: int ):
+        
+        if key in self._keys_to_sizes:
+            
+            self._keys_to_sizes[ key ] = size
+            
+        
+    
+    def SetCacheSize( self, cache_size: int ):
+        
+        pass
+        
+    
+    def Touch( self, key ):
+        
+        if key in self._keys_to_sizes:
+            
+            self._keys_to_sizes.move_to_end( key )
+            
+        
+    
+
+class DataCacheEvictionPolicySegmentedLRU( object ):
+    
+    # new items go into a probationary segment, and only a later, separate access promotes them to the protected segment
+    # a one-off scan through fifty thousand thumbnails then only churns probation, and the working set in protected survives it
+    
+    PROTECTED_FRACTION = 0.8
+    
+    # hits this soon after the last access are the same 'use', e.g. waterfall render and then the immediate paint, and they do not promote
+    CORRELATED_ACCESS_PERIOD = 2.0
+    
+    def __init__( self, cache_size: int ):
+        
+        self._probationary_keys_to_sizes: collections.OrderedDict[ typing.Any, int ] = collections.OrderedDict()
+        self._protected_keys_to_sizes: collections.OrderedDict[ typing.Any, int ] = collections.OrderedDict()
+        
+        self._probationary_keys_to_last_access_times = {}
+        
+        self._protected_size = 0
+        self._protected_size_limit = int( cache_size * self.PROTECTED_FRACTION )
+        
+        self._num_promotions = 0
+        self._num_demotions = 0
+        
+    
+    def _DemoteOverflow( self ):
+        
+        while self._protected_size > self._protected_size_limit and len( self._protected_keys_to_sizes ) > 0:
+            
+            ( key, size ) = self._protected_keys_to_sizes.popitem( last = False )
+            
+            self._protected_size -= size
+            
+            # back to the fresh end of probation, so it gets one more chance to prove itself
+            self._probationary_keys_to_sizes[ key ] = size
+            self._probationary_keys_to_last_access_times[ key ] = 0.0
+            
+            self._num_demotions += 1
+            
+        
+    
+    def Add( self, key, size: int ):
+        
+        self._probationary_keys_to_sizes[ key ] = size
+        self._probationary_keys_to_last_access_times[ key ] = time.monotonic()
+        
+    
+    def Clear( self ):
+        
+        self._probationary_keys_to_sizes.clear()
+        self._protected_keys_to_sizes.clear()
+        
+        self._probationary_keys_to_last_access_times = {}
+        
+        self._protected_size = 0
+        
+    
+    def Delete( self, key ):
+        
+        if key in self._protected_keys_to_sizes:
+            
+            self._protected_size -= self._protected_keys_to_sizes[ key ]
+            
+            del self._protected_keys_to_sizes[ key ]
+            
+        elif key in self._probationary_keys_to_sizes:
+            
+            del self._probationary_keys_to_sizes[ key ]
+            del self._probationary_keys_to_last_access_times[ key ]
+            
+        
+    
+    def GetSegments( self ) -> list[ collections.OrderedDict ]:
+        
+        return [ self._probationary_keys_to_sizes, self._protected_keys_to_sizes ]
+        
+    
+    def GetStats( self ) -> dict:
+        
+        return {
+            'num_probationary' : len( self._probationary_keys_to_sizes ),
+            'num_protected' : len( self._protected_keys_to_sizes ),
+            'protected_bytes' : self._protected_size,
+            'protected_bytes_limit' : self._protected_size_limit,
+            'promotions' : self._num_promotions,
+            'demotions' : self._num_demotions
+        }
+        
+    
+    def NotifySizeChanged( self, key, size: int ):
+        
+        if key in self._protected_keys_to_sizes:
+            
+            self._protected_size += size - self._protected_keys_to_sizes[ key ]
+            
+            self._protected_keys_to_sizes[ key ] = size
+            
+            self._DemoteOverflow()
+            
+        elif key in self._probationary_keys_to_sizes:
+            
+            self._probationary_keys_to_sizes[ key ] = size
+            
+        
+    
+    def SetCacheSize( self, cache_size: int ):
+        
+        self._protected_size_limit = int( cache_size * self.PROTECTED_FRACTION )
+        
+        self._DemoteOverflow()
+        
+    
+    def Touch( self, key ):
+        
+        if key in self._protected_keys_to_sizes:
+            
+            self._protected_keys_to_sizes.move_to_end( key )
+            
+        elif key in self._probationary_keys_to_sizes:
+            
+            now = time.monotonic()
+            
+            if now - self._probationary_keys_to_last_access_times[ key ] < self.CORRELATED_ACCESS_PERIOD:
+                
+                self._probationary_keys_to_sizes.move_to_end( key )
+                self._probationary_keys_to_last_access_times[ key ] = now
+                
+                return
+                
+            
+            size = self._probationary_keys_to_sizes[ key ]
+            
+            del self._probationary_keys_to_sizes[ key ]
+            del self._probationary_keys_to_last_access_times[ key ]
+            
+            self._protected_keys_to_sizes[ key ] = size
+            self._protected_size += size
+            
+            self._num_promotions += 1
+            
+            self._DemoteOverflow()
+            
+        
+    
+
+def GenerateEvictionPolicy( eviction_policy: int, cache_size: int ):
+    
+    if eviction_policy == CACHE_EVICTION_POLICY_SEGMENTED_LRU:
+        
+        return DataCacheEvictionPolicySegmentedLRU( cache_size )
+        
+    else:
+        
+        return DataCacheEvictionPolicyLRU()
+        
+    
+
 class DataCache( object ):
     
-    def __init__( self, controller: "CG.ClientController.Controller", name, cache_size, timeout = 1200 ):
+    def __init__( self, controller: "CG.ClientController.Controller", name, cache_size, timeout = 1200, eviction_policy = CACHE_EVICTION_POLICY_LRU ):
         
         self._controller = controller
         self._name = name
         self._cache_size = cache_size
         self._timeout = timeout
         
-        self._keys_to_data: collections.OrderedDict[ typing.Any, DataCacheEntry ] = collections.OrderedDict()
+        self._keys_to_data: dict[ typing.Any, DataCacheEntry ] = {}
+        
+        self._eviction_policy_type = eviction_policy
+        self._eviction_policy = GenerateEvictionPolicy( self._eviction_policy_type, self._cache_size )
         
         self._total_estimated_memory_footprint = 0
         
+        self._num_hits = 0
+        self._num_misses = 0
+        self._num_adds = 0
+        self._num_added_bytes = 0
+        self._num_evictions = 0
+        self._num_evicted_bytes = 0
+        
         self._lock = threading.Lock()
         
         self._controller.sub( self, 'MaintainCache', 'memory_maintenance_pulse' )
@@ -66,6 +299,8 @@ class DataCache( object ):
         
         del self._keys_to_data[ key ]
         
+        self._eviction_policy.Delete( key )
+        
         self._total_estimated_memory_footprint -= entry.size_estimate
         
         if HG.cache_report_mode:
@@ -87,7 +322,9 @@ class DataCache( object ):
         
         expected_free_space = self._cache_size - self._total_estimated_memory_footprint
         
-        for ( key, entry ) in self._keys_to_data.items():
+        for key in self._IterateKeysInEvictionOrder():
+            
+            entry = self._keys_to_data[ key ]
             
             if not entry.data.IsFinishedLoading():
                 
@@ -108,7 +345,7 @@ class DataCache( object ):
             
             for key in deletee_keys:
                 
-                self._Delete( key )
+                self._Evict( key )
                 
             
             return True
@@ -122,10 +359,24 @@ class DataCache( object ):
     
     def _DeleteOldestItem( self ):
         
-        ( key, entry ) = self._keys_to_data.popitem( last = False )
+        key = next( self._IterateKeysInEvictionOrder() )
+        
+        self._Evict( key )
+        
+    
+    def _Evict( self, key ):
+        
+        entry = self._keys_to_data[ key ]
+        
+        del self._keys_to_data[ key ]
+        
+        self._eviction_policy.Delete( key )
         
         self._total_estimated_memory_footprint -= entry.size_estimate
         
+        self._num_evictions += 1
+        self._num_evicted_bytes += entry.size_estimate
+        
         if HG.cache_report_mode:
             
             HydrusData.ShowText( 'Cache "{}" removing oldest item "{}", size "{}". Current size {}.'.format( self._name, key, HydrusData.ToHumanBytes( entry.size_estimate ), HydrusData.ConvertValueRangeToBytes( self._total_estimated_memory_footprint, self._cache_size ) ) )
@@ -136,9 +387,13 @@ class DataCache( object ):
         
         if key not in self._keys_to_data:
             
+            self._num_misses += 1
+            
             raise Exception( f'Cache error! Looking for "{key}", but it was missing.' )
             
         
+        self._num_hits += 1
+        
         self._TouchKey( key )
 
         entry = self._keys_to_data[ key ]
@@ -154,14 +409,24 @@ class DataCache( object ):
             
             entry.size_estimate = new_estimate
             
+            self._eviction_policy.NotifySizeChanged( key, new_estimate )
+            
         
         return data
         
     
+    def _IterateKeysInEvictionOrder( self ):
+        
+        for segment in self._eviction_policy.GetSegments():
+            
+            yield from segment.keys()
+            
+        
+    
     def _TouchKey( self, key ):
         
         self._keys_to_data[ key ].touch()
-        self._keys_to_data.move_to_end( key )
+        self._eviction_policy.Touch( key )
         
     
     def Clear( self ):
@@ -170,6 +435,8 @@ class DataCache( object ):
             
             self._keys_to_data.clear()
             
+            self._eviction_policy.Clear()
+            
             self._total_estimated_memory_footprint = 0
             
         
@@ -180,7 +447,7 @@ class DataCache( object ):
             
             if key not in self._keys_to_data:
                 
-                while self._total_estimated_memory_footprint > self._cache_size:
+                while self._total_estimated_memory_footprint > self._cache_size and len( self._keys_to_data ) > 0:
                     
                     self._DeleteOldestItem()
                     
@@ -191,8 +458,13 @@ class DataCache( object ):
                 
                 self._keys_to_data[ key ] = entry
                 
+                self._eviction_policy.Add( key, entry.size_estimate )
+                
                 self._total_estimated_memory_footprint += entry.size_estimate
                 
+                self._num_adds += 1
+                self._num_added_bytes += entry.size_estimate
+                
                 if HG.cache_report_mode:
                     
                     HydrusData.ShowText(
@@ -242,6 +514,8 @@ class DataCache( object ):
                 
             else:
                 
+                self._num_misses += 1
+                
                 return None
                 
             
@@ -255,6 +529,33 @@ class DataCache( object ):
             
         
     
+    def GetStats( self ) -> dict:
+        
+        with self._lock:
+            
+            num_lookups = self._num_hits + self._num_misses
+            
+            stats = {
+                'name' : self._name,
+                'eviction_policy' : cache_eviction_policy_str_lookup[ self._eviction_policy_type ],
+                'num_items' : len( self._keys_to_data ),
+                'size_bytes' : self._total_estimated_memory_footprint,
+                'size_limit_bytes' : self._cache_size,
+                'hits' : self._num_hits,
+                'misses' : self._num_misses,
+                'hit_rate' : self._num_hits / num_lookups if num_lookups > 0 else None,
+                'adds' : self._num_adds,
+                'added_bytes' : self._num_added_bytes,
+                'evictions' : self._num_evictions,
+                'evicted_bytes' : self._num_evicted_bytes
+            }
+            
+            stats.update( self._eviction_policy.GetStats() )
+            
+            return stats
+            
+        
+    
     def HasData( self, key ) -> bool:
         
         with self._lock:
@@ -276,26 +577,27 @@ class DataCache( object ):
                 
                 older_than_this_has_timed_out = time.monotonic() - self._timeout
                 
-                num_to_remove = 0
+                deletee_keys = []
                 
-                for entry in self._keys_to_data.values():
+                # each segment is oldest first, so we can stop at the first fresh guy in each
+                for segment in self._eviction_policy.GetSegments():
                     
-                    if entry.last_access_time < older_than_this_has_timed_out:
-                        
-                        num_to_remove += 1
+                    for key in segment.keys():
                         
-                    else:
-                        
-                        break
+                        if self._keys_to_data[ key ].last_access_time < older_than_this_has_timed_out:
+                            
+                            deletee_keys.append( key )
+                            
+                        else:
+                            
+                            break
+                            
                         
                     
                 
-                if num_to_remove > 0:
+                for key in deletee_keys:
                     
-                    for i in range( num_to_remove ):
-                        
-                        self._DeleteOldestItem()
-                        
+                    self._Evict( key )
                     
                 
             
@@ -308,10 +610,33 @@ class DataCache( object ):
             self._cache_size = cache_size
             self._timeout = timeout
             
+            self._eviction_policy.SetCacheSize( self._cache_size )
+            
         
         self.MaintainCache()
         
     
+    def SetEvictionPolicy( self, eviction_policy: int ):
+        
+        with self._lock:
+            
+            if eviction_policy == self._eviction_policy_type:
+                
+                return
+                
+            
+            old_keys_in_eviction_order = list( self._IterateKeysInEvictionOrder() )
+            
+            self._eviction_policy_type = eviction_policy
+            self._eviction_policy = GenerateEvictionPolicy( self._eviction_policy_type, self._cache_size )
+            
+            for key in old_keys_in_eviction_order:
+                
+                self._eviction_policy.Add( key, self._keys_to_data[ key ].size_estimate )
+                
+            
+        
+    
     def TouchKey( self, key ):
         
         with self._lock:
@@ -0,0 +1,461 @@
+import collections
+import mmap
+import os
+import re
+import struct
+import threading
+
+from hydrus.core import HydrusPaths
+
+# normally every thumbnail is its own loose file, so populating a fresh page of 10k results is 10k open/read/close on the thumbnail drive
+# this keeps a second copy of thumbnails in a few big append-only pack files, read through mmap, with a hash index we load on boot
+# it is only ever a cache. the loose files are still the truth, and anything that changes a thumbnail tells us to forget our copy
+
+INDEX_FILENAME = 'thumbnails.index'
+PACK_FILENAME_TEMPLATE = 'thumbnails_{}.pack'
+PACK_FILENAME_RE = re.compile( r'^thumbnails_(\d+)\.pack$' )
+
+# hash, pack number, offset, length. a length of 0 means 'forget this hash'
+INDEX_RECORD_STRUCT = struct.Struct( '<32sHQI' )
+
+MAX_PACK_SIZE = 1024 * 1048576
+
+# we never rewrite packs in place. when enough of the store is dead space, we wipe it and let it fill back up from the loose files
+MIN_DEAD_BYTES_FOR_RESET = 256 * 1048576
+
+def DeleteThumbnailPackStore( directory: str ):
+    
+    if os.path.exists( directory ):
+        
+        HydrusPaths.DeletePath( directory )
+        
+    
+
+class ThumbnailPackStore( object ):
+    
+    def __init__( self, directory: str ):
+        
+        self._directory = directory
+        
+        self._lock = threading.Lock()
+        
+        self._closed = False
+        
+        self._hashes_to_locations = {}
+        
+        self._live_bytes = 0
+        self._dead_bytes = 0
+        
+        self._pack_nums_to_mmaps = {}
+        
+        # reads copy out of the mmap outside the lock, so an mmap we remap or close while someone is reading it waits here until they are done
+        self._mmap_ids_to_num_readers = collections.Counter()
+        self._retired_mmap_ids_to_mmaps = {}
+        
+        self._index_file = None
+        self._write_pack_num = 0
+        self._write_pack_file = None
+        
+        HydrusPaths.MakeSureDirectoryExists( self._directory )
+        
+        self._LoadIndex()
+        
+    
+    def _AppendIndexRecord( self, hash: bytes, pack_num: int, offset: int, length: int ):
+        
+        self._index_file.write( INDEX_RECORD_STRUCT.pack( hash, pack_num, offset, length ) )
+        self._index_file.flush()
+        
+    
+    def _CloseFiles( self ):
+        
+        for mm in self._pack_nums_to_mmaps.values():
+            
+            self._RetireMMap( mm )
+            
+        
+        self._pack_nums_to_mmaps = {}
+        
+        if self._write_pack_file is not None:
+            
+            self._write_pack_file.close()
+            
+            self._write_pack_file = None
+            
+        
+        if self._index_file is not None:
+            
+            self._index_file.close()
+            
+            self._index_file = None
+            
+        
+    
+    def _Forget( self, hash: bytes ):
+        
+        ( pack_num, offset, length ) = self._hashes_to_locations.pop( hash )
+        
+        self._live_bytes -= length
+        self._dead_bytes += length
+        
+    
+    def _GetIndexPath( self ):
+        
+        return os.path.join( self._directory, INDEX_FILENAME )
+        
+    
+    def _GetMMap( self, pack_num: int, needed_end: int ) -> mmap.mmap:
+        
+        mm = self._pack_nums_to_mmaps.get( pack_num, None )
+        
+        if mm is None or len( mm ) < needed_end:
+            
+            # the pack grew since we mapped it
+            
+            if mm is not None:
+                
+                self._RetireMMap( mm )
+                
+                del self._pack_nums_to_mmaps[ pack_num ]
+                
+            
+            with open( self._GetPackPath( pack_num ), 'rb' ) as f:
+                
+                mm = mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_READ )
+                
+            
+            self._pack_nums_to_mmaps[ pack_num ] = mm
+            
+        
+        return mm
+        
+    
+    def _GetPackPath( self, pack_num: int ):
+        
+        return os.path.join( self._directory, PACK_FILENAME_TEMPLATE.format( pack_num ) )
+        
+    
+    def _LoadIndex( self ):
+        
+        pack_nums_to_sizes = {}
+        
+        for filename in os.listdir( self._directory ):
+            
+            m = PACK_FILENAME_RE.match( filename )
+            
+            if m is not None:
+                
+                pack_nums_to_sizes[ int( m.group( 1 ) ) ] = os.path.getsize( os.path.join( self._directory, filename ) )
+                
+            
+        
+        index_path = self._GetIndexPath()
+        
+        if os.path.exists( index_path ):
+            
+            with open( index_path, 'rb' ) as f:
+                
+                index_bytes = f.read()
+                
+            
+            num_good_bytes = len( index_bytes ) - ( len( index_bytes ) % INDEX_RECORD_STRUCT.size )
+            
+            if num_good_bytes < len( index_bytes ):
+                
+                # we crashed halfway through a record write
+                
+                with open( index_path, 'r+b' ) as f:
+                    
+                    f.truncate( num_good_bytes )
+                    
+                
+            
+            for ( hash, pack_num, offset, length ) in INDEX_RECORD_STRUCT.iter_unpack( index_bytes[ : num_good_bytes ] ):
+                
+                if hash in self._hashes_to_locations:
+                    
+                    self._Forget( hash )
+                    
+                
+                if length == 0:
+                    
+                    continue
+                    
+                
+                if pack_num not in pack_nums_to_sizes or offset + length > pack_nums_to_sizes[ pack_num ]:
+                    
+                    continue
+                    
+                
+                self._hashes_to_locations[ hash ] = ( pack_num, offset, length )
+                
+                self._live_bytes += length
+                
+            
+        
+        if len( pack_nums_to_sizes ) > 0:
+            
+            self._write_pack_num = max( pack_nums_to_sizes.keys() )
+            
+        
+        self._index_file = open( index_path, 'ab' )
+        
+    
+    def _OpenWritePackFile( self, num_bytes_to_write: int ):
+        
+        if self._write_pack_file is None:
+            
+            self._write_pack_file = open( self._GetPackPath( self._write_pack_num ), 'ab' )
+            
+        
+        if self._write_pack_file.tell() > 0 and self._write_pack_file.tell() + num_bytes_to_write > MAX_PACK_SIZE:
+            
+            self._write_pack_file.close()
+            
+            self._write_pack_num += 1
+            
+            self._write_pack_file = open( self._GetPackPath( self._write_pack_num ), 'ab' )
+            
+        
+    
+    def _ReleaseMMap( self, mm: mmap.mmap ):
+        
+        mm_id = id( mm )
+        
+        self._mmap_ids_to_num_readers[ mm_id ] -= 1
+        
+        if self._mmap_ids_to_num_readers[ mm_id ] <= 0:
+            
+            del self._mmap_ids_to_num_readers[ mm_id ]
+            
+            if mm_id in self._retired_mmap_ids_to_mmaps:
+                
+                self._retired_mmap_ids_to_mmaps.pop( mm_id ).close()
+                
+            
+        
+    
+    def _ResetIfMostlyDead( self ):
+        
+        if self._dead_bytes > MIN_DEAD_BYTES_FOR_RESET and self._dead_bytes > self._live_bytes:
+            
+            self._CloseFiles()
+            
+            DeleteThumbnailPackStore( self._directory )
+            
+            HydrusPaths.MakeSureDirectoryExists( self._directory )
+            
+            self._hashes_to_locations = {}
+            
+            self._live_bytes = 0
+            self._dead_bytes = 0
+            
+            self._write_pack_num = 0
+            
+            self._index_file = open( self._GetIndexPath(), 'ab' )
+            
+        
+    
+    def _RetireMMap( self, mm: mmap.mmap ):
+        
+        if id( mm ) in self._mmap_ids_to_num_readers:
+            
+            self._retired_mmap_ids_to_mmaps[ id( mm ) ] = mm
+            
+        else:
+            
+            mm.close()
+            
+        
+    
+    def AddThumbnailBytes( self, hash: bytes, thumbnail_bytes: bytes ):
+        
+        if len( thumbnail_bytes ) == 0:
+            
+            return
+            
+        
+        with self._lock:
+            
+            if self._closed:
+                
+                return
+                
+            
+            if hash in self._hashes_to_locations:
+                
+                self._Forget( hash )
+                
+            
+            self._OpenWritePackFile( len( thumbnail_bytes ) )
+            
+            offset = self._write_pack_file.tell()
+            
+            self._write_pack_file.write( thumbnail_bytes )
+            self._write_pack_file.flush()
+            
+            # the index record goes in only once the data is safely in the pack, so a crash here leaves orphan bytes, never a bad pointer
+            self._AppendIndexRecord( hash, self._write_pack_num, offset, len( thumbnail_bytes ) )
+            
+            self._hashes_to_locations[ hash ] = ( self._write_pack_num, offset, len( thumbnail_bytes ) )
+            
+            self._live_bytes += len( thumbnail_bytes )
+            
+            self._ResetIfMostlyDead()
+            
+        
+    
+    def Close( self ):
+        
+        with self._lock:
+            
+            self._closed = True
+            
+            self._CloseFiles()
+            
+        
+    
+    def DeleteThumbnails( self, hashes ):
+        
+        with self._lock:
+            
+            if self._closed:
+                
+                return
+                
+            
+            for hash in hashes:
+                
+                if hash in self._hashes_to_locations:
+                    
+                    self._Forget( hash )
+                    
+                    self._AppendIndexRecord( hash, 0, 0, 0 )
+                    
+                
+            
+            self._ResetIfMostlyDead()
+            
+        
+    
+    def GetStats( self ) -> dict:
+        
+        with self._lock:
+            
+            return {
+                'num_thumbnails' : len( self._hashes_to_locations ),
+                'live_bytes' : self._live_bytes,
+                'dead_bytes' : self._dead_bytes,
+                'num_packs' : self._write_pack_num + 1
+            }
+            
+        
+    
+    def GetThumbnailBytes( self, hash: bytes ) -> bytes | None:
+        
+        # we only hold the lock to find the data. the copy out of the mmap may page in from disk, and other threads shouldn't wait on that
+        
+        with self._lock:
+            
+            if self._closed or hash not in self._hashes_to_locations:
+                
+                return None
+                
+            
+            location = self._hashes_to_locations[ hash ]
+            
+            ( pack_num, offset, length ) = location
+            
+            try:
+                
+                mm = self._GetMMap( pack_num, offset + length )
+                
+            except ( OSError, ValueError ):
+                
+                self._Forget( hash )
+                
+                return None
+                
+            
+            self._mmap_ids_to_num_readers[ id( mm ) ] += 1
+            
+        
+        try:
+            
+            thumbnail_bytes = mm[ offset : offset + length ]
+            
+        except ( OSError, ValueError ):
+            
+            thumbnail_bytes = None
+            
+        finally:
+            
+            with self._lock:
+                
+                self._ReleaseMMap( mm )
+                
+            
+        
+        if thumbnail_bytes is None or len( thumbnail_bytes ) != length:
+            
+            # the pack got truncated under us somehow
+            
+            with self._lock:
+                
+                # it may have been replaced while we were reading
+                if self._hashes_to_locations.get( hash, None ) == location:
+                    
+                    self._Forget( hash )
+                    
+                
+            
+            return None
+            
+        
+        return thumbnail_bytes
+        
+    
+    def HasThumbnail( self, hash: bytes ) -> bool:
+        
+        with self._lock:
+            
+            return hash in self._hashes_to_locations
+            
+        
+    
+    def WillNeed( self, hashes ):
+        
+        # a hint that we are about to read these. we tell the OS in pack order, so on a spinning disk it can do one sweep instead of seeking around
+        
+        if not hasattr( mmap, 'MADV_WILLNEED' ):
+            
+            return
+            
+        
+        with self._lock:
+            
+            if self._closed:
+                
+                return
+                
+            
+            locations = sorted( ( self._hashes_to_locations[ hash ] for hash in hashes if hash in self._hashes_to_locations ) )
+            
+            for ( pack_num, offset, length ) in locations:
+                
+                try:
+                    
+                    mm = self._GetMMap( pack_num, offset + length )
+                    
+                    start = offset - ( offset % mmap.PAGESIZE )
+                    
+                    mm.madvise( mmap.MADV_WILLNEED, start, offset + length - start )
+                    
+                except ( OSError, ValueError ):
+                    
+                    continue
+                    
+                
+            
+        
+    
@@ -2,9 +2,11 @@ import collections
 import collections.abc
 import hashlib
 import itertools    
+import json
 import math
 import os
 import sqlite3
+import threading
 import time
 import traceback
 import typing
@@ -36,6 +38,7 @@ from hydrus.client import ClientThreading
 from hydrus.client import ClientTime
 from hydrus.client.db import ClientDBDefinitionsCache
 from hydrus.client.db import ClientDBContentUpdates
+from hydrus.client.db import ClientDBFileChangeJournal
 from hydrus.client.db import ClientDBFileDeleteLock
 from hydrus.client.db import ClientDBFilesDuplicatesAutoResolutionSearch
 from hydrus.client.db import ClientDBFilesDuplicatesAutoResolutionStorage
@@ -183,6 +186,9 @@ from hydrus.client.networking import ClientNetworkingBandwidthLegacy
 # ▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▓▓██▓▓▓▒▒▓▓▓▓▒▓▓▓▓▓▓▓▓▓▓▓▓▓▓▓▓▓▓▒▒▒▒▓▓▓▓▓▓▓▓▓▓▓▓▓▓▓▓▓▒▒▒▓▓        ▒░▓░  ░░ ▒▓▒▒▒▒▒▒
 # ▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒░░░░▒▒░░▓▓▒▓▓▓▒▒▒▒▒▒▒▒▒▒▒▒▒▒▓▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▒▓▓▓▓▓  ░▒▒▒▒       ▓████▒     ▒▒▒▒▒▒▒▒
 
+# sits next to the db files in the backup folder and remembers what each file folder looked like last time
+CLIENT_FILES_BACKUP_MANIFEST_FILENAME = 'client_files_backup_manifest.json'
+
 def report_content_speed_to_job_status( job_status, rows_done, total_rows, precise_timestamp, num_rows, row_name ):
     
     it_took = HydrusTime.GetNowPrecise() - precise_timestamp
@@ -242,10 +248,34 @@ class DB( HydrusDB.HydrusDB ):
     
     READ_WRITE_ACTIONS = [ 'service_info', 'system_predicates', 'missing_thumbnail_hashes' ]
     
+    # every other write wipes the file search result cache, since we can't know what it changed
+    WRITE_ACTIONS_THAT_DO_NOT_AFFECT_FILE_SEARCH = {
+        'analyze',
+        'dirty_services',
+        'file_maintenance_add_jobs',
+        'file_maintenance_add_jobs_hashes',
+        'file_maintenance_cancel_jobs',
+        'maintain_hashed_serialisables',
+        'null',
+        'push_recent_tags',
+        'register_shutdown_work',
+        'serialisable_simple'
+    }
+    
+    # the options hold search settings, and the domain manager holds the url classes that system:known url matches against
+    SERIALISABLE_TYPES_THAT_AFFECT_FILE_SEARCH = {
+        HydrusSerialisable.SERIALISABLE_TYPE_CLIENT_OPTIONS,
+        HydrusSerialisable.SERIALISABLE_TYPE_NETWORK_DOMAIN_MANAGER
+    }
+    
+    PARALLEL_READ_ACTIONS = [ 'file_hashes', 'hash_ids_to_hashes', 'media_results', 'media_results_from_ids' ]
+    
     def __init__( self, controller: "CG.ClientController.Controller", db_dir, db_name ):
         
         self._initial_messages = []
         
+        self._backup_lock = threading.Lock()
+        
         self._have_printed_a_cannot_vacuum_message = False
         
         self._after_job_content_update_packages = []
@@ -330,6 +360,136 @@ class DB( HydrusDB.HydrusDB ):
     
     def _Backup( self, path ):
         
+        if HG.db_journal_mode != 'WAL':
+            
+            # outside of WAL, a long read blocks every write, so we do it the old way with everything closed
+            self._BackupOffline( path )
+            
+            return
+            
+        
+        if not self._backup_lock.acquire( False ):
+            
+            HydrusData.ShowText( 'A database backup is already running!' )
+            
+            return
+            
+        
+        # the backup reads with its own connection, so it needs to see everything we have done so far
+        self._cursor_transaction_wrapper.CommitAndBegin()
+        
+        db_dir = self._db_dir
+        db_filenames = dict( self._db_filenames )
+        additional_filenames = self._GetPossibleAdditionalDBFilenames()
+        
+        def do_it():
+            
+            job_status = ClientThreading.JobStatus( cancellable = True )
+            
+            job_status.SetStatusTitle( 'backing up db' )
+            
+            self._controller.pub( 'message', job_status )
+            
+            started = HydrusTime.GetNowFloat()
+            
+            def is_cancelled_hook():
+                
+                return job_status.IsCancelled()
+                
+            
+            def text_update_hook( text ):
+                
+                job_status.SetStatusText( text )
+                
+            
+            try:
+                
+                HydrusPaths.MakeSureDirectoryExists( path )
+                
+                HydrusDB.BackupDBFilesOnline( db_dir, db_filenames, path, text_update_hook = text_update_hook, is_cancelled_hook = is_cancelled_hook )
+                
+                for additional_filename in additional_filenames:
+                    
+                    source = os.path.join( db_dir, additional_filename )
+                    dest = os.path.join( path, additional_filename )
+                    
+                    if os.path.exists( source ):
+                        
+                        HydrusPaths.MirrorFile( source, dest )
+                        
+                    
+                
+                client_files_default = os.path.join( db_dir, 'client_files' )
+                
+                if os.path.exists( client_files_default ):
+                    
+                    manifest_path = os.path.join( path, CLIENT_FILES_BACKUP_MANIFEST_FILENAME )
+                    
+                    manifest = {}
+                    
+                    if os.path.exists( manifest_path ):
+                        
+                        try:
+                            
+                            with open( manifest_path, 'r', encoding = 'utf-8' ) as f:
+                                
+                                manifest = json.load( f )
+                                
+                            
+                        except Exception as e:
+                            
+                            HydrusData.Print( f'Could not read the backup manifest at "{manifest_path}", so every file folder will be checked. Error follows:' )
+                            HydrusData.PrintException( e, do_wait = False )
+                            
+                        
+                    
+                    def save_manifest( manifest_to_save ):
+                        
+                        with open( manifest_path, 'w', encoding = 'utf-8' ) as f:
+                            
+                            json.dump( manifest_to_save, f )
+                            
+                        
+                    
+                    # even a cancelled or failed run gives us the folders it finished, so the next one can skip them
+                    manifest = HydrusPaths.MirrorTreeWithManifest( client_files_default, os.path.join( path, 'client_files' ), manifest, text_update_hook = text_update_hook, is_cancelled_hook = is_cancelled_hook, partial_manifest_hook = save_manifest )
+                    
+                    save_manifest( manifest )
+                    
+                
+                if job_status.IsCancelled():
+                    
+                    job_status.SetStatusText( 'backup cancelled!' )
+                    
+                else:
+                    
+                    job_status.SetStatusText( 'backup complete in {}!'.format( HydrusTime.TimeDeltaToPrettyTimeDelta( HydrusTime.GetNowFloat() - started ) ) )
+                    
+                
+            except ( HydrusExceptions.CancelledException, HydrusExceptions.ShutdownException ):
+                
+                job_status.SetStatusText( 'backup cancelled!' )
+                
+            except Exception as e:
+                
+                job_status.SetStatusText( 'backup failed!' )
+                
+                HydrusData.ShowText( f'The database backup to "{path}" failed! The error follows:' )
+                HydrusData.ShowException( e )
+                
+            finally:
+                
+                job_status.Finish()
+                
+                self._backup_lock.release()
+                
+            
+        
+        self._controller.CallToThreadLongRunning( do_it )
+        
+    
+    def _BackupOffline( self, path ):
+        
         self._CloseDBConnection()
         
         job_status = ClientThreading.JobStatus( cancellable = True )
@@ -408,32 +568,40 @@ class DB( HydrusDB.HydrusDB ):
         tag_ids_in_dispute.update( self.modules_tag_siblings.GetAllTagIds( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, tag_service_id ) )
         tag_ids_in_dispute.update( self.modules_tag_parents.GetAllTagIds( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, tag_service_id ) )
         
-        for tag_id in tag_ids_in_dispute:
-            
-            storage_implication_tag_ids = { tag_id }
+        for block_of_tag_ids in HydrusLists.SplitIteratorIntoChunks( tag_ids_in_dispute, 1024 ):
             
-            actual_implication_tag_ids = self.modules_tag_display.GetImpliedBy( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, tag_service_id, tag_id )
+            tag_ids_to_implied_by = self.modules_tag_display.GetTagsToImpliedBy( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, tag_service_id, block_of_tag_ids )
             
-            add_implication_tag_ids = actual_implication_tag_ids.difference( storage_implication_tag_ids )
+            tag_ids_to_add_implied_by = {}
+            tag_ids_to_delete_implied_by = {}
             
-            if len( add_implication_tag_ids ) > 0:
+            for tag_id in block_of_tag_ids:
                 
-                for file_service_id in file_service_ids:
+                storage_implication_tag_ids = { tag_id }
+                
+                actual_implication_tag_ids = tag_ids_to_implied_by[ tag_id ]
+                
+                add_implication_tag_ids = actual_implication_tag_ids.difference( storage_implication_tag_ids )
+                
+                if len( add_implication_tag_ids ) > 0:
                     
-                    self.modules_mappings_cache_specific_display.AddImplications( file_service_id, tag_service_id, add_implication_tag_ids, tag_id )
+                    tag_ids_to_add_implied_by[ tag_id ] = add_implication_tag_ids
                     
                 
-            
-            delete_implication_tag_ids = storage_implication_tag_ids.difference( actual_implication_tag_ids )
-            
-            if len( delete_implication_tag_ids ) > 0:
+                delete_implication_tag_ids = storage_implication_tag_ids.difference( actual_implication_tag_ids )
                 
-                for file_service_id in file_service_ids:
+                if len( delete_implication_tag_ids ) > 0:
                     
-                    self.modules_mappings_cache_specific_display.DeleteImplications( file_service_id, tag_service_id, delete_implication_tag_ids, tag_id )
+                    tag_ids_to_delete_implied_by[ tag_id ] = delete_implication_tag_ids
                     
                 
             
+            for file_service_id in file_service_ids:
+                
+                self.modules_mappings_cache_specific_display.AddImplications( file_service_id, tag_service_id, tag_ids_to_add_implied_by )
+                self.modules_mappings_cache_specific_display.DeleteImplications( file_service_id, tag_service_id, tag_ids_to_delete_implied_by )
+                
+            
         
         for block_of_tag_ids in HydrusLists.SplitIteratorIntoChunks( tag_ids_in_dispute, 1024 ):
             
@@ -826,17 +994,12 @@ class DB( HydrusDB.HydrusDB ):
             
             file_service_ids = self.modules_services.GetServiceIds( HC.FILE_SERVICES_WITH_SPECIFIC_MAPPING_CACHES )
             
+            # every chain that changed is done together in one set-based pass per file domain
+            
             for file_service_id in file_service_ids:
                 
-                for ( tag_id, implication_tag_ids ) in tag_ids_to_delete_implied_by.items():
-                    
-                    self.modules_mappings_cache_specific_display.DeleteImplications( file_service_id, tag_service_id, implication_tag_ids, tag_id )
-                    
-                
-                for ( tag_id, implication_tag_ids ) in tag_ids_to_add_implied_by.items():
-                    
-                    self.modules_mappings_cache_specific_display.AddImplications( file_service_id, tag_service_id, implication_tag_ids, tag_id )
-                    
+                self.modules_mappings_cache_specific_display.DeleteImplications( file_service_id, tag_service_id, tag_ids_to_delete_implied_by )
+                self.modules_mappings_cache_specific_display.AddImplications( file_service_id, tag_service_id, tag_ids_to_add_implied_by )
                 
             
             for ( tag_id, implication_tag_ids ) in tag_ids_to_delete_implied_by.items():
@@ -1979,6 +2142,17 @@ class DB( HydrusDB.HydrusDB ):
         return boned_stats
         
     
+    def _GetDeferredPhysicalDelete( self ):
+        
+        if self._backup_lock.locked():
+            
+            # an online backup copies client_files after it has snapshotted the db, so a file deleted in that window would be missing from the backup even though its db still has it
+            return ( None, None )
+            
+        
+        return self.modules_files_storage.GetDeferredPhysicalDelete()
+        
+    
     def _GetFileHistory( self, num_steps: int, file_search_context: ClientSearchFileSearchContext.FileSearchContext = None, job_status = None ):
         
         # TODO: clean this up. it is a mess cribbed from the boned work, and I'm piping similar nonsense down to the db tables
@@ -2954,6 +3128,62 @@ class DB( HydrusDB.HydrusDB ):
         return None
         
     
+    def _GetParallelReadCommandsToMethods( self, c: sqlite3.Cursor, parallel_read_snapshot: HydrusDB.ParallelReadSnapshot ) -> dict:
+        
+        # a read-only copy of what media results needs. no transaction wrapper or maintenance module, so anything that tries to write falls over and the job goes to the main thread
+        
+        modules_services = ClientDBServices.ClientDBMasterServices( c )
+        modules_hashes = ClientDBMaster.ClientDBMasterHashes( c )
+        modules_tags = ClientDBMaster.ClientDBMasterTags( c )
+        modules_urls = ClientDBMaster.ClientDBMasterURLs( c )
+        modules_texts = ClientDBMaster.ClientDBMasterTexts( c )
+        
+        modules_files_metadata_basic = ClientDBFilesMetadataBasic.ClientDBFilesMetadataBasic( c )
+        modules_files_viewing_stats = ClientDBFilesViewingStats.ClientDBFilesViewingStats( c )
+        modules_url_map = ClientDBURLMap.ClientDBURLMap( c, modules_urls )
+        modules_notes_map = ClientDBNotesMap.ClientDBNotesMap( c, modules_texts )
+        modules_files_storage = ClientDBFilesStorage.ClientDBFilesStorage( c, None, None, modules_services, modules_hashes, modules_texts )
+        modules_files_timestamps = ClientDBFilesTimestamps.ClientDBFilesTimestamps( c, modules_urls, modules_files_viewing_stats, modules_files_storage )
+        modules_files_inbox = ClientDBFilesInbox.ClientDBFilesInbox( c, modules_services, modules_files_storage, modules_files_timestamps )
+        modules_mappings_counts = ClientDBMappingsCounts.ClientDBMappingsCounts( c, None, modules_services )
+        modules_tags_local_cache = ClientDBDefinitionsCache.ClientDBCacheLocalTags( c, modules_tags, modules_services, modules_mappings_counts )
+        modules_hashes_local_cache = ClientDBDefinitionsCache.ClientDBCacheLocalHashes( c, modules_hashes, modules_services, modules_files_storage )
+        modules_ratings = ClientDBRatings.ClientDBRatings( c, modules_services )
+        modules_service_paths = ClientDBServicePaths.ClientDBServicePaths( c, modules_services, modules_texts, modules_hashes_local_cache )
+        modules_mappings_storage = ClientDBMappingsStorage.ClientDBMappingsStorage( c, None, modules_services )
+        modules_tag_siblings = ClientDBTagSiblings.ClientDBTagSiblings( c, None, modules_services, modules_tags, modules_tags_local_cache )
+        modules_tag_parents = ClientDBTagParents.ClientDBTagParents( c, None, modules_services, modules_tags_local_cache, modules_tag_siblings )
+        modules_tag_display = ClientDBTagDisplay.ClientDBTagDisplay( c, None, modules_services, modules_tags, modules_tags_local_cache, modules_tag_siblings, modules_tag_parents )
+        modules_similar_files = ClientDBSimilarFiles.ClientDBSimilarFiles( c, None, modules_services, modules_hashes, modules_files_storage )
+        
+        modules_media_results = ClientDBMediaResults.ClientDBMediaResults(
+            c,
+            modules_services,
+            modules_hashes_local_cache,
+            modules_tags_local_cache,
+            modules_files_metadata_basic,
+            modules_files_storage,
+            modules_service_paths,
+            modules_files_timestamps,
+            modules_url_map,
+            modules_files_viewing_stats,
+            modules_ratings,
+            modules_notes_map,
+            modules_files_inbox,
+            modules_mappings_storage,
+            modules_tag_display,
+            modules_similar_files,
+            parallel_read_snapshot = parallel_read_snapshot
+        )
+        
+        return {
+            'file_hashes' : modules_hashes.GetFileHashes,
+            'hash_ids_to_hashes' : modules_hashes.GetHashIdsToHashesReadOnly,
+            'media_results' : modules_media_results.GetMediaResultsFromHashes,
+            'media_results_from_ids' : modules_media_results.GetMediaResults
+        }
+        
+    
     def _GetPossibleAdditionalDBFilenames( self ):
         
         paths = HydrusDB.HydrusDB._GetPossibleAdditionalDBFilenames( self )
@@ -3835,7 +4065,7 @@ class DB( HydrusDB.HydrusDB ):
         
         try:
             
-            HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+            HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
             
         except Exception as e:
             
@@ -3898,12 +4128,13 @@ class DB( HydrusDB.HydrusDB ):
                 'autocomplete_predicates' : self.modules_tag_search.GetAutocompletePredicates,
                 'client_files_subfolders' : self.modules_files_physical_storage.GetClientFilesSubfolders,
                 'deferred_delete_data' : self.modules_db_maintenance.GetDeferredDeleteTableData,
-                'deferred_physical_delete' : self.modules_files_storage.GetDeferredPhysicalDelete,
+                'deferred_physical_delete' : self._GetDeferredPhysicalDelete,
                 'duplicates_auto_resolution_actioned_pairs' : self.modules_files_duplicates_auto_resolution_search.GetActionedPairs,
                 'duplicates_auto_resolution_denied_pairs' : self.modules_files_duplicates_auto_resolution_search.GetDeniedPairs,
                 'duplicates_auto_resolution_pending_action_pairs' : self.modules_files_duplicates_auto_resolution_search.GetPendingActionPairs,
                 'duplicates_auto_resolution_resolution_pair' : self.modules_files_duplicates_auto_resolution_search.GetResolutionPair,
                 'duplicates_auto_resolution_rules_with_counts' : self.modules_files_duplicates_auto_resolution_storage.GetRulesWithCounts,
+                'file_change_journal' : self.modules_file_change_journal.GetChanges,
                 'file_duplicate_hashes' : self.modules_files_duplicates_storage.GetFileHashesByDuplicateType,
                 'file_duplicate_info' : self.modules_files_duplicates_storage.GetFileDuplicateInfo,
                 'file_hashes' : self.modules_hashes.GetFileHashes,
@@ -4216,6 +4447,12 @@ class DB( HydrusDB.HydrusDB ):
         
         #
         
+        self.modules_file_change_journal = ClientDBFileChangeJournal.ClientDBFileChangeJournal( self._c, self.modules_hashes_local_cache )
+        
+        self._modules.append( self.modules_file_change_journal )
+        
+        #
+        
         self.modules_recent_tags = ClientDBTagSuggestions.ClientDBRecentTags( self._c, self.modules_tags, self.modules_services, self.modules_tags_local_cache )
         
         self._modules.append( self.modules_recent_tags )
@@ -4366,6 +4603,7 @@ class DB( HydrusDB.HydrusDB ):
             self.modules_files_inbox,
             self.modules_file_delete_lock,
             self.modules_hashes_local_cache,
+            self.modules_file_change_journal,
             self.modules_ratings,
             self.modules_service_paths,
             self.modules_mappings_storage,
@@ -4494,6 +4732,10 @@ class DB( HydrusDB.HydrusDB ):
             HydrusData.ShowText( 'A database exception looked like it could be a very serious \'database image is malformed\' error! Unless you know otherwise, please shut down the client immediately and check the \'Recovery->Help my db is broke\' document in the help.' )
             
         
+        # the transaction is about to be rolled back, so anything we cached in memory during it may be wrong
+        self.modules_similar_files.ResetInMemoryCaches()
+        self.modules_files_query.ClearSearchResultCache()
+        
         if job.IsSynchronous():
             
             db_traceback = 'Database ' + tb
@@ -4955,29 +5197,50 @@ class DB( HydrusDB.HydrusDB ):
         num_done = 0
         still_work_to_do = True
         
-        group_of_hash_ids = self.modules_similar_files.GetSomeHashIdsToSimilarSearch( search_distance, 10 )
+        # we search files in batches, so all their similar files lookups go in one pass. we start small and grow the batch while we have time
+        num_to_get = 16
+        
+        group_of_hash_ids = self.modules_similar_files.GetSomeHashIdsToSimilarSearch( search_distance, num_to_get )
         
         while len( group_of_hash_ids ) > 0:
             
-            for ( i, hash_id ) in enumerate( group_of_hash_ids ):
+            batch_time_started_float = HydrusTime.GetNowFloat()
+            
+            hash_ids_to_similar_hash_ids_and_distances = self.modules_similar_files.SearchFiles( group_of_hash_ids, search_distance )
+            
+            for hash_id in group_of_hash_ids:
                 
                 media_id = self.modules_files_duplicates_storage.GetMediaId( hash_id )
                 
-                potential_duplicate_media_ids_and_distances = [ ( self.modules_files_duplicates_storage.GetMediaId( duplicate_hash_id ), distance ) for ( duplicate_hash_id, distance ) in self.modules_similar_files.SearchFile( hash_id, search_distance ) if duplicate_hash_id != hash_id ]
+                potential_duplicate_media_ids_and_distances = [ ( self.modules_files_duplicates_storage.GetMediaId( duplicate_hash_id ), distance ) for ( duplicate_hash_id, distance ) in hash_ids_to_similar_hash_ids_and_distances[ hash_id ] if duplicate_hash_id != hash_id ]
                 
                 self.modules_files_duplicates_updates.AddPotentialDuplicates( media_id, potential_duplicate_media_ids_and_distances )
                 
-                self.modules_similar_files.SetSearchStatus( hash_id, search_distance )
-                
-                num_done += 1
+            
+            self.modules_similar_files.SetSearchStatuses( group_of_hash_ids, search_distance )
+            
+            num_done += len( group_of_hash_ids )
+            
+            if work_period is not None:
                 
-                if work_period is not None and HydrusTime.TimeHasPassedFloat( time_started_float + work_period ):
+                if HydrusTime.TimeHasPassedFloat( time_started_float + work_period ):
                     
                     return ( still_work_to_do, num_done )
                     
                 
+                batch_time_took = HydrusTime.GetNowFloat() - batch_time_started_float
+                
+                if batch_time_took < work_period / 8:
+                    
+                    num_to_get = min( num_to_get * 2, 1024 )
+                    
+                
+            else:
+                
+                num_to_get = min( num_to_get * 2, 1024 )
+                
             
-            group_of_hash_ids = self.modules_similar_files.GetSomeHashIdsToSimilarSearch( search_distance, 10 )
+            group_of_hash_ids = self.modules_similar_files.GetSomeHashIdsToSimilarSearch( search_distance, num_to_get )
             
         
         still_work_to_do = False
@@ -8477,6 +8740,27 @@ class DB( HydrusDB.HydrusDB ):
             
         
     
+    def _Write( self, action, *args, **kwargs ):
+        
+        if action == 'content_updates':
+            
+            content_update_package = args[0]
+            
+            self.modules_files_query.NotifyContentUpdatePackage( content_update_package )
+            
+        elif action == 'serialisable' and args[0].SERIALISABLE_TYPE not in self.SERIALISABLE_TYPES_THAT_AFFECT_FILE_SEARCH:
+            
+            # sessions, bandwidth, subscriptions and so on
+            pass
+            
+        elif action not in self.WRITE_ACTIONS_THAT_DO_NOT_AFFECT_FILE_SEARCH:
+            
+            self.modules_files_query.ClearSearchResultCache()
+            
+        
+        return HydrusDB.HydrusDB._Write( self, action, *args, **kwargs )
+        
+    
     def pub_content_update_package_after_commit( self, content_update_package ):
         
         self._after_job_content_update_packages.append( content_update_package )
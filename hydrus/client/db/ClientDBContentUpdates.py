@@ -15,6 +15,7 @@ from hydrus.client import ClientLocation
 from hydrus.client.db import ClientDBDefinitionsCache
 from hydrus.client.db import ClientDBFilesInbox
 from hydrus.client.db import ClientDBMappingsStorage
+from hydrus.client.db import ClientDBFileChangeJournal
 from hydrus.client.db import ClientDBFileDeleteLock
 from hydrus.client.db import ClientDBFilesDuplicatesUpdates
 from hydrus.client.db import ClientDBFilesMaintenanceQueue
@@ -65,6 +66,7 @@ class ClientDBContentUpdates( ClientDBModule.ClientDBModule ):
         modules_files_inbox: ClientDBFilesInbox.ClientDBFilesInbox,
         modules_file_delete_lock: ClientDBFileDeleteLock.ClientDBFileDeleteLock,
         modules_hashes_local_cache: ClientDBDefinitionsCache.ClientDBCacheLocalHashes,
+        modules_file_change_journal: ClientDBFileChangeJournal.ClientDBFileChangeJournal,
         modules_ratings: ClientDBRatings.ClientDBRatings,
         modules_service_paths: ClientDBServicePaths.ClientDBServicePaths,
         modules_mappings_storage: ClientDBMappingsStorage.ClientDBMappingsStorage,
@@ -96,6 +98,7 @@ class ClientDBContentUpdates( ClientDBModule.ClientDBModule ):
         self.modules_files_inbox = modules_files_inbox
         self.modules_file_delete_lock = modules_file_delete_lock
         self.modules_hashes_local_cache = modules_hashes_local_cache
+        self.modules_file_change_journal = modules_file_change_journal
         self.modules_ratings = modules_ratings
         self.modules_service_paths = modules_service_paths
         self.modules_mappings_storage = modules_mappings_storage
@@ -156,6 +159,8 @@ class ClientDBContentUpdates( ClientDBModule.ClientDBModule ):
                 self._cursor_transaction_wrapper.pub_after_job( 'notify_new_pending' )
                 
             
+            self.modules_file_change_journal.RecordChanges( HC.CONTENT_TYPE_FILES, new_hash_ids )
+            
             delta_size = self.modules_files_metadata_basic.GetTotalSize( new_hash_ids )
             num_viewable_files = self.modules_files_metadata_basic.GetNumViewable( new_hash_ids )
             num_files = len( new_hash_ids )
@@ -323,6 +328,8 @@ class ClientDBContentUpdates( ClientDBModule.ClientDBModule ):
                 self._cursor_transaction_wrapper.pub_after_job( 'notify_new_pending' )
                 
             
+            self.modules_file_change_journal.RecordChanges( HC.CONTENT_TYPE_FILES, existing_hash_ids )
+            
             delta_size = self.modules_files_metadata_basic.GetTotalSize( existing_hash_ids )
             num_viewable_files = self.modules_files_metadata_basic.GetNumViewable( existing_hash_ids )
             num_existing_files_removed = len( existing_hash_ids )
@@ -464,6 +471,9 @@ class ClientDBContentUpdates( ClientDBModule.ClientDBModule ):
         
         valid_content_update_package = ClientContentUpdates.ContentUpdatePackage()
         
+        # file adds and deletes get journalled down in AddFiles and DeleteFiles, where we know what actually changed
+        journal_content_types_to_hashes = {}
+        
         for ( service_key, content_updates ) in content_update_package.IterateContentUpdates():
             
             try:
@@ -497,6 +507,11 @@ class ClientDBContentUpdates( ClientDBModule.ClientDBModule ):
                 
                 ( data_type, action, row ) = content_update.ToTuple()
                 
+                if data_type in ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_TYPE_NOTES, HC.CONTENT_TYPE_RATINGS, HC.CONTENT_TYPE_URLS ):
+                    
+                    journal_content_types_to_hashes.setdefault( data_type, set() ).update( content_update.GetHashes() )
+                    
+                
                 if service_type in HC.REAL_FILE_SERVICES:
                     
                     if data_type == HC.CONTENT_TYPE_FILES:
@@ -1205,6 +1220,11 @@ class ClientDBContentUpdates( ClientDBModule.ClientDBModule ):
                 
             
         
+        for ( content_type, hashes ) in journal_content_types_to_hashes.items():
+            
+            self.modules_file_change_journal.RecordChanges( content_type, self.modules_hashes_local_cache.GetHashIds( hashes ) )
+            
+        
         if publish_content_updates:
             
             if notify_new_pending:
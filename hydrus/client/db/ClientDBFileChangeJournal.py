@@ -0,0 +1,104 @@
+import collections.abc
+import sqlite3
+
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusDBBase
+from hydrus.core import HydrusTime
+
+from hydrus.client.db import ClientDBDefinitionsCache
+from hydrus.client.db import ClientDBModule
+
+# an external tool that wants to mirror the client has to poll full metadata for everything, which is slow and mostly pointless
+# this journal remembers which files changed in which way, under a sequence number that only ever goes up, so they can ask 'what changed since x?'
+# it is compacted--a file only has one row per content type, and a new change moves it to the end--so it stays about as big as the number of files
+
+JOURNAL_CONTENT_TYPES = {
+    HC.CONTENT_TYPE_FILES,
+    HC.CONTENT_TYPE_MAPPINGS,
+    HC.CONTENT_TYPE_NOTES,
+    HC.CONTENT_TYPE_RATINGS,
+    HC.CONTENT_TYPE_URLS
+}
+
+class ClientDBFileChangeJournal( ClientDBModule.ClientDBModule ):
+    
+    def __init__(
+        self,
+        cursor: sqlite3.Cursor,
+        modules_hashes_local_cache: ClientDBDefinitionsCache.ClientDBCacheLocalHashes
+    ):
+        
+        self.modules_hashes_local_cache = modules_hashes_local_cache
+        
+        super().__init__( 'client file change journal', cursor )
+        
+    
+    def _GetInitialTableGenerationDict( self ) -> dict:
+        
+        return {
+            'main.file_change_journal' : ( 'CREATE TABLE IF NOT EXISTS {} ( sequence_id INTEGER PRIMARY KEY AUTOINCREMENT, hash_id INTEGER, content_type INTEGER, timestamp_ms INTEGER, UNIQUE ( hash_id, content_type ) );', 680 )
+        }
+        
+    
+    def GetChanges( self, since_sequence_id: int, limit: int ):
+        
+        rows = self._Execute( 'SELECT sequence_id, hash_id, content_type, timestamp_ms FROM file_change_journal WHERE sequence_id > ? ORDER BY sequence_id ASC LIMIT ?;', ( since_sequence_id, limit ) ).fetchall()
+        
+        hash_ids_to_hashes = self.modules_hashes_local_cache.GetHashIdsToHashes( hash_ids = { hash_id for ( sequence_id, hash_id, content_type, timestamp_ms ) in rows } )
+        
+        changes = [ ( sequence_id, hash_id, hash_ids_to_hashes[ hash_id ], content_type, timestamp_ms ) for ( sequence_id, hash_id, content_type, timestamp_ms ) in rows ]
+        
+        return ( changes, self.GetLatestSequenceId() )
+        
+    
+    def GetLatestSequenceId( self ) -> int:
+        
+        result = self._Execute( 'SELECT MAX( sequence_id ) FROM file_change_journal;' ).fetchone()
+        
+        if result is None or result[0] is None:
+            
+            return 0
+            
+        
+        return result[0]
+        
+    
+    def GetTablesAndColumnsThatUseDefinitions( self, content_type: int ) -> list[ tuple[ str, str ] ]:
+        
+        tables_and_columns = []
+        
+        if content_type == HC.CONTENT_TYPE_HASH:
+            
+            tables_and_columns.append( ( 'file_change_journal', 'hash_id' ) )
+            
+        
+        return tables_and_columns
+        
+    
+    def RecordChanges( self, content_type: int, hash_ids: collections.abc.Collection[ int ] ):
+        
+        if content_type not in JOURNAL_CONTENT_TYPES or len( hash_ids ) == 0:
+            
+            return
+            
+        
+        now_ms = HydrusTime.GetNowMS()
+        
+        # the REPLACE deletes the old row and gives us a fresh sequence_id, which is the whole point
+        self._ExecuteMany( 'INSERT OR REPLACE INTO file_change_journal ( hash_id, content_type, timestamp_ms ) VALUES ( ?, ?, ? );', ( ( hash_id, content_type, now_ms ) for hash_id in hash_ids ) )
+        
+    
+    def Repair( self, current_db_version, cursor_transaction_wrapper: HydrusDBBase.DBCursorTransactionWrapper ):
+        
+        # the journal is new and starts empty, so a client that predates it just makes it quietly rather than hearing that something is missing
+        
+        if not self._TableExists( 'main.file_change_journal' ):
+            
+            self.CreateInitialTables()
+            
+            cursor_transaction_wrapper.CommitAndBegin()
+            
+        
+        super().Repair( current_db_version, cursor_transaction_wrapper )
+        
+    
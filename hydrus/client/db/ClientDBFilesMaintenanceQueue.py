@@ -132,8 +132,6 @@ class ClientDBFilesMaintenanceQueue( ClientDBModule.ClientDBModule ):
                     hashes_to_job_types[ hash ] = job_types
                     
                 
-                hashes_to_job_types = { hash_ids_to_hashes[ hash_id ] : job_types for ( hash_id, job_types ) in hash_ids_to_job_types.items() }
-                
                 return hashes_to_job_types
                 
             
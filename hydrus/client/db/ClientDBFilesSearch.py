@@ -1,3 +1,4 @@
+import collections
 import collections.abc
 import random
 import sqlite3
@@ -31,6 +32,7 @@ from hydrus.client.db import ClientDBTagSearch
 from hydrus.client.db import ClientDBTagSiblings
 from hydrus.client.db import ClientDBURLMap
 from hydrus.client.media import ClientMediaSort
+from hydrus.client.metadata import ClientContentUpdates
 from hydrus.client.metadata import ClientTags
 from hydrus.client.search import ClientNumberTest
 from hydrus.client.search import ClientSearchFileSearchContext
@@ -39,17 +41,44 @@ from hydrus.client.search import ClientSearchTagContext
 
 SHOWN_UNINITIALISED_SEARCH_ERROR = False
 
-def intersection_update_qhi( query_hash_ids: set[ int ] | None, some_hash_ids: collections.abc.Collection[ int ], force_create_new_set = False ) -> set[ int ]:
+# polling dashboards and refreshing pages ask for the same few searches over and over
+SEARCH_RESULT_CACHE_MAX_NUM_ENTRIES = 64
+SEARCH_RESULT_CACHE_MAX_NUM_HASH_IDS = 8 * 1024 * 1024
+
+# past this many ids, a python set is hundreds of bytes per id and slow to intersect, so we hold the search results in a compact sorted array instead
+COMPACT_QUERY_HASH_IDS_THRESHOLD = 65536
+
+def intersection_update_qhi( query_hash_ids: collections.abc.MutableSet[ int ] | None, some_hash_ids: collections.abc.Collection[ int ], force_create_new_set = False ) -> collections.abc.MutableSet[ int ]:
     
     if query_hash_ids is None:
         
-        if not isinstance( some_hash_ids, set ) or force_create_new_set:
+        if isinstance( some_hash_ids, HydrusLists.SortedIntegerSet ):
+            
+            if force_create_new_set:
+                
+                some_hash_ids = some_hash_ids.copy()
+                
+            
+        else:
+            
+            if not isinstance( some_hash_ids, set ) or force_create_new_set:
+                
+                some_hash_ids = set( some_hash_ids )
+                
             
-            some_hash_ids = set( some_hash_ids )
+            if len( some_hash_ids ) >= COMPACT_QUERY_HASH_IDS_THRESHOLD:
+                
+                some_hash_ids = HydrusLists.SortedIntegerSet( some_hash_ids )
+                
             
         
         return some_hash_ids
         
+    elif isinstance( some_hash_ids, HydrusLists.SortedIntegerSet ) and not isinstance( query_hash_ids, HydrusLists.SortedIntegerSet ):
+        
+        # don't unpack a giant compact set just to check a few ids against it
+        return some_hash_ids.intersection( query_hash_ids )
+        
     else:
         
         query_hash_ids.intersection_update( some_hash_ids )
@@ -97,6 +126,148 @@ class SearchState( object ):
         
     
 
+class FileSearchResultCache( object ):
+    
+    # remembers the raw result sets of recent file searches, before sort and limit, so a page or API client polling the same search doesn't redo all the work
+    # each entry knows which tag services it read and whether it cares about inbox or viewing stats, so the common content updates only knock out what they touched
+    
+    def __init__( self, max_num_entries: int = SEARCH_RESULT_CACHE_MAX_NUM_ENTRIES, max_num_hash_ids: int = SEARCH_RESULT_CACHE_MAX_NUM_HASH_IDS ):
+        
+        self._max_num_entries = max_num_entries
+        self._max_num_hash_ids = max_num_hash_ids
+        
+        # key -> ( hash_ids, tag_service_keys, depends_on_inbox, depends_on_viewing_stats )
+        self._keys_to_entries = collections.OrderedDict()
+        
+        self._num_hash_ids = 0
+        
+    
+    def _Delete( self, key ):
+        
+        ( hash_ids, tag_service_keys, depends_on_inbox, depends_on_viewing_stats ) = self._keys_to_entries.pop( key )
+        
+        self._num_hash_ids -= len( hash_ids )
+        
+    
+    def Clear( self ):
+        
+        self._keys_to_entries = collections.OrderedDict()
+        
+        self._num_hash_ids = 0
+        
+    
+    def GetResult( self, key ) -> HydrusLists.SortedIntegerSet | None:
+        
+        if key not in self._keys_to_entries:
+            
+            return None
+            
+        
+        self._keys_to_entries.move_to_end( key )
+        
+        ( hash_ids, tag_service_keys, depends_on_inbox, depends_on_viewing_stats ) = self._keys_to_entries[ key ]
+        
+        # these are never edited in place, so handing out a shallow copy is safe
+        return hash_ids.copy()
+        
+    
+    def NotifyContentUpdatePackage( self, content_update_package: ClientContentUpdates.ContentUpdatePackage ):
+        
+        if len( self._keys_to_entries ) == 0:
+            
+            return
+            
+        
+        touched_tag_service_keys = set()
+        touched_inbox = False
+        touched_viewing_stats = False
+        
+        for ( service_key, content_updates ) in content_update_package.IterateContentUpdates():
+            
+            for content_update in content_updates:
+                
+                data_type = content_update.GetDataType()
+                
+                if data_type == HC.CONTENT_TYPE_MAPPINGS:
+                    
+                    touched_tag_service_keys.add( service_key )
+                    
+                elif data_type == HC.CONTENT_TYPE_FILES and content_update.IsInboxRelated():
+                    
+                    touched_inbox = True
+                    
+                elif data_type == HC.CONTENT_TYPE_FILE_VIEWING_STATS:
+                    
+                    touched_viewing_stats = True
+                    
+                elif data_type == HC.CONTENT_TYPE_TIMESTAMP:
+                    
+                    # searches with timestamp preds are never cached, and we don't cache sorts
+                    continue
+                    
+                else:
+                    
+                    # files moving around, ratings, notes, urls, duplicates--too many ways to matter, so start again
+                    self.Clear()
+                    
+                    return
+                    
+                
+            
+        
+        for ( key, ( hash_ids, tag_service_keys, depends_on_inbox, depends_on_viewing_stats ) ) in list( self._keys_to_entries.items() ):
+            
+            if tag_service_keys is None:
+                
+                touched_our_tags = len( touched_tag_service_keys ) > 0
+                
+            else:
+                
+                touched_our_tags = not tag_service_keys.isdisjoint( touched_tag_service_keys )
+                
+            
+            if touched_our_tags or ( touched_inbox and depends_on_inbox ) or ( touched_viewing_stats and depends_on_viewing_stats ):
+                
+                self._Delete( key )
+                
+            
+        
+    
+    def SetResult( self, key, hash_ids: collections.abc.Collection[ int ], tag_service_keys: frozenset[ bytes ] | None, depends_on_inbox: bool, depends_on_viewing_stats: bool ):
+        
+        if len( hash_ids ) > self._max_num_hash_ids:
+            
+            return
+            
+        
+        if key in self._keys_to_entries:
+            
+            self._Delete( key )
+            
+        
+        if not isinstance( hash_ids, HydrusLists.SortedIntegerSet ):
+            
+            hash_ids = HydrusLists.SortedIntegerSet( hash_ids )
+            
+        
+        self._keys_to_entries[ key ] = ( hash_ids, tag_service_keys, depends_on_inbox, depends_on_viewing_stats )
+        
+        self._num_hash_ids += len( hash_ids )
+        
+        while len( self._keys_to_entries ) > self._max_num_entries or self._num_hash_ids > self._max_num_hash_ids:
+            
+            oldest_key = next( iter( self._keys_to_entries ) )
+            
+            self._Delete( oldest_key )
+            
+        
+    
+    def __len__( self ):
+        
+        return len( self._keys_to_entries )
+        
+    
+
 def GetFilesInfoPredicates( system_predicates: ClientSearchFileSearchContext.FileSystemPredicates ):
     
     simple_preds = system_predicates.GetSimpleInfo()
@@ -1099,6 +1270,8 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         self.modules_files_duplicates_storage = modules_files_duplicates_storage
         self.modules_files_search_tags = modules_files_search_tags
         
+        self._search_result_cache = FileSearchResultCache()
+        
         super().__init__( 'client file query', cursor )
         
     
@@ -1235,11 +1408,9 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             
             all_similar_hash_ids = set()
             
-            for similar_to_hash in similar_to_hashes:
-                
-                hash_id = self.modules_hashes_local_cache.GetHashId( similar_to_hash )
-                
-                similar_hash_ids_and_distances = self.modules_similar_files.SearchFile( hash_id, max_hamming )
+            similar_to_hash_ids = self.modules_hashes_local_cache.GetHashIds( similar_to_hashes )
+            
+            for similar_hash_ids_and_distances in self.modules_similar_files.SearchFiles( similar_to_hash_ids, max_hamming ).values():
                 
                 similar_hash_ids = [ similar_hash_id for ( similar_hash_id, distance ) in similar_hash_ids_and_distances ]
                 
@@ -1468,7 +1639,8 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
                     include_files_info = True
                     
                 
-                file_info_query_hash_ids = set()
+                # this is the 'everything in the domain' fetch, which can be millions of rows, so straight to the compact set
+                file_info_query_hash_ids = HydrusLists.SortedIntegerSet()
                 
                 for files_table_name in db_location_context.GetMultipleFilesTableNames():
                     
@@ -1480,13 +1652,13 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
                     
                     if query_hash_ids is None:
                         
-                        loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id AS h1 FROM {} WHERE {};'.format( files_table_name, ' AND '.join( files_info_predicates ) ) ) )
+                        loop_query_hash_ids = self._STSortedIntegerSet( self._Execute( 'SELECT hash_id AS h1 FROM {} WHERE {};'.format( files_table_name, ' AND '.join( files_info_predicates ) ) ) )
                         
                     else:
                         
                         if is_inbox and len( query_hash_ids ) == len( self.modules_files_inbox.inbox_hash_ids ):
                             
-                            loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id AS h1 FROM {} NATURAL JOIN {} WHERE {};'.format( 'file_inbox', files_table_name, ' AND '.join( files_info_predicates ) ) ) )
+                            loop_query_hash_ids = self._STSortedIntegerSet( self._Execute( 'SELECT hash_id AS h1 FROM {} NATURAL JOIN {} WHERE {};'.format( 'file_inbox', files_table_name, ' AND '.join( files_info_predicates ) ) ) )
                             
                         else:
                             
@@ -1494,7 +1666,7 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
                                 
                                 self._AnalyzeTempTable( temp_table_name )
                                 
-                                loop_query_hash_ids = self._STS( self._Execute( 'SELECT hash_id AS h1 FROM {} NATURAL JOIN {} WHERE {};'.format( temp_table_name, files_table_name, ' AND '.join( files_info_predicates ) ) ) )
+                                loop_query_hash_ids = self._STSortedIntegerSet( self._Execute( 'SELECT hash_id AS h1 FROM {} NATURAL JOIN {} WHERE {};'.format( temp_table_name, files_table_name, ' AND '.join( files_info_predicates ) ) ) )
                                 
                             
                         
@@ -2484,6 +2656,128 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             
         
     
+    def _DoSearchStages( self, file_search_context: ClientSearchFileSearchContext.FileSearchContext, job_status: ClientThreading.JobStatus, query_hash_ids: set[ int ] | None, db_location_context: ClientDBFilesStorage.DBLocationContext ):
+        
+        # if the job is cancelled, what comes back is junk
+        
+        system_predicates = file_search_context.GetSystemPredicates()
+        
+        tags_to_include = file_search_context.GetTagsToInclude()
+        
+        namespaces_to_include = file_search_context.GetNamespacesToInclude()
+        
+        wildcards_to_include = file_search_context.GetWildcardsToInclude()
+        
+        there_are_tags_to_search = len( tags_to_include ) > 0 or len( namespaces_to_include ) > 0 or len( wildcards_to_include ) > 0
+        
+        # ok, let's set up the big list of simple search preds
+        
+        or_predicates = file_search_context.GetORPredicates()
+        
+        done_or_predicates = len( or_predicates ) == 0
+        
+        done_files_info_predicates = False
+        
+        have_cross_referenced_file_locations = False
+        
+        files_info_predicates = GetFilesInfoPredicates( system_predicates )
+        
+        there_are_simple_files_info_preds_to_search_for = len( files_info_predicates ) > 0
+        
+        done_tricky_incdec_ratings = False
+        
+        search_state = SearchState(
+            done_or_predicates,
+            done_files_info_predicates,
+            have_cross_referenced_file_locations,
+            there_are_tags_to_search,
+            there_are_simple_files_info_preds_to_search_for,
+            done_tricky_incdec_ratings
+        )
+        
+        # And now the search proper
+        
+        if search_state.DoOrPredsInFirstRound():
+            
+            query_hash_ids = self._DoOrPreds( file_search_context, job_status, or_predicates, query_hash_ids )
+            
+            search_state.NotifyDoneOrPreds()
+            
+            if job_status.IsCancelled():
+                
+                return query_hash_ids
+                
+            
+        
+        #
+        
+        query_hash_ids = self._Do1PreInclusiveTagPreds( file_search_context, job_status, query_hash_ids, db_location_context, search_state )
+        
+        if job_status.IsCancelled():
+            
+            return query_hash_ids
+            
+        
+        #
+        
+        query_hash_ids = self._Do2InclusiveTagPreds( file_search_context, job_status, query_hash_ids, search_state )
+        
+        if job_status.IsCancelled():
+            
+            return query_hash_ids
+            
+        
+        #
+        
+        if search_state.DoOrPredsInSecondRound():
+            
+            query_hash_ids = self._DoOrPreds( file_search_context, job_status, or_predicates, query_hash_ids )
+            
+            search_state.NotifyDoneOrPreds()
+            
+            if job_status.IsCancelled():
+                
+                return query_hash_ids
+                
+            
+        
+        # now the simple preds and desperate last shot to populate query_hash_ids
+        
+        query_hash_ids = self._Do3FileInfoPreds( file_search_context, job_status, query_hash_ids, db_location_context, search_state )
+        
+        # at this point, query_hash_ids has something in it
+        
+        query_hash_ids = self._Do4InexpensivePostFileCrossReferencePreds( file_search_context, job_status, query_hash_ids, search_state )
+        
+        #
+        
+        if job_status.IsCancelled():
+            
+            return query_hash_ids
+            
+        
+        #
+        
+        # OR round three--final chance to kick in, and the preferred one. query_hash_ids is now set, so this shouldn't be super slow for most scenarios
+        if not search_state.done_or_predicates:
+            
+            query_hash_ids = self._DoOrPreds( file_search_context, job_status, or_predicates, query_hash_ids )
+            
+            search_state.NotifyDoneOrPreds()
+            
+            if job_status.IsCancelled():
+                
+                return query_hash_ids
+                
+            
+        
+        #
+        
+        query_hash_ids = self._Do5ExpensivePostFileCrossReferencePreds( file_search_context, job_status, query_hash_ids, db_location_context, search_state )
+        
+        return query_hash_ids
+        
+    
     def _DoSimpleRatingPreds( self, file_search_context: ClientSearchFileSearchContext.FileSearchContext, query_hash_ids: set[ int ] | None, job_status: ClientThreading.JobStatus | None = None ) -> set[ int ] | None:
         
         cancelled_hook = None
@@ -2767,6 +3061,66 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         return query_hash_ids
         
     
+    def _GetSearchResultCacheDependencies( self, file_search_context: ClientSearchFileSearchContext.FileSearchContext ):
+        
+        system_predicates = file_search_context.GetSystemPredicates()
+        
+        tag_service_keys = { file_search_context.GetTagContext().service_key }
+        
+        for predicate in system_predicates.GetAdvancedTagPredicates():
+            
+            ( service_key_or_none, tag_display_type, statuses, tag ) = predicate.GetValue()
+            
+            if service_key_or_none is not None:
+                
+                tag_service_keys.add( service_key_or_none )
+                
+            
+        
+        depends_on_inbox = system_predicates.MustBeInbox() or system_predicates.MustBeArchive()
+        depends_on_viewing_stats = len( system_predicates.GetFileViewingStatsPredicates() ) > 0
+        
+        if len( file_search_context.GetORPredicates() ) > 0:
+            
+            # an OR pred could be hiding anything
+            
+            tag_service_keys = None
+            depends_on_inbox = True
+            depends_on_viewing_stats = True
+            
+        elif CC.COMBINED_TAG_SERVICE_KEY in tag_service_keys:
+            
+            tag_service_keys = None
+            
+        else:
+            
+            tag_service_keys = frozenset( tag_service_keys )
+            
+        
+        return ( tag_service_keys, depends_on_inbox, depends_on_viewing_stats )
+        
+    
+    def _GetSearchResultCacheKey( self, file_search_context: ClientSearchFileSearchContext.FileSearchContext, query_hash_ids ):
+        
+        if query_hash_ids is not None:
+            
+            return None
+            
+        
+        # 'imported in the last day' means something different every time we ask, so no caching
+        if True in ( len( ranges ) > 0 for ranges in file_search_context.GetSystemPredicates().GetTimestampRangesMS().values() ):
+            
+            return None
+            
+        
+        return file_search_context.DumpToString()
+        
+    
+    def ClearSearchResultCache( self ):
+        
+        self._search_result_cache.Clear()
+        
+    
     def GetHashIdsFromQuery(
         self,
         file_search_context: ClientSearchFileSearchContext.FileSearchContext,
@@ -2784,7 +3138,14 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         
         if query_hash_ids is not None:
             
-            query_hash_ids = set( query_hash_ids )
+            if isinstance( query_hash_ids, HydrusLists.SortedIntegerSet ):
+                
+                query_hash_ids = query_hash_ids.copy()
+                
+            else:
+                
+                query_hash_ids = set( query_hash_ids )
+                
             
         
         system_predicates = file_search_context.GetSystemPredicates()
@@ -2855,122 +3216,34 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
             return []
             
         
-        tags_to_include = file_search_context.GetTagsToInclude()
-        
-        namespaces_to_include = file_search_context.GetNamespacesToInclude()
-        
-        wildcards_to_include = file_search_context.GetWildcardsToInclude()
-        
-        there_are_tags_to_search = len( tags_to_include ) > 0 or len( namespaces_to_include ) > 0 or len( wildcards_to_include ) > 0
+        search_result_cache_key = self._GetSearchResultCacheKey( file_search_context, query_hash_ids )
         
-        # ok, let's set up the big list of simple search preds
-        
-        or_predicates = file_search_context.GetORPredicates()
+        cached_query_hash_ids = None
         
-        done_or_predicates = len( or_predicates ) == 0
-        
-        done_files_info_predicates = False
-        
-        have_cross_referenced_file_locations = False
-        
-        files_info_predicates = GetFilesInfoPredicates( system_predicates )
-        
-        there_are_simple_files_info_preds_to_search_for = len( files_info_predicates ) > 0
-        
-        done_tricky_incdec_ratings = False
-        
-        search_state = SearchState(
-            done_or_predicates,
-            done_files_info_predicates,
-            have_cross_referenced_file_locations,
-            there_are_tags_to_search,
-            there_are_simple_files_info_preds_to_search_for,
-            done_tricky_incdec_ratings
-        )
-        
-        # And now the search proper
-        
-        if search_state.DoOrPredsInFirstRound():
+        if search_result_cache_key is not None:
             
-            query_hash_ids = self._DoOrPreds( file_search_context, job_status, or_predicates, query_hash_ids )
+            cached_query_hash_ids = self._search_result_cache.GetResult( search_result_cache_key )
             
-            search_state.NotifyDoneOrPreds()
-            
-            if job_status.IsCancelled():
-                
-                return []
-                
-            
-        
-        #
-        
-        query_hash_ids = self._Do1PreInclusiveTagPreds( file_search_context, job_status, query_hash_ids, db_location_context, search_state )
-        
-        if job_status.IsCancelled():
-            
-            return []
-            
-        
-        # 
         
-        query_hash_ids = self._Do2InclusiveTagPreds( file_search_context, job_status, query_hash_ids, search_state )
-        
-        if job_status.IsCancelled():
+        if cached_query_hash_ids is not None:
             
-            return []
+            query_hash_ids = cached_query_hash_ids
             
-        
-        #
-        
-        if search_state.DoOrPredsInSecondRound():
-            
-            query_hash_ids = self._DoOrPreds( file_search_context, job_status, or_predicates, query_hash_ids )
+        else:
             
-            search_state.NotifyDoneOrPreds()
+            query_hash_ids = self._DoSearchStages( file_search_context, job_status, query_hash_ids, db_location_context )
             
             if job_status.IsCancelled():
                 
                 return []
                 
             
-        
-        # now the simple preds and desperate last shot to populate query_hash_ids
-        
-        query_hash_ids = self._Do3FileInfoPreds( file_search_context, job_status, query_hash_ids, db_location_context, search_state )
-        
-        # at this point, query_hash_ids has something in it
-        
-        query_hash_ids = self._Do4InexpensivePostFileCrossReferencePreds( file_search_context, job_status, query_hash_ids, search_state )
-        
-        #
-        
-        if job_status.IsCancelled():
-            
-            return []
-            
-        
-        #
-        
-        # OR round three--final chance to kick in, and the preferred one. query_hash_ids is now set, so this shouldn't be super slow for most scenarios
-        if not search_state.done_or_predicates:
-            
-            query_hash_ids = self._DoOrPreds( file_search_context, job_status, or_predicates, query_hash_ids )
-            
-            search_state.NotifyDoneOrPreds()
-            
-            if job_status.IsCancelled():
+            if search_result_cache_key is not None:
                 
-                return []
+                ( tag_service_keys, depends_on_inbox, depends_on_viewing_stats ) = self._GetSearchResultCacheDependencies( file_search_context )
+                
+                self._search_result_cache.SetResult( search_result_cache_key, query_hash_ids, tag_service_keys, depends_on_inbox, depends_on_viewing_stats )
                 
-            
-        
-        #
-        
-        query_hash_ids = self._Do5ExpensivePostFileCrossReferencePreds( file_search_context, job_status, query_hash_ids, db_location_context, search_state )
-        
-        if job_status.IsCancelled():
-            
-            return []
             
         
         #
@@ -3017,6 +3290,11 @@ class ClientDBFilesQuery( ClientDBModule.ClientDBModule ):
         return tables_and_columns
         
     
+    def NotifyContentUpdatePackage( self, content_update_package: ClientContentUpdates.ContentUpdatePackage ):
+        
+        self._search_result_cache.NotifyContentUpdatePackage( content_update_package )
+        
+    
     def PopulateSearchIntoTempTable( self, file_search_context: ClientSearchFileSearchContext.FileSearchContext, temp_table_name: str, query_hash_ids = None ) -> list[ int ]:
         
         query_hash_ids = self.GetHashIdsFromQuery( file_search_context, apply_implicit_limit = False, query_hash_ids = query_hash_ids )
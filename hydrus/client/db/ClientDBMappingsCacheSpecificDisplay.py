@@ -222,9 +222,13 @@ class ClientDBMappingsCacheSpecificDisplay( ClientDBModule.ClientDBModule ):
             
         
     
-    def AddImplications( self, file_service_id, tag_service_id, implication_tag_ids, tag_id, status_hook = None ):
+    def AddImplications( self, file_service_id, tag_service_id, tag_ids_to_implication_tag_ids, status_hook = None ):
         
-        if len( implication_tag_ids ) == 0:
+        # this does a whole batch of chains in one go. when the PTR changes a big sibling, we might have thousands of tags to update, and doing them one by one was slow
+        
+        all_implication_tag_ids = set( itertools.chain.from_iterable( tag_ids_to_implication_tag_ids.values() ) )
+        
+        if len( all_implication_tag_ids ) == 0:
             
             return
             
@@ -232,51 +236,52 @@ class ClientDBMappingsCacheSpecificDisplay( ClientDBModule.ClientDBModule ):
         ( cache_current_mappings_table_name, cache_deleted_mappings_table_name, cache_pending_mappings_table_name ) = ClientDBMappingsStorage.GenerateSpecificMappingsCacheTableNames( file_service_id, tag_service_id )
         ( cache_display_current_mappings_table_name, cache_display_pending_mappings_table_name ) = ClientDBMappingsStorage.GenerateSpecificDisplayMappingsCacheTableNames( file_service_id, tag_service_id )
         
-        statuses_to_count_delta = collections.Counter()
+        tag_ids_to_count_deltas = collections.defaultdict( lambda: [ 0, 0 ] )
         
-        ( current_implication_tag_ids, current_implication_tag_ids_weight, pending_implication_tag_ids, pending_implication_tag_ids_weight ) = self.modules_mappings_counts.GetCurrentPendingPositiveCountsAndWeights( ClientTags.TAG_DISPLAY_STORAGE, file_service_id, tag_service_id, implication_tag_ids )
+        ( current_implication_tag_ids, current_implication_tag_ids_weight, pending_implication_tag_ids, pending_implication_tag_ids_weight ) = self.modules_mappings_counts.GetCurrentPendingPositiveCountsAndWeights( ClientTags.TAG_DISPLAY_STORAGE, file_service_id, tag_service_id, all_implication_tag_ids )
         
         jobs = []
         
-        jobs.append( ( HC.CONTENT_STATUS_CURRENT, cache_display_current_mappings_table_name, cache_current_mappings_table_name, current_implication_tag_ids, current_implication_tag_ids_weight ) )
-        jobs.append( ( HC.CONTENT_STATUS_PENDING, cache_display_pending_mappings_table_name, cache_pending_mappings_table_name, pending_implication_tag_ids, pending_implication_tag_ids_weight ) )
+        jobs.append( ( 0, cache_display_current_mappings_table_name, cache_current_mappings_table_name, current_implication_tag_ids ) )
+        jobs.append( ( 1, cache_display_pending_mappings_table_name, cache_pending_mappings_table_name, pending_implication_tag_ids ) )
         
-        for ( status, cache_display_mappings_table_name, cache_mappings_table_name, add_tag_ids, add_tag_ids_weight ) in jobs:
+        for ( delta_index, cache_display_mappings_table_name, cache_mappings_table_name, add_tag_ids ) in jobs:
+            
+            implication_rows = [ ( tag_id, implication_tag_id ) for ( tag_id, implication_tag_ids ) in tag_ids_to_implication_tag_ids.items() for implication_tag_id in implication_tag_ids if implication_tag_id in add_tag_ids ]
             
-            if add_tag_ids_weight == 0:
+            if len( implication_rows ) == 0:
                 
                 # nothing to actually add, so nbd
                 
                 continue
                 
             
-            if len( add_tag_ids ) == 1:
-                
-                ( add_tag_id, ) = add_tag_ids
-                
-                self._Execute( 'INSERT OR IGNORE INTO {} ( hash_id, tag_id ) SELECT hash_id, ? FROM {} WHERE tag_id = ?;'.format( cache_display_mappings_table_name, cache_mappings_table_name ), ( tag_id, add_tag_id ) )
-                
-                statuses_to_count_delta[ status ] = self._GetRowCount()
+            with self._MakeTemporaryIntegerTable( implication_rows, ( 'tag_id', 'implication_tag_id' ) ) as temp_implications_table_name:
                 
-            else:
-                
-                with self._MakeTemporaryIntegerTable( add_tag_ids, 'tag_id' ) as temp_tag_ids_table_name:
+                with self._MakeTemporaryIntegerTable( [], ( 'hash_id', 'tag_id' ) ) as temp_new_mappings_table_name:
+                    
+                    # for all new implications, get files with those tags and not existing. we gather them first so we can count them per tag
                     
-                    # for all new implications, get files with those tags and not existing
+                    self._Execute( f'INSERT OR IGNORE INTO {temp_new_mappings_table_name} ( hash_id, tag_id ) SELECT cache_mappings.hash_id, implications.tag_id FROM {temp_implications_table_name} AS implications CROSS JOIN {cache_mappings_table_name} AS cache_mappings ON ( cache_mappings.tag_id = implications.implication_tag_id ) WHERE NOT EXISTS ( SELECT 1 FROM {cache_display_mappings_table_name} AS display_mappings WHERE display_mappings.hash_id = cache_mappings.hash_id AND display_mappings.tag_id = implications.tag_id );' )
                     
-                    self._Execute( 'INSERT OR IGNORE INTO {} ( hash_id, tag_id ) SELECT hash_id, ? FROM {} CROSS JOIN {} USING ( tag_id );'.format( cache_display_mappings_table_name, temp_tag_ids_table_name, cache_mappings_table_name ), ( tag_id, ) )
+                    self._Execute( f'INSERT OR IGNORE INTO {cache_display_mappings_table_name} ( hash_id, tag_id ) SELECT hash_id, tag_id FROM {temp_new_mappings_table_name};' )
                     
-                    statuses_to_count_delta[ status ] = self._GetRowCount()
+                    for ( tag_id, count ) in self._Execute( f'SELECT tag_id, COUNT( * ) FROM {temp_new_mappings_table_name} GROUP BY tag_id;' ).fetchall():
+                        
+                        tag_ids_to_count_deltas[ tag_id ][ delta_index ] += count
+                        
                     
                 
             
+            if status_hook is not None:
+                
+                status_hook( 'added {} implications'.format( HydrusNumbers.ToHumanInt( len( implication_rows ) ) ) )
+                
+            
         
-        current_delta = statuses_to_count_delta[ HC.CONTENT_STATUS_CURRENT ]
-        pending_delta = statuses_to_count_delta[ HC.CONTENT_STATUS_PENDING ]
-        
-        if current_delta > 0 or pending_delta > 0:
+        if len( tag_ids_to_count_deltas ) > 0:
             
-            counts_cache_changes = ( ( tag_id, current_delta, pending_delta ), )
+            counts_cache_changes = [ ( tag_id, current_delta, pending_delta ) for ( tag_id, ( current_delta, pending_delta ) ) in tag_ids_to_count_deltas.items() ]
             
             self.modules_mappings_counts_update.AddCounts( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, file_service_id, tag_service_id, counts_cache_changes )
             
@@ -379,115 +384,72 @@ class ClientDBMappingsCacheSpecificDisplay( ClientDBModule.ClientDBModule ):
             
         
     
-    def DeleteImplications( self, file_service_id, tag_service_id, implication_tag_ids, tag_id, status_hook = None ):
+    def DeleteImplications( self, file_service_id, tag_service_id, tag_ids_to_implication_tag_ids, status_hook = None ):
         
-        if len( implication_tag_ids ) == 0:
+        all_implication_tag_ids = set( itertools.chain.from_iterable( tag_ids_to_implication_tag_ids.values() ) )
+        
+        if len( all_implication_tag_ids ) == 0:
             
             return
             
         
-        statuses_to_count_delta = collections.Counter()
-        
         ( cache_current_mappings_table_name, cache_deleted_mappings_table_name, cache_pending_mappings_table_name ) = ClientDBMappingsStorage.GenerateSpecificMappingsCacheTableNames( file_service_id, tag_service_id )
         ( cache_display_current_mappings_table_name, cache_display_pending_mappings_table_name ) = ClientDBMappingsStorage.GenerateSpecificDisplayMappingsCacheTableNames( file_service_id, tag_service_id )
         
-        remaining_implication_tag_ids = set( self.modules_tag_display.GetImpliedBy( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, tag_service_id, tag_id ) ).difference( implication_tag_ids )
+        tag_ids_to_implied_by = self.modules_tag_display.GetTagsToImpliedBy( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, tag_service_id, set( tag_ids_to_implication_tag_ids.keys() ) )
+        
+        keep_rows = [ ( tag_id, keep_tag_id ) for ( tag_id, implication_tag_ids ) in tag_ids_to_implication_tag_ids.items() for keep_tag_id in set( tag_ids_to_implied_by[ tag_id ] ).difference( implication_tag_ids ) ]
         
-        ( current_implication_tag_ids, current_implication_tag_ids_weight, pending_implication_tag_ids, pending_implication_tag_ids_weight ) = self.modules_mappings_counts.GetCurrentPendingPositiveCountsAndWeights( ClientTags.TAG_DISPLAY_STORAGE, file_service_id, tag_service_id, implication_tag_ids )
-        ( current_remaining_implication_tag_ids, current_remaining_implication_tag_ids_weight, pending_remaining_implication_tag_ids, pending_remaining_implication_tag_ids_weight ) = self.modules_mappings_counts.GetCurrentPendingPositiveCountsAndWeights( ClientTags.TAG_DISPLAY_STORAGE, file_service_id, tag_service_id, remaining_implication_tag_ids )
+        tag_ids_to_count_deltas = collections.defaultdict( lambda: [ 0, 0 ] )
+        
+        ( current_implication_tag_ids, current_implication_tag_ids_weight, pending_implication_tag_ids, pending_implication_tag_ids_weight ) = self.modules_mappings_counts.GetCurrentPendingPositiveCountsAndWeights( ClientTags.TAG_DISPLAY_STORAGE, file_service_id, tag_service_id, all_implication_tag_ids )
         
         jobs = []
         
-        jobs.append( ( HC.CONTENT_STATUS_CURRENT, cache_display_current_mappings_table_name, cache_current_mappings_table_name, current_implication_tag_ids, current_implication_tag_ids_weight, current_remaining_implication_tag_ids, current_remaining_implication_tag_ids_weight ) )
-        jobs.append( ( HC.CONTENT_STATUS_PENDING, cache_display_pending_mappings_table_name, cache_pending_mappings_table_name, pending_implication_tag_ids, pending_implication_tag_ids_weight, pending_remaining_implication_tag_ids, pending_remaining_implication_tag_ids_weight ) )
+        jobs.append( ( 0, cache_display_current_mappings_table_name, cache_current_mappings_table_name, current_implication_tag_ids ) )
+        jobs.append( ( 1, cache_display_pending_mappings_table_name, cache_pending_mappings_table_name, pending_implication_tag_ids ) )
         
-        for ( status, cache_display_mappings_table_name, cache_mappings_table_name, removee_tag_ids, removee_tag_ids_weight, keep_tag_ids, keep_tag_ids_weight ) in jobs:
+        with self._MakeTemporaryIntegerTable( keep_rows, ( 'tag_id', 'implication_tag_id' ) ) as temp_keeps_table_name:
             
-            if removee_tag_ids_weight == 0:
+            for ( delta_index, cache_display_mappings_table_name, cache_mappings_table_name, removee_tag_ids ) in jobs:
                 
-                # nothing to remove, so nothing to do!
+                removee_rows = [ ( tag_id, implication_tag_id ) for ( tag_id, implication_tag_ids ) in tag_ids_to_implication_tag_ids.items() for implication_tag_id in implication_tag_ids if implication_tag_id in removee_tag_ids ]
                 
-                continue
+                if len( removee_rows ) == 0:
+                    
+                    # nothing to remove, so nothing to do!
+                    
+                    continue
+                    
                 
-            
-            # ultimately here, we are doing "delete all display mappings with hash_ids that have a storage mapping for a removee tag and no storage mappings for a keep tag
-            # in order to reduce overhead, we go full meme and do a bunch of different situations
-            
-            with self._MakeTemporaryIntegerTable( [], 'tag_id' ) as temp_removee_tag_ids_table_name:
+                # ultimately here, we are doing "delete all display mappings with hash_ids that have a storage mapping for a removee tag and no storage mappings for a keep tag"
+                # we do it for every chain at once. the keep test goes through the candidate file's own storage tags, which are few, rather than the keep tags, which for something like 'female' may be many thousands
                 
-                with self._MakeTemporaryIntegerTable( [], 'tag_id' ) as temp_keep_tag_ids_table_name:
+                with self._MakeTemporaryIntegerTable( removee_rows, ( 'tag_id', 'implication_tag_id' ) ) as temp_removees_table_name:
                     
-                    if len( removee_tag_ids ) == 1:
-                        
-                        ( removee_tag_id, ) = removee_tag_ids
+                    with self._MakeTemporaryIntegerTable( [], ( 'hash_id', 'tag_id' ) ) as temp_doomed_mappings_table_name:
                         
-                        hash_id_in_storage_remove = 'hash_id IN ( SELECT hash_id FROM {} WHERE tag_id = {} )'.format( cache_mappings_table_name, removee_tag_id )
-                        
-                    else:
-                        
-                        self._ExecuteMany( 'INSERT INTO {} ( tag_id ) VALUES ( ? );'.format( temp_removee_tag_ids_table_name ), ( ( removee_tag_id, ) for removee_tag_id in removee_tag_ids ) )
-                        
-                        hash_id_in_storage_remove = 'hash_id IN ( SELECT DISTINCT hash_id FROM {} CROSS JOIN {} USING ( tag_id ) )'.format( temp_removee_tag_ids_table_name, cache_mappings_table_name )
-                        
-                    
-                    if keep_tag_ids_weight == 0:
+                        self._Execute( f'INSERT OR IGNORE INTO {temp_doomed_mappings_table_name} ( hash_id, tag_id ) SELECT cache_mappings.hash_id, removees.tag_id FROM {temp_removees_table_name} AS removees CROSS JOIN {cache_mappings_table_name} AS cache_mappings ON ( cache_mappings.tag_id = removees.implication_tag_id ) WHERE EXISTS ( SELECT 1 FROM {cache_display_mappings_table_name} AS display_mappings WHERE display_mappings.hash_id = cache_mappings.hash_id AND display_mappings.tag_id = removees.tag_id ) AND NOT EXISTS ( SELECT 1 FROM {cache_mappings_table_name} AS keep_mappings CROSS JOIN {temp_keeps_table_name} AS keeps ON ( keeps.tag_id = removees.tag_id AND keeps.implication_tag_id = keep_mappings.tag_id ) WHERE keep_mappings.hash_id = cache_mappings.hash_id );' )
                         
-                        predicates_phrase = hash_id_in_storage_remove
+                        self._Execute( f'DELETE FROM {cache_display_mappings_table_name} WHERE ( hash_id, tag_id ) IN ( SELECT hash_id, tag_id FROM {temp_doomed_mappings_table_name} );' )
                         
-                    else:
-                        
-                        # WARNING, WARNING: Big Brain Query, potentially great/awful
-                        # note that in the 'clever/file join' situation, the number of total mappings is many, but we are deleting a few
-                        # we want to precisely scan the status of the potential hashes to delete, not scan through them all to see what not to do
-                        # therefore, we do NOT EXISTS, which just scans the parts, rather than NOT IN, which does the whole query and then checks against all results
-                        
-                        if len( keep_tag_ids ) == 1:
-                            
-                            ( keep_tag_id, ) = keep_tag_ids
-                            
-                            if ClientDBMappingsStorage.DoingAFileJoinTagSearchIsFaster( removee_tag_ids_weight, keep_tag_ids_weight ):
-                                
-                                hash_id_not_in_storage_keep = 'NOT EXISTS ( SELECT 1 FROM {} WHERE {}.hash_id = {}.hash_id and tag_id = {} )'.format( cache_mappings_table_name, cache_display_mappings_table_name, cache_mappings_table_name, keep_tag_id )
-                                
-                            else:
-                                
-                                hash_id_not_in_storage_keep = 'hash_id NOT IN ( SELECT hash_id FROM {} WHERE tag_id = {} )'.format( cache_mappings_table_name, keep_tag_id )
-                                
-                            
-                        else:
+                        for ( tag_id, count ) in self._Execute( f'SELECT tag_id, COUNT( * ) FROM {temp_doomed_mappings_table_name} GROUP BY tag_id;' ).fetchall():
                             
-                            self._ExecuteMany( 'INSERT INTO {} ( tag_id ) VALUES ( ? );'.format( temp_keep_tag_ids_table_name ), ( ( keep_tag_id, ) for keep_tag_id in keep_tag_ids ) )
+                            tag_ids_to_count_deltas[ tag_id ][ delta_index ] += count
                             
-                            if ClientDBMappingsStorage.DoingAFileJoinTagSearchIsFaster( removee_tag_ids_weight, keep_tag_ids_weight ):
-                                
-                                # (files to) mappings to temp tags
-                                hash_id_not_in_storage_keep = 'NOT EXISTS ( SELECT 1 FROM {} CROSS JOIN {} USING ( tag_id ) WHERE {}.hash_id = {}.hash_id )'.format( cache_mappings_table_name, temp_keep_tag_ids_table_name, cache_display_mappings_table_name, cache_mappings_table_name )
-                                
-                            else:
-                                
-                                # temp tags to mappings
-                                hash_id_not_in_storage_keep = ' hash_id NOT IN ( SELECT DISTINCT hash_id FROM {} CROSS JOIN {} USING ( tag_id ) )'.format( temp_keep_tag_ids_table_name, cache_mappings_table_name )
-                                
-                            
-                        
-                        predicates_phrase = '{} AND {}'.format( hash_id_in_storage_remove, hash_id_not_in_storage_keep )
                         
                     
-                    query = 'DELETE FROM {} WHERE tag_id = {} AND {};'.format( cache_display_mappings_table_name, tag_id, predicates_phrase )
-                    
-                    self._Execute( query )
+                
+                if status_hook is not None:
                     
-                    statuses_to_count_delta[ status ] = self._GetRowCount()
+                    status_hook( 'removed {} implications'.format( HydrusNumbers.ToHumanInt( len( removee_rows ) ) ) )
                     
                 
             
         
-        current_delta = statuses_to_count_delta[ HC.CONTENT_STATUS_CURRENT ]
-        pending_delta = statuses_to_count_delta[ HC.CONTENT_STATUS_PENDING ]
-        
-        if current_delta > 0 or pending_delta > 0:
+        if len( tag_ids_to_count_deltas ) > 0:
             
-            counts_cache_changes = ( ( tag_id, current_delta, pending_delta ), )
+            counts_cache_changes = [ ( tag_id, current_delta, pending_delta ) for ( tag_id, ( current_delta, pending_delta ) ) in tag_ids_to_count_deltas.items() ]
             
             self.modules_mappings_counts_update.ReduceCounts( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL, file_service_id, tag_service_id, counts_cache_changes )
             
@@ -329,6 +329,47 @@ class ClientDBMasterHashes( ClientDBModule.ClientDBModule ):
         return hash_ids_to_hashes
         
     
+    def GetHashIdsToHashesReadOnly( self, hash_ids = None, hashes = None, create_new_hash_ids = True, error_on_missing_hash_ids = False ):
+        
+        # for the parallel read connections. anything that would need a write here--a new definition, or emergency orphan recovery--raises DataMissing so the main connection can do it
+        
+        if hash_ids is not None:
+            
+            self._PopulateHashIdsToHashesCache( hash_ids, error_on_missing_hash_ids = True )
+            
+            hash_ids_to_hashes = { hash_id : self._hash_ids_to_hashes_cache[ hash_id ] for hash_id in hash_ids }
+            
+        elif hashes is not None:
+            
+            hash_ids_to_hashes = {}
+            
+            for hash in hashes:
+                
+                result = self._Execute( 'SELECT hash_id FROM hashes WHERE hash = ?;', ( sqlite3.Binary( hash ), ) ).fetchone()
+                
+                if result is None:
+                    
+                    if create_new_hash_ids:
+                        
+                        raise HydrusExceptions.DataMissing( 'A hash was not yet defined!' )
+                        
+                    
+                    continue
+                    
+                
+                ( hash_id, ) = result
+                
+                hash_ids_to_hashes[ hash_id ] = hash
+                
+            
+        else:
+            
+            raise NotImplementedError()
+            
+        
+        return hash_ids_to_hashes
+        
+    
     def GetTablesAndColumnsThatUseDefinitions( self, content_type: int ) -> list[ tuple[ str, str ] ]:
         
         if content_type == HC.CONTENT_TYPE_HASH:
@@ -5,6 +5,8 @@ import sqlite3
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDB
+from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusLists
 
 from hydrus.client import ClientGlobals as CG
@@ -49,7 +51,8 @@ class ClientDBMediaResults( ClientDBModule.ClientDBModule ):
         modules_files_inbox: ClientDBFilesInbox.ClientDBFilesInbox,
         modules_mappings_storage: ClientDBMappingsStorage.ClientDBMappingsStorage,
         modules_tag_display: ClientDBTagDisplay.ClientDBTagDisplay,
-        modules_similar_files: ClientDBSimilarFiles.ClientDBSimilarFiles
+        modules_similar_files: ClientDBSimilarFiles.ClientDBSimilarFiles,
+        parallel_read_snapshot: HydrusDB.ParallelReadSnapshot | None = None
     ):
         
         self.modules_services = modules_services
@@ -68,11 +71,31 @@ class ClientDBMediaResults( ClientDBModule.ClientDBModule ):
         self.modules_tag_display = modules_tag_display
         self.modules_similar_files = modules_similar_files
         
+        self._parallel_read_snapshot = parallel_read_snapshot
+        
         self._weakref_media_result_cache = ClientMediaResultCache.MediaResultCache.instance()
         
         super().__init__( 'client media results', cursor )
         
     
+    def _AddMediaResultsToCache( self, media_results: list[ ClientMediaResult.MediaResult ] ):
+        
+        if self._parallel_read_snapshot is None:
+            
+            self._weakref_media_result_cache.AddMediaResults( media_results )
+            
+        else:
+            
+            # a write may have started while we were reading. it will be updating whatever is in the cache, so ours would miss that and go stale
+            added_ok = self._parallel_read_snapshot.DoIfNoWriteSince( lambda: self._weakref_media_result_cache.AddMediaResults( media_results ) )
+            
+            if not added_ok:
+                
+                raise HydrusExceptions.DBException( 'A write started while these media results were being read.' )
+                
+            
+        
+    
     def ClearMediaResultCache( self ):
         
         self._weakref_media_result_cache.Clear()
@@ -529,7 +552,7 @@ class ClientDBMediaResults( ClientDBModule.ClientDBModule ):
                 missing_media_results.append( ClientMediaResult.MediaResult( file_info_manager, tags_manager, times_manager, locations_manager, ratings_manager, notes_manager, file_viewing_stats_manager ) )
                 
             
-            self._weakref_media_result_cache.AddMediaResults( missing_media_results )
+            self._AddMediaResultsToCache( missing_media_results )
             
             cached_media_results.extend( missing_media_results )
             
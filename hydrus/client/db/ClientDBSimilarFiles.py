@@ -17,6 +17,7 @@ from hydrus.client.db import ClientDBFilesStorage
 from hydrus.client.db import ClientDBModule
 from hydrus.client.db import ClientDBMaster
 from hydrus.client.db import ClientDBServices
+from hydrus.client.files.images import ClientImagePerceptualHashIndex
 
 class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
     
@@ -42,6 +43,9 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         self._non_vp_treed_perceptual_hash_ids = set()
         self._root_node_perceptual_hash_id = None
         
+        self._perceptual_hash_index = None
+        self._perceptual_hash_index_next_load_attempt = 0
+        
     
     def _AddLeaf( self, perceptual_hash_id, perceptual_hash ):
         
@@ -367,6 +371,11 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
             self._AddLeaf( perceptual_hash_id, perceptual_hash )
             
+            if self._perceptual_hash_index is not None:
+                
+                self._perceptual_hash_index.AddPerceptualHashes( [ ( perceptual_hash_id, perceptual_hash ) ] )
+                
+            
         else:
             
             ( perceptual_hash_id, ) = result
@@ -382,6 +391,34 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         return perceptual_hash_ids
         
     
+    def _GetPerceptualHashIdsToHashIds( self, perceptual_hash_ids: collections.abc.Collection[ int ] ) -> dict[ int, list[ int ] ]:
+        
+        with self._MakeTemporaryIntegerTable( perceptual_hash_ids, 'phash_id' ) as temp_table_name:
+            
+            # temp perceptual_hashes to hash map
+            perceptual_hash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._Execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
+            
+        
+        return perceptual_hash_ids_to_hash_ids
+        
+    
+    def _GetPerceptualHashIndex( self ) -> ClientImagePerceptualHashIndex.PerceptualHashIndex | None:
+        
+        if not CG.client_controller.new_options.GetBoolean( 'similar_files_use_in_memory_perceptual_hash_index' ):
+            
+            self._perceptual_hash_index = None
+            
+            return None
+            
+        
+        if self._perceptual_hash_index is None and HydrusTime.TimeHasPassed( self._perceptual_hash_index_next_load_attempt ):
+            
+            self._LoadPerceptualHashIndex()
+            
+        
+        return self._perceptual_hash_index
+        
+    
     def _GetPixelHashId( self, hash_id: int ) -> int | None:
         
         result = self._Execute( 'SELECT pixel_hash_id FROM pixel_hash_map WHERE hash_id = ?;', ( hash_id, ) ).fetchone()
@@ -398,6 +435,33 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         
     
+    def _LoadPerceptualHashIndex( self ):
+        
+        ( num_perceptual_hashes, ) = self._Execute( 'SELECT COUNT( * ) FROM shape_perceptual_hashes;' ).fetchone()
+        
+        if not ClientImagePerceptualHashIndex.IndexWouldFitInMemory( num_perceptual_hashes ):
+            
+            HydrusData.Print( f'Did not have enough free memory to load {HydrusNumbers.ToHumanInt( num_perceptual_hashes )} perceptual hashes into the in-memory similar files index, so falling back to the search tree for now.' )
+            
+            self._perceptual_hash_index_next_load_attempt = HydrusTime.GetNow() + 3600
+            
+            return
+            
+        
+        time_started = HydrusTime.GetNowPrecise()
+        
+        perceptual_hash_index = ClientImagePerceptualHashIndex.PerceptualHashIndex()
+        
+        perceptual_hash_index.SetPerceptualHashes( self._Execute( 'SELECT phash_id, phash FROM shape_perceptual_hashes;' ) )
+        
+        self._perceptual_hash_index = perceptual_hash_index
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( f'Loaded {HydrusNumbers.ToHumanInt( num_perceptual_hashes )} perceptual hashes into the similar files index in {HydrusTime.TimeDeltaToPrettyTimeDelta( HydrusTime.GetNowPrecise() - time_started )}, using {HydrusData.ToHumanBytes( perceptual_hash_index.GetMemoryUsage() )}.' )
+            
+        
+    
     def _PopBestRootNode( self, node_rows ):
         
         if len( node_rows ) == 1:
@@ -531,6 +595,11 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
             self._ExecuteMany( 'DELETE FROM shape_perceptual_hashes WHERE phash_id = ?;', ( ( p_id, ) for p_id in orphan_perceptual_hash_ids ) )
             
+            if self._perceptual_hash_index is not None:
+                
+                self._perceptual_hash_index.RemovePerceptualHashIds( orphan_perceptual_hash_ids )
+                
+            
         
         useful_nodes = [ row for row in unbalanced_nodes if row[0] in useful_perceptual_hash_ids ]
         
@@ -619,6 +688,120 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         
     
+    def _SearchPerceptualHashesVPTree( self, search_perceptual_hashes: collections.abc.Collection[ bytes ], search_radius: int ) -> dict[ int, int ]:
+        
+        if self._root_node_perceptual_hash_id is None:
+            
+            top_node_result = self._Execute( 'SELECT phash_id FROM shape_vptree WHERE parent_id IS NULL;' ).fetchone()
+            
+            if top_node_result is None:
+                
+                return {}
+                
+            
+            ( self._root_node_perceptual_hash_id, ) = top_node_result
+            
+        
+        similar_perceptual_hash_ids_to_distances = {}
+        
+        num_cycles = 0
+        total_nodes_searched = 0
+        
+        for search_perceptual_hash in search_perceptual_hashes:
+            
+            next_potentials = [ self._root_node_perceptual_hash_id ]
+            
+            while len( next_potentials ) > 0:
+                
+                current_potentials = next_potentials
+                next_potentials = []
+                
+                num_cycles += 1
+                total_nodes_searched += len( current_potentials )
+                
+                # this is no longer an iterable inside the main node SELECT because it was causing crashes on linux!!
+                # after investigation, it seemed to be SQLite having a problem with part of Get64BitHammingDistance touching perceptual_hashes it presumably was still hanging on to
+                # the crash was in sqlite code, again presumably on subsequent fetch
+                # adding a fake delay in seemed to fix it also. guess it was some memory maintenance buffer/bytes thing
+                # anyway, we now just get the whole lot of results first and then work on the whole lot
+                # UPDATE: we moved to a cache finally, so the iteration danger is less worrying, but leaving the above up anyway
+                
+                self._TryToPopulatePerceptualHashToVPTreeNodeCache( current_potentials )
+                
+                for node_perceptual_hash_id in current_potentials:
+                    
+                    result = self._perceptual_hash_id_to_vp_tree_node_cache.get( node_perceptual_hash_id, None )
+                    
+                    if result is None:
+                        
+                        # something crazy happened, probably a broken tree branch, move on
+                        continue
+                        
+                    
+                    ( node_perceptual_hash, node_radius, inner_perceptual_hash_id, outer_perceptual_hash_id ) = result
+                    
+                    # first check the node itself--is it similar?
+                    
+                    node_hamming_distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, node_perceptual_hash )
+                    
+                    if node_hamming_distance <= search_radius:
+                        
+                        if node_perceptual_hash_id in similar_perceptual_hash_ids_to_distances:
+                            
+                            current_distance = similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ]
+                            
+                            similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = min( node_hamming_distance, current_distance )
+                            
+                        else:
+                            
+                            similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = node_hamming_distance
+                            
+                        
+                    
+                    # now how about its children--where should we search next?
+                    
+                    if node_radius is not None:
+                        
+                        # we have two spheres--node and search--their centers separated by node_hamming_distance
+                        # we want to search inside/outside the node_sphere if the search_sphere intersects with those spaces
+                        # there are four possibles:
+                        # (----N----)-(--S--)    intersects with outer only - distance between N and S > their radii
+                        # (----N---(-)-S--)      intersects with both
+                        # (----N-(--S-)-)        intersects with both
+                        # (---(-N-S--)-)         intersects with inner only - distance between N and S + radius_S does not exceed radius_N
+                        
+                        if inner_perceptual_hash_id is not None:
+                            
+                            spheres_disjoint = node_hamming_distance > ( node_radius + search_radius )
+                            
+                            if not spheres_disjoint: # i.e. they intersect at some point
+                                
+                                next_potentials.append( inner_perceptual_hash_id )
+                                
+                            
+                        
+                        if outer_perceptual_hash_id is not None:
+                            
+                            search_sphere_subset_of_node_sphere = ( node_hamming_distance + search_radius ) <= node_radius
+                            
+                            if not search_sphere_subset_of_node_sphere: # i.e. search sphere intersects with non-node sphere space at some point
+                                
+                                next_potentials.append( outer_perceptual_hash_id )
+                                
+                            
+                        
+                    
+                
+            
+        
+        if HG.db_report_mode:
+            
+            HydrusData.ShowText( 'Similar file search touched {} nodes over {} cycles.'.format( HydrusNumbers.ToHumanInt( total_nodes_searched ), HydrusNumbers.ToHumanInt( num_cycles ) ) )
+            
+        
+        return similar_perceptual_hash_ids_to_distances
+        
+    
     def _TryToPopulatePerceptualHashToVPTreeNodeCache( self, perceptual_hash_ids: collections.abc.Collection[ int ] ):
         
         # the node cache used to limit itself to 1,000,000 nodes, but on clients with 13m files it was churning
@@ -695,6 +878,12 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         
         self._ExecuteMany( 'INSERT OR IGNORE INTO shape_maintenance_branch_regen ( phash_id ) VALUES ( ? );', ( ( perceptual_hash_id, ) for perceptual_hash_id in useless_perceptual_hash_ids ) )
         
+        if self._perceptual_hash_index is not None:
+            
+            # the tree keeps these until the branch regen, but there is no point the index comparing against them
+            self._perceptual_hash_index.RemovePerceptualHashIds( useless_perceptual_hash_ids )
+            
+        
         self._cursor_transaction_wrapper.pub_after_job( 'notify_new_shape_search_branch_maintenance_work' )
         
     
@@ -853,6 +1042,11 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
             all_nodes = good_nodes
             
+            if self._perceptual_hash_index is not None:
+                
+                self._perceptual_hash_index.SetPerceptualHashes( all_nodes )
+                
+            
             if len( all_nodes ) == 0:
                 
                 return
@@ -922,6 +1116,16 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         
     
+    def ResetInMemoryCaches( self ):
+        
+        # a rolled-back transaction may have left these out of sync with the tables, so we'll reload them lazily
+        self._perceptual_hash_id_to_vp_tree_node_cache = {}
+        self._non_vp_treed_perceptual_hash_ids = set()
+        self._root_node_perceptual_hash_id = None
+        
+        self._perceptual_hash_index = None
+        
+    
     def ResetSearch( self, hash_ids ):
         
         num_done = self._DeltaShapeSearchCacheNumbersRemoveFiles( hash_ids )
@@ -942,33 +1146,121 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
     
     def SearchFile( self, hash_id: int, max_hamming_distance: int ) -> list:
         
-        similar_hash_ids_and_distances = [ ( hash_id, 0 ) ]
+        return self.SearchFiles( ( hash_id, ), max_hamming_distance )[ hash_id ]
+        
+    
+    def SearchFiles( self, hash_ids: collections.abc.Collection[ int ], max_hamming_distance: int ) -> dict[ int, list ]:
         
-        pixel_hash_id = self._GetPixelHashId( hash_id )
+        # this does the whole group in one set of queries and, with the index, one pass over all the phashes
+        # the potential duplicates discovery job is the big customer here, so it wants to do hundreds of files at a time
         
-        if pixel_hash_id is not None:
+        hash_ids_to_similar_hash_ids_and_distances = { hash_id : [ ( hash_id, 0 ) ] for hash_id in hash_ids }
+        
+        if len( hash_ids ) == 0:
             
-            similar_hash_ids_and_distances.extend( self.SearchPixelHashes( ( pixel_hash_id, ) ) )
+            return hash_ids_to_similar_hash_ids_and_distances
             
         
-        if max_hamming_distance == 0:
+        with self._MakeTemporaryIntegerTable( hash_ids, 'hash_id' ) as temp_hash_ids_table_name:
             
-            exact_match_hash_ids = self._STL( self._Execute( 'SELECT hash_id FROM shape_perceptual_hash_map WHERE phash_id IN ( SELECT phash_id FROM shape_perceptual_hash_map WHERE hash_id = ? );', ( hash_id, ) ) )
+            # temp hashes to our pixel hashes to all files with that pixel hash
+            pixel_dupe_rows = self._Execute( f'SELECT {temp_hash_ids_table_name}.hash_id, pixel_dupes.hash_id FROM {temp_hash_ids_table_name} CROSS JOIN pixel_hash_map AS ours ON ( {temp_hash_ids_table_name}.hash_id = ours.hash_id ) CROSS JOIN pixel_hash_map AS pixel_dupes ON ( ours.pixel_hash_id = pixel_dupes.pixel_hash_id );' ).fetchall()
             
-            similar_hash_ids_and_distances.extend( [ ( exact_match_hash_id, 0 ) for exact_match_hash_id in exact_match_hash_ids ] )
+            for ( hash_id, pixel_dupe_hash_id ) in pixel_dupe_rows:
+                
+                hash_ids_to_similar_hash_ids_and_distances[ hash_id ].append( ( pixel_dupe_hash_id, 0 ) )
+                
             
-        else:
+            if max_hamming_distance == 0:
+                
+                # temp hashes to our phashes to all files with that phash
+                exact_match_rows = self._Execute( f'SELECT {temp_hash_ids_table_name}.hash_id, exact_matches.hash_id FROM {temp_hash_ids_table_name} CROSS JOIN shape_perceptual_hash_map AS ours ON ( {temp_hash_ids_table_name}.hash_id = ours.hash_id ) CROSS JOIN shape_perceptual_hash_map AS exact_matches ON ( ours.phash_id = exact_matches.phash_id );' ).fetchall()
+                
+                for ( hash_id, exact_match_hash_id ) in exact_match_rows:
+                    
+                    hash_ids_to_similar_hash_ids_and_distances[ hash_id ].append( ( exact_match_hash_id, 0 ) )
+                    
+                
+                perceptual_hash_rows = []
+                
+            else:
+                
+                # temp hashes to our phashes
+                perceptual_hash_rows = self._Execute( f'SELECT hash_id, phash FROM {temp_hash_ids_table_name} CROSS JOIN shape_perceptual_hash_map USING ( hash_id ) CROSS JOIN shape_perceptual_hashes USING ( phash_id );' ).fetchall()
+                
             
-            perceptual_hash_ids = self._GetPerceptualHashIdsFromHashId( hash_id )
+        
+        if len( perceptual_hash_rows ) > 0:
             
-            perceptual_hashes = self._GetPerceptualHashes( perceptual_hash_ids )
+            hash_ids_to_perceptual_hashes = HydrusData.BuildKeyToSetDict( perceptual_hash_rows )
             
-            similar_hash_ids_and_distances.extend( self.SearchPerceptualHashes( perceptual_hashes, max_hamming_distance ) )
+            perceptual_hash_index = self._GetPerceptualHashIndex()
+            
+            if perceptual_hash_index is None:
+                
+                hash_ids_to_similar_perceptual_hash_ids_to_distances = { hash_id : self._SearchPerceptualHashesVPTree( perceptual_hashes, max_hamming_distance ) for ( hash_id, perceptual_hashes ) in hash_ids_to_perceptual_hashes.items() }
+                
+            else:
+                
+                search_hash_ids = []
+                search_perceptual_hashes = []
+                
+                for ( hash_id, perceptual_hashes ) in hash_ids_to_perceptual_hashes.items():
+                    
+                    for perceptual_hash in perceptual_hashes:
+                        
+                        search_hash_ids.append( hash_id )
+                        search_perceptual_hashes.append( perceptual_hash )
+                        
+                    
+                
+                hash_ids_to_similar_perceptual_hash_ids_to_distances = collections.defaultdict( dict )
+                
+                for ( hash_id, similar_perceptual_hash_ids_to_distances ) in zip( search_hash_ids, perceptual_hash_index.SearchMany( search_perceptual_hashes, max_hamming_distance ) ):
+                    
+                    current_results = hash_ids_to_similar_perceptual_hash_ids_to_distances[ hash_id ]
+                    
+                    for ( perceptual_hash_id, distance ) in similar_perceptual_hash_ids_to_distances.items():
+                        
+                        if perceptual_hash_id not in current_results or distance < current_results[ perceptual_hash_id ]:
+                            
+                            current_results[ perceptual_hash_id ] = distance
+                            
+                        
+                    
+                
+            
+            all_similar_perceptual_hash_ids = set()
+            
+            for similar_perceptual_hash_ids_to_distances in hash_ids_to_similar_perceptual_hash_ids_to_distances.values():
+                
+                all_similar_perceptual_hash_ids.update( similar_perceptual_hash_ids_to_distances.keys() )
+                
+            
+            similar_perceptual_hash_ids_to_hash_ids = self._GetPerceptualHashIdsToHashIds( all_similar_perceptual_hash_ids )
+            
+            for ( hash_id, similar_perceptual_hash_ids_to_distances ) in hash_ids_to_similar_perceptual_hash_ids_to_distances.items():
+                
+                # files can have multiple perceptual_hashes, and perceptual_hashes can refer to multiple files, so let's make sure we are setting the smallest distance we found
+                
+                similar_hash_ids_to_distances = {}
+                
+                for ( perceptual_hash_id, distance ) in similar_perceptual_hash_ids_to_distances.items():
+                    
+                    for similar_hash_id in similar_perceptual_hash_ids_to_hash_ids.get( perceptual_hash_id, [] ):
+                        
+                        if similar_hash_id not in similar_hash_ids_to_distances or distance < similar_hash_ids_to_distances[ similar_hash_id ]:
+                            
+                            similar_hash_ids_to_distances[ similar_hash_id ] = distance
+                            
+                        
+                    
+                
+                hash_ids_to_similar_hash_ids_and_distances[ hash_id ].extend( similar_hash_ids_to_distances.items() )
+                
             
         
-        similar_hash_ids_and_distances = HydrusLists.DedupeList( similar_hash_ids_and_distances )
-        
-        return similar_hash_ids_and_distances
+        return { hash_id : HydrusLists.DedupeList( similar_hash_ids_and_distances ) for ( hash_id, similar_hash_ids_and_distances ) in hash_ids_to_similar_hash_ids_and_distances.items() }
         
     
     def SearchPixelHashes( self, search_pixel_hash_ids: collections.abc.Collection[ int ] ):
@@ -1022,127 +1314,26 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
         else:
             
-            search_radius = max_hamming_distance
+            perceptual_hash_index = self._GetPerceptualHashIndex()
             
-            if self._root_node_perceptual_hash_id is None:
+            if perceptual_hash_index is None:
                 
-                top_node_result = self._Execute( 'SELECT phash_id FROM shape_vptree WHERE parent_id IS NULL;' ).fetchone()
+                similar_perceptual_hash_ids_to_distances = self._SearchPerceptualHashesVPTree( search_perceptual_hashes, max_hamming_distance )
                 
-                if top_node_result is None:
-                    
-                    return similar_hash_ids_and_distances
-                    
+            else:
                 
-                ( self._root_node_perceptual_hash_id, ) = top_node_result
+                similar_perceptual_hash_ids_to_distances = perceptual_hash_index.Search( search_perceptual_hashes, max_hamming_distance )
                 
             
-            similar_perceptual_hash_ids_to_distances = {}
-            
-            num_cycles = 0
-            total_nodes_searched = 0
-            
-            for search_perceptual_hash in search_perceptual_hashes:
+            if len( similar_perceptual_hash_ids_to_distances ) == 0:
                 
-                next_potentials = [ self._root_node_perceptual_hash_id ]
-                
-                while len( next_potentials ) > 0:
-                    
-                    current_potentials = next_potentials
-                    next_potentials = []
-                    
-                    num_cycles += 1
-                    total_nodes_searched += len( current_potentials )
-                    
-                    # this is no longer an iterable inside the main node SELECT because it was causing crashes on linux!!
-                    # after investigation, it seemed to be SQLite having a problem with part of Get64BitHammingDistance touching perceptual_hashes it presumably was still hanging on to
-                    # the crash was in sqlite code, again presumably on subsequent fetch
-                    # adding a fake delay in seemed to fix it also. guess it was some memory maintenance buffer/bytes thing
-                    # anyway, we now just get the whole lot of results first and then work on the whole lot
-                    # UPDATE: we moved to a cache finally, so the iteration danger is less worrying, but leaving the above up anyway
-                    
-                    self._TryToPopulatePerceptualHashToVPTreeNodeCache( current_potentials )
-                    
-                    for node_perceptual_hash_id in current_potentials:
-                        
-                        result = self._perceptual_hash_id_to_vp_tree_node_cache.get( node_perceptual_hash_id, None )
-                        
-                        if result is None:
-                            
-                            # something crazy happened, probably a broken tree branch, move on
-                            continue
-                            
-                        
-                        ( node_perceptual_hash, node_radius, inner_perceptual_hash_id, outer_perceptual_hash_id ) = result
-                        
-                        # first check the node itself--is it similar?
-                        
-                        node_hamming_distance = HydrusData.Get64BitHammingDistance( search_perceptual_hash, node_perceptual_hash )
-                        
-                        if node_hamming_distance <= search_radius:
-                            
-                            if node_perceptual_hash_id in similar_perceptual_hash_ids_to_distances:
-                                
-                                current_distance = similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ]
-                                
-                                similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = min( node_hamming_distance, current_distance )
-                                
-                            else:
-                                
-                                similar_perceptual_hash_ids_to_distances[ node_perceptual_hash_id ] = node_hamming_distance
-                                
-                            
-                        
-                        # now how about its children--where should we search next?
-                        
-                        if node_radius is not None:
-                            
-                            # we have two spheres--node and search--their centers separated by node_hamming_distance
-                            # we want to search inside/outside the node_sphere if the search_sphere intersects with those spaces
-                            # there are four possibles:
-                            # (----N----)-(--S--)    intersects with outer only - distance between N and S > their radii
-                            # (----N---(-)-S--)      intersects with both
-                            # (----N-(--S-)-)        intersects with both
-                            # (---(-N-S--)-)         intersects with inner only - distance between N and S + radius_S does not exceed radius_N
-                            
-                            if inner_perceptual_hash_id is not None:
-                                
-                                spheres_disjoint = node_hamming_distance > ( node_radius + search_radius )
-                                
-                                if not spheres_disjoint: # i.e. they intersect at some point
-                                    
-                                    next_potentials.append( inner_perceptual_hash_id )
-                                    
-                                
-                            
-                            if outer_perceptual_hash_id is not None:
-                                
-                                search_sphere_subset_of_node_sphere = ( node_hamming_distance + search_radius ) <= node_radius
-                                
-                                if not search_sphere_subset_of_node_sphere: # i.e. search sphere intersects with non-node sphere space at some point
-                                    
-                                    next_potentials.append( outer_perceptual_hash_id )
-                                    
-                                
-                            
-                        
-                    
-                
-            
-            if HG.db_report_mode:
-                
-                HydrusData.ShowText( 'Similar file search touched {} nodes over {} cycles.'.format( HydrusNumbers.ToHumanInt( total_nodes_searched ), HydrusNumbers.ToHumanInt( num_cycles ) ) )
+                return similar_hash_ids_and_distances
                 
             
             # so, now we have perceptual_hash_ids and distances. let's map that to actual files.
             # files can have multiple perceptual_hashes, and perceptual_hashes can refer to multiple files, so let's make sure we are setting the smallest distance we found
             
-            similar_perceptual_hash_ids = list( similar_perceptual_hash_ids_to_distances.keys() )
-            
-            with self._MakeTemporaryIntegerTable( similar_perceptual_hash_ids, 'phash_id' ) as temp_table_name:
-                
-                # temp perceptual_hashes to hash map
-                similar_perceptual_hash_ids_to_hash_ids = HydrusData.BuildKeyToListDict( self._Execute( 'SELECT phash_id, hash_id FROM {} CROSS JOIN shape_perceptual_hash_map USING ( phash_id );'.format( temp_table_name ) ) )
-                
+            similar_perceptual_hash_ids_to_hash_ids = self._GetPerceptualHashIdsToHashIds( list( similar_perceptual_hash_ids_to_distances.keys() ) )
             
             similar_hash_ids_to_distances = {}
             
@@ -1208,12 +1399,14 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         current_perceptual_hash_ids = self._STS( self._Execute( 'SELECT phash_id FROM shape_perceptual_hash_map WHERE hash_id = ?;', ( hash_id, ) ) )
         
         perceptual_hash_ids = set()
+        perceptual_hash_index_rows = []
         
         for perceptual_hash in perceptual_hashes:
             
             perceptual_hash_id = self._GetPerceptualHashId( perceptual_hash )
             
             perceptual_hash_ids.add( perceptual_hash_id )
+            perceptual_hash_index_rows.append( ( perceptual_hash_id, perceptual_hash ) )
             
         
         if perceptual_hash_ids == current_perceptual_hash_ids:
@@ -1230,6 +1423,12 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
             
             self.AssociatePerceptualHashes( hash_id, perceptual_hash_ids )
             
+            if self._perceptual_hash_index is not None:
+                
+                # these may be pre-existing phashes that an earlier disassociation dropped from the index
+                self._perceptual_hash_index.AddPerceptualHashes( perceptual_hash_index_rows )
+                
+            
         
         return True
         
@@ -1243,6 +1442,15 @@ class ClientDBSimilarFiles( ClientDBModule.ClientDBModule ):
         self._DeltaShapeSearchCacheNumbers( search_distance, 1 )
         
     
+    def SetSearchStatuses( self, hash_ids: collections.abc.Collection[ int ], search_distance: int ):
+        
+        num_done = self._DeltaShapeSearchCacheNumbersRemoveFiles( hash_ids )
+        
+        self._ExecuteMany( 'UPDATE shape_search_cache SET searched_distance = ? WHERE hash_id = ?;', ( ( search_distance, hash_id ) for hash_id in hash_ids ) )
+        
+        self._DeltaShapeSearchCacheNumbers( search_distance, num_done )
+        
+    
     def StopSearchingFile( self, hash_id ):
         
         self._DeltaShapeSearchCacheNumbersRemoveFile( hash_id )
@@ -220,7 +220,7 @@ def HasHumanReadableEmbeddedMetadata( path, mime, human_file_description = None,
     return has_human_readable_embedded_metadata
     
 
-def HasTransparency( path, mime, duration_ms = None, num_frames = None, resolution = None ):
+def HasTransparency( path, mime, duration_ms = None, num_frames = None, resolution = None, numpy_image = None ):
     
     if mime not in HC.MIMES_THAT_WE_CAN_CHECK_FOR_TRANSPARENCY:
         
@@ -231,7 +231,10 @@ def HasTransparency( path, mime, duration_ms = None, num_frames = None, resoluti
         
         if mime in HC.IMAGES:
             
-            numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime )
+            if numpy_image is None:
+                
+                numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime )
+                
             
             return HydrusImageColours.NumPyImageHasUsefulAlphaChannel( numpy_image )
             
@@ -1,4 +1,5 @@
 import os
+import queue
 import threading
 import time
 
@@ -72,6 +73,7 @@ class FilesMaintenanceManager( ClientDaemons.ManagerWithMainLoop ):
         self._ReInitialiseWorkRules()
         
         self._maintenance_lock = threading.Lock()
+        self._job_status_lock = threading.Lock()
         
         self._reset_background_event = threading.Event()
         
@@ -626,6 +628,21 @@ class FilesMaintenanceManager( ClientDaemons.ManagerWithMainLoop ):
             
         
     
+    def _IncrementJobStatusCount( self, job_status: ClientThreading.JobStatus, name: str ):
+        
+        with self._job_status_lock:
+            
+            count = job_status.GetIfHasVariable( name )
+            
+            if count is None:
+                
+                count = 0
+                
+            
+            job_status.SetVariable( name, count + 1 )
+            
+        
+    
     def _RegenFileMetadata( self, media_result ):
         
         hash = media_result.GetHash()
@@ -881,7 +898,57 @@ class FilesMaintenanceManager( ClientDaemons.ManagerWithMainLoop ):
             return
             
         
-        cleared_jobs = []
+        # all the jobs for a file are done together, and the files go in the order they sit on disk, so a big queue reads each file once and does not send the drive seeking all over
+        # the heavy cpu stuff like similar files metadata then gets to work on several files at once
+        
+        media_results_and_job_types = self._SortByStorageLocation( media_results_to_job_types )
+        
+        if len( media_results_and_job_types ) > 1:
+            
+            num_threads = self._controller.new_options.GetInteger( 'file_maintenance_num_threads' )
+            
+        else:
+            
+            num_threads = 1
+            
+        
+        results_queue = queue.Queue()
+        
+        def do_file( media_result, job_types ):
+            
+            file_cleared_jobs = []
+            file_keep_going = False
+            
+            try:
+                
+                file_keep_going = self._RunJobsForFile( media_result, job_types, job_status, job_done_hook, file_cleared_jobs )
+                
+            finally:
+                
+                results_queue.put( ( file_cleared_jobs, file_keep_going ) )
+                
+            
+        
+        # in a dict so the collector has scope to alter it
+        run_status = {}
+        
+        run_status[ 'num_in_flight' ] = 0
+        run_status[ 'keep_going' ] = True
+        run_status[ 'cleared_jobs' ] = []
+        
+        def collect_file_result():
+            
+            ( file_cleared_jobs, file_keep_going ) = results_queue.get()
+            
+            run_status[ 'num_in_flight' ] -= 1
+            
+            run_status[ 'cleared_jobs' ].extend( file_cleared_jobs )
+            
+            if not file_keep_going:
+                
+                run_status[ 'keep_going' ] = False
+                
+            
         
         try:
             
@@ -889,217 +956,243 @@ class FilesMaintenanceManager( ClientDaemons.ManagerWithMainLoop ):
             
             last_time_jobs_were_cleared = HydrusTime.GetNow()
             
-            for ( media_result, job_types ) in media_results_to_job_types.items():
+            for ( media_result, job_types ) in media_results_and_job_types:
                 
                 big_pauser.Pause()
                 
-                hash = media_result.GetHash()
-                
-                if job_status.IsCancelled() or self._shutdown:
+                if not run_status[ 'keep_going' ] or job_status.IsCancelled() or self._shutdown:
                     
                     return
                     
                 
-                for job_type in job_types:
+                run_status[ 'num_in_flight' ] += 1
+                
+                if num_threads == 1:
                     
-                    if HG.file_report_mode:
-                        
-                        HydrusData.ShowText( 'file maintenance: {} for {}'.format( ClientFilesMaintenance.regen_file_enum_to_str_lookup[ job_type ], hash.hex() ) )
-                        
+                    do_file( media_result, job_types )
                     
-                    if job_done_hook is not None:
-                        
-                        job_done_hook()
-                        
+                else:
                     
-                    clear_job = True
+                    self._controller.CallToThread( do_file, media_result, job_types )
                     
-                    additional_data = None
+                
+                while run_status[ 'num_in_flight' ] >= num_threads:
                     
-                    try:
-                        
-                        if job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_METADATA:
-                            
-                            additional_data = self._RegenFileMetadata( media_result )
-                            
-                            # media_result has just changed
-                            break
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP:
-                            
-                            additional_data = self._RegenFileModifiedTimestampMS( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
-                            
-                            additional_data = self._RegenFileOtherHashes( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_TRANSPARENCY:
-                            
-                            additional_data = self._HasTransparency( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_EXIF:
-                            
-                            additional_data = self._HasEXIF( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA:
-                            
-                            additional_data = self._HasHumanReadableEmbeddedMetadata( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE:
-                            
-                            additional_data = self._HasICCProfile( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_PIXEL_HASH:
-                            
-                            additional_data = self._RegenPixelHash( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL:
-                            
-                            additional_data = self._RegenFileThumbnailForce( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
-                            
-                            was_regenerated = self._RegenFileThumbnailRefit( media_result )
-                            
-                            additional_data = was_regenerated
-                            
-                            if was_regenerated:
-                                
-                                num_thumb_refits = job_status.GetIfHasVariable( 'num_thumb_refits' )
-                                
-                                if num_thumb_refits is None:
-                                    
-                                    num_thumb_refits = 0
-                                    
-                                
-                                num_thumb_refits += 1
-                                
-                                job_status.SetVariable( 'num_thumb_refits', num_thumb_refits )
-                                
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES:
-                            
-                            self._DeleteNeighbourDupes( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP:
-                            
-                            additional_data = self._CheckSimilarFilesMembership( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA:
-                            
-                            additional_data = self._RegenSimilarFilesMetadata( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS:
-                            
-                            self._FixFilePermissions( media_result )
-                            
-                        elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_BLURHASH:
-                            
-                            additional_data = self._RegenBlurhash( media_result )
-                            
-                        elif job_type in (
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_REMOVE_RECORD,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_DELETE_RECORD,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL_ELSE_REMOVE_RECORD,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL_ELSE_REMOVE_RECORD,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE,
-                            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_LOG_ONLY
-                        ):
-                            
-                            file_was_bad = self._CheckFileIntegrity( media_result, job_type )
-                            
-                            if file_was_bad:
-                                
-                                num_bad_files = job_status.GetIfHasVariable( 'num_bad_files' )
-                                
-                                if num_bad_files is None:
-                                    
-                                    num_bad_files = 0
-                                    
-                                
-                                num_bad_files += 1
-                                
-                                job_status.SetVariable( 'num_bad_files', num_bad_files )
-                                
-                            
-                        
-                    except HydrusExceptions.ShutdownException:
-                        
-                        # no worries
-                        
-                        clear_job = False
-                        
-                        return
-                        
-                    except IOError as e:
-                        
-                        HydrusData.PrintException( e )
-                        
-                        job_status = ClientThreading.JobStatus()
-                        
-                        message = 'Hey, while performing file maintenance task "{}" on file {}, the client ran into an I/O Error! This could be just some media library moaning about a weird (probably truncated) file, but it could also be a significant hard drive problem. Look at the error yourself. If it looks serious, you should shut the client down and check your hard drive health immediately. Just to be safe, no more file maintenance jobs will be run this program boot, and a full traceback has been written to the log.'.format( ClientFilesMaintenance.regen_file_enum_to_str_lookup[ job_type ], hash.hex() )
-                        message += '\n' * 2
-                        message += str( e )
-                        
-                        job_status.SetStatusText( message )
-                        
-                        job_status.SetFiles( [ hash ], 'I/O error file' )
-                        
-                        CG.client_controller.pub( 'message', job_status )
-                        
-                        self._serious_error_encountered = True
-                        self._shutdown = True
-                        
-                        return
-                        
-                    except Exception as e:
-                        
-                        HydrusData.PrintException( e )
-                        
-                        job_status = ClientThreading.JobStatus()
-                        
-                        message = 'There was an unexpected problem performing maintenance task "{}" on file {}! The job will not be reattempted. A full traceback of this error should be written to the log.'.format( ClientFilesMaintenance.regen_file_enum_to_str_lookup[ job_type ], hash.hex() )
-                        message += '\n' * 2
-                        message += str( e )
-                        
-                        job_status.SetStatusText( message )
-                        
-                        job_status.SetFiles( [ hash ], 'failed file' )
-                        
-                        CG.client_controller.pub( 'message', job_status )
-                        
-                    finally:
-                        
-                        self._work_tracker.ReportRequestUsed( num_requests = ClientFilesMaintenance.regen_file_enum_to_job_weight_lookup[ job_type ] )
-                        
-                        if clear_job:
-                            
-                            cleared_jobs.append( ( hash, job_type, additional_data ) )
-                            
-                        
+                    collect_file_result()
                     
                 
-                if HydrusTime.TimeHasPassed( last_time_jobs_were_cleared + 10 ) or len( cleared_jobs ) > 256:
+                if HydrusTime.TimeHasPassed( last_time_jobs_were_cleared + 10 ) or len( run_status[ 'cleared_jobs' ] ) > 256:
                     
-                    self._controller.WriteSynchronous( 'file_maintenance_clear_jobs', cleared_jobs )
+                    self._controller.WriteSynchronous( 'file_maintenance_clear_jobs', run_status[ 'cleared_jobs' ] )
                     
                     last_time_jobs_were_cleared = HydrusTime.GetNow()
                     
-                    cleared_jobs = []
+                    run_status[ 'cleared_jobs' ] = []
                     
                 
             
         finally:
             
-            if len( cleared_jobs ) > 0:
+            # let anything still working finish, so its results are not lost
+            while run_status[ 'num_in_flight' ] > 0:
+                
+                collect_file_result()
+                
+            
+            if len( run_status[ 'cleared_jobs' ] ) > 0:
+                
+                self._controller.Write( 'file_maintenance_clear_jobs', run_status[ 'cleared_jobs' ] )
+                
+            
+        
+    
+    def _RunJobsForFile( self, media_result, job_types, job_status, job_done_hook, cleared_jobs ) -> bool:
+        """
+        Does the file's jobs in order, adding what got done to cleared_jobs. Several threads may be in here at once.
+        
+        :return: False if we should stop working.
+        """
+        
+        hash = media_result.GetHash()
+        
+        for job_type in job_types:
+            
+            if HG.file_report_mode:
+                
+                HydrusData.ShowText( 'file maintenance: {} for {}'.format( ClientFilesMaintenance.regen_file_enum_to_str_lookup[ job_type ], hash.hex() ) )
+                
+            
+            if job_done_hook is not None:
+                
+                with self._job_status_lock:
+                    
+                    job_done_hook()
+                    
+                
+            
+            clear_job = True
+            
+            additional_data = None
+            
+            try:
+                
+                if job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_METADATA:
+                    
+                    additional_data = self._RegenFileMetadata( media_result )
+                    
+                    # media_result has just changed
+                    break
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP:
+                    
+                    additional_data = self._RegenFileModifiedTimestampMS( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_OTHER_HASHES:
+                    
+                    additional_data = self._RegenFileOtherHashes( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_TRANSPARENCY:
+                    
+                    additional_data = self._HasTransparency( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_EXIF:
+                    
+                    additional_data = self._HasEXIF( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_HUMAN_READABLE_EMBEDDED_METADATA:
+                    
+                    additional_data = self._HasHumanReadableEmbeddedMetadata( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_HAS_ICC_PROFILE:
+                    
+                    additional_data = self._HasICCProfile( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_PIXEL_HASH:
+                    
+                    additional_data = self._RegenPixelHash( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FORCE_THUMBNAIL:
+                    
+                    additional_data = self._RegenFileThumbnailForce( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_REFIT_THUMBNAIL:
+                    
+                    was_regenerated = self._RegenFileThumbnailRefit( media_result )
+                    
+                    additional_data = was_regenerated
+                    
+                    if was_regenerated:
+                        
+                        self._IncrementJobStatusCount( job_status, 'num_thumb_refits' )
+                        
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_DELETE_NEIGHBOUR_DUPES:
+                    
+                    self._DeleteNeighbourDupes( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_CHECK_SIMILAR_FILES_MEMBERSHIP:
+                    
+                    additional_data = self._CheckSimilarFilesMembership( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_SIMILAR_FILES_METADATA:
+                    
+                    additional_data = self._RegenSimilarFilesMetadata( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FIX_PERMISSIONS:
+                    
+                    self._FixFilePermissions( media_result )
+                    
+                elif job_type == ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_BLURHASH:
+                    
+                    additional_data = self._RegenBlurhash( media_result )
+                    
+                elif job_type in (
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_REMOVE_RECORD,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_DELETE_RECORD,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_TRY_URL_ELSE_REMOVE_RECORD,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_REMOVE_RECORD,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_TRY_URL_ELSE_REMOVE_RECORD,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_DATA_SILENT_DELETE,
+                    ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_INTEGRITY_PRESENCE_LOG_ONLY
+                ):
+                    
+                    file_was_bad = self._CheckFileIntegrity( media_result, job_type )
+                    
+                    if file_was_bad:
+                        
+                        self._IncrementJobStatusCount( job_status, 'num_bad_files' )
+                        
+                    
+                
+            except HydrusExceptions.ShutdownException:
+                
+                # no worries
+                
+                clear_job = False
+                
+                return False
+                
+            except IOError as e:
+                
+                HydrusData.PrintException( e )
                 
-                self._controller.Write( 'file_maintenance_clear_jobs', cleared_jobs )
+                job_status = ClientThreading.JobStatus()
+                
+                message = 'Hey, while performing file maintenance task "{}" on file {}, the client ran into an I/O Error! This could be just some media library moaning about a weird (probably truncated) file, but it could also be a significant hard drive problem. Look at the error yourself. If it looks serious, you should shut the client down and check your hard drive health immediately. Just to be safe, no more file maintenance jobs will be run this program boot, and a full traceback has been written to the log.'.format( ClientFilesMaintenance.regen_file_enum_to_str_lookup[ job_type ], hash.hex() )
+                message += '\n' * 2
+                message += str( e )
+                
+                job_status.SetStatusText( message )
+                
+                job_status.SetFiles( [ hash ], 'I/O error file' )
+                
+                CG.client_controller.pub( 'message', job_status )
+                
+                self._serious_error_encountered = True
+                self._shutdown = True
+                
+                return False
+                
+            except Exception as e:
+                
+                HydrusData.PrintException( e )
+                
+                job_status = ClientThreading.JobStatus()
+                
+                message = 'There was an unexpected problem performing maintenance task "{}" on file {}! The job will not be reattempted. A full traceback of this error should be written to the log.'.format( ClientFilesMaintenance.regen_file_enum_to_str_lookup[ job_type ], hash.hex() )
+                message += '\n' * 2
+                message += str( e )
+                
+                job_status.SetStatusText( message )
+                
+                job_status.SetFiles( [ hash ], 'failed file' )
+                
+                CG.client_controller.pub( 'message', job_status )
+                
+            finally:
+                
+                self._work_tracker.ReportRequestUsed( num_requests = ClientFilesMaintenance.regen_file_enum_to_job_weight_lookup[ job_type ] )
+                
+                if clear_job:
+                    
+                    cleared_jobs.append( ( hash, job_type, additional_data ) )
+                    
                 
             
         
+        return True
+        
+    
+    def _SortByStorageLocation( self, media_results_to_job_types ):
+        
+        hashes_to_media_results = { media_result.GetHash() : media_result for media_result in media_results_to_job_types.keys() }
+        
+        sorted_hashes = self._controller.client_files_manager.SortHashesByStorageLocation( list( hashes_to_media_results.keys() ) )
+        
+        return [ ( hashes_to_media_results[ hash ], media_results_to_job_types[ hashes_to_media_results[ hash ] ] ) for hash in sorted_hashes ]
+        
     
     def CancelJobs( self, job_type ):
         
@@ -1307,7 +1400,7 @@ class FilesMaintenanceManager( ClientDaemons.ManagerWithMainLoop ):
                         
                         media_results_to_job_types = { hashes_to_media_results[ hash ] : job_types for ( hash, job_types ) in hashes_to_job_types.items() }
                         
-                        for ( media_result, job_types ) in media_results_to_job_types.items():
+                        for ( media_result, job_types ) in self._SortByStorageLocation( media_results_to_job_types ):
                             
                             wait_on_maintenance()
                             
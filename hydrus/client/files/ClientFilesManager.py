@@ -1,6 +1,7 @@
 import collections
 import collections.abc
 import os
+import queue
 import random
 import threading
 import time
@@ -24,6 +25,7 @@ from hydrus.client import ClientGlobals as CG
 from hydrus.client import ClientPaths
 from hydrus.client import ClientThreading
 from hydrus.client.files import ClientFilesMaintenance
+from hydrus.client.files import ClientFilesMigration
 from hydrus.client.files import ClientFilesPhysical
 
 class ClientFilesManager( object ):
@@ -263,6 +265,23 @@ class ClientFilesManager( object ):
         return needed_to_copy_file
         
     
+    def _CompleteRebalanceMove( self, move: ClientFilesMigration.MigrationMove ):
+        
+        with self._master_locations_rwlock.write:
+            
+            if not move.LocationsAreSecretlyTheSame():
+                
+                ClientFilesMigration.SyncAndVerifySubfolderCopy( move.source_subfolder.path, move.dest_subfolder.path )
+                
+            
+            # the dest is now a complete copy, so the merge in here is just deleting the source files
+            # these two lines can cause a deadlock because the db sometimes calls stuff in here.
+            self._controller.WriteSynchronous( 'relocate_client_files', move.source_subfolder, move.dest_subfolder )
+            
+            self._Reinit()
+            
+        
+    
     def _DoMissingLocationsCheck( self ):
         
         if CG.client_controller.IsFirstStart():
@@ -366,6 +385,40 @@ class ClientFilesManager( object ):
             
         
     
+    def _DoRebalanceCopy( self, move: ClientFilesMigration.MigrationMove, verify_hashes: bool, throughput: ClientFilesMigration.MigrationThroughput, is_cancelled_hook, results_queue: queue.Queue ):
+        
+        try:
+            
+            if move.LocationsAreSecretlyTheSame():
+                
+                completed = True
+                
+            else:
+                
+                completed = ClientFilesMigration.CopySubfolderFiles( move.source_subfolder.path, move.dest_subfolder.path, throughput = throughput, is_cancelled_hook = is_cancelled_hook )
+                
+                if completed and verify_hashes and move.source_subfolder.IsForFiles():
+                    
+                    # reading everything back is slow, so we do it here and not in the final sync. the prefix read lock just holds off imports and deletes in this subfolder
+                    
+                    with self._master_locations_rwlock.read:
+                        
+                        with self._prefixes_to_rwlocks[ move.prefix ].read:
+                            
+                            completed = ClientFilesMigration.VerifySubfolderCopyHashes( move.source_subfolder.path, move.dest_subfolder.path, is_cancelled_hook = is_cancelled_hook )
+                            
+                        
+                    
+                
+            
+            results_queue.put( ( move, completed, None ) )
+            
+        except Exception as e:
+            
+            results_queue.put( ( move, False, e ) )
+            
+        
+    
     def _GenerateExpectedFilePath( self, hash, mime ):
         
         # TODO: this guy is presumably nuked or altered when we move to overlapping locations. there is no 'expected' to check, but there might be multiple, or a 'preferred' for imports
@@ -527,7 +580,14 @@ class ClientFilesManager( object ):
         return self._prefixes_to_rwlocks[ prefix ]
         
     
-    def _GetRebalanceTuple( self ):
+    def _GetRebalanceTuple( self, prefixes_to_pending_base_locations = None ):
+        
+        # pending moves are the ones currently being copied. we plan as if they are done, and we don't offer them again
+        
+        if prefixes_to_pending_base_locations is None:
+            
+            prefixes_to_pending_base_locations = {}
+            
         
         try:
             
@@ -564,7 +624,7 @@ class ClientFilesManager( object ):
                 
                 subfolder = subfolders[0]
                 
-                base_location = subfolder.base_location
+                base_location = prefixes_to_pending_base_locations.get( file_prefix, subfolder.base_location )
                 
                 all_media_base_locations.add( base_location )
                 
@@ -690,6 +750,11 @@ class ClientFilesManager( object ):
                 
                 for file_prefix in file_prefixes:
                     
+                    if file_prefix in prefixes_to_pending_base_locations:
+                        
+                        continue
+                        
+                    
                     subfolders = self._prefixes_to_client_files_subfolders[ file_prefix ]
                     
                     subfolder = subfolders[0]
@@ -711,6 +776,11 @@ class ClientFilesManager( object ):
                 
                 for thumbnail_prefix in thumbnail_prefixes:
                     
+                    if thumbnail_prefix in prefixes_to_pending_base_locations:
+                        
+                        continue
+                        
+                    
                     if ideal_thumbnail_override_base_location is None:
                         
                         file_prefix = 'f' + thumbnail_prefix[1:]
@@ -747,7 +817,7 @@ class ClientFilesManager( object ):
                         
                         file_subfolder = typing.cast( ClientFilesPhysical.FilesStorageSubfolder, file_subfolders[0] )
                         
-                        correct_base_location = file_subfolder.base_location
+                        correct_base_location = prefixes_to_pending_base_locations.get( file_subfolder.prefix, file_subfolder.base_location )
                         
                     else:
                         
@@ -782,6 +852,62 @@ class ClientFilesManager( object ):
             
         
     
+    def _GetResumableRebalanceMoves( self, journal_rows ) -> list[ ClientFilesMigration.MigrationMove ]:
+        """
+        You can only call this guy if you have the total lock already!
+        """
+        
+        ( ideal_media_base_locations, ideal_thumbnail_override_base_location ) = self._controller.Read( 'ideal_client_files_locations' )
+        
+        ideal_paths_to_base_locations = { base_location.path : base_location for base_location in ideal_media_base_locations }
+        
+        if ideal_thumbnail_override_base_location is not None:
+            
+            ideal_paths_to_base_locations[ ideal_thumbnail_override_base_location.path ] = ideal_thumbnail_override_base_location
+            
+        
+        moves = []
+        
+        for ( prefix, source_path, dest_path ) in journal_rows:
+            
+            if prefix not in self._prefixes_to_client_files_subfolders:
+                
+                continue
+                
+            
+            current_subfolder = self._prefixes_to_client_files_subfolders[ prefix ][0]
+            
+            if current_subfolder.base_location.path != source_path:
+                
+                # we finished this one just before we were interrupted, or it moved some other way since
+                
+                continue
+                
+            
+            if dest_path in ideal_paths_to_base_locations and ideal_paths_to_base_locations[ dest_path ].PathExists():
+                
+                dest_subfolder = ClientFilesPhysical.FilesStorageSubfolder( prefix, ideal_paths_to_base_locations[ dest_path ] )
+                
+                moves.append( ClientFilesMigration.MigrationMove( current_subfolder, dest_subfolder ) )
+                
+            else:
+                
+                # the user changed their mind about where this should go. the partial copy is only a copy, so we can clear it out
+                
+                abandoned_subfolder = ClientFilesPhysical.FilesStorageSubfolder( prefix, ClientFilesPhysical.FilesStorageBaseLocation( dest_path, 0 ) )
+                
+                if os.path.exists( abandoned_subfolder.path ) and not ( os.path.exists( current_subfolder.path ) and os.path.samefile( abandoned_subfolder.path, current_subfolder.path ) ):
+                    
+                    HydrusData.Print( f'Clearing out the abandoned partial copy of "{current_subfolder}" at "{abandoned_subfolder.path}".' )
+                    
+                    HydrusPaths.DeletePath( abandoned_subfolder.path )
+                    
+                
+            
+        
+        return moves
+        
+    
     def _GetSubfolderForFile( self, hash: bytes, prefix_type: str ) -> ClientFilesPhysical.FilesStorageSubfolder:
         
         # TODO: So this will be a crux of the more complicated system
@@ -836,6 +962,18 @@ class ClientFilesManager( object ):
         raise HydrusExceptions.FileMissingException( 'File for ' + hash.hex() + ' not found!' )
         
     
+    def _ReadRebalanceJournal( self ) -> list[ tuple[ str, str, str ] ]:
+        
+        journal_rows = self._controller.Read( 'serialisable_simple', ClientFilesMigration.MIGRATION_JOURNAL_NAME )
+        
+        if journal_rows is None:
+            
+            return []
+            
+        
+        return [ tuple( journal_row ) for journal_row in journal_rows ]
+        
+    
     def _Reinit( self ):
         
         self._ReinitSubfolders()
@@ -873,6 +1011,18 @@ class ClientFilesManager( object ):
             
         
     
+    def _WriteRebalanceJournal( self, journal_rows: list[ tuple[ str, str, str ] ] ):
+        
+        if len( journal_rows ) == 0:
+            
+            self._controller.WriteSynchronous( 'serialisable_simple', ClientFilesMigration.MIGRATION_JOURNAL_NAME, None )
+            
+        else:
+            
+            self._controller.WriteSynchronous( 'serialisable_simple', ClientFilesMigration.MIGRATION_JOURNAL_NAME, [ list( journal_row ) for journal_row in journal_rows ] )
+            
+        
+    
     def AllLocationsAreDefault( self ):
         
         with self._master_locations_rwlock.read:
@@ -1455,35 +1605,154 @@ class ClientFilesManager( object ):
                 return
                 
             
-            with self._master_locations_rwlock.write:
+            verify_hashes = self._controller.new_options.GetBoolean( 'file_migration_verify_hashes' )
+            
+            def is_cancelled_hook():
+                
+                return job_status.IsCancelled() or HydrusThreading.IsThreadShuttingDown()
+                
+            
+            throughput = ClientFilesMigration.MigrationThroughput()
+            
+            results_queue = queue.Queue()
+            
+            # anything we were partway through last time goes first, so the copying we already did is not wasted
+            
+            with self._master_locations_rwlock.read:
+                
+                resumable_moves = self._GetResumableRebalanceMoves( self._ReadRebalanceJournal() )
+                
+            
+            journal_rows = [ move.ToJournalRow() for move in resumable_moves ]
+            
+            self._WriteRebalanceJournal( journal_rows )
+            
+            prefixes_to_moves_in_flight: dict[ str, ClientFilesMigration.MigrationMove ] = {}
+            
+            first_error = None
+            
+            while True:
                 
-                rebalance_tuple = self._GetRebalanceTuple()
+                ok_to_start_moves = first_error is None and not is_cancelled_hook()
                 
-                while rebalance_tuple is not None:
+                while ok_to_start_moves and len( prefixes_to_moves_in_flight ) < ClientFilesMigration.MAX_CONCURRENT_MOVES:
                     
-                    if job_status.IsCancelled():
+                    if len( resumable_moves ) > 0:
+                        
+                        move = resumable_moves[0]
+                        
+                    else:
+                        
+                        prefixes_to_pending_base_locations = { prefix : move_in_flight.dest_subfolder.base_location for ( prefix, move_in_flight ) in prefixes_to_moves_in_flight.items() }
+                        
+                        with self._master_locations_rwlock.read:
+                            
+                            rebalance_tuple = self._GetRebalanceTuple( prefixes_to_pending_base_locations = prefixes_to_pending_base_locations )
+                            
+                        
+                        if rebalance_tuple is None:
+                            
+                            break
+                            
+                        
+                        move = ClientFilesMigration.MigrationMove( *rebalance_tuple )
+                        
+                    
+                    device_is_busy = False
+                    
+                    for device in ( move.source_device, move.dest_device ):
+                        
+                        if len( [ 1 for move_in_flight in prefixes_to_moves_in_flight.values() if move_in_flight.UsesDevice( device ) ] ) >= ClientFilesMigration.MAX_CONCURRENT_MOVES_PER_DEVICE:
+                            
+                            device_is_busy = True
+                            
+                        
+                    
+                    if device_is_busy:
                         
                         break
                         
                     
-                    ( source_subfolder, dest_subfolder ) = rebalance_tuple
+                    if len( resumable_moves ) > 0:
+                        
+                        resumable_moves.pop( 0 )
+                        
+                    else:
+                        
+                        journal_rows.append( move.ToJournalRow() )
+                        
+                        self._WriteRebalanceJournal( journal_rows )
+                        
+                    
+                    HydrusData.Print( f'Moving {move}.' )
+                    
+                    prefixes_to_moves_in_flight[ move.prefix ] = move
+                    
+                    self._controller.CallToThread( self._DoRebalanceCopy, move, verify_hashes, throughput, is_cancelled_hook, results_queue )
+                    
+                
+                if len( prefixes_to_moves_in_flight ) == 0:
+                    
+                    break
+                    
+                
+                job_status.SetStatusText( f'Moving {HydrusNumbers.ToHumanInt( len( prefixes_to_moves_in_flight ) )} subfolders. {throughput.GetStatusText()}' )
+                
+                try:
+                    
+                    ( move, completed, e ) = results_queue.get( timeout = 1.0 )
+                    
+                except queue.Empty:
+                    
+                    continue
+                    
+                
+                del prefixes_to_moves_in_flight[ move.prefix ]
+                
+                if e is not None:
+                    
+                    if first_error is None:
+                        
+                        first_error = e
+                        
+                    
+                    continue
+                    
+                
+                if not completed:
                     
-                    text = f'Moving "{source_subfolder}" to "{dest_subfolder}".'
+                    # we were cancelled. the journal remembers this one for next time
                     
-                    HydrusData.Print( text )
+                    continue
                     
-                    job_status.SetStatusText( text )
+                
+                try:
                     
-                    # these two lines can cause a deadlock because the db sometimes calls stuff in here.
-                    self._controller.WriteSynchronous( 'relocate_client_files', source_subfolder, dest_subfolder )
+                    self._CompleteRebalanceMove( move )
                     
-                    self._Reinit()
+                except Exception as e:
                     
-                    rebalance_tuple = self._GetRebalanceTuple()
+                    if first_error is None:
+                        
+                        first_error = e
+                        
                     
-                    time.sleep( 0.01 )
+                    continue
                     
                 
+                journal_rows.remove( move.ToJournalRow() )
+                
+                self._WriteRebalanceJournal( journal_rows )
+                
+                throughput.ReportSubfolderDone()
+                
+            
+            HydrusData.Print( f'File migration finished: {throughput.GetStatusText()}' )
+            
+            if first_error is not None:
+                
+                raise first_error
+                
             
         finally:
             
@@ -1497,6 +1766,11 @@ class ClientFilesManager( object ):
         
         with self._master_locations_rwlock.read:
             
+            if len( self._ReadRebalanceJournal() ) > 0:
+                
+                return True
+                
+            
             return self._GetRebalanceTuple() is not None
             
         
@@ -1601,6 +1875,27 @@ class ClientFilesManager( object ):
             
         
     
+    def SortHashesByStorageLocation( self, hashes: collections.abc.Collection[ bytes ] ) -> list[ bytes ]:
+        """
+        Puts the hashes in the order they sit on disk--grouped by base location and then prefix subfolder--so a big job reading them all gets nice sequential access.
+        """
+        
+        with self._master_locations_rwlock.read:
+            
+            def sort_key( hash ):
+                
+                subfolders = self._GetPossibleSubfoldersForFile( hash, 'f' )
+                
+                base_location_path = subfolders[0].base_location.path if len( subfolders ) > 0 else ''
+                
+                # the prefix is the front of the hash, so the hash sorts by subfolder for us
+                return ( base_location_path, hash )
+                
+            
+            return sorted( hashes, key = sort_key )
+            
+        
+    
     def UpdateFileModifiedTimestampMS( self, media, modified_timestamp_ms: int ):
         
         hash = media.GetHash()
@@ -0,0 +1,266 @@
+import os
+import threading
+
+from hydrus.core import HydrusData
+from hydrus.core import HydrusNumbers
+from hydrus.core import HydrusPaths
+from hydrus.core import HydrusTime
+from hydrus.core.files import HydrusFileHandling
+from hydrus.core.processes import HydrusThreading
+
+from hydrus.client.files import ClientFilesPhysical
+
+# moving a big library between drives used to go one prefix subfolder at a time with all file access locked, and it forgot everything on a restart
+# now we copy several subfolders at once with no locks held, and only take the big lock for a quick final sync and switch-over
+# the moves we are partway through are remembered in the db, so an interrupted job picks up where it left off and the partial copies are not wasted
+
+MIGRATION_JOURNAL_NAME = 'client_files_migration_journal'
+
+MAX_CONCURRENT_MOVES = 4
+
+# two copies hitting the same spinning disk is about as much as it can take before they start fighting over the head
+MAX_CONCURRENT_MOVES_PER_DEVICE = 2
+
+def CopySubfolderFiles( source_dir: str, dest_dir: str, throughput: "MigrationThroughput | None" = None, is_cancelled_hook = None ) -> bool:
+    """
+    Copies everything in the source subfolder to the dest, skipping what is already there with the same size and date.
+    Files that are deleted while we work are skipped; the final sync sorts them out.
+    
+    :return: False if we were cancelled.
+    """
+    
+    if not os.path.exists( source_dir ):
+        
+        return True
+        
+    
+    HydrusPaths.MakeSureDirectoryExists( dest_dir )
+    
+    pauser = HydrusThreading.BigJobPauser()
+    
+    for filename in ListSubfolderFilenames( source_dir ):
+        
+        if is_cancelled_hook is not None and is_cancelled_hook():
+            
+            return False
+            
+        
+        pauser.Pause()
+        
+        source_path = os.path.join( source_dir, filename )
+        dest_path = os.path.join( dest_dir, filename )
+        
+        try:
+            
+            copied = HydrusPaths.MirrorFile( source_path, dest_path )
+            
+        except Exception as e:
+            
+            if not os.path.exists( source_path ):
+                
+                continue
+                
+            
+            raise
+            
+        
+        if copied and throughput is not None:
+            
+            throughput.ReportFileCopied( os.path.getsize( dest_path ) )
+            
+        
+    
+    return True
+    
+
+def GetDeviceKey( path: str ):
+    
+    try:
+        
+        return HydrusPaths.GetDeviceId( path )
+        
+    except OSError:
+        
+        return path
+        
+    
+
+def ListSubfolderFilenames( path: str ) -> list[ str ]:
+    
+    with os.scandir( path ) as it:
+        
+        return [ entry.name for entry in it if entry.is_file() ]
+        
+    
+
+def SyncAndVerifySubfolderCopy( source_dir: str, dest_dir: str ):
+    """
+    The last pass, done while nothing can touch the source. Catches anything that changed during the big copy and then checks the result is all there.
+    This runs under the big lock, so it only checks sizes. Any hash checking happens before, in VerifySubfolderCopyHashes.
+    """
+    
+    CopySubfolderFiles( source_dir, dest_dir )
+    
+    if not os.path.exists( source_dir ):
+        
+        return
+        
+    
+    source_filenames = set( ListSubfolderFilenames( source_dir ) )
+    
+    # stuff that got deleted from the source while we were copying
+    for filename in set( ListSubfolderFilenames( dest_dir ) ).difference( source_filenames ):
+        
+        HydrusPaths.DeletePath( os.path.join( dest_dir, filename ) )
+        
+    
+    for filename in source_filenames:
+        
+        source_path = os.path.join( source_dir, filename )
+        dest_path = os.path.join( dest_dir, filename )
+        
+        if not os.path.exists( dest_path ) or os.path.getsize( dest_path ) != os.path.getsize( source_path ):
+            
+            raise Exception( f'After copying "{source_path}" to "{dest_path}", the destination was missing or the wrong size!' )
+            
+        
+    
+
+def VerifySubfolderCopyHashes( source_dir: str, dest_dir: str, is_cancelled_hook = None ) -> bool:
+    """
+    Reads every copied file back and checks its hash. Do this after the big copy, with the subfolder's prefix locked for reading so nothing is added or deleted as we go.
+    A bad copy is deleted so the next attempt copies it again.
+    
+    :return: False if we were cancelled.
+    """
+    
+    if not os.path.exists( source_dir ) or not os.path.exists( dest_dir ):
+        
+        return True
+        
+    
+    pauser = HydrusThreading.BigJobPauser()
+    
+    dest_filenames = set( ListSubfolderFilenames( dest_dir ) )
+    
+    for filename in ListSubfolderFilenames( source_dir ):
+        
+        if filename not in dest_filenames:
+            
+            continue
+            
+        
+        if is_cancelled_hook is not None and is_cancelled_hook():
+            
+            return False
+            
+        
+        pauser.Pause()
+        
+        # file storage names are the sha256, so we can check the copy without reading the source again
+        
+        ( hash_hex, ext ) = os.path.splitext( filename )
+        
+        if len( hash_hex ) != 64:
+            
+            continue
+            
+        
+        dest_path = os.path.join( dest_dir, filename )
+        
+        if HydrusFileHandling.GetHashFromPath( dest_path ).hex() != hash_hex:
+            
+            HydrusPaths.DeletePath( dest_path )
+            
+            raise Exception( f'After copying "{os.path.join( source_dir, filename )}" to "{dest_path}", the destination had the wrong hash!' )
+            
+        
+    
+    return True
+    
+
+class MigrationMove( object ):
+    
+    def __init__( self, source_subfolder: ClientFilesPhysical.FilesStorageSubfolder, dest_subfolder: ClientFilesPhysical.FilesStorageSubfolder ):
+        
+        self.source_subfolder = source_subfolder
+        self.dest_subfolder = dest_subfolder
+        
+        self.prefix = source_subfolder.prefix
+        
+        self.source_device = GetDeviceKey( source_subfolder.base_location.path )
+        self.dest_device = GetDeviceKey( dest_subfolder.base_location.path )
+        
+    
+    def __repr__( self ):
+        
+        return f'"{self.source_subfolder}" to "{self.dest_subfolder}"'
+        
+    
+    def LocationsAreSecretlyTheSame( self ) -> bool:
+        
+        # via symlinking etc..., so there is nothing to copy
+        
+        try:
+            
+            return os.path.samefile( self.source_subfolder.base_location.path, self.dest_subfolder.base_location.path )
+            
+        except OSError:
+            
+            return False
+            
+        
+    
+    def ToJournalRow( self ) -> tuple[ str, str, str ]:
+        
+        return ( self.prefix, self.source_subfolder.base_location.path, self.dest_subfolder.base_location.path )
+        
+    
+    def UsesDevice( self, device ) -> bool:
+        
+        return device in ( self.source_device, self.dest_device )
+        
+    
+
+class MigrationThroughput( object ):
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._started = HydrusTime.GetNowFloat()
+        
+        self._num_files_copied = 0
+        self._num_bytes_copied = 0
+        self._num_subfolders_done = 0
+        
+    
+    def GetStatusText( self ) -> str:
+        
+        with self._lock:
+            
+            time_elapsed = max( HydrusTime.GetNowFloat() - self._started, 1.0 )
+            
+            bytes_per_second = self._num_bytes_copied / time_elapsed
+            
+            return f'{HydrusNumbers.ToHumanInt( self._num_subfolders_done )} subfolders moved, {HydrusNumbers.ToHumanInt( self._num_files_copied )} files ({HydrusData.ToHumanBytes( self._num_bytes_copied )}) copied at {HydrusData.ToHumanBytes( bytes_per_second )}/s'
+            
+        
+    
+    def ReportFileCopied( self, num_bytes: int ):
+        
+        with self._lock:
+            
+            self._num_files_copied += 1
+            self._num_bytes_copied += num_bytes
+            
+        
+    
+    def ReportSubfolderDone( self ):
+        
+        with self._lock:
+            
+            self._num_subfolders_done += 1
+            
+        
+    
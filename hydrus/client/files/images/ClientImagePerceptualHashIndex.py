@@ -0,0 +1,320 @@
+import collections.abc
+import threading
+
+import numpy
+
+from hydrus.core import HydrusLists
+from hydrus.core import HydrusPSUtil
+
+# the search is a big ( num_search_hashes x num_index_hashes ) uint64 xor and popcount, so we do it in blocks to keep memory sane
+MAX_SEARCH_BLOCK_CELLS = 16 * 1024 * 1024
+
+# phash_id int64 + phash uint64
+BYTES_PER_INDEXED_PERCEPTUAL_HASH = numpy.dtype( numpy.int64 ).itemsize + numpy.dtype( numpy.uint64 ).itemsize
+
+if hasattr( numpy, 'bitwise_count' ):
+    
+    # the uint8 result
+    POPCOUNT_BYTES_PER_CELL = numpy.dtype( numpy.uint8 ).itemsize
+    
+    def _PopCount( array: numpy.ndarray ) -> numpy.ndarray:
+        
+        return numpy.bitwise_count( array )
+        
+    
+else:
+    
+    # numpy < 2.0 has no popcount ufunc, so we fall back to an 8-bit lookup table
+    
+    BYTE_POPCOUNTS = numpy.array( [ bin( i ).count( '1' ) for i in range( 256 ) ], dtype = numpy.uint8 )
+    
+    # the lookup makes a uint8 for each of the eight bytes, and then we sum that to the uint8 result
+    POPCOUNT_BYTES_PER_CELL = 9 * numpy.dtype( numpy.uint8 ).itemsize
+    
+    def _PopCount( array: numpy.ndarray ) -> numpy.ndarray:
+        
+        as_bytes = array.view( numpy.uint8 ).reshape( array.shape + ( 8, ) )
+        
+        return BYTE_POPCOUNTS[ as_bytes ].sum( axis = -1, dtype = numpy.uint8 )
+        
+    
+
+# a search block is a uint64 xor scratch buffer, then the popcount, then a bool or a min over that
+SEARCH_BLOCK_BYTES_PER_CELL = numpy.dtype( numpy.uint64 ).itemsize + POPCOUNT_BYTES_PER_CELL + numpy.dtype( numpy.bool_ ).itemsize
+
+def PerceptualHashesToNumPy( perceptual_hashes: collections.abc.Collection[ bytes ] ) -> numpy.ndarray:
+    
+    # big-endian to match HydrusData.Get64BitHammingDistance, although popcount of xor doesn't care
+    return numpy.frombuffer( b''.join( perceptual_hashes ), dtype = '>u8' ).astype( numpy.uint64 )
+    
+
+def GetHammingDistances( search_perceptual_hashes: numpy.ndarray, perceptual_hashes: numpy.ndarray ) -> numpy.ndarray:
+    
+    # returns ( num_search, num_perceptual_hashes ) uint8 matrix
+    
+    return _PopCount( numpy.bitwise_xor( search_perceptual_hashes[ :, None ], perceptual_hashes[ None, : ] ) )
+    
+
+def IndexWouldFitInMemory( num_perceptual_hashes: int ) -> bool:
+    
+    if not HydrusPSUtil.PSUTIL_OK:
+        
+        return True
+        
+    
+    approx_available_memory = HydrusPSUtil.psutil.virtual_memory().available
+    
+    # index itself, the rebuild copy, and a search block with its scratch buffers, and still leave plenty for everything else
+    approx_memory_needed = ( num_perceptual_hashes * BYTES_PER_INDEXED_PERCEPTUAL_HASH * 2 ) + ( MAX_SEARCH_BLOCK_CELLS * SEARCH_BLOCK_BYTES_PER_CELL )
+    
+    return approx_memory_needed < approx_available_memory / 4
+    
+
+class PerceptualHashIndex( object ):
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._perceptual_hash_ids = numpy.empty( 0, dtype = numpy.int64 )
+        self._perceptual_hashes = numpy.empty( 0, dtype = numpy.uint64 )
+        
+        # we don't want to reallocate the whole array on every single file import, so adds and removes queue up until the next search
+        self._pending_adds = {}
+        self._pending_removes = set()
+        
+    
+    def _Consolidate( self ):
+        
+        if len( self._pending_removes ) > 0:
+            
+            keep = numpy.isin( self._perceptual_hash_ids, numpy.fromiter( self._pending_removes, dtype = numpy.int64, count = len( self._pending_removes ) ), invert = True )
+            
+            self._perceptual_hash_ids = self._perceptual_hash_ids[ keep ]
+            self._perceptual_hashes = self._perceptual_hashes[ keep ]
+            
+            self._pending_removes = set()
+            
+        
+        if len( self._pending_adds ) > 0:
+            
+            new_perceptual_hash_ids = numpy.fromiter( self._pending_adds.keys(), dtype = numpy.int64, count = len( self._pending_adds ) )
+            new_perceptual_hashes = PerceptualHashesToNumPy( list( self._pending_adds.values() ) )
+            
+            # an add may be a re-add of something we already have
+            keep = numpy.isin( self._perceptual_hash_ids, new_perceptual_hash_ids, invert = True )
+            
+            self._perceptual_hash_ids = numpy.concatenate( ( self._perceptual_hash_ids[ keep ], new_perceptual_hash_ids ) )
+            self._perceptual_hashes = numpy.concatenate( ( self._perceptual_hashes[ keep ], new_perceptual_hashes ) )
+            
+            self._pending_adds = {}
+            
+        
+    
+    def AddPerceptualHashes( self, rows: collections.abc.Iterable[ tuple[ int, bytes ] ] ):
+        
+        with self._lock:
+            
+            for ( perceptual_hash_id, perceptual_hash ) in rows:
+                
+                if not isinstance( perceptual_hash, bytes ) or len( perceptual_hash ) != 8:
+                    
+                    continue
+                    
+                
+                self._pending_removes.discard( perceptual_hash_id )
+                self._pending_adds[ perceptual_hash_id ] = perceptual_hash
+                
+            
+        
+    
+    def GetMemoryUsage( self ) -> int:
+        
+        with self._lock:
+            
+            return self._perceptual_hash_ids.nbytes + self._perceptual_hashes.nbytes + ( len( self._pending_adds ) * BYTES_PER_INDEXED_PERCEPTUAL_HASH )
+            
+        
+    
+    def RemovePerceptualHashIds( self, perceptual_hash_ids: collections.abc.Iterable[ int ] ):
+        
+        with self._lock:
+            
+            for perceptual_hash_id in perceptual_hash_ids:
+                
+                if perceptual_hash_id in self._pending_adds:
+                    
+                    del self._pending_adds[ perceptual_hash_id ]
+                    
+                
+                self._pending_removes.add( perceptual_hash_id )
+                
+            
+        
+    
+    def Search( self, search_perceptual_hashes: collections.abc.Collection[ bytes ], max_hamming_distance: int ) -> dict[ int, int ]:
+        
+        perceptual_hash_ids_to_distances = {}
+        
+        search_perceptual_hashes = [ search_perceptual_hash for search_perceptual_hash in search_perceptual_hashes if isinstance( search_perceptual_hash, bytes ) and len( search_perceptual_hash ) == 8 ]
+        
+        if len( search_perceptual_hashes ) == 0:
+            
+            return perceptual_hash_ids_to_distances
+            
+        
+        with self._lock:
+            
+            self._Consolidate()
+            
+            perceptual_hash_ids = self._perceptual_hash_ids
+            perceptual_hashes = self._perceptual_hashes
+            
+        
+        num_perceptual_hashes = len( perceptual_hashes )
+        
+        if num_perceptual_hashes == 0:
+            
+            return perceptual_hash_ids_to_distances
+            
+        
+        search_array = PerceptualHashesToNumPy( search_perceptual_hashes )
+        
+        num_search_per_block = max( 1, MAX_SEARCH_BLOCK_CELLS // num_perceptual_hashes )
+        num_index_per_block = min( num_perceptual_hashes, MAX_SEARCH_BLOCK_CELLS )
+        
+        for search_start in range( 0, len( search_array ), num_search_per_block ):
+            
+            search_block = search_array[ search_start : search_start + num_search_per_block ]
+            
+            for index_start in range( 0, num_perceptual_hashes, num_index_per_block ):
+                
+                index_block = perceptual_hashes[ index_start : index_start + num_index_per_block ]
+                
+                # min over the search hashes, since we want the best distance any of them got
+                distances = GetHammingDistances( search_block, index_block ).min( axis = 0 )
+                
+                ( hit_indices, ) = numpy.nonzero( distances <= max_hamming_distance )
+                
+                if len( hit_indices ) == 0:
+                    
+                    continue
+                    
+                
+                hit_perceptual_hash_ids = perceptual_hash_ids[ index_start + hit_indices ].tolist()
+                hit_distances = distances[ hit_indices ].tolist()
+                
+                for ( perceptual_hash_id, distance ) in zip( hit_perceptual_hash_ids, hit_distances ):
+                    
+                    if perceptual_hash_id not in perceptual_hash_ids_to_distances or distance < perceptual_hash_ids_to_distances[ perceptual_hash_id ]:
+                        
+                        perceptual_hash_ids_to_distances[ perceptual_hash_id ] = distance
+                        
+                    
+                
+            
+        
+        return perceptual_hash_ids_to_distances
+        
+    
+    def SearchMany( self, search_perceptual_hashes: collections.abc.Sequence[ bytes ], max_hamming_distance: int ) -> list[ dict[ int, int ] ]:
+        
+        # one result dict per search hash, in order. this is the block distance matrix version for batch work
+        
+        results = [ {} for search_perceptual_hash in search_perceptual_hashes ]
+        
+        valid_indices = [ i for ( i, search_perceptual_hash ) in enumerate( search_perceptual_hashes ) if isinstance( search_perceptual_hash, bytes ) and len( search_perceptual_hash ) == 8 ]
+        
+        if len( valid_indices ) == 0:
+            
+            return results
+            
+        
+        with self._lock:
+            
+            self._Consolidate()
+            
+            perceptual_hash_ids = self._perceptual_hash_ids
+            perceptual_hashes = self._perceptual_hashes
+            
+        
+        num_perceptual_hashes = len( perceptual_hashes )
+        
+        if num_perceptual_hashes == 0:
+            
+            return results
+            
+        
+        search_array = PerceptualHashesToNumPy( [ search_perceptual_hashes[ i ] for i in valid_indices ] )
+        
+        num_search_per_block = max( 1, MAX_SEARCH_BLOCK_CELLS // num_perceptual_hashes )
+        num_index_per_block = min( num_perceptual_hashes, MAX_SEARCH_BLOCK_CELLS )
+        
+        for search_start in range( 0, len( search_array ), num_search_per_block ):
+            
+            search_block = search_array[ search_start : search_start + num_search_per_block ]
+            
+            for index_start in range( 0, num_perceptual_hashes, num_index_per_block ):
+                
+                index_block = perceptual_hashes[ index_start : index_start + num_index_per_block ]
+                
+                distances = GetHammingDistances( search_block, index_block )
+                
+                ( hit_rows, hit_columns ) = numpy.nonzero( distances <= max_hamming_distance )
+                
+                if len( hit_rows ) == 0:
+                    
+                    continue
+                    
+                
+                hit_distances = distances[ hit_rows, hit_columns ].tolist()
+                hit_perceptual_hash_ids = perceptual_hash_ids[ index_start + hit_columns ].tolist()
+                
+                for ( row, perceptual_hash_id, distance ) in zip( hit_rows.tolist(), hit_perceptual_hash_ids, hit_distances ):
+                    
+                    results[ valid_indices[ search_start + row ] ][ perceptual_hash_id ] = distance
+                    
+                
+            
+        
+        return results
+        
+    
+    def SetPerceptualHashes( self, rows: collections.abc.Iterable[ tuple[ int, bytes ] ] ):
+        
+        # rows may be a big cursor, so we go in chunks rather than making a giant list of tuples
+        
+        perceptual_hash_id_blocks = [ numpy.empty( 0, dtype = numpy.int64 ) ]
+        perceptual_hash_blocks = [ numpy.empty( 0, dtype = numpy.uint64 ) ]
+        
+        for chunk in HydrusLists.SplitIteratorIntoChunks( rows, 65536 ):
+            
+            chunk = [ ( perceptual_hash_id, perceptual_hash ) for ( perceptual_hash_id, perceptual_hash ) in chunk if isinstance( perceptual_hash, bytes ) and len( perceptual_hash ) == 8 ]
+            
+            perceptual_hash_id_blocks.append( numpy.fromiter( ( perceptual_hash_id for ( perceptual_hash_id, perceptual_hash ) in chunk ), dtype = numpy.int64, count = len( chunk ) ) )
+            perceptual_hash_blocks.append( PerceptualHashesToNumPy( [ perceptual_hash for ( perceptual_hash_id, perceptual_hash ) in chunk ] ) )
+            
+        
+        perceptual_hash_ids = numpy.concatenate( perceptual_hash_id_blocks )
+        perceptual_hashes = numpy.concatenate( perceptual_hash_blocks )
+        
+        with self._lock:
+            
+            self._perceptual_hash_ids = perceptual_hash_ids
+            self._perceptual_hashes = perceptual_hashes
+            
+            self._pending_adds = {}
+            self._pending_removes = set()
+            
+        
+    
+    def __len__( self ):
+        
+        with self._lock:
+            
+            self._Consolidate()
+            
+            return len( self._perceptual_hash_ids )
+            
+        
+    
@@ -19,7 +19,7 @@ def DiscardBlankPerceptualHashes( perceptual_hashes ):
     return perceptual_hashes
     
 
-def GenerateUsefulShapePerceptualHashes( path, mime ):
+def GenerateUsefulShapePerceptualHashes( path, mime, numpy_image = None ):
     
     if HG.phash_generation_report_mode:
         
@@ -28,7 +28,10 @@ def GenerateUsefulShapePerceptualHashes( path, mime ):
     
     try:
         
-        numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime )
+        if numpy_image is None:
+            
+            numpy_image = HydrusImageHandling.GenerateNumPyImage( path, mime )
+            
         
         return GenerateUsefulShapePerceptualHashesNumPy( numpy_image )
         
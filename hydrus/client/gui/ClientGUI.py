@@ -932,7 +932,15 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         
         text = action + ' backup at "' + path + '"?'
         text += '\n' * 2
-        text += 'The database will be locked while the backup occurs, which may lock up your gui as well.'
+        
+        if HG.db_journal_mode == 'WAL':
+            
+            text += 'The backup will run in the background, and you can keep using the client while it works. It will copy a snapshot of the database as it is when the backup starts.'
+            
+        else:
+            
+            text += 'The database will be locked while the backup occurs, which may lock up your gui as well.'
+            
         
         result = ClientGUIDialogsQuick.GetYesNo( self, text )
         
@@ -1672,6 +1680,30 @@ class FrameGUI( CAC.ApplicationCommandProcessorMixin, ClientGUITopLevelWindows.M
         HydrusMemory.PrintCurrentMemoryUse( ( QW.QWidget, ) )
         
     
+    def _DebugShowCacheStats( self ):
+        
+        for stats in self._controller.GetCacheStats().values():
+            
+            hit_rate = stats[ 'hit_rate' ]
+            
+            hit_rate_str = 'no lookups yet' if hit_rate is None else HydrusNumbers.FloatToPercentage( hit_rate )
+            
+            lines = [
+                '{} ({})'.format( stats[ 'name' ], stats[ 'eviction_policy' ] ),
+                'size: {}, {} items'.format( HydrusData.ConvertValueRangeToBytes( stats[ 'size_bytes' ], stats[ 'size_limit_bytes' ] ), HydrusNumbers.ToHumanInt( stats[ 'num_items' ] ) ),
+                'hits: {}, misses: {}, hit rate: {}'.format( HydrusNumbers.ToHumanInt( stats[ 'hits' ] ), HydrusNumbers.ToHumanInt( stats[ 'misses' ] ), hit_rate_str ),
+                'added: {} ({}), evicted: {} ({})'.format( HydrusNumbers.ToHumanInt( stats[ 'adds' ] ), HydrusData.ToHumanBytes( stats[ 'added_bytes' ] ), HydrusNumbers.ToHumanInt( stats[ 'evictions' ] ), HydrusData.ToHumanBytes( stats[ 'evicted_bytes' ] ) )
+            ]
+            
+            if 'num_protected' in stats:
+                
+                lines.append( 'protected: {} items, {}, promotions: {}, demotions: {}'.format( HydrusNumbers.ToHumanInt( stats[ 'num_protected' ] ), HydrusData.ConvertValueRangeToBytes( stats[ 'protected_bytes' ], stats[ 'protected_bytes_limit' ] ), HydrusNumbers.ToHumanInt( stats[ 'promotions' ] ), HydrusNumbers.ToHumanInt( stats[ 'demotions' ] ) ) )
+                
+            
+            HydrusData.ShowText( '\n'.join( lines ) )
+            
+        
+    
     def _DebugShowScheduledJobs( self ):
         
         self._controller.DebugShowScheduledJobs()
@@ -2162,7 +2194,7 @@ ATTACH "client.mappings.db" as external_mappings;'''
                         
                         try:
                             
-                            update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+                            update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
                             
                         except Exception as e:
                             
@@ -3069,6 +3101,8 @@ ATTACH "client.mappings.db" as external_mappings;'''
                         
                         ClientGUIMenus.AppendMenuItem( submenu, 'change update period' + HC.UNICODE_ELLIPSIS, 'Change the update period for this service.', self._ManageServiceOptionsUpdatePeriod, service_key )
                         
+                        ClientGUIMenus.AppendMenuItem( submenu, 'change update format' + HC.UNICODE_ELLIPSIS, 'Change the file format this service uses for new updates.', self._ManageServiceOptionsUpdateEncoding, service_key )
+                        
                         ClientGUIMenus.AppendMenuItem( submenu, 'change anonymisation period' + HC.UNICODE_ELLIPSIS, 'Change the account history nullification period for this service.', self._ManageServiceOptionsNullificationPeriod, service_key )
                         
                         if service_type == HC.TAG_REPOSITORY:
@@ -3662,6 +3696,7 @@ ATTACH "client.mappings.db" as external_mappings;'''
         ClientGUIMenus.AppendMenuItem( memory_actions, 'run slow memory maintenance', 'Tell all the slow caches to maintain themselves.', self._controller.MaintainMemorySlow )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'clear all rendering caches', 'Tell the image rendering system to forget all current images, tiles, and thumbs. This will often free up a bunch of memory immediately.', self._controller.ClearCaches )
         ClientGUIMenus.AppendMenuItem( memory_actions, 'clear thumbnail cache', 'Tell the thumbnail cache to forget everything and redraw all current thumbs.', self._controller.pub, 'clear_thumbnail_cache' )
+        ClientGUIMenus.AppendMenuItem( memory_actions, 'show cache stats', 'Show the size, hit rate, and eviction counts of the image, tile, and thumbnail caches.', self._DebugShowCacheStats )
         
         if HydrusMemory.PYMPLER_OK:
             
@@ -4822,6 +4857,70 @@ ATTACH "client.mappings.db" as external_mappings;'''
             
         
     
+    def _ManageServiceOptionsUpdateEncoding( self, service_key ):
+        
+        service = self._controller.services_manager.GetService( service_key )
+        
+        update_encoding = service.GetUpdateEncoding()
+        
+        message = 'Updates are normally json. The compact format is much smaller and faster to process, but clients older than this version cannot read it. Changing this only affects new updates.'
+        
+        choice_tuples = [
+            ( 'json (all clients)', HydrusNetwork.UPDATE_ENCODING_JSON ),
+            ( 'compact (this version and later)', HydrusNetwork.UPDATE_ENCODING_COMPACT )
+        ]
+        
+        try:
+            
+            update_encoding = ClientGUIDialogsQuick.SelectFromList( self, 'edit update format', choice_tuples, value_to_select = update_encoding, sort_tuples = False )
+            
+        except HydrusExceptions.CancelledException:
+            
+            return
+            
+        
+        result = ClientGUIDialogsQuick.GetYesNo( self, message, yes_label = 'set it', no_label = 'forget it' )
+        
+        if result != QW.QDialog.DialogCode.Accepted:
+            
+            return
+            
+        
+        job_status = ClientThreading.JobStatus()
+        
+        job_status.SetStatusTitle( 'setting update format' )
+        job_status.SetStatusText( 'uploading' + HC.UNICODE_ELLIPSIS )
+        
+        self._controller.pub( 'message', job_status )
+        
+        def work_callable():
+            
+            service.Request( HC.POST, 'options_update_encoding', { 'update_encoding' : update_encoding } )
+            
+            return 1
+            
+        
+        def publish_callable( gumpf ):
+            
+            job_status.SetStatusText( 'done!' )
+            
+            job_status.FinishAndDismiss( 5 )
+            
+            service.SetAccountRefreshDueNow()
+            
+        
+        def errback_callable( etype, value, tb ):
+            
+            job_status.SetExceptionTuple( etype, value, tb )
+            
+            job_status.Finish()
+            
+        
+        job = ClientGUIAsync.AsyncQtJob( self, work_callable, publish_callable, errback_callable = errback_callable )
+        
+        job.start()
+        
+    
     def _ManageServiceOptionsUpdatePeriod( self, service_key ):
         
         service = self._controller.services_manager.GetService( service_key )
@@ -1167,6 +1167,7 @@ class COLUMN_LIST_REVIEW_NETWORK_SESSIONS( COLUMN_LIST_DEFINITION ):
     NETWORK_CONTEXT = 0
     COOKIES = 1
     EXPIRES = 2
+    CONNECTIONS = 3
     
 
 column_list_type_name_lookup[ COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID ] = 'network sessions'
@@ -1174,6 +1175,7 @@ column_list_type_name_lookup[ COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID ] = 'networ
 register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.NETWORK_CONTEXT, 'network context', False, 34, True )
 register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.COOKIES, 'cookies', False, 9, True )
 register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.EXPIRES, 'expires', False, 28, True )
+register_column_type( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID, COLUMN_LIST_REVIEW_NETWORK_SESSIONS.CONNECTIONS, 'connections', True, 36, True )
 
 default_column_list_sort_lookup[ COLUMN_LIST_REVIEW_NETWORK_SESSIONS.ID ] = ( COLUMN_LIST_REVIEW_NETWORK_SESSIONS.NETWORK_CONTEXT, True )
 
@@ -36,6 +36,7 @@ from hydrus.client.gui.widgets import ClientGUIBandwidth
 from hydrus.client.gui.widgets import ClientGUICommon
 from hydrus.client.networking import ClientNetworking
 from hydrus.client.networking import ClientNetworkingContexts
+from hydrus.client.networking import ClientNetworkingCurlCFFI
 from hydrus.client.networking import ClientNetworkingDomain
 from hydrus.client.networking import ClientNetworkingJobs
 from hydrus.client.networking import ClientNetworkingSessions
@@ -1251,6 +1252,8 @@ class ReviewNetworkJobs( ClientGUIScrolledPanels.ReviewPanel ):
         self._refresh_time_delta = ClientGUITime.NoneableTimeDeltaWidget( self._list_ctrl_panel, 0.25, 'auto-refresh', none_phrase = 'manual refresh', min = 0.05, days = False, hours = False, minutes = True, seconds = True, milliseconds = True )
         self._refresh_time_delta.SetValue( None )
         
+        self._status_metrics_st = ClientGUICommon.BetterStaticText( self )
+        
         #
         
         self._list_ctrl.Sort()
@@ -1266,6 +1269,7 @@ class ReviewNetworkJobs( ClientGUIScrolledPanels.ReviewPanel ):
         
         QP.AddToLayout( vbox, st, CC.FLAGS_EXPAND_PERPENDICULAR )
         QP.AddToLayout( vbox, self._list_ctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
+        QP.AddToLayout( vbox, self._status_metrics_st, CC.FLAGS_EXPAND_PERPENDICULAR )
         QP.AddToLayout( vbox, self._refresh_time_delta, CC.FLAGS_ON_RIGHT )
         
         self._refresh_time_delta.timeDeltaChanged.connect( self._RefreshTimeDeltaChanged )
@@ -1317,6 +1321,17 @@ class ReviewNetworkJobs( ClientGUIScrolledPanels.ReviewPanel ):
         
         self._list_ctrl.SetData( job_rows )
         
+        statuses_to_metrics = self._controller.network_engine.GetStatusMetrics()
+        
+        lines = []
+        
+        for ( status, ( num_jobs, num_jobs_passed_through, average_time_spent ) ) in sorted( statuses_to_metrics.items() ):
+            
+            lines.append( f'{ClientNetworking.job_status_str_lookup[ status ]}: {HydrusNumbers.ToHumanInt( num_jobs )} now, {HydrusNumbers.ToHumanInt( num_jobs_passed_through )} passed through, {HydrusTime.TimeDeltaToPrettyTimeDelta( average_time_spent )} on average' )
+            
+        
+        self._status_metrics_st.setText( '\n'.join( lines ) )
+        
     
     def _RefreshTimeDeltaChanged( self ):
         
@@ -1520,7 +1535,25 @@ class ReviewNetworkSessionsPanel( ClientGUIScrolledPanels.ReviewPanel ):
                 
             
         
-        display_tuple = ( pretty_network_context, pretty_number_of_cookies, pretty_expiry )
+        if ClientNetworkingCurlCFFI.SessionIsCurlCFFI( session ):
+            
+            pretty_connections = 'managed by curl_cffi'
+            
+        else:
+            
+            ( num_new_connections, num_reused_connections, average_connect_time ) = self._session_manager.GetConnectionPoolStats( network_context )
+            
+            if num_new_connections + num_reused_connections == 0:
+                
+                pretty_connections = ''
+                
+            else:
+                
+                pretty_connections = f'{HydrusNumbers.ToHumanInt( num_new_connections )} opened ({HydrusNumbers.ToHumanInt( int( average_connect_time * 1000 ) )}ms to connect), {HydrusNumbers.ToHumanInt( num_reused_connections )} reused'
+                
+            
+        
+        display_tuple = ( pretty_network_context, pretty_number_of_cookies, pretty_expiry, pretty_connections )
         
         return display_tuple
         
@@ -1560,7 +1593,9 @@ class ReviewNetworkSessionsPanel( ClientGUIScrolledPanels.ReviewPanel ):
                 
             
         
-        sort_tuple = ( pretty_network_context, number_of_cookies, expiry )
+        ( num_new_connections, num_reused_connections, average_connect_time ) = self._session_manager.GetConnectionPoolStats( network_context )
+        
+        sort_tuple = ( pretty_network_context, number_of_cookies, expiry, ( num_reused_connections, num_new_connections ) )
         
         return sort_tuple
         
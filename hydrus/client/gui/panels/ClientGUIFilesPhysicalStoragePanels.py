@@ -540,6 +540,11 @@ class MoveMediaFilesPanel( ClientGUIScrolledPanels.ReviewPanel ):
         
         self._rebalance_button = ClientGUICommon.BetterButton( file_locations_panel, 'move files now', self._Rebalance )
         
+        self._verify_hashes = QW.QCheckBox( 'check file hashes after copying', file_locations_panel )
+        self._verify_hashes.setToolTip( ClientGUIFunctions.WrapToolTip( 'Files are always checked by size after they are copied. This also reads every copied file back and checks its hash, which is safer but makes the move take longer.' ) )
+        
+        self._verify_hashes.setChecked( CG.client_controller.new_options.GetBoolean( 'file_migration_verify_hashes' ) )
+        
         #
         
         info_panel.Add( self._current_install_path_st, CC.FLAGS_EXPAND_PERPENDICULAR )
@@ -561,6 +566,7 @@ class MoveMediaFilesPanel( ClientGUIScrolledPanels.ReviewPanel ):
         rebalance_hbox = QP.HBoxLayout()
         
         QP.AddToLayout( rebalance_hbox, self._rebalance_status_st, CC.FLAGS_EXPAND_BOTH_WAYS )
+        QP.AddToLayout( rebalance_hbox, self._verify_hashes, CC.FLAGS_CENTER_PERPENDICULAR )
         QP.AddToLayout( rebalance_hbox, self._rebalance_button, CC.FLAGS_CENTER_PERPENDICULAR )
         
         file_locations_panel.Add( current_media_base_locations_listctrl_panel, CC.FLAGS_EXPAND_BOTH_WAYS )
@@ -1139,7 +1145,7 @@ class MoveMediaFilesPanel( ClientGUIScrolledPanels.ReviewPanel ):
             
         
         
-        message = 'Moving files can be a slow and slightly laggy process, with the UI intermittently hanging, which sometimes makes manually stopping a large ongoing job difficult. Would you like to set a max runtime on this job?'
+        message = 'Moving files can be a slow process. Several folders are copied at once, and if the job is stopped or the client is closed, the next run will pick up where it left off. Would you like to set a max runtime on this job?'
         
         yes_tuples = []
         
@@ -1192,6 +1198,8 @@ class MoveMediaFilesPanel( ClientGUIScrolledPanels.ReviewPanel ):
             stop_time = HydrusTime.GetNow() + result
             
         
+        CG.client_controller.new_options.SetBoolean( 'file_migration_verify_hashes', self._verify_hashes.isChecked() )
+        
         job_status = ClientThreading.JobStatus( cancellable = True, stop_time = stop_time )
         
         CG.client_controller.pub( 'do_file_storage_rebalance', job_status )
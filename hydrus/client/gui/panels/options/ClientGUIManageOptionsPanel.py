@@ -275,8 +275,10 @@ class ManageOptionsPanel( ClientGUIScrolledPanels.ManagePanel ):
                 
             
             curl_cffi_changes = self._original_new_options.GetNoneableString( 'curl_cffi_definition' ) != test_new_options.GetNoneableString( 'curl_cffi_definition' )
+            http2_changes = self._original_new_options.GetBoolean( 'use_http2' ) != test_new_options.GetBoolean( 'use_http2' )
+            pool_changes = self._original_new_options.GetInteger( 'max_pooled_connections_per_domain' ) != test_new_options.GetInteger( 'max_pooled_connections_per_domain' )
             
-            if curl_cffi_changes:
+            if curl_cffi_changes or http2_changes or pool_changes:
                 
                 CG.client_controller.network_engine.session_manager.ReinitialiseSessions()
                 
@@ -12,6 +12,7 @@ from hydrus.client.gui import QtPorting as QP
 from hydrus.client.gui.metadata import ClientGUITime
 from hydrus.client.gui.panels.options import ClientGUIOptionsPanelBase
 from hydrus.client.gui.widgets import ClientGUICommon
+from hydrus.client.networking import ClientNetworkingCurlCFFI
 from hydrus.client.networking import ClientNetworkingSessions
 
 class ConnectionPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
@@ -69,6 +70,15 @@ class ConnectionPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._max_network_jobs = ClientGUICommon.BetterSpinBox( general, min = 1, max = max_network_jobs_max )
         self._max_network_jobs_per_domain = ClientGUICommon.BetterSpinBox( general, min = 1, max = max_network_jobs_per_domain_max )
         
+        self._max_pooled_connections_per_domain = ClientGUICommon.BetterSpinBox( general, min = 1, max = 100 )
+        self._max_pooled_connections_per_domain.setToolTip( ClientGUIFunctions.WrapToolTip( 'How many open connections to keep around for each domain, so new jobs can skip the connect and TLS handshake. You can see how often connections are reused under review session cookies.' ) )
+        
+        self._pooled_connection_idle_timeout = ClientGUICommon.BetterSpinBox( general, min = 60, max = 86400 )
+        self._pooled_connection_idle_timeout.setToolTip( ClientGUIFunctions.WrapToolTip( 'If a domain has had no new work for this long, its open connections are closed. This is checked about once a minute.' ) )
+        
+        self._use_http2 = QW.QCheckBox( general )
+        self._use_http2.setToolTip( ClientGUIFunctions.WrapToolTip( 'Talk to https servers with HTTP/2 where they support it, which sends many requests down one connection. This needs curl_cffi, and the connection pool settings above do not apply to it. Hydrus services are not affected.' ) )
+        
         self._set_requests_ca_bundle_env = QW.QCheckBox( general )
         self._set_requests_ca_bundle_env.setToolTip( ClientGUIFunctions.WrapToolTip( 'Just testing something here; ignore unless hydev asks you to use it please. Requires restart. Note: this breaks the self-signed certificates of hydrus services.' ) )
         
@@ -104,6 +114,13 @@ class ConnectionPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         
         self._curl_cffi_definition.SetValue( self._new_options.GetNoneableString( 'curl_cffi_definition' ) )
         
+        self._use_http2.setChecked( self._new_options.GetBoolean( 'use_http2' ) )
+        
+        if not ClientNetworkingCurlCFFI.CURL_CFFI_OK:
+            
+            self._use_http2.setEnabled( False )
+            
+        
         self._http_proxy.SetValue( self._new_options.GetNoneableString( 'http_proxy' ) )
         self._https_proxy.SetValue( self._new_options.GetNoneableString( 'https_proxy' ) )
         self._no_proxy.SetValue( self._new_options.GetNoneableString( 'no_proxy' ) )
@@ -122,6 +139,9 @@ class ConnectionPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._max_network_jobs.setValue( self._new_options.GetInteger( 'max_network_jobs' ) )
         self._max_network_jobs_per_domain.setValue( self._new_options.GetInteger( 'max_network_jobs_per_domain' ) )
         
+        self._max_pooled_connections_per_domain.setValue( self._new_options.GetInteger( 'max_pooled_connections_per_domain' ) )
+        self._pooled_connection_idle_timeout.setValue( self._new_options.GetInteger( 'pooled_connection_idle_timeout' ) )
+        
         #
         
         if self._new_options.GetBoolean( 'advanced_mode' ):
@@ -146,6 +166,9 @@ class ConnectionPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         rows.append( ( 'Halt new jobs as long as this many network infrastructure errors on their domain (0 for never wait): ', self._domain_network_infrastructure_error_velocity ) )
         rows.append( ( 'max number of simultaneous active network jobs: ', self._max_network_jobs ) )
         rows.append( ( 'max number of simultaneous active network jobs per domain: ', self._max_network_jobs_per_domain ) )
+        rows.append( ( 'max number of kept-alive connections per domain: ', self._max_pooled_connections_per_domain ) )
+        rows.append( ( 'close kept-alive connections after this long idle (seconds): ', self._pooled_connection_idle_timeout ) )
+        rows.append( ( 'use HTTP/2 where available (requires curl_cffi): ', self._use_http2 ) )
         rows.append( ( 'DEBUG: set the REQUESTS_CA_BUNDLE env to certifi cacert.pem on program start:', self._set_requests_ca_bundle_env ) )
         rows.append( ( 'DEBUG: do not verify regular https traffic:', self._do_not_verify_regular_https ) )
         rows.append( ( 'TEST: run the curl_cffi test with this browser definition:', self._curl_cffi_definition ) )
@@ -255,6 +278,7 @@ class ConnectionPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._new_options.SetBoolean( 'verify_regular_https', not self._do_not_verify_regular_https.isChecked() )
         
         self._new_options.SetNoneableString( 'curl_cffi_definition', self._curl_cffi_definition.GetValue() )
+        self._new_options.SetBoolean( 'use_http2', self._use_http2.isChecked() )
         
         self._new_options.SetNoneableString( 'http_proxy', self._http_proxy.GetValue() )
         self._new_options.SetNoneableString( 'https_proxy', self._https_proxy.GetValue() )
@@ -274,4 +298,7 @@ class ConnectionPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._new_options.SetInteger( 'max_network_jobs', self._max_network_jobs.value() )
         self._new_options.SetInteger( 'max_network_jobs_per_domain', self._max_network_jobs_per_domain.value() )
         
+        self._new_options.SetInteger( 'max_pooled_connections_per_domain', self._max_pooled_connections_per_domain.value() )
+        self._new_options.SetInteger( 'pooled_connection_idle_timeout', self._pooled_connection_idle_timeout.value() )
+        
     
@@ -25,6 +25,9 @@ class ImportingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._thread_slots_watcher_files = ClientGUICommon.BetterSpinBox( work_slots_panel, 5, 1, 500 )
         self._thread_slots_watcher_check = ClientGUICommon.BetterSpinBox( work_slots_panel, 15, 1, 500 )
         
+        self._local_import_workers = ClientGUICommon.BetterSpinBox( work_slots_panel, 1, 1, 64 )
+        self._local_import_workers.setToolTip( ClientGUIFunctions.WrapToolTip( 'Local file imports and import folders normally do one file at a time. If you have a fast drive and several cores, they can hash, parse, and generate thumbnails for this many files at once. Files are still added to your storage and database one at a time. Not much point going higher than your number of cores, and set it to 1 if your import source is a spinning disk.' ) )
+        
         #
         
         filetypes = ClientGUICommon.StaticBox( self, 'filetypes' )
@@ -47,6 +50,8 @@ class ImportingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._thread_slots_watcher_files.setValue( self._new_options.GetInteger( 'thread_slots_watcher_files' ) )
         self._thread_slots_watcher_check.setValue( self._new_options.GetInteger( 'thread_slots_watcher_check' ) )
         
+        self._local_import_workers.setValue( self._new_options.GetInteger( 'local_import_workers' ) )
+        
         #
         
         self._allow_comic_book_archive_detection.setChecked( self._new_options.GetBoolean( 'allow_comic_book_archive_detection' ) )
@@ -64,6 +69,7 @@ class ImportingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         rows.append( ( 'Number of watcher page file queues that can run at the same time:', self._thread_slots_watcher_files ) )
         rows.append( ( 'Number of watcher page checkers that can run at the same time:', self._thread_slots_watcher_check ) )
         rows.append( ( 'Number of other paged importer jobs that can run at the same time:', self._thread_slots_misc ) )
+        rows.append( ( 'Number of files a local import or import folder works on at the same time:', self._local_import_workers ) )
         
         gridbox = ClientGUICommon.WrapInGrid( work_slots_panel, rows )
         
@@ -125,4 +131,6 @@ class ImportingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._new_options.SetInteger( 'thread_slots_watcher_files', self._thread_slots_watcher_files.value() )
         self._new_options.SetInteger( 'thread_slots_watcher_check', self._thread_slots_watcher_check.value() )
         
+        self._new_options.SetInteger( 'local_import_workers', self._local_import_workers.value() )
+        
     
@@ -75,6 +75,14 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         self._file_maintenance_idle_throttle_velocity.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
         self._file_maintenance_active_throttle_velocity.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
         
+        self._file_maintenance_num_threads = ClientGUICommon.BetterSpinBox( self._file_maintenance_panel, min = 1, max = 16 )
+        
+        tt = 'When you tell file maintenance to work hard, or run a job on many files right now, this many files are worked on at once. Heavy jobs like similar files metadata and thumbnail regeneration are mostly CPU work, so a couple of threads gets through a big queue much faster. Each thread can use a lot of memory on a very large image, so do not go too high.'
+        tt += '\n' * 2
+        tt += 'The normal background work does one file at a time, as per the throttles above.'
+        
+        self._file_maintenance_num_threads.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
         #
         
         self._repository_processing_panel = ClientGUICommon.StaticBox( self, 'repository processing', can_expand = True, start_expanded = False )
@@ -103,6 +111,10 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         tt = 'DO NOT CHANGE UNLESS YOU KNOW WHAT YOU ARE DOING. Repository processing operates on a work-rest cycle. This setting determines how long it should wait before starting a new work packet, in multiples of the last work time. This is for when you force-start work from review services.'
         self._repository_processing_rest_percentage_normal.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
         
+        self._repository_processing_num_updates_to_prefetch = ClientGUICommon.BetterSpinBox( self._repository_processing_panel, min = 1, max = 10 )
+        tt = 'While the database is busy with one update file, this many upcoming update files are read and parsed on other threads so they are ready to go. Each one sits in memory until it is processed, and a big update can be a couple hundred MB parsed, so do not push this too high.'
+        self._repository_processing_num_updates_to_prefetch.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
         #
         
         self._tag_display_processing_panel = ClientGUICommon.StaticBox( self, 'sibling/parent sync processing', can_expand = True, start_expanded = False )
@@ -144,6 +156,10 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         
         self._maintain_similar_files_duplicate_pairs_during_active = QW.QCheckBox( self._potential_duplicates_panel )
         
+        self._similar_files_use_in_memory_perceptual_hash_index = QW.QCheckBox( self._potential_duplicates_panel )
+        tt = 'Loads all your perceptual hashes into one compact block of memory (about 16 bytes per hash) and compares against all of them at once, which is much faster than walking the on-disk search tree. If your system does not seem to have enough free memory for it, the search tree will be used instead. Changes apply on the next search.'
+        self._similar_files_use_in_memory_perceptual_hash_index.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
         self._potential_duplicates_search_work_time_idle = ClientGUITime.TimeDeltaWidget( self._potential_duplicates_panel, min = 0.02, seconds = True, milliseconds = True )
         tt = 'DO NOT CHANGE UNLESS YOU KNOW WHAT YOU ARE DOING. Potential search operates on a work-rest cycle. This setting determines how long it should work for in each work packet. Actual work time will normally be a little larger than this, and on large databases the minimum work time may be upwards of several seconds.'
         self._potential_duplicates_search_work_time_idle.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
@@ -243,6 +259,8 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         
         self._file_maintenance_active_throttle_velocity.SetValue( file_maintenance_active_throttle_velocity )
         
+        self._file_maintenance_num_threads.setValue( self._new_options.GetInteger( 'file_maintenance_num_threads' ) )
+        
         self._repository_processing_work_time_very_idle.SetValue( HydrusTime.SecondiseMSFloat( self._new_options.GetInteger( 'repository_processing_work_time_ms_very_idle' ) ) )
         self._repository_processing_rest_percentage_very_idle.setValue( self._new_options.GetInteger( 'repository_processing_rest_percentage_very_idle' ) )
         
@@ -252,6 +270,8 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         self._repository_processing_work_time_normal.SetValue( HydrusTime.SecondiseMSFloat( self._new_options.GetInteger( 'repository_processing_work_time_ms_normal' ) ) )
         self._repository_processing_rest_percentage_normal.setValue( self._new_options.GetInteger( 'repository_processing_rest_percentage_normal' ) )
         
+        self._repository_processing_num_updates_to_prefetch.setValue( self._new_options.GetInteger( 'repository_processing_num_updates_to_prefetch' ) )
+        
         self._tag_display_maintenance_during_idle.setChecked( self._new_options.GetBoolean( 'tag_display_maintenance_during_idle' ) )
         self._tag_display_maintenance_during_active.setChecked( self._new_options.GetBoolean( 'tag_display_maintenance_during_active' ) )
         
@@ -266,6 +286,7 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         
         self._maintain_similar_files_duplicate_pairs_during_idle.setChecked( self._new_options.GetBoolean( 'maintain_similar_files_duplicate_pairs_during_idle' ) )
         self._maintain_similar_files_duplicate_pairs_during_active.setChecked( self._new_options.GetBoolean( 'maintain_similar_files_duplicate_pairs_during_active' ) )
+        self._similar_files_use_in_memory_perceptual_hash_index.setChecked( self._new_options.GetBoolean( 'similar_files_use_in_memory_perceptual_hash_index' ) )
         
         self._potential_duplicates_search_work_time_idle.SetValue( HydrusTime.SecondiseMSFloat( self._new_options.GetInteger( 'potential_duplicates_search_work_time_ms_idle' ) ) )
         self._potential_duplicates_search_rest_percentage_idle.setValue( self._new_options.GetInteger( 'potential_duplicates_search_rest_percentage_idle' ) )
@@ -371,6 +392,7 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         rows.append( ( 'Idle throttle: ', self._file_maintenance_idle_throttle_velocity ) )
         rows.append( ( 'Run file maintenance during normal time: ', self._file_maintenance_during_active ) )
         rows.append( ( 'Normal throttle: ', self._file_maintenance_active_throttle_velocity ) )
+        rows.append( ( 'Files to work on at once when working hard: ', self._file_maintenance_num_threads ) )
         
         gridbox = ClientGUICommon.WrapInGrid( self._file_maintenance_panel, rows )
         
@@ -390,6 +412,7 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         rows.append( ( '"Idle" rest time percentage: ', self._repository_processing_rest_percentage_idle ) )
         rows.append( ( '"Normal" ideal work packet time: ', self._repository_processing_work_time_normal ) )
         rows.append( ( '"Normal" rest time percentage: ', self._repository_processing_rest_percentage_normal ) )
+        rows.append( ( 'Number of update files to load ahead: ', self._repository_processing_num_updates_to_prefetch ) )
         
         gridbox = ClientGUICommon.WrapInGrid( self._repository_processing_panel, rows )
         
@@ -430,6 +453,7 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         rows.append( ( 'Search for potential duplicates in "normal" time: ', self._maintain_similar_files_duplicate_pairs_during_active ) )
         rows.append( ( '"Normal" ideal work packet time: ', self._potential_duplicates_search_work_time_active ) )
         rows.append( ( '"Normal" rest time percentage: ', self._potential_duplicates_search_rest_percentage_active ) )
+        rows.append( ( 'Search with an in-memory perceptual hash index: ', self._similar_files_use_in_memory_perceptual_hash_index ) )
         
         gridbox = ClientGUICommon.WrapInGrid( self._potential_duplicates_panel, rows )
         
@@ -555,6 +579,8 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         self._new_options.SetInteger( 'file_maintenance_active_throttle_files', file_maintenance_active_throttle_files )
         self._new_options.SetInteger( 'file_maintenance_active_throttle_time_delta', file_maintenance_active_throttle_time_delta )
         
+        self._new_options.SetInteger( 'file_maintenance_num_threads', self._file_maintenance_num_threads.value() )
+        
         self._new_options.SetInteger( 'repository_processing_work_time_ms_very_idle', HydrusTime.MillisecondiseS( self._repository_processing_work_time_very_idle.GetValue() ) )
         self._new_options.SetInteger( 'repository_processing_rest_percentage_very_idle', self._repository_processing_rest_percentage_very_idle.value() )
         
@@ -564,6 +590,8 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         self._new_options.SetInteger( 'repository_processing_work_time_ms_normal', HydrusTime.MillisecondiseS( self._repository_processing_work_time_normal.GetValue() ) )
         self._new_options.SetInteger( 'repository_processing_rest_percentage_normal', self._repository_processing_rest_percentage_normal.value() )
         
+        self._new_options.SetInteger( 'repository_processing_num_updates_to_prefetch', self._repository_processing_num_updates_to_prefetch.value() )
+        
         self._new_options.SetBoolean( 'tag_display_maintenance_during_idle', self._tag_display_maintenance_during_idle.isChecked() )
         self._new_options.SetBoolean( 'tag_display_maintenance_during_active', self._tag_display_maintenance_during_active.isChecked() )
         
@@ -582,6 +610,7 @@ class MaintenanceAndProcessingPanel( ClientGUIOptionsPanelBase.OptionsPagePanel
         self._new_options.SetBoolean( 'maintain_similar_files_duplicate_pairs_during_active', self._maintain_similar_files_duplicate_pairs_during_active.isChecked() )
         self._new_options.SetInteger( 'potential_duplicates_search_work_time_ms_active', HydrusTime.MillisecondiseS( self._potential_duplicates_search_work_time_active.GetValue() ) )
         self._new_options.SetInteger( 'potential_duplicates_search_rest_percentage_active', self._potential_duplicates_search_rest_percentage_active.value() )
+        self._new_options.SetBoolean( 'similar_files_use_in_memory_perceptual_hash_index', self._similar_files_use_in_memory_perceptual_hash_index.isChecked() )
         
         self._new_options.SetBoolean( 'duplicates_auto_resolution_during_idle', self._duplicates_auto_resolution_during_idle.isChecked() )
         self._new_options.SetInteger( 'duplicates_auto_resolution_work_time_ms_idle', HydrusTime.MillisecondiseS( self._duplicates_auto_resolution_work_time_idle.GetValue() ) )
@@ -6,6 +6,7 @@ from hydrus.core import HydrusTime
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientData
+from hydrus.client.caches import ClientCachesBase
 from hydrus.client.gui import ClientGUIFunctions
 from hydrus.client.gui import QtPorting as QP
 from hydrus.client.gui.metadata import ClientGUITime
@@ -42,6 +43,29 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         
         self._thumbnail_cache_timeout.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
         
+        self._thumbnail_cache_eviction_policy = ClientGUICommon.BetterChoice( thumbnail_cache_panel )
+        
+        for eviction_policy in ( ClientCachesBase.CACHE_EVICTION_POLICY_LRU, ClientCachesBase.CACHE_EVICTION_POLICY_SEGMENTED_LRU ):
+            
+            self._thumbnail_cache_eviction_policy.addItem( ClientCachesBase.cache_eviction_policy_str_lookup[ eviction_policy ], eviction_policy )
+            
+        
+        tt = 'How the cache decides what to throw out when it is full. Plain least-recently-used will flush everything if you scroll through a page bigger than the cache. The segmented version only keeps thumbs you come back to in its protected part, so a long scroll does not push out the thumbs you actually use.'
+        
+        self._thumbnail_cache_eviction_policy.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
+        self._thumbnail_decode_workers = ClientGUICommon.BetterSpinBox( thumbnail_cache_panel, min = 1, max = 64 )
+        
+        tt = 'When a page of thumbnails is first shown, this many threads will load and decode them at once. Image decoding mostly happens outside of python\'s lock, so on a machine with many cores, a higher number fills a big page faster. Set it to 1 for the old one-at-a-time behaviour.'
+        
+        self._thumbnail_decode_workers.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
+        self._use_thumbnail_pack_store = QW.QCheckBox( thumbnail_cache_panel )
+        
+        tt = 'Thumbnails are normally one file each, so showing a fresh page of thousands of them means thousands of separate file reads. This is slow on an HDD. With this on, the client also keeps a copy of the thumbnails it shows in a few big pack files in your database directory, and reads them from there next time. It costs about as much disk space as your thumbnails again. Turning it off deletes the packs.'
+        
+        self._use_thumbnail_pack_store.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
         image_cache_panel = ClientGUICommon.StaticBox( self, 'image cache', can_expand = True, start_expanded = False )
         
         self._image_cache_size = ClientGUIBytes.BytesControl( image_cache_panel )
@@ -134,6 +158,26 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         
         #
         
+        client_api_panel = ClientGUICommon.StaticBox( self, 'client api workers', can_expand = True, start_expanded = False )
+        
+        self._client_api_light_workers = ClientGUICommon.BetterSpinBox( client_api_panel, min = 1, max = 64 )
+        self._client_api_light_max_queued = ClientGUICommon.BetterSpinBox( client_api_panel, min = 0, max = 10000 )
+        
+        tt = 'Most Client API requests are quick lookups or small edits. This many of them can be worked on at once, and this many more can wait in line before the API starts telling clients to back off (429) and try again later.'
+        
+        self._client_api_light_workers.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        self._client_api_light_max_queued.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
+        self._client_api_heavy_workers = ClientGUICommon.BetterSpinBox( client_api_panel, min = 1, max = 64 )
+        self._client_api_heavy_max_queued = ClientGUICommon.BetterSpinBox( client_api_panel, min = 0, max = 10000 )
+        
+        tt = 'File searches, big metadata fetches, renders, file imports, and duplicate searches can take a while. They get their own set of workers so a script hammering them cannot block the quick requests. Before these pools, all API requests shared ten threads, so going lower than ten here may slow down a script that imports or searches in parallel.'
+        
+        self._client_api_heavy_workers.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        self._client_api_heavy_max_queued.setToolTip( ClientGUIFunctions.WrapToolTip( tt ) )
+        
+        #
+        
         buffer_panel = ClientGUICommon.StaticBox( self, 'video buffer', can_expand = True, start_expanded = False )
         
         self._video_buffer_size = ClientGUIBytes.BytesControl( buffer_panel )
@@ -148,6 +192,9 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._image_tile_cache_size.SetValue( self._new_options.GetInteger( 'image_tile_cache_size' ) )
         
         self._thumbnail_cache_timeout.SetValue( self._new_options.GetInteger( 'thumbnail_cache_timeout' ) )
+        self._thumbnail_cache_eviction_policy.SetValue( self._new_options.GetInteger( 'thumbnail_cache_eviction_policy' ) )
+        self._thumbnail_decode_workers.setValue( self._new_options.GetInteger( 'thumbnail_decode_workers' ) )
+        self._use_thumbnail_pack_store.setChecked( self._new_options.GetBoolean( 'use_thumbnail_pack_store' ) )
         self._image_cache_timeout.SetValue( self._new_options.GetInteger( 'image_cache_timeout' ) )
         self._image_tile_cache_timeout.SetValue( self._new_options.GetInteger( 'image_tile_cache_timeout' ) )
         
@@ -159,6 +206,11 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._watcher_page_status_update_time_minimum.SetValue( HydrusTime.SecondiseMSFloat( self._new_options.GetInteger( 'watcher_page_status_update_time_minimum_ms' ) ) )
         self._watcher_page_status_update_time_ratio_denominator.setValue( self._new_options.GetInteger( 'watcher_page_status_update_time_ratio_denominator' ) )
         
+        self._client_api_light_workers.setValue( self._new_options.GetInteger( 'client_api_light_workers' ) )
+        self._client_api_light_max_queued.setValue( self._new_options.GetInteger( 'client_api_light_max_queued' ) )
+        self._client_api_heavy_workers.setValue( self._new_options.GetInteger( 'client_api_heavy_workers' ) )
+        self._client_api_heavy_max_queued.setValue( self._new_options.GetInteger( 'client_api_heavy_max_queued' ) )
+        
         self._video_buffer_size.SetValue( self._new_options.GetInteger( 'video_buffer_size' ) )
         
         self._media_viewer_prefetch_num_previous.setValue( self._new_options.GetInteger( 'media_viewer_prefetch_num_previous' ) )
@@ -222,6 +274,9 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         
         rows.append( ( 'Memory reserved for thumbnail cache:', thumbnails_sizer ) )
         rows.append( ( 'Thumbnail cache timeout:', self._thumbnail_cache_timeout ) )
+        rows.append( ( 'Thumbnail cache eviction policy:', self._thumbnail_cache_eviction_policy ) )
+        rows.append( ( 'Thumbnail decode workers:', self._thumbnail_decode_workers ) )
+        rows.append( ( 'Keep thumbnails in pack files for faster loading:', self._use_thumbnail_pack_store ) )
         
         gridbox = ClientGUICommon.WrapInGrid( thumbnail_cache_panel, rows )
         
@@ -315,6 +370,29 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         
         #
         
+        text = 'Client API jobs are split into light and heavy, and each sort has its own set of worker threads. Changes apply to the next request.'
+        
+        st = ClientGUICommon.BetterStaticText( client_api_panel, text )
+        
+        st.setWordWrap( True )
+        
+        client_api_panel.Add( st, CC.FLAGS_EXPAND_PERPENDICULAR )
+        
+        rows = []
+        
+        rows.append( ( 'Light job workers:', self._client_api_light_workers ) )
+        rows.append( ( 'Light jobs that may wait in line:', self._client_api_light_max_queued ) )
+        rows.append( ( 'Heavy job workers:', self._client_api_heavy_workers ) )
+        rows.append( ( 'Heavy jobs that may wait in line:', self._client_api_heavy_max_queued ) )
+        
+        gridbox = ClientGUICommon.WrapInGrid( client_api_panel, rows )
+        
+        client_api_panel.Add( gridbox, CC.FLAGS_EXPAND_SIZER_PERPENDICULAR )
+        
+        QP.AddToLayout( vbox, client_api_panel, CC.FLAGS_EXPAND_PERPENDICULAR )
+        
+        #
+        
         text = 'This old option does not apply to mpv! It only applies to the native hydrus animation renderer!'
         text += '\n'
         text += 'Hydrus video rendering is CPU intensive.'
@@ -490,6 +568,9 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._new_options.SetInteger( 'image_tile_cache_size', self._image_tile_cache_size.GetValue() )
         
         self._new_options.SetInteger( 'thumbnail_cache_timeout', self._thumbnail_cache_timeout.GetValue() )
+        self._new_options.SetInteger( 'thumbnail_cache_eviction_policy', self._thumbnail_cache_eviction_policy.GetValue() )
+        self._new_options.SetInteger( 'thumbnail_decode_workers', self._thumbnail_decode_workers.value() )
+        self._new_options.SetBoolean( 'use_thumbnail_pack_store', self._use_thumbnail_pack_store.isChecked() )
         self._new_options.SetInteger( 'image_cache_timeout', self._image_cache_timeout.GetValue() )
         self._new_options.SetInteger( 'image_tile_cache_timeout', self._image_tile_cache_timeout.GetValue() )
         
@@ -508,6 +589,11 @@ class SpeedAndMemoryPanel( ClientGUIOptionsPanelBase.OptionsPagePanel ):
         self._new_options.SetInteger( 'watcher_page_status_update_time_minimum_ms', int( self._watcher_page_status_update_time_minimum.GetValue() * 1000 ) )
         self._new_options.SetInteger( 'watcher_page_status_update_time_ratio_denominator', self._watcher_page_status_update_time_ratio_denominator.value() )
         
+        self._new_options.SetInteger( 'client_api_light_workers', self._client_api_light_workers.value() )
+        self._new_options.SetInteger( 'client_api_light_max_queued', self._client_api_light_max_queued.value() )
+        self._new_options.SetInteger( 'client_api_heavy_workers', self._client_api_heavy_workers.value() )
+        self._new_options.SetInteger( 'client_api_heavy_max_queued', self._client_api_heavy_max_queued.value() )
+        
         self._new_options.SetInteger( 'video_buffer_size', self._video_buffer_size.GetValue() )
         
     
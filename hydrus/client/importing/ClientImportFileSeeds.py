@@ -3166,6 +3166,43 @@ class FileSeedCache( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetNextFileSeeds( self, status: int, num_file_seeds: int ) -> list[ FileSeed ]:
+        
+        # the next n file seeds with this status, in order
+        
+        with self._lock:
+            
+            first_file_seed = self._GetNextFileSeed( status )
+            
+            if first_file_seed is None:
+                
+                return []
+                
+            
+            file_seeds = [ first_file_seed ]
+            
+            if num_file_seeds > 1:
+                
+                file_seeds_to_indices = self._GetFileSeedsToIndices()
+                
+                for file_seed in self._file_seeds[ file_seeds_to_indices[ first_file_seed ] + 1 : ]:
+                    
+                    if len( file_seeds ) >= num_file_seeds:
+                        
+                        break
+                        
+                    
+                    if file_seed.status == status:
+                        
+                        file_seeds.append( file_seed )
+                        
+                    
+                
+            
+            return file_seeds
+            
+        
+    
     def GetNumNewFilesSince( self, since: int ):
         
         num_files = 0
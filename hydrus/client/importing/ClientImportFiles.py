@@ -122,6 +122,7 @@ class FileImportJob( object ):
         self._thumbnail_bytes = None
         self._perceptual_hashes = None
         self._extra_hashes = None
+        self._first_bytes_of_file = None
         self._has_transparency = None
         self._has_exif = None
         self._has_human_readable_embedded_metadata = None
@@ -218,7 +219,8 @@ class FileImportJob( object ):
             status_hook( 'calculating hash' )
             
         
-        hash = HydrusFileHandling.GetHashFromPath( self._temp_path )
+        # we grab everything from this one read, so the later steps do not have to go back to the disk for it
+        ( hash, self._extra_hashes, self._first_bytes_of_file ) = HydrusFileHandling.GetAllHashesFromPath( self._temp_path )
         
         if HG.file_import_report_mode:
             
@@ -254,7 +256,7 @@ class FileImportJob( object ):
                 status_hook( 'generating filetype' )
                 
             
-            mime = HydrusFileHandling.GetMime( self._temp_path )
+            mime = HydrusFileHandling.GetMime( self._temp_path, first_bytes_of_file = self._first_bytes_of_file )
             
             self._pre_import_file_status.mime = mime
             
@@ -302,6 +304,27 @@ class FileImportJob( object ):
             HydrusData.ShowText( 'File import job file info: {}'.format( self._file_info ) )
             
         
+        # for a normal image, the thumbnail, phash, transparency, and pixel hash all want the same decoded pixels, so we decode once here and share it
+        # if this fails, they each fall back to loading the file themselves and deal with the error in their own way
+        numpy_image = None
+        
+        if mime in HC.IMAGES:
+            
+            if status_hook is not None:
+                
+                status_hook( 'decoding image' )
+                
+            
+            try:
+                
+                numpy_image = HydrusImageHandling.GenerateNumPyImage( self._temp_path, mime, human_file_description = self._human_file_description )
+                
+            except Exception as e:
+                
+                numpy_image = None
+                
+            
+        
         if mime in HC.MIMES_WITH_THUMBNAILS:
             
             if status_hook is not None:
@@ -324,7 +347,7 @@ class FileImportJob( object ):
             
             extra_description = f'File with hash "{self.GetHash().hex()}".'
             
-            thumbnail_numpy = HydrusFileHandling.GenerateThumbnailNumPy( self._temp_path, target_resolution, mime, duration_ms, num_frames, percentage_in = percentage_in, extra_description = extra_description )
+            thumbnail_numpy = HydrusFileHandling.GenerateThumbnailNumPy( self._temp_path, target_resolution, mime, duration_ms, num_frames, percentage_in = percentage_in, extra_description = extra_description, numpy_image = numpy_image )
             
             # this guy handles almost all his own exceptions now, so no need for clever catching. if it fails, we are prob talking an I/O failure, which is not a 'thumbnail failed' error
             self._thumbnail_bytes = HydrusImageHandling.GenerateThumbnailBytesFromNumPy( thumbnail_numpy )
@@ -351,7 +374,7 @@ class FileImportJob( object ):
                 HydrusData.ShowText( 'File import job generating perceptual_hashes' )
                 
             
-            self._perceptual_hashes = ClientImagePerceptualHashes.GenerateUsefulShapePerceptualHashes( self._temp_path, mime )
+            self._perceptual_hashes = ClientImagePerceptualHashes.GenerateUsefulShapePerceptualHashes( self._temp_path, mime, numpy_image = numpy_image )
             
             if HG.file_import_report_mode:
                 
@@ -359,21 +382,24 @@ class FileImportJob( object ):
                 
             
         
-        if HG.file_import_report_mode:
+        if self._extra_hashes is None:
             
-            HydrusData.ShowText( 'File import job generating other hashes' )
+            if HG.file_import_report_mode:
+                
+                HydrusData.ShowText( 'File import job generating other hashes' )
+                
             
-        
-        if status_hook is not None:
+            if status_hook is not None:
+                
+                status_hook( 'generating additional hashes' )
+                
             
-            status_hook( 'generating additional hashes' )
+            self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
             
         
-        self._extra_hashes = HydrusFileHandling.GetExtraHashesFromPath( self._temp_path )
-        
         #
         
-        self._has_transparency = ClientFiles.HasTransparency( self._temp_path, mime, duration_ms = duration_ms, num_frames = num_frames, resolution = ( width, height ) )
+        self._has_transparency = ClientFiles.HasTransparency( self._temp_path, mime, duration_ms = duration_ms, num_frames = num_frames, resolution = ( width, height ), numpy_image = numpy_image )
         
         has_exif = False
         
@@ -439,7 +465,14 @@ class FileImportJob( object ):
             
             try:
                 
-                self._pixel_hash = HydrusImageHandling.GetImagePixelHash( self._temp_path, mime )
+                if numpy_image is None:
+                    
+                    self._pixel_hash = HydrusImageHandling.GetImagePixelHash( self._temp_path, mime )
+                    
+                else:
+                    
+                    self._pixel_hash = HydrusImageHandling.GetImagePixelHashNumPy( numpy_image )
+                    
                 
             except Exception as e:
                 
@@ -447,6 +480,9 @@ class FileImportJob( object ):
                 
             
         
+        # the decoded image can be very big, so let it go as soon as we are done with it
+        numpy_image = None
+        
         self._file_modified_timestamp_ms = HydrusFileHandling.GetFileModifiedTimestampMS( self._temp_path )
         
     
@@ -209,15 +209,15 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
     
     def _WorkOnFiles( self ):
         
-        file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
+        num_workers = CG.client_controller.new_options.GetInteger( 'local_import_workers' )
         
-        if file_seed is None:
+        file_seeds = self._file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, num_workers )
+        
+        if len( file_seeds ) == 0:
             
             return
             
         
-        path = file_seed.file_seed_data
-        
         with self._lock:
             
             self._files_status = 'importing'
@@ -233,9 +233,16 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
         
         full_import_options_container = CG.client_controller.import_options_manager.GenerateFullImportOptionsContainer( self._import_options_container, IOC.IMPORT_OPTIONS_CALLER_TYPE_LOCAL_IMPORT )
         
-        file_seed.ImportPath( self._file_seed_cache, full_import_options_container, status_hook = status_hook )
+        ClientImporting.ImportPaths( file_seeds, self._file_seed_cache, full_import_options_container, status_hook = status_hook )
         
-        if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+        for file_seed in file_seeds:
+            
+            if file_seed.status not in CC.SUCCESSFUL_IMPORT_STATES:
+                
+                continue
+                
+            
+            path = file_seed.file_seed_data
             
             if len( self._metadata_routers ) > 0:
                 
@@ -298,6 +305,7 @@ class HDDImport( HydrusSerialisable.SerialisableBase ):
                             
                         
                     
+                
             
         
         with self._lock:
@@ -774,26 +782,30 @@ class ImportFolder( HydrusSerialisable.SerialisableBaseNamed ):
         # num_to_do is num currently unknown
         num_total = self._file_seed_cache.GetFileSeedCount( CC.STATUS_UNKNOWN )
         
-        file_seed: ClientImportFileSeeds.FileSeed | None = None
+        file_seeds: list[ ClientImportFileSeeds.FileSeed ] = []
         
         while True:
             
-            previous_file_seed: ClientImportFileSeeds.FileSeed | None = file_seed
+            previous_file_seeds = file_seeds
+            
+            num_workers = CG.client_controller.new_options.GetInteger( 'local_import_workers' )
             
-            file_seed = self._file_seed_cache.GetNextFileSeed( CC.STATUS_UNKNOWN )
+            file_seeds = self._file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, num_workers )
             
             p1 = CG.client_controller.new_options.GetBoolean( 'pause_import_folders_sync' ) or self._paused
             p2 = HydrusThreading.IsThreadShuttingDown()
             p3 = job_status.IsCancelled()
             
-            if file_seed is None or p1 or p2 or p3:
+            if len( file_seeds ) == 0 or p1 or p2 or p3:
                 
                 break
                 
             
-            if previous_file_seed is not None and previous_file_seed == file_seed:
+            unprocessed_file_seeds = set( previous_file_seeds ).intersection( file_seeds )
+            
+            if len( unprocessed_file_seeds ) > 0:
                 
-                raise Exception( f'Somehow we did not process the file job: {previous_file_seed.file_seed_data}! Please let hydev know about this.' )
+                raise Exception( f'Somehow we did not process the file job: {list( unprocessed_file_seeds )[0].file_seed_data}! Please let hydev know about this.' )
                 
             
             did_work = True
@@ -808,99 +820,105 @@ class ImportFolder( HydrusSerialisable.SerialisableBaseNamed ):
             job_status.SetStatusText( 'importing: ' + HydrusNumbers.ValueRangeToPrettyString( num_files_imported, num_total ) )
             job_status.SetGauge( num_files_imported, num_total )  
             
-            path = file_seed.file_seed_data
-            
             try:
                 
                 full_import_options_container = CG.client_controller.import_options_manager.GenerateFullImportOptionsContainer( self._import_options_container, IOC.IMPORT_OPTIONS_CALLER_TYPE_LOCAL_IMPORT_FOLDER )
                 
-                file_seed.ImportPath( self._file_seed_cache, full_import_options_container )
+                ClientImporting.ImportPaths( file_seeds, self._file_seed_cache, full_import_options_container )
                 
-                if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
+                for file_seed in file_seeds:
                     
-                    hash = None
+                    path = file_seed.file_seed_data
                     
-                    if file_seed.HasHash():
+                    if file_seed.status in CC.SUCCESSFUL_IMPORT_STATES:
                         
-                        hash = file_seed.GetHash()
+                        hash = None
                         
-                        if len( self._metadata_routers ) > 0:
+                        if file_seed.HasHash():
                             
-                            media_result = CG.client_controller.Read( 'media_result', hash )
+                            hash = file_seed.GetHash()
                             
-                            for metadata_router in self._metadata_routers:
+                            if len( self._metadata_routers ) > 0:
                                 
-                                try:
-                                    
-                                    metadata_router.Work( media_result, path )
-                                    
-                                except Exception as e:
-                                    
-                                    HydrusData.ShowText( 'Trying to run metadata routing in the import folder "' + self._name + '" threw an error!' )
+                                media_result = CG.client_controller.Read( 'media_result', hash )
+                                
+                                for metadata_router in self._metadata_routers:
                                     
-                                    HydrusData.ShowException( e )
+                                    try:
+                                        
+                                        metadata_router.Work( media_result, path )
+                                        
+                                    except Exception as e:
+                                        
+                                        HydrusData.ShowText( 'Trying to run metadata routing in the import folder "' + self._name + '" threw an error!' )
+                                        
+                                        HydrusData.ShowException( e )
+                                        
                                     
                                 
                             
-                        
-                        service_keys_to_tags = ClientTags.ServiceKeysToTags()
-                        
-                        for ( tag_service_key, filename_tagging_options ) in self._tag_service_keys_to_filename_tagging_options.items():
-                            
-                            if not CG.client_controller.services_manager.ServiceExists( tag_service_key ):
-                                
-                                continue
-                                
+                            service_keys_to_tags = ClientTags.ServiceKeysToTags()
                             
-                            try:
+                            for ( tag_service_key, filename_tagging_options ) in self._tag_service_keys_to_filename_tagging_options.items():
                                 
-                                tags = filename_tagging_options.GetTags( tag_service_key, path )
+                                if not CG.client_controller.services_manager.ServiceExists( tag_service_key ):
+                                    
+                                    continue
+                                    
                                 
-                                if len( tags ) > 0:
+                                try:
+                                    
+                                    tags = filename_tagging_options.GetTags( tag_service_key, path )
+                                    
+                                    if len( tags ) > 0:
+                                        
+                                        service_keys_to_tags[ tag_service_key ] = tags
+                                        
+                                    
+                                except Exception as e:
+                                    
+                                    HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
                                     
-                                    service_keys_to_tags[ tag_service_key ] = tags
+                                    HydrusData.ShowException( e )
                                     
                                 
-                            except Exception as e:
+                            
+                            if len( service_keys_to_tags ) > 0:
                                 
-                                HydrusData.ShowText( 'Trying to parse filename tags in the import folder "' + self._name + '" threw an error!' )
+                                content_update_package = ClientContentUpdates.ContentUpdatePackage.STATICCreateFromServiceKeysToTags( { hash }, service_keys_to_tags )
                                 
-                                HydrusData.ShowException( e )
+                                CG.client_controller.WriteSynchronous( 'content_updates', content_update_package )
                                 
                             
                         
-                        if len( service_keys_to_tags ) > 0:
+                        num_files_imported += 1
+                        
+                        if hash not in presentation_hashes_fast:
                             
-                            content_update_package = ClientContentUpdates.ContentUpdatePackage.STATICCreateFromServiceKeysToTags( { hash }, service_keys_to_tags )
+                            presentation_import_options = full_import_options_container.GetPresentationImportOptions()
                             
-                            CG.client_controller.WriteSynchronous( 'content_updates', content_update_package )
+                            if file_seed.ShouldPresent( presentation_import_options ):
+                                
+                                presentation_hashes.append( hash )
+                                
+                                presentation_hashes_fast.add( hash )
+                                
                             
                         
-                    
-                    num_files_imported += 1
-                    
-                    if hash not in presentation_hashes_fast:
-                        
-                        presentation_import_options = full_import_options_container.GetPresentationImportOptions()
+                    elif file_seed.status == CC.STATUS_ERROR:
                         
-                        if file_seed.ShouldPresent( presentation_import_options ):
-                            
-                            presentation_hashes.append( hash )
-                            
-                            presentation_hashes_fast.add( hash )
-                            
+                        HydrusData.Print( f'Import folder "{self._name}" failed to import: "{path}"' )
                         
                     
-                elif file_seed.status == CC.STATUS_ERROR:
-                    
-                    HydrusData.Print( f'Import folder "{self._name}" failed to import: "{path}"' )
+                    i += 1
                     
                 
-                i += 1
-                
             finally:
                 
-                self._ActionSeed( file_seed )
+                for file_seed in file_seeds:
+                    
+                    self._ActionSeed( file_seed )
+                    
                 
                 pauser.Pause()
                 
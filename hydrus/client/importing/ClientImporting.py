@@ -1,4 +1,5 @@
 import random
+import threading
 
 from hydrus.core import HydrusData
 from hydrus.core import HydrusNumbers
@@ -79,6 +80,53 @@ def GetRepeatingJobInitialDelay():
     return 0.5 + ( random.random() * 0.5 )
     
 
+def ImportPaths( file_seeds: list[ ClientImportFileSeeds.FileSeed ], file_seed_cache: ClientImportFileSeeds.FileSeedCache, full_import_options_container: ImportOptionsContainer.ImportOptionsContainer, status_hook = None ):
+    
+    # with more than one seed, each does its whole import on its own thread, so hashing, parsing, thumbnails and phashes run side by side
+    # the copy into file storage and the db write are already one-at-a-time in the files manager locks and the db queue
+    # we wait for all of them, so the caller can do its post-import work in seed order
+    
+    if len( file_seeds ) == 1:
+        
+        file_seeds[0].ImportPath( file_seed_cache, full_import_options_container, status_hook = status_hook )
+        
+        return
+        
+    
+    def do_it( file_seed: ClientImportFileSeeds.FileSeed, done_event: threading.Event ):
+        
+        try:
+            
+            file_seed.ImportPath( file_seed_cache, full_import_options_container )
+            
+        finally:
+            
+            done_event.set()
+            
+        
+    
+    if status_hook is not None:
+        
+        status_hook( f'importing {HydrusNumbers.ToHumanInt( len( file_seeds ) )} files at once' )
+        
+    
+    done_events = []
+    
+    for file_seed in file_seeds:
+        
+        done_event = threading.Event()
+        
+        CG.client_controller.CallToThread( do_it, file_seed, done_event )
+        
+        done_events.append( done_event )
+        
+    
+    for done_event in done_events:
+        
+        done_event.wait()
+        
+    
+
 def PublishPresentationHashes( publishing_label: str, hashes: list[ bytes ], publish_to_popup_button: bool, publish_files_to_page: bool ):
     
     if publish_to_popup_button:
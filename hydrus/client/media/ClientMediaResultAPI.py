@@ -11,6 +11,20 @@ from hydrus.client import ClientGlobals as CG
 from hydrus.client.media import ClientMediaResult
 from hydrus.client.metadata import ClientTags
 
+# file_id and hash are always in a row. these are the other bits a caller can ask for
+METADATA_FIELDS = (
+    'file_info',
+    'thumbnail',
+    'notes',
+    'file_services',
+    'times',
+    'status',
+    'urls',
+    'ratings',
+    'tags',
+    'file_viewing_statistics'
+)
+
 def AddMissingHashToFileMetadata( metadata_list: list[ dict ], hash: bytes ):
     
     metadata_row = {
@@ -34,7 +48,23 @@ def GetMediaResultAPIDict( media_result: ClientMediaResult.MediaResult ):
     return metadata_dict
     
 
-def PopulateMetadataAPIDict( metadata_list: list[ dict ], hashes: list[ bytes ], hashes_to_media_results: dict[ bytes, ClientMediaResult.MediaResult ], hide_service_keys_tags = True, detailed_url_information = True, include_notes = True, include_milliseconds = True ):
+def PopulateMetadataAPIDict( metadata_list: list[ dict ], hashes: list[ bytes ], hashes_to_media_results: dict[ bytes, ClientMediaResult.MediaResult ], hide_service_keys_tags = True, detailed_url_information = True, include_notes = True, include_milliseconds = True, fields = None ):
+    
+    # making all this for a million files is slow, so if the caller only wants some of it, we only make that
+    
+    if fields is None:
+        
+        fields = { field for field in METADATA_FIELDS if field != 'notes' }
+        
+    else:
+        
+        fields = set( fields )
+        
+    
+    if include_notes:
+        
+        fields.add( 'notes' )
+        
     
     if not hide_service_keys_tags:
         
@@ -79,45 +109,51 @@ def PopulateMetadataAPIDict( metadata_list: list[ dict ], hashes: list[ bytes ],
             width = file_info_manager.width
             height = file_info_manager.height
             
-            pixel_hash = file_info_manager.pixel_hash
-            
-            if pixel_hash is not None:
-                
-                pixel_hash_encoded = pixel_hash.hex()
-                
-            else:
-                
-                pixel_hash_encoded = None
-                
-            
             metadata_dict = {
                 'file_id' : file_info_manager.hash_id,
-                'hash' : file_info_manager.hash.hex(),
-                'size' : file_info_manager.size,
-                'mime' : HC.mime_mimetype_string_lookup[ mime ],
-                'filetype_human' : HC.mime_string_lookup[ file_info_manager.mime ],
-                'filetype_enum' : file_info_manager.mime,
-                'ext' : HC.mime_ext_lookup[ mime ],
-                'width' : width,
-                'height' : height,
-                'duration' : file_info_manager.duration_ms,
-                'num_frames' : file_info_manager.num_frames,
-                'num_words' : file_info_manager.num_words,
-                'has_audio' : file_info_manager.has_audio,
-                'blurhash' : file_info_manager.blurhash,
-                'pixel_hash' : pixel_hash_encoded
+                'hash' : file_info_manager.hash.hex()
             }
             
-            filetype_forced = file_info_manager.FiletypeIsForced()
-            
-            metadata_dict[ 'filetype_forced' ] = filetype_forced
-            
-            if filetype_forced:
+            if 'file_info' in fields:
+                
+                pixel_hash = file_info_manager.pixel_hash
+                
+                if pixel_hash is not None:
+                    
+                    pixel_hash_encoded = pixel_hash.hex()
+                    
+                else:
+                    
+                    pixel_hash_encoded = None
+                    
                 
-                metadata_dict[ 'original_mime' ] = HC.mime_mimetype_string_lookup[ file_info_manager.original_mime ]
+                metadata_dict.update( {
+                    'size' : file_info_manager.size,
+                    'mime' : HC.mime_mimetype_string_lookup[ mime ],
+                    'filetype_human' : HC.mime_string_lookup[ file_info_manager.mime ],
+                    'filetype_enum' : file_info_manager.mime,
+                    'ext' : HC.mime_ext_lookup[ mime ],
+                    'width' : width,
+                    'height' : height,
+                    'duration' : file_info_manager.duration_ms,
+                    'num_frames' : file_info_manager.num_frames,
+                    'num_words' : file_info_manager.num_words,
+                    'has_audio' : file_info_manager.has_audio,
+                    'blurhash' : file_info_manager.blurhash,
+                    'pixel_hash' : pixel_hash_encoded
+                } )
+                
+                filetype_forced = file_info_manager.FiletypeIsForced()
+                
+                metadata_dict[ 'filetype_forced' ] = filetype_forced
+                
+                if filetype_forced:
+                    
+                    metadata_dict[ 'original_mime' ] = HC.mime_mimetype_string_lookup[ file_info_manager.original_mime ]
+                    
                 
             
-            if file_info_manager.mime in HC.MIMES_WITH_THUMBNAILS:
+            if 'thumbnail' in fields and file_info_manager.mime in HC.MIMES_WITH_THUMBNAILS:
                 
                 if width is not None and height is not None and width > 0 and height > 0:
                     
@@ -128,230 +164,246 @@ def PopulateMetadataAPIDict( metadata_list: list[ dict ], hashes: list[ bytes ],
                     
                 
             
-            if include_notes:
+            if 'notes' in fields:
                 
                 metadata_dict[ 'notes' ] = media_result.GetNotesManager().GetNamesToNotes()
                 
             
             locations_manager = media_result.GetLocationsManager()
             
-            metadata_dict[ 'file_services' ] = {
-                'current' : {},
-                'deleted' : {}
-            }
-            
             times_manager = locations_manager.GetTimesManager()
             
-            current = locations_manager.GetCurrent()
-            
-            for file_service_key in current:
+            if 'file_services' in fields:
                 
-                metadata_dict[ 'file_services' ][ 'current' ][ file_service_key.hex() ] = {
-                    'name' : service_keys_to_names[ file_service_key ],
-                    'type' : service_keys_to_types[ file_service_key ],
-                    'type_pretty' : HC.service_string_lookup[ service_keys_to_types[ file_service_key ] ],
-                    'time_imported' : time_converter( times_manager.GetImportedTimestampMS( file_service_key ) )
+                metadata_dict[ 'file_services' ] = {
+                    'current' : {},
+                    'deleted' : {}
                 }
                 
-            
-            deleted = locations_manager.GetDeleted()
-            
-            for file_service_key in deleted:
-                
-                metadata_dict[ 'file_services' ][ 'deleted' ][ file_service_key.hex() ] = {
-                    'name' : service_keys_to_names[ file_service_key ],
-                    'type' : service_keys_to_types[ file_service_key ],
-                    'type_pretty' : HC.service_string_lookup[ service_keys_to_types[ file_service_key ] ],
-                    'time_deleted' : time_converter( times_manager.GetDeletedTimestampMS( file_service_key ) ),
-                    'time_imported' : time_converter( times_manager.GetPreviouslyImportedTimestampMS( file_service_key ) )
-                }
+                current = locations_manager.GetCurrent()
                 
-            
-            metadata_dict[ 'time_modified' ] = time_converter( times_manager.GetAggregateModifiedTimestampMS() )
-            
-            domains_to_file_modified_timestamps_ms = times_manager.GetDomainModifiedTimestampsMS()
-            
-            local_modified_timestamp_ms = times_manager.GetFileModifiedTimestampMS()
-            
-            if local_modified_timestamp_ms is not None:
+                for file_service_key in current:
+                    
+                    metadata_dict[ 'file_services' ][ 'current' ][ file_service_key.hex() ] = {
+                        'name' : service_keys_to_names[ file_service_key ],
+                        'type' : service_keys_to_types[ file_service_key ],
+                        'type_pretty' : HC.service_string_lookup[ service_keys_to_types[ file_service_key ] ],
+                        'time_imported' : time_converter( times_manager.GetImportedTimestampMS( file_service_key ) )
+                    }
+                    
                 
-                domains_to_file_modified_timestamps_ms[ 'local' ] = local_modified_timestamp_ms
+                deleted = locations_manager.GetDeleted()
+                
+                for file_service_key in deleted:
+                    
+                    metadata_dict[ 'file_services' ][ 'deleted' ][ file_service_key.hex() ] = {
+                        'name' : service_keys_to_names[ file_service_key ],
+                        'type' : service_keys_to_types[ file_service_key ],
+                        'type_pretty' : HC.service_string_lookup[ service_keys_to_types[ file_service_key ] ],
+                        'time_deleted' : time_converter( times_manager.GetDeletedTimestampMS( file_service_key ) ),
+                        'time_imported' : time_converter( times_manager.GetPreviouslyImportedTimestampMS( file_service_key ) )
+                    }
+                    
                 
             
-            metadata_dict[ 'time_modified_details' ] = { domain : time_converter( timestamp_ms ) for ( domain, timestamp_ms ) in domains_to_file_modified_timestamps_ms.items() }
-            
-            metadata_dict[ 'is_inbox' ] = locations_manager.inbox
-            
-            if not locations_manager.inbox:
+            if 'times' in fields:
                 
-                archived_time_ms = times_manager.GetArchivedTimestampMS()
+                metadata_dict[ 'time_modified' ] = time_converter( times_manager.GetAggregateModifiedTimestampMS() )
                 
-                if archived_time_ms is not None:
+                domains_to_file_modified_timestamps_ms = times_manager.GetDomainModifiedTimestampsMS()
+                
+                local_modified_timestamp_ms = times_manager.GetFileModifiedTimestampMS()
+                
+                if local_modified_timestamp_ms is not None:
                     
-                    metadata_dict[ 'time_archived' ] = time_converter( archived_time_ms )
+                    domains_to_file_modified_timestamps_ms[ 'local' ] = local_modified_timestamp_ms
+                    
+                
+                metadata_dict[ 'time_modified_details' ] = { domain : time_converter( timestamp_ms ) for ( domain, timestamp_ms ) in domains_to_file_modified_timestamps_ms.items() }
+                
+                if not locations_manager.inbox:
+                    
+                    archived_time_ms = times_manager.GetArchivedTimestampMS()
+                    
+                    if archived_time_ms is not None:
+                        
+                        metadata_dict[ 'time_archived' ] = time_converter( archived_time_ms )
+                        
                     
                 
             
-            metadata_dict[ 'is_local' ] = locations_manager.IsLocal()
-            metadata_dict[ 'is_trashed' ] = locations_manager.IsTrashed()
-            metadata_dict[ 'is_deleted' ] = CC.COMBINED_LOCAL_FILE_DOMAINS_SERVICE_KEY in locations_manager.GetDeleted() or locations_manager.IsTrashed()
-            
-            metadata_dict[ 'has_transparency' ] = file_info_manager.has_transparency
-            metadata_dict[ 'has_exif' ] = file_info_manager.has_exif
-            metadata_dict[ 'has_human_readable_embedded_metadata' ] = file_info_manager.has_human_readable_embedded_metadata
-            metadata_dict[ 'has_icc_profile' ] = file_info_manager.has_icc_profile
-            
-            known_urls = sorted( locations_manager.GetURLs() )
-            
-            metadata_dict[ 'known_urls' ] = known_urls
+            if 'status' in fields:
+                
+                metadata_dict[ 'is_inbox' ] = locations_manager.inbox
+                metadata_dict[ 'is_local' ] = locations_manager.IsLocal()
+                metadata_dict[ 'is_trashed' ] = locations_manager.IsTrashed()
+                metadata_dict[ 'is_deleted' ] = CC.COMBINED_LOCAL_FILE_DOMAINS_SERVICE_KEY in locations_manager.GetDeleted() or locations_manager.IsTrashed()
+                
             
-            metadata_dict[ 'ipfs_multihashes' ] = { ipfs_service_key.hex() : multihash for ( ipfs_service_key, multihash ) in locations_manager.GetServiceFilenames().items() if ipfs_service_key in ipfs_service_keys }
+            if 'file_info' in fields:
+                
+                metadata_dict[ 'has_transparency' ] = file_info_manager.has_transparency
+                metadata_dict[ 'has_exif' ] = file_info_manager.has_exif
+                metadata_dict[ 'has_human_readable_embedded_metadata' ] = file_info_manager.has_human_readable_embedded_metadata
+                metadata_dict[ 'has_icc_profile' ] = file_info_manager.has_icc_profile
+                
             
-            if detailed_url_information:
+            if 'urls' in fields:
                 
-                detailed_known_urls = []
+                known_urls = sorted( locations_manager.GetURLs() )
                 
-                for known_url in known_urls:
+                metadata_dict[ 'known_urls' ] = known_urls
+                
+                metadata_dict[ 'ipfs_multihashes' ] = { ipfs_service_key.hex() : multihash for ( ipfs_service_key, multihash ) in locations_manager.GetServiceFilenames().items() if ipfs_service_key in ipfs_service_keys }
+                
+                if detailed_url_information:
                     
-                    try:
-                        
-                        normalised_url = CG.client_controller.network_engine.domain_manager.NormaliseURL( known_url )
-                        
-                        ( url_type, match_name, can_parse, cannot_parse_reason ) = CG.client_controller.network_engine.domain_manager.GetURLParseCapability( normalised_url )
+                    detailed_known_urls = []
+                    
+                    for known_url in known_urls:
                         
-                    except HydrusExceptions.URLClassException as e:
+                        try:
+                            
+                            normalised_url = CG.client_controller.network_engine.domain_manager.NormaliseURL( known_url )
+                            
+                            ( url_type, match_name, can_parse, cannot_parse_reason ) = CG.client_controller.network_engine.domain_manager.GetURLParseCapability( normalised_url )
+                            
+                        except HydrusExceptions.URLClassException as e:
+                            
+                            continue
+                            
                         
-                        continue
+                        detailed_dict = { 'normalised_url' : normalised_url, 'url_type' : url_type, 'url_type_string' : HC.url_type_string_lookup[ url_type ], 'match_name' : match_name, 'can_parse' : can_parse }
                         
-                    
-                    detailed_dict = { 'normalised_url' : normalised_url, 'url_type' : url_type, 'url_type_string' : HC.url_type_string_lookup[ url_type ], 'match_name' : match_name, 'can_parse' : can_parse }
-                    
-                    if not can_parse:
+                        if not can_parse:
+                            
+                            detailed_dict[ 'cannot_parse_reason' ] = cannot_parse_reason
+                            
                         
-                        detailed_dict[ 'cannot_parse_reason' ] = cannot_parse_reason
+                        detailed_known_urls.append( detailed_dict )
                         
                     
-                    detailed_known_urls.append( detailed_dict )
+                    metadata_dict[ 'detailed_known_urls' ] = detailed_known_urls
                     
                 
-                metadata_dict[ 'detailed_known_urls' ] = detailed_known_urls
-                
-            
-            ratings_manager = media_result.GetRatingsManager()
             
-            ratings_dict = {}
-            
-            for rating_service_key in rating_service_keys:
-                
-                rating_object = ratings_manager.GetRatingForAPI( rating_service_key )
+            if 'ratings' in fields:
                 
-                ratings_dict[ rating_service_key.hex() ] = rating_object
+                ratings_manager = media_result.GetRatingsManager()
                 
-            
-            metadata_dict[ 'ratings' ] = ratings_dict
-            
-            tags_manager = media_result.GetTagsManager()
-            
-            tags_dict = {}
-            
-            for tag_service_key in tag_service_keys:
+                ratings_dict = {}
                 
-                storage_statuses_to_tags = tags_manager.GetStatusesToTags( tag_service_key, ClientTags.TAG_DISPLAY_STORAGE )
+                for rating_service_key in rating_service_keys:
+                    
+                    rating_object = ratings_manager.GetRatingForAPI( rating_service_key )
+                    
+                    ratings_dict[ rating_service_key.hex() ] = rating_object
+                    
                 
-                storage_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in storage_statuses_to_tags.items() if len( tags ) > 0 }
+                metadata_dict[ 'ratings' ] = ratings_dict
                 
-                display_statuses_to_tags = tags_manager.GetStatusesToTags( tag_service_key, ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL )
+            
+            if 'tags' in fields:
                 
-                display_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in display_statuses_to_tags.items() if len( tags ) > 0 }
+                tags_manager = media_result.GetTagsManager()
                 
-                tags_dict_object = {
-                    'name' : service_keys_to_names[ tag_service_key ],
-                    'type' : service_keys_to_types[ tag_service_key ],
-                    'type_pretty' : HC.service_string_lookup[ service_keys_to_types[ tag_service_key ] ],
-                    'storage_tags' : storage_tags_json_serialisable,
-                    'display_tags' : display_tags_json_serialisable
-                }
+                tags_dict = {}
                 
-                tags_dict[ tag_service_key.hex() ] = tags_dict_object
+                for tag_service_key in tag_service_keys:
+                    
+                    storage_statuses_to_tags = tags_manager.GetStatusesToTags( tag_service_key, ClientTags.TAG_DISPLAY_STORAGE )
+                    
+                    storage_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in storage_statuses_to_tags.items() if len( tags ) > 0 }
+                    
+                    display_statuses_to_tags = tags_manager.GetStatusesToTags( tag_service_key, ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL )
+                    
+                    display_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in display_statuses_to_tags.items() if len( tags ) > 0 }
+                    
+                    tags_dict_object = {
+                        'name' : service_keys_to_names[ tag_service_key ],
+                        'type' : service_keys_to_types[ tag_service_key ],
+                        'type_pretty' : HC.service_string_lookup[ service_keys_to_types[ tag_service_key ] ],
+                        'storage_tags' : storage_tags_json_serialisable,
+                        'display_tags' : display_tags_json_serialisable
+                    }
+                    
+                    tags_dict[ tag_service_key.hex() ] = tags_dict_object
+                    
                 
-            
-            metadata_dict[ 'tags' ] = tags_dict
-            
-            #
-            
-            file_viewing_stats_list = []
-            
-            fvsm = media_result.GetFileViewingStatsManager()
-            
-            for canvas_type in [
-                CC.CANVAS_MEDIA_VIEWER,
-                CC.CANVAS_PREVIEW,
-                CC.CANVAS_CLIENT_API
-            ]:
-                
-                views = fvsm.GetViews( canvas_type )
-                viewtime = HydrusTime.SecondiseMSFloat( fvsm.GetViewtimeMS( canvas_type ) )
-                last_viewed_timestamp = HydrusTime.SecondiseMSFloat( times_manager.GetLastViewedTimestampMS( canvas_type ) )
-                
-                json_object = {
-                    'canvas_type' : canvas_type,
-                    'canvas_type_pretty' : CC.canvas_type_str_lookup[ canvas_type ],
-                    'views' : views,
-                    'viewtime' : viewtime,
-                    'last_viewed_timestamp' : last_viewed_timestamp
-                }
+                metadata_dict[ 'tags' ] = tags_dict
                 
-                file_viewing_stats_list.append( json_object )
+                # Old stuff starts here
                 
-            
-            metadata_dict[ 'file_viewing_statistics' ] = file_viewing_stats_list
-            
-            # Old stuff starts here
-            
-            api_service_keys_to_statuses_to_tags = {}
-            
-            service_keys_to_statuses_to_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
-            
-            for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
-                
-                statuses_to_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in statuses_to_tags.items() if len( tags ) > 0 }
-                
-                if len( statuses_to_tags_json_serialisable ) > 0:
+                if not hide_service_keys_tags:
                     
-                    api_service_keys_to_statuses_to_tags[ service_key.hex() ] = statuses_to_tags_json_serialisable
+                    api_service_keys_to_statuses_to_tags = {}
+                    
+                    service_keys_to_statuses_to_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_STORAGE )
+                    
+                    for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
+                        
+                        statuses_to_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in statuses_to_tags.items() if len( tags ) > 0 }
+                        
+                        if len( statuses_to_tags_json_serialisable ) > 0:
+                            
+                            api_service_keys_to_statuses_to_tags[ service_key.hex() ] = statuses_to_tags_json_serialisable
+                            
+                        
+                    
+                    metadata_dict[ 'service_keys_to_statuses_to_tags' ] = api_service_keys_to_statuses_to_tags
+                    
+                    #
+                    
+                    api_service_keys_to_statuses_to_tags = {}
+                    
+                    service_keys_to_statuses_to_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL )
+                    
+                    for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
+                        
+                        statuses_to_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in statuses_to_tags.items() if len( tags ) > 0 }
+                        
+                        if len( statuses_to_tags_json_serialisable ) > 0:
+                            
+                            api_service_keys_to_statuses_to_tags[ service_key.hex() ] = statuses_to_tags_json_serialisable
+                            
+                        
+                    
+                    metadata_dict[ 'service_keys_to_statuses_to_display_tags' ] = api_service_keys_to_statuses_to_tags
                     
                 
-            
-            if not hide_service_keys_tags:
-                
-                metadata_dict[ 'service_keys_to_statuses_to_tags' ] = api_service_keys_to_statuses_to_tags
+                # old stuff ends here
                 
             
-            #
-            
-            api_service_keys_to_statuses_to_tags = {}
-            
-            service_keys_to_statuses_to_tags = tags_manager.GetServiceKeysToStatusesToTags( ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL )
-            
-            for ( service_key, statuses_to_tags ) in service_keys_to_statuses_to_tags.items():
+            if 'file_viewing_statistics' in fields:
                 
-                statuses_to_tags_json_serialisable = { str( status ) : sorted( tags, key = HydrusText.HumanTextSortKey ) for ( status, tags ) in statuses_to_tags.items() if len( tags ) > 0 }
+                file_viewing_stats_list = []
                 
-                if len( statuses_to_tags_json_serialisable ) > 0:
+                fvsm = media_result.GetFileViewingStatsManager()
+                
+                for canvas_type in [
+                    CC.CANVAS_MEDIA_VIEWER,
+                    CC.CANVAS_PREVIEW,
+                    CC.CANVAS_CLIENT_API
+                ]:
                     
-                    api_service_keys_to_statuses_to_tags[ service_key.hex() ] = statuses_to_tags_json_serialisable
+                    views = fvsm.GetViews( canvas_type )
+                    viewtime = HydrusTime.SecondiseMSFloat( fvsm.GetViewtimeMS( canvas_type ) )
+                    last_viewed_timestamp = HydrusTime.SecondiseMSFloat( times_manager.GetLastViewedTimestampMS( canvas_type ) )
+                    
+                    json_object = {
+                        'canvas_type' : canvas_type,
+                        'canvas_type_pretty' : CC.canvas_type_str_lookup[ canvas_type ],
+                        'views' : views,
+                        'viewtime' : viewtime,
+                        'last_viewed_timestamp' : last_viewed_timestamp
+                    }
+                    
+                    file_viewing_stats_list.append( json_object )
                     
                 
-            
-            if not hide_service_keys_tags:
-                
-                metadata_dict[ 'service_keys_to_statuses_to_display_tags' ] = api_service_keys_to_statuses_to_tags
+                metadata_dict[ 'file_viewing_statistics' ] = file_viewing_stats_list
                 
             
-            # old stuff ends here
-            
-            #
-            
             metadata_list.append( metadata_dict )
             
         else:
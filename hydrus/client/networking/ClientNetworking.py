@@ -1,13 +1,14 @@
 import collections
 import collections.abc
+import heapq
 import threading
-import time
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusLists
+from hydrus.core import HydrusTime
 
 from hydrus.client import ClientGlobals as CG
 from hydrus.client.networking import ClientNetworkingBandwidth
@@ -31,6 +32,315 @@ job_status_str_lookup = {
     JOB_STATUS_RUNNING : 'running'
 }
 
+JOB_EVENT_DONE = 0
+JOB_EVENT_WOKEN = 1
+
+# the engine used to check every job on every tick and tick every second. now a job is only looked at when it wakes up or something happens to it
+# a job that is waiting on something we cannot hear about (a login in another job, a validation popup) gets looked at again this often
+PARKED_JOB_RECHECK_PERIOD = 5.0
+
+# a safety net, in case something wakes a job without telling us
+MAX_WORK_LOOP_WAIT = 5.0
+
+class NetworkJobQueue( object ):
+    """
+    The jobs waiting in one stage of the engine.
+    Awake jobs are popped in the order they were added to the engine, and sleeping jobs sit in a heap until their wake time comes around.
+    """
+    
+    def __init__( self ):
+        
+        # heap entries are never removed, just made stale by giving the job a new token
+        self._jobs_to_entries = {}
+        
+        self._ready = []
+        self._sleeping = []
+        
+        self._next_token = 0
+        
+    
+    def __contains__( self, job ):
+        
+        return job in self._jobs_to_entries
+        
+    
+    def __iter__( self ):
+        
+        return iter( self._jobs_to_entries )
+        
+    
+    def __len__( self ):
+        
+        return len( self._jobs_to_entries )
+        
+    
+    def _EntryIsCurrent( self, job, token ):
+        
+        return job in self._jobs_to_entries and self._jobs_to_entries[ job ][1] == token
+        
+    
+    def _GetNewToken( self, job, sequence_number ):
+        
+        token = self._next_token
+        
+        self._next_token += 1
+        
+        self._jobs_to_entries[ job ] = ( sequence_number, token )
+        
+        return token
+        
+    
+    def _WakeSleepers( self, now ):
+        
+        while len( self._sleeping ) > 0 and self._sleeping[0][0] <= now:
+            
+            ( wake_time, sequence_number, token, job ) = heapq.heappop( self._sleeping )
+            
+            if self._EntryIsCurrent( job, token ):
+                
+                heapq.heappush( self._ready, ( sequence_number, token, job ) )
+                
+            
+        
+        while len( self._ready ) > 0 and not self._EntryIsCurrent( self._ready[0][2], self._ready[0][1] ):
+            
+            heapq.heappop( self._ready )
+            
+        
+    
+    def Add( self, job, sequence_number ):
+        
+        token = self._GetNewToken( job, sequence_number )
+        
+        heapq.heappush( self._ready, ( sequence_number, token, job ) )
+        
+    
+    def AddSleeping( self, job, sequence_number, wake_time ):
+        
+        token = self._GetNewToken( job, sequence_number )
+        
+        heapq.heappush( self._sleeping, ( wake_time, sequence_number, token, job ) )
+        
+    
+    def Discard( self, job ):
+        
+        if job in self._jobs_to_entries:
+            
+            del self._jobs_to_entries[ job ]
+            
+        
+    
+    def GetNextWakeTime( self, now ) -> float | None:
+        """
+        When we next have something to do. This is now if a job is already awake.
+        """
+        
+        self._WakeSleepers( now )
+        
+        if len( self._ready ) > 0:
+            
+            return now
+            
+        
+        while len( self._sleeping ) > 0 and not self._EntryIsCurrent( self._sleeping[0][3], self._sleeping[0][2] ):
+            
+            heapq.heappop( self._sleeping )
+            
+        
+        if len( self._sleeping ) == 0:
+            
+            return None
+            
+        
+        return self._sleeping[0][0]
+        
+    
+    def PeekReadySequenceNumber( self, now ) -> int | None:
+        
+        self._WakeSleepers( now )
+        
+        if len( self._ready ) == 0:
+            
+            return None
+            
+        
+        return self._ready[0][0]
+        
+    
+    def PopReady( self, now ):
+        
+        self._WakeSleepers( now )
+        
+        if len( self._ready ) == 0:
+            
+            return None
+            
+        
+        ( sequence_number, token, job ) = heapq.heappop( self._ready )
+        
+        del self._jobs_to_entries[ job ]
+        
+        return job
+        
+    
+    def Wake( self, job ):
+        
+        if job in self._jobs_to_entries:
+            
+            ( sequence_number, token ) = self._jobs_to_entries[ job ]
+            
+            self.Add( job, sequence_number )
+            
+        
+    
+    def WakeAll( self ):
+        
+        for ( job, ( sequence_number, token ) ) in list( self._jobs_to_entries.items() ):
+            
+            self.Add( job, sequence_number )
+            
+        
+    
+
+class NetworkJobDomainQueues( object ):
+    """
+    The jobs waiting for a work slot, in one queue per second-level domain, so a busy domain does not hold up the others.
+    """
+    
+    def __init__( self ):
+        
+        self._domains_to_queues = {}
+        self._jobs_to_domains = {}
+        
+    
+    def __contains__( self, job ):
+        
+        return job in self._jobs_to_domains
+        
+    
+    def __iter__( self ):
+        
+        return iter( self._jobs_to_domains )
+        
+    
+    def __len__( self ):
+        
+        return len( self._jobs_to_domains )
+        
+    
+    def _ForgetJob( self, job ):
+        
+        domain = self._jobs_to_domains[ job ]
+        
+        del self._jobs_to_domains[ job ]
+        
+        queue = self._domains_to_queues[ domain ]
+        
+        queue.Discard( job )
+        
+        if len( queue ) == 0:
+            
+            del self._domains_to_queues[ domain ]
+            
+        
+    
+    def _GetQueue( self, job ) -> NetworkJobQueue:
+        
+        domain = job.GetSecondLevelDomain()
+        
+        self._jobs_to_domains[ job ] = domain
+        
+        if domain not in self._domains_to_queues:
+            
+            self._domains_to_queues[ domain ] = NetworkJobQueue()
+            
+        
+        return self._domains_to_queues[ domain ]
+        
+    
+    def Add( self, job, sequence_number ):
+        
+        self._GetQueue( job ).Add( job, sequence_number )
+        
+    
+    def AddSleeping( self, job, sequence_number, wake_time ):
+        
+        self._GetQueue( job ).AddSleeping( job, sequence_number, wake_time )
+        
+    
+    def Discard( self, job ):
+        
+        if job in self._jobs_to_domains:
+            
+            self._ForgetJob( job )
+            
+        
+    
+    def GetNextWakeTime( self, now, domains_to_skip: collections.abc.Collection[ str ] ) -> float | None:
+        
+        wake_times = [ wake_time for wake_time in ( queue.GetNextWakeTime( now ) for ( domain, queue ) in self._domains_to_queues.items() if domain not in domains_to_skip ) if wake_time is not None ]
+        
+        if len( wake_times ) == 0:
+            
+            return None
+            
+        
+        return min( wake_times )
+        
+    
+    def PopReady( self, now, domains_to_skip: collections.abc.Collection[ str ] ):
+        """
+        Pops the awake job that has been in the engine longest, skipping domains that have no free slots.
+        """
+        
+        best_sequence_number = None
+        best_queue = None
+        
+        for ( domain, queue ) in self._domains_to_queues.items():
+            
+            if domain in domains_to_skip:
+                
+                continue
+                
+            
+            sequence_number = queue.PeekReadySequenceNumber( now )
+            
+            if sequence_number is not None and ( best_sequence_number is None or sequence_number < best_sequence_number ):
+                
+                best_sequence_number = sequence_number
+                best_queue = queue
+                
+            
+        
+        if best_queue is None:
+            
+            return None
+            
+        
+        job = best_queue.PopReady( now )
+        
+        self._ForgetJob( job )
+        
+        return job
+        
+    
+    def Wake( self, job ):
+        
+        if job in self._jobs_to_domains:
+            
+            self._domains_to_queues[ self._jobs_to_domains[ job ] ].Wake( job )
+            
+        
+    
+    def WakeAll( self ):
+        
+        for queue in self._domains_to_queues.values():
+            
+            queue.WakeAll()
+            
+        
+    
+
 class NetworkEngine( object ):
     
     def __init__(
@@ -56,21 +366,32 @@ class NetworkEngine( object ):
         self.MAX_JOBS = 1
         self.MAX_JOBS_PER_DOMAIN = 1
         
-        self.RefreshOptions()
-        
         self._new_work_to_do = threading.Event()
         
+        self.RefreshOptions()
+        
         self._domains_to_login = []
         
         self._active_domains_counter = collections.Counter()
         
-        self._jobs_awaiting_validity = []
+        self._next_job_sequence_number = 0
+        self._jobs_to_sequence_numbers = {}
+        self._jobs_to_statuses_and_times = {}
+        
+        # jobs tell us about these from their own threads, often while holding their own locks, so they cannot wait on ours
+        # deque appends and pops are atomic, so this needs no lock of its own
+        self._job_events = collections.deque()
+        
+        self._jobs_awaiting_validity = NetworkJobQueue()
         self._current_validation_process = None
-        self._jobs_awaiting_bandwidth = []
-        self._jobs_awaiting_login = []
+        self._jobs_awaiting_bandwidth = NetworkJobQueue()
+        self._jobs_awaiting_login = NetworkJobQueue()
         self._current_login_process = None
-        self._jobs_awaiting_slot = []
-        self._jobs_running = []
+        self._jobs_awaiting_slot = NetworkJobDomainQueues()
+        self._jobs_running = set()
+        
+        self._statuses_to_num_jobs_passed_through = collections.Counter()
+        self._statuses_to_total_time_spent = collections.Counter()
         
         self._pause_all_new_network_traffic = self.controller.new_options.GetBoolean( 'pause_all_new_network_traffic' )
         
@@ -88,6 +409,154 @@ class NetworkEngine( object ):
         self.login_manager.SetCurrentLoginProcess( login_process )
         
     
+    def _GetJobQueue( self, status: int ):
+        
+        if status == JOB_STATUS_AWAITING_VALIDITY:
+            
+            return self._jobs_awaiting_validity
+            
+        elif status == JOB_STATUS_AWAITING_BANDWIDTH:
+            
+            return self._jobs_awaiting_bandwidth
+            
+        elif status == JOB_STATUS_AWAITING_LOGIN:
+            
+            return self._jobs_awaiting_login
+            
+        elif status == JOB_STATUS_AWAITING_SLOT:
+            
+            return self._jobs_awaiting_slot
+            
+        else:
+            
+            return self._jobs_running
+            
+        
+    
+    def _GetFullDomains( self ) -> set[ str ]:
+        
+        return { domain for ( domain, count ) in self._active_domains_counter.items() if count >= self.MAX_JOBS_PER_DOMAIN }
+        
+    
+    def _GetNextWakeTime( self, now: float ) -> float | None:
+        
+        wake_times = [ queue.GetNextWakeTime( now ) for queue in ( self._jobs_awaiting_validity, self._jobs_awaiting_bandwidth, self._jobs_awaiting_login ) ]
+        
+        # jobs that cannot get a slot are no reason to wake up. a running job finishing will tell us when one frees up
+        if len( self._jobs_running ) < self.MAX_JOBS:
+            
+            wake_times.append( self._jobs_awaiting_slot.GetNextWakeTime( now, self._GetFullDomains() ) )
+            
+        
+        wake_times = [ wake_time for wake_time in wake_times if wake_time is not None ]
+        
+        if len( wake_times ) == 0:
+            
+            return None
+            
+        
+        return min( wake_times )
+        
+    
+    def _MoveJob( self, job: ClientNetworkingJobs.NetworkJob, status: int, now: float ):
+        
+        self._RecordTimeSpent( job, now )
+        
+        self._jobs_to_statuses_and_times[ job ] = ( status, now )
+        
+        if status == JOB_STATUS_RUNNING:
+            
+            self._jobs_running.add( job )
+            
+        else:
+            
+            self._GetJobQueue( status ).Add( job, self._jobs_to_sequence_numbers[ job ] )
+            
+        
+    
+    def _ProcessJobEvents( self, now: float ):
+        
+        while len( self._job_events ) > 0:
+            
+            ( job_event, job ) = self._job_events.popleft()
+            
+            if job not in self._jobs_to_statuses_and_times:
+                
+                continue
+                
+            
+            if job_event == JOB_EVENT_DONE:
+                
+                self._RemoveJob( job, now )
+                
+            elif job_event == JOB_EVENT_WOKEN:
+                
+                ( status, time_entered ) = self._jobs_to_statuses_and_times[ job ]
+                
+                if status != JOB_STATUS_RUNNING:
+                    
+                    self._GetJobQueue( status ).Wake( job )
+                    
+                
+            
+        
+    
+    def _RecordTimeSpent( self, job: ClientNetworkingJobs.NetworkJob, now: float ):
+        
+        if job in self._jobs_to_statuses_and_times:
+            
+            ( status, time_entered ) = self._jobs_to_statuses_and_times[ job ]
+            
+            self._statuses_to_num_jobs_passed_through[ status ] += 1
+            self._statuses_to_total_time_spent[ status ] += now - time_entered
+            
+        
+    
+    def _RemoveJob( self, job: ClientNetworkingJobs.NetworkJob, now: float ):
+        
+        self._RecordTimeSpent( job, now )
+        
+        ( status, time_entered ) = self._jobs_to_statuses_and_times[ job ]
+        
+        del self._jobs_to_statuses_and_times[ job ]
+        del self._jobs_to_sequence_numbers[ job ]
+        
+        if status == JOB_STATUS_RUNNING:
+            
+            ClientNetworkingFunctions.NetworkReportMode( f'Network Job Done: {job._method} {job._url}' )
+            
+            self._jobs_running.discard( job )
+            
+            second_level_domain = job.GetSecondLevelDomain()
+            
+            self._active_domains_counter[ second_level_domain ] -= 1
+            
+            if self._active_domains_counter[ second_level_domain ] <= 0:
+                
+                del self._active_domains_counter[ second_level_domain ]
+                
+            
+        else:
+            
+            self._GetJobQueue( status ).Discard( job )
+            
+        
+    
+    def _RequeueJob( self, job: ClientNetworkingJobs.NetworkJob, now: float ):
+        
+        ( status, time_entered ) = self._jobs_to_statuses_and_times[ job ]
+        
+        wake_time = job.GetWakeTime()
+        
+        if wake_time <= now:
+            
+            # the job is waiting on something that will not tell us when it is done
+            wake_time = now + PARKED_JOB_RECHECK_PERIOD
+            
+        
+        self._GetJobQueue( status ).AddSleeping( job, self._jobs_to_sequence_numbers[ job ], wake_time )
+        
+    
     def AddJob( self, job: ClientNetworkingJobs.NetworkJob ):
         
         ClientNetworkingFunctions.NetworkReportMode( f'Network Job Added: {job._method}  {job._url}' )
@@ -96,7 +565,16 @@ class NetworkEngine( object ):
             
             job.engine = self
             
-            self._jobs_awaiting_validity.append( job )
+            if job in self._jobs_to_statuses_and_times:
+                
+                return
+                
+            
+            self._jobs_to_sequence_numbers[ job ] = self._next_job_sequence_number
+            
+            self._next_job_sequence_number += 1
+            
+            self._MoveJob( job, JOB_STATUS_AWAITING_VALIDITY, HydrusTime.GetNowFloat() )
             
         
         self._new_work_to_do.set()
@@ -111,28 +589,57 @@ class NetworkEngine( object ):
             self._domains_to_login = HydrusLists.DedupeList( self._domains_to_login )
             
         
+        self._new_work_to_do.set()
+        
     
     def GetJobsSnapshot( self ):
         
         with self._lock:
             
-            jobs = []
+            jobs = [ ( status, job ) for ( job, ( status, time_entered ) ) in self._jobs_to_statuses_and_times.items() ]
             
-            jobs.extend( ( ( JOB_STATUS_AWAITING_VALIDITY, j ) for j in self._jobs_awaiting_validity ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_BANDWIDTH, j ) for j in self._jobs_awaiting_bandwidth ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_LOGIN, j ) for j in self._jobs_awaiting_login ) )
-            jobs.extend( ( ( JOB_STATUS_AWAITING_SLOT, j ) for j in self._jobs_awaiting_slot ) )
-            jobs.extend( ( ( JOB_STATUS_RUNNING, j ) for j in self._jobs_running ) )
+            jobs.sort( key = lambda row: row[0] )
             
             return jobs
             
         
     
+    def GetStatusMetrics( self ) -> dict[ int, tuple[ int, int, float ] ]:
+        """
+        For each job status: how many jobs are in it now, how many have passed through it, and how many seconds they spent in it on average.
+        """
+        
+        with self._lock:
+            
+            statuses_to_metrics = {}
+            
+            for status in job_status_str_lookup.keys():
+                
+                num_jobs = len( self._GetJobQueue( status ) )
+                
+                num_jobs_passed_through = self._statuses_to_num_jobs_passed_through[ status ]
+                
+                if num_jobs_passed_through == 0:
+                    
+                    average_time_spent = 0.0
+                    
+                else:
+                    
+                    average_time_spent = self._statuses_to_total_time_spent[ status ] / num_jobs_passed_through
+                    
+                
+                statuses_to_metrics[ status ] = ( num_jobs, num_jobs_passed_through, average_time_spent )
+                
+            
+            return statuses_to_metrics
+            
+        
+    
     def IsBusy( self ) -> bool:
         
         with self._lock:
             
-            return len( self._jobs_awaiting_validity ) + len( self._jobs_awaiting_bandwidth ) + len( self._jobs_awaiting_login ) + len( self._jobs_awaiting_slot ) + len( self._jobs_running ) > 50
+            return len( self._jobs_to_statuses_and_times ) > 50
             
         
     
@@ -154,17 +661,31 @@ class NetworkEngine( object ):
     
     def MainLoop( self ):
         
-        def ProcessValidationJob( job: ClientNetworkingJobs.NetworkJob ):
+        def WorkQueue( queue: NetworkJobQueue, process_job_callable, now: float ):
             
-            if job.IsDone():
+            while True:
                 
-                return False
+                job = queue.PopReady( now )
                 
-            elif job.IsAsleep():
+                if job is None:
+                    
+                    break
+                    
                 
-                return True
+                if job.IsDone():
+                    
+                    self._RemoveJob( job, now )
+                    
+                elif job.IsAsleep() or process_job_callable( job, now ):
+                    
+                    self._RequeueJob( job, now )
+                    
                 
-            elif not job.IsValid():
+            
+        
+        def ProcessValidationJob( job: ClientNetworkingJobs.NetworkJob, now: float ):
+            
+            if not job.IsValid():
                 
                 if job.CanValidateInPopup():
                     
@@ -193,12 +714,14 @@ class NetworkEngine( object ):
                     
                     job.SetError( HydrusExceptions.ValidationException( error_text ), error_text )
                     
+                    self._RemoveJob( job, now )
+                    
                     return False
                     
                 
             else:
                 
-                self._jobs_awaiting_bandwidth.append( job )
+                self._MoveJob( job, JOB_STATUS_AWAITING_BANDWIDTH, now )
                 
                 return False
                 
@@ -212,21 +735,14 @@ class NetworkEngine( object ):
                     
                     self._current_validation_process = None
                     
+                    self._jobs_awaiting_validity.WakeAll()
+                    
                 
             
         
-        def ProcessBandwidthJob( job: ClientNetworkingJobs.NetworkJob ):
+        def ProcessBandwidthJob( job: ClientNetworkingJobs.NetworkJob, now: float ):
             
-            if job.IsDone():
-                
-                return False
-                
-            elif job.IsAsleep():
-                
-                return True
-                
-            
-            elif self._pause_all_new_network_traffic:
+            if self._pause_all_new_network_traffic:
                 
                 job.SetStatus( 'all new network traffic is paused' + HC.UNICODE_ELLIPSIS )
                 
@@ -236,11 +752,12 @@ class NetworkEngine( object ):
                 
             elif not job.TryToStartBandwidth():
                 
+                # the job has gone to sleep until its bandwidth estimate comes around
                 return True
                 
             else:
                 
-                self._jobs_awaiting_login.append( job )
+                self._MoveJob( job, JOB_STATUS_AWAITING_LOGIN, now )
                 
                 return False
                 
@@ -269,17 +786,9 @@ class NetworkEngine( object ):
                 
             
         
-        def ProcessLoginJob( job: ClientNetworkingJobs.NetworkJob ):
+        def ProcessLoginJob( job: ClientNetworkingJobs.NetworkJob, now: float ):
             
-            if job.IsDone():
-                
-                return False
-                
-            elif job.IsAsleep():
-                
-                return True
-                
-            elif job.CurrentlyNeedsLogin():
+            if job.CurrentlyNeedsLogin():
                 
                 try:
                     
@@ -310,6 +819,8 @@ class NetworkEngine( object ):
                         
                         job.Cancel( message )
                         
+                        self._RemoveJob( job, now )
+                        
                         return False
                         
                     
@@ -346,7 +857,16 @@ class NetworkEngine( object ):
                 
             else:
                 
-                self._jobs_awaiting_slot.append( job )
+                if self._active_domains_counter[ job.GetSecondLevelDomain() ] >= self.MAX_JOBS_PER_DOMAIN:
+                    
+                    job.SetStatus( 'waiting for other jobs on this domain to finish' )
+                    
+                else:
+                    
+                    job.SetStatus( 'waiting for other jobs to finish' + HC.UNICODE_ELLIPSIS )
+                    
+                
+                self._MoveJob( job, JOB_STATUS_AWAITING_SLOT, now )
                 
                 return False
                 
@@ -360,28 +880,39 @@ class NetworkEngine( object ):
                     
                     self._AssignCurrentLoginProcess( None )
                     
+                    self._jobs_awaiting_login.WakeAll()
+                    
                 
             
         
-        def ProcessReadyJob( job: ClientNetworkingJobs.NetworkJob ):
+        def ProcessReadyJobs( now: float ):
             
-            if job.IsDone():
-                
-                return False
-                
-            elif job.IsAsleep():
+            # jobs on a busy domain, or behind a full engine, are not touched at all. they wake when a running job finishes
+            
+            while len( self._jobs_running ) < self.MAX_JOBS:
                 
-                return True
+                job = self._jobs_awaiting_slot.PopReady( now, self._GetFullDomains() )
                 
-            elif len( self._jobs_running ) < self.MAX_JOBS:
+                if job is None:
+                    
+                    break
+                    
                 
-                if self._pause_all_new_network_traffic:
+                if job.IsDone():
+                    
+                    self._RemoveJob( job, now )
+                    
+                elif job.IsAsleep():
+                    
+                    self._RequeueJob( job, now )
+                    
+                elif self._pause_all_new_network_traffic:
                     
                     job.SetStatus( 'all new network traffic is paused' + HC.UNICODE_ELLIPSIS )
                     
                     job.Sleep( 2 )
                     
-                    return True
+                    self._RequeueJob( job, now )
                     
                 elif self.controller.JustWokeFromSleep():
                     
@@ -389,23 +920,15 @@ class NetworkEngine( object ):
                     
                     job.Sleep( 5 )
                     
-                    return True
-                    
-                elif self._active_domains_counter[ job.GetSecondLevelDomain() ] >= self.MAX_JOBS_PER_DOMAIN:
-                    
-                    job.SetStatus( 'waiting for other jobs on this domain to finish' )
-                    
-                    job.Sleep( 2 )
-                    
-                    return True
+                    self._RequeueJob( job, now )
                     
                 elif not job.TokensOK():
                     
-                    return True
+                    self._RequeueJob( job, now )
                     
                 elif not job.DomainOK():
                     
-                    return True
+                    self._RequeueJob( job, now )
                     
                 else:
                     
@@ -415,39 +938,18 @@ class NetworkEngine( object ):
                     
                     self.controller.CallToThread( job.Start )
                     
-                    self._jobs_running.append( job )
-                    
-                    return False
+                    self._MoveJob( job, JOB_STATUS_RUNNING, now )
                     
                 
-            else:
-                
-                job.SetStatus( 'waiting for other jobs to finish' + HC.UNICODE_ELLIPSIS )
-                
-                return True
-                
             
         
-        def ProcessRunningJob( job: ClientNetworkingJobs.NetworkJob ):
+        def ProcessRunningJobs( now: float ):
             
-            if job.IsDone():
-                
-                ClientNetworkingFunctions.NetworkReportMode( f'Network Job Done: {job._method} {job._url}' )
-                
-                second_level_domain = job.GetSecondLevelDomain()
-                
-                self._active_domains_counter[ second_level_domain ] -= 1
-                
-                if self._active_domains_counter[ second_level_domain ] == 0:
-                    
-                    del self._active_domains_counter[ second_level_domain ]
-                    
-                
-                return False
-                
-            else:
+            # jobs tell us when they are done, but there are only a handful of these, so we double-check
+            
+            for job in [ job for job in self._jobs_running if job.IsDone() ]:
                 
-                return True
+                self._RemoveJob( job, now )
                 
             
         
@@ -455,35 +957,53 @@ class NetworkEngine( object ):
         
         while not ( self._local_shutdown or HG.model_shutdown ):
             
+            # clearing before we work means anything that comes in while we are busy gets caught on the next loop
+            self._new_work_to_do.clear()
+            
             with self._lock:
                 
-                self._jobs_awaiting_validity = list( filter( ProcessValidationJob, self._jobs_awaiting_validity ) )
+                now = HydrusTime.GetNowFloat()
+                
+                self._ProcessJobEvents( now )
+                
+                ProcessRunningJobs( now )
+                
+                WorkQueue( self._jobs_awaiting_validity, ProcessValidationJob, now )
                 
                 ProcessCurrentValidationJob()
                 
-                self._jobs_awaiting_bandwidth = list( filter( ProcessBandwidthJob, self._jobs_awaiting_bandwidth ) )
+                WorkQueue( self._jobs_awaiting_bandwidth, ProcessBandwidthJob, now )
                 
                 ProcessForceLogins()
                 
-                self._jobs_awaiting_login = list( filter( ProcessLoginJob, self._jobs_awaiting_login ) )
+                WorkQueue( self._jobs_awaiting_login, ProcessLoginJob, now )
                 
                 ProcessCurrentLoginJob()
                 
-                self._jobs_awaiting_slot = list( filter( ProcessReadyJob, self._jobs_awaiting_slot ) )
+                ProcessReadyJobs( now )
                 
-                self._jobs_running = list( filter( ProcessRunningJob, self._jobs_running ) )
+                time_to_wait = MAX_WORK_LOOP_WAIT
+                
+                now = HydrusTime.GetNowFloat()
+                
+                next_wake_time = self._GetNextWakeTime( now )
+                
+                if next_wake_time is not None:
+                    
+                    time_to_wait = min( time_to_wait, next_wake_time - now )
+                    
+                
+                if self._current_validation_process is not None or self._current_login_process is not None:
+                    
+                    # these do not tell us when they are done, so we keep an eye on them
+                    time_to_wait = min( time_to_wait, 1.0 )
+                    
                 
             
-            # we want to catch the rollover of the second for bandwidth jobs
-            
-            now_with_subsecond = time.time()
-            subsecond_part = now_with_subsecond % 1
-            
-            time_until_next_second = 1.0 - subsecond_part
-            
-            self._new_work_to_do.wait( time_until_next_second )
-            
-            self._new_work_to_do.clear()
+            if time_to_wait > 0:
+                
+                self._new_work_to_do.wait( time_to_wait )
+                
             
         
         self._is_running = False
@@ -491,6 +1011,20 @@ class NetworkEngine( object ):
         self._is_shutdown = True
         
     
+    def NotifyJobDone( self, job: ClientNetworkingJobs.NetworkJob ):
+        
+        self._job_events.append( ( JOB_EVENT_DONE, job ) )
+        
+        self._new_work_to_do.set()
+        
+    
+    def NotifyJobWoken( self, job: ClientNetworkingJobs.NetworkJob ):
+        
+        self._job_events.append( ( JOB_EVENT_WOKEN, job ) )
+        
+        self._new_work_to_do.set()
+        
+    
     def PauseNewJobs( self ):
         
         self._pause_all_new_network_traffic = True
@@ -522,6 +1056,8 @@ class NetworkEngine( object ):
             self.MAX_JOBS_PER_DOMAIN = self.controller.new_options.GetInteger( 'max_network_jobs_per_domain' )
             
         
+        self._new_work_to_do.set()
+        
     
     def Shutdown( self ):
         
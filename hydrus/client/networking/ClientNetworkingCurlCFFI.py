@@ -13,6 +13,7 @@ CURL_CFFI_IMPORT_ERROR = 'curl_cffi seems fine!'
 
 try:
     
+    import curl_cffi.const
     import curl_cffi.requests
     import curl_cffi.requests.exceptions
     
@@ -57,10 +58,19 @@ except Exception as e:
     
 
 def CreateCurlCFFISession(
-    definition: str
+    definition: str | None,
+    http2: bool = False
 ):
     
-    curl_cffi_session = MyCurlCFFISession( impersonate = definition )
+    if http2:
+        
+        # http/2 over https, falling back to 1.1 if the server does not offer it. plain http stays on 1.1
+        curl_cffi_session = MyCurlCFFISession( impersonate = definition, http_version = curl_cffi.const.CurlHttpVersion.V2TLS )
+        
+    else:
+        
+        curl_cffi_session = MyCurlCFFISession( impersonate = definition )
+        
     
     return curl_cffi_session
     
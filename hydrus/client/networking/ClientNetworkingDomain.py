@@ -1,6 +1,5 @@
 import collections
 import collections.abc
-import functools
 import threading
 import time
 
@@ -64,7 +63,7 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
         self._url_class_keys_to_display = set()
         self._url_class_keys_to_parser_keys = HydrusSerialisable.SerialisableBytesDictionary()
         
-        self._url_domain_masks_to_url_classes = collections.defaultdict( list )
+        self._url_class_matcher = ClientNetworkingURLClass.URLClassMatcher( [] )
         
         # TODO: Replace this with DomainStatus and do Cleanse/IsStub clearing on load
         # We will be converting to Network Context as we do!
@@ -226,55 +225,7 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
     
     def _GetURLClass( self, url ):
         
-        try:
-            
-            domain = ClientNetworkingFunctions.ConvertURLIntoDomain( url )
-            
-        except HydrusExceptions.URLClassException:
-            
-            return None
-            
-        
-        url_domain_masks = self._GetURLDomainMasks( domain )
-        
-        for url_domain_mask in url_domain_masks:
-            
-            url_classes = self._url_domain_masks_to_url_classes[ url_domain_mask ]
-            
-            for url_class in url_classes:
-                
-                try:
-                    
-                    url_class.Test( url )
-                    
-                    return url_class
-                    
-                except HydrusExceptions.URLClassException:
-                    
-                    continue
-                    
-                
-            
-        
-        return None
-        
-    
-    @functools.lru_cache( 128 )
-    def _GetURLDomainMasks( self, domain ) -> list[ ClientNetworkingURLClass.URLDomainMask ]:
-        
-        url_domain_masks = []
-        
-        for url_domain_mask in self._url_domain_masks_to_url_classes.keys():
-            
-            if url_domain_mask.Matches( domain ):
-                
-                url_domain_masks.append( url_domain_mask )
-                
-            
-        
-        url_domain_masks.sort( key = lambda udm: udm.GetSortingComplexity(), reverse = True )
-        
-        return url_domain_masks
+        return self._url_class_matcher.GetURLClass( url )
         
     
     def _GetURLToFetch( self, url: str ):
@@ -364,22 +315,36 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
             
         
     
-    def _RecalcCache( self ):
+    def _NormaliseURL( self, url, for_server = False ):
         
-        self._GetURLDomainMasks.cache_clear()
+        try:
+            
+            ClientNetworkingFunctions.CheckLooksLikeAFullURL( url )
+            
+        except HydrusExceptions.URLClassException:
+            
+            return url
+            
         
-        self._url_domain_masks_to_url_classes = collections.defaultdict( list )
+        url_class = self._GetURLClass( url )
         
-        for url_class in self._url_classes:
+        if url_class is None:
             
-            self._url_domain_masks_to_url_classes[ url_class.GetURLDomainMask() ].append( url_class )
+            # this is less about washing as it is about stripping the fragment
+            normalised_url = ClientNetworkingFunctions.EnsureURLIsEncoded( url, keep_fragment = False )
             
-        
-        for url_classes in self._url_domain_masks_to_url_classes.values():
+        else:
             
-            ClientNetworkingURLClass.SortURLClassesListDescendingComplexity( url_classes )
+            normalised_url = url_class.Normalise( url, for_server = for_server )
             
         
+        return normalised_url
+        
+    
+    def _RecalcCache( self ):
+        
+        self._url_class_matcher = ClientNetworkingURLClass.URLClassMatcher( self._url_classes )
+        
         self._gug_keys_to_gugs = { gug.GetGUGKey() : gug for gug in self._gugs }
         self._gug_names_to_gugs = { gug.GetName() : gug for gug in self._gugs }
         
@@ -1470,6 +1435,14 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
         return ( url_type, match_name, can_parse, cannot_parse_reason )
         
     
+    def GetURLsToURLClasses( self, urls: collections.abc.Iterable[ str ] ) -> dict[ str, ClientNetworkingURLClass.URLClass | None ]:
+        
+        with self._lock:
+            
+            return self._url_class_matcher.GetURLsToURLClasses( urls )
+            
+        
+    
     def GetURLToFetch( self, url ):
         
         with self._lock:
@@ -1587,28 +1560,7 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
         
         with self._lock:
             
-            try:
-                
-                ClientNetworkingFunctions.CheckLooksLikeAFullURL( url )
-                
-            except HydrusExceptions.URLClassException:
-                
-                return url
-                
-            
-            url_class = self._GetURLClass( url )
-            
-            if url_class is None:
-                
-                # this is less about washing as it is about stripping the fragment
-                normalised_url = ClientNetworkingFunctions.EnsureURLIsEncoded( url, keep_fragment = False )
-                
-            else:
-                
-                normalised_url = url_class.Normalise( url, for_server = for_server )
-                
-            
-            return normalised_url
+            return self._NormaliseURL( url, for_server = for_server )
             
         
     
@@ -1616,19 +1568,22 @@ class NetworkDomainManager( HydrusSerialisable.SerialisableBase ):
         
         normalised_urls = []
         
-        for url in urls:
+        with self._lock:
             
-            try:
-                
-                normalised_url = self.NormaliseURL( url, for_server = for_server )
+            for url in urls:
                 
-            except HydrusExceptions.URLClassException:
+                try:
+                    
+                    normalised_url = self._NormaliseURL( url, for_server = for_server )
+                    
+                except HydrusExceptions.URLClassException:
+                    
+                    continue
+                    
                 
-                continue
+                normalised_urls.append( normalised_url )
                 
             
-            normalised_urls.append( normalised_url )
-            
         
         normalised_urls = HydrusLists.DedupeList( normalised_urls )
         
@@ -910,12 +910,27 @@ class NetworkJob( object ):
         
         self._is_done_event.set()
         
+        if self.engine is not None:
+            
+            self.engine.NotifyJobDone( self )
+            
+        
     
     def _Sleep( self, seconds_float ):
         
         self._wake_time_float = HydrusTime.GetNowFloat() + seconds_float
         
     
+    def _Wake( self ):
+        
+        self._wake_time_float = 0.0
+        
+        if self.engine is not None:
+            
+            self.engine.NotifyJobWoken( self )
+            
+        
+    
     def _WaitOnConnectionError( self, status_text: str ):
         
         connection_error_wait_time = CG.client_controller.new_options.GetInteger( 'connection_error_wait_time' )
@@ -1280,6 +1295,14 @@ class NetworkJob( object ):
             
         
     
+    def GetWakeTime( self ) -> float:
+        
+        with self._lock:
+            
+            return self._wake_time_float
+            
+        
+    
     def HasError( self ):
         
         with self._lock:
@@ -1359,7 +1382,7 @@ class NetworkJob( object ):
                 
                 self._bandwidth_manual_override = True
                 
-                self._wake_time_float = 0.0
+                self._Wake()
                 
             else:
                 
@@ -1367,6 +1390,11 @@ class NetworkJob( object ):
                 
                 self._wake_time_float = min( self._wake_time_float, self._bandwidth_manual_override_delayed_timestamp + 1.0 )
                 
+                if self.engine is not None:
+                    
+                    self.engine.NotifyJobWoken( self )
+                    
+                
             
         
     
@@ -1392,7 +1420,7 @@ class NetworkJob( object ):
             
             self._gallery_token_consumed = True
             
-            self._wake_time_float = 0.0
+            self._Wake()
             
         
     
@@ -1402,7 +1430,7 @@ class NetworkJob( object ):
             
             self.engine.domain_manager.ScrubDomainErrors( self._url )
             
-            self._wake_time_float = 0.0
+            self._Wake()
             
         
     
@@ -1902,6 +1930,11 @@ class NetworkJob( object ):
                         
                         self._Sleep( 0.8 )
                         
+                    else:
+                        
+                        # bandwidth frees up on the rollover of the second, so sleep until the one the estimate points at
+                        self._Sleep( max( waiting_duration, 1 ) - ( HydrusTime.GetNowFloat() % 1 ) )
+                        
                     
                 
                 return result
@@ -2,8 +2,12 @@ import collections.abc
 import http.cookiejar
 import pickle
 import requests
+import requests.adapters
 import threading
+import time
 import typing
+import urllib3.connection
+import urllib3.connectionpool
 
 from hydrus.core import HydrusData
 from hydrus.core import HydrusSerialisable
@@ -117,14 +121,147 @@ def GetRequestsSessionCookieJar( ambiguous_session ) -> requests.sessions.Reques
         
     
 
+class ConnectionPoolStats( object ):
+    """
+    How often a session's connection pool had to make a new connection, and how long that took.
+    A new connection is a TCP connect and, for https, a TLS handshake, so if this is high for a busy domain, its pool is too small or timing out too early.
+    """
+    
+    def __init__( self ):
+        
+        self._lock = threading.Lock()
+        
+        self._num_new_connections = 0
+        self._num_reused_connections = 0
+        self._total_connect_time = 0.0
+        
+    
+    def GetStats( self ) -> tuple[ int, int, float ]:
+        """
+        Returns ( num_new_connections, num_reused_connections, average_connect_time ).
+        """
+        
+        with self._lock:
+            
+            if self._num_new_connections == 0:
+                
+                average_connect_time = 0.0
+                
+            else:
+                
+                average_connect_time = self._total_connect_time / self._num_new_connections
+                
+            
+            return ( self._num_new_connections, self._num_reused_connections, average_connect_time )
+            
+        
+    
+    def ReportNewConnection( self, connect_time: float ):
+        
+        with self._lock:
+            
+            self._num_new_connections += 1
+            self._total_connect_time += connect_time
+            
+        
+    
+    def ReportReusedConnection( self ):
+        
+        with self._lock:
+            
+            self._num_reused_connections += 1
+            
+        
+    
+
+class MeasuredConnectionMixin( object ):
+    
+    # set on connect and cleared once the adapter has reported it, so a connection that is dropped and remade counts again
+    hydrus_connect_time = None
+    
+    def connect( self ):
+        
+        started = time.perf_counter()
+        
+        super().connect()
+        
+        self.hydrus_connect_time = time.perf_counter() - started
+        
+    
+
+class MeasuredHTTPConnection( MeasuredConnectionMixin, urllib3.connection.HTTPConnection ):
+    
+    pass
+    
+
+class MeasuredHTTPSConnection( MeasuredConnectionMixin, urllib3.connection.HTTPSConnection ):
+    
+    pass
+    
+
+class MeasuredHTTPConnectionPool( urllib3.connectionpool.HTTPConnectionPool ):
+    
+    ConnectionCls = MeasuredHTTPConnection
+    
+
+class MeasuredHTTPSConnectionPool( urllib3.connectionpool.HTTPSConnectionPool ):
+    
+    ConnectionCls = MeasuredHTTPSConnection
+    
+
+class NetworkHTTPAdapter( requests.adapters.HTTPAdapter ):
+    """
+    A requests adapter with a pool size we choose, that reports how often it gets to reuse a kept-alive connection.
+    """
+    
+    def __init__( self, connection_stats: ConnectionPoolStats, max_connections: int ):
+        
+        self._connection_stats = connection_stats
+        
+        super().__init__( pool_maxsize = max_connections )
+        
+    
+    def init_poolmanager( self, *args, **kwargs ):
+        
+        super().init_poolmanager( *args, **kwargs )
+        
+        self.poolmanager.pool_classes_by_scheme = {
+            'http' : MeasuredHTTPConnectionPool,
+            'https' : MeasuredHTTPSConnectionPool
+        }
+        
+    
+    def send( self, request, *args, **kwargs ):
+        
+        response = super().send( request, *args, **kwargs )
+        
+        # we stream, so the connection is still attached to the response here
+        connection = getattr( response.raw, 'connection', None )
+        
+        if isinstance( connection, MeasuredConnectionMixin ):
+            
+            if connection.hydrus_connect_time is None:
+                
+                self._connection_stats.ReportReusedConnection()
+                
+            else:
+                
+                self._connection_stats.ReportNewConnection( connection.hydrus_connect_time )
+                
+                connection.hydrus_connect_time = None
+                
+            
+        
+        return response
+        
+    
+
 class NetworkSessionManagerSessionContainer( HydrusSerialisable.SerialisableBaseNamed ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_NETWORK_SESSION_MANAGER_SESSION_CONTAINER
     SERIALISABLE_NAME = 'Session Manager Session Container'
     SERIALISABLE_VERSION = 2
     
-    POOL_CONNECTION_TIMEOUT = 5 * 60
-    
     def __init__( self, name, network_context = None, session = None ):
         
         if network_context is None:
@@ -136,6 +273,8 @@ class NetworkSessionManagerSessionContainer( HydrusSerialisable.SerialisableBase
         
         self.network_context = network_context
         
+        self.connection_stats = ConnectionPoolStats()
+        
         if session is None:
             
             session = self._CreateEmptySession()
@@ -154,6 +293,7 @@ class NetworkSessionManagerSessionContainer( HydrusSerialisable.SerialisableBase
         # Network UI can block DomainOK on an invalid session with reason yeah
         
         curl_cffi_definition = CG.client_controller.new_options.GetNoneableString( 'curl_cffi_definition' )
+        use_http2 = CG.client_controller.new_options.GetBoolean( 'use_http2' ) and ClientNetworkingCurlCFFI.CURL_CFFI_OK
         
         if curl_cffi_definition is not None and not ClientNetworkingCurlCFFI.CURL_CFFI_OK:
             
@@ -177,16 +317,24 @@ class NetworkSessionManagerSessionContainer( HydrusSerialisable.SerialisableBase
             
             # disabled for now
             curl_cffi_definition = None
+            use_http2 = False
             
         
-        if curl_cffi_definition is not None:
+        if curl_cffi_definition is not None or use_http2:
             
-            session = ClientNetworkingCurlCFFI.CreateCurlCFFISession( curl_cffi_definition )
+            # curl keeps its own connection cache, so the pool settings below do not apply
+            session = ClientNetworkingCurlCFFI.CreateCurlCFFISession( curl_cffi_definition, http2 = use_http2 )
             
         else:
             
             session = requests.Session()
             
+            # each domain gets its own session, so this is a per-domain pool
+            adapter = NetworkHTTPAdapter( self.connection_stats, CG.client_controller.new_options.GetInteger( 'max_pooled_connections_per_domain' ) )
+            
+            session.mount( 'https://', adapter )
+            session.mount( 'http://', adapter )
+            
         
         if self.network_context.context_type == CC.NETWORK_CONTEXT_HYDRUS:
             
@@ -271,7 +419,9 @@ class NetworkSessionManagerSessionContainer( HydrusSerialisable.SerialisableBase
             return
             
         
-        if not self.pool_is_cleared and HydrusTime.TimeHasPassed( self.last_touched_time + self.POOL_CONNECTION_TIMEOUT ):
+        pool_idle_timeout = CG.client_controller.new_options.GetInteger( 'pooled_connection_idle_timeout' )
+        
+        if not self.pool_is_cleared and HydrusTime.TimeHasPassed( self.last_touched_time + pool_idle_timeout ):
             
             try:
                 
@@ -485,6 +635,21 @@ class NetworkSessionManager( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def GetConnectionPoolStats( self, network_context ) -> tuple[ int, int, float ]:
+        
+        with self._lock:
+            
+            network_context = self._GetSessionNetworkContext( network_context )
+            
+            if network_context not in self._network_contexts_to_session_containers:
+                
+                return ( 0, 0, 0.0 )
+                
+            
+            return self._network_contexts_to_session_containers[ network_context ].connection_stats.GetStats()
+            
+        
+    
     def GetDirtySessionContainers( self ):
         
         with self._lock:
@@ -1,5 +1,8 @@
+import collections
+import collections.abc
 import functools
 import re
+import threading
 import urllib.parse
 
 from hydrus.core import HydrusConstants as HC
@@ -19,6 +22,9 @@ SEND_REFERRAL_URL_NEVER = 1
 SEND_REFERRAL_URL_CONVERTER_IF_NONE_PROVIDED = 2
 SEND_REFERRAL_URL_ONLY_CONVERTER = 3
 
+# a url we have already matched does not need to be matched again. a big url import list or a thread with thousands of posts will check the same urls many times over
+URL_CLASS_MATCHER_CACHE_SIZE = 4096
+
 SEND_REFERRAL_URL_TYPES = [ SEND_REFERRAL_URL_ONLY_IF_PROVIDED, SEND_REFERRAL_URL_NEVER, SEND_REFERRAL_URL_CONVERTER_IF_NONE_PROVIDED, SEND_REFERRAL_URL_ONLY_CONVERTER ]
 
 send_referral_url_string_lookup = {}
@@ -81,6 +87,32 @@ def SortURLClassesListDescendingComplexity( url_classes: list[ "URLClass" ] ):
     url_classes.sort( key = lambda u_c: u_c.GetSortingComplexityKey(), reverse = True )
     
 
+class ParsedURL( object ):
+    
+    # testing a url against many url classes used to re-encode and re-parse it for every single one, so we do it once here
+    
+    def __init__( self, url: str ):
+        
+        url = ClientNetworkingFunctions.EnsureURLIsEncoded( url )
+        
+        self.p = ClientNetworkingFunctions.ParseURL( url )
+        
+        self.path_components = ClientNetworkingFunctions.ConvertPathTextToList( self.p.path )
+        
+        ( self.query_dict, self.single_value_parameters, param_order ) = ClientNetworkingFunctions.ConvertQueryTextToDict( self.p.query )
+        
+    
+    def GetFirstPathComponent( self ) -> str | None:
+        
+        if len( self.path_components ) == 0:
+            
+            return None
+            
+        
+        return self.path_components[0]
+        
+    
+
 class URLClassParameterFixedName( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_URL_CLASS_PARAMETER_FIXED_NAME
@@ -360,6 +392,25 @@ class URLDomainMask( HydrusSerialisable.SerialisableBase ):
         return list( self._domain_regexes )
         
     
+    def GetMismatchReason( self, domain: str ) -> str | None:
+        
+        if self.Matches( domain ):
+            
+            return None
+            
+        
+        me_str = self.ToString()
+        
+        if self.match_subdomains:
+            
+            return domain + ' (potentially excluding subdomains) did not match ' + me_str
+            
+        else:
+            
+            return domain + ' did not match ' + me_str
+            
+        
+    
     def GetRawDomains( self ) -> list[ str ]:
         
         return list( self._raw_domains )
@@ -429,18 +480,11 @@ class URLDomainMask( HydrusSerialisable.SerialisableBase ):
     
     def Test( self, domain: str ):
         
-        if not self.Matches( domain ):
-            
-            me_str = self.ToString()
+        reason = self.GetMismatchReason( domain )
+        
+        if reason is not None:
             
-            if self.match_subdomains:
-                
-                raise HydrusExceptions.URLClassException( domain + ' (potentially excluding subdomains) did not match ' + me_str )
-                
-            else:
-                
-                raise HydrusExceptions.URLClassException( domain + ' did not match ' + me_str )
-                
+            raise HydrusExceptions.URLClassException( reason )
             
         
     
@@ -771,6 +815,134 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
         return query
         
     
+    def _GetMismatchReason( self, parsed_url: "ParsedURL" ) -> str | None:
+        
+        p = parsed_url.p
+        
+        reason = self._url_domain_mask.GetMismatchReason( p.netloc )
+        
+        if reason is not None:
+            
+            return reason
+            
+        
+        reason = self._GetPathComponentsMismatchReason( p.path, parsed_url.path_components )
+        
+        if reason is not None:
+            
+            return reason
+            
+        
+        query_dict = parsed_url.query_dict
+        single_value_parameters = parsed_url.single_value_parameters
+        
+        if self._no_more_parameters_than_this:
+            
+            good_fixed_names = { parameter.GetName() for parameter in self._parameters if isinstance( parameter, URLClassParameterFixedName ) }
+            
+            for ( name, value ) in query_dict.items():
+                
+                if name not in good_fixed_names:
+                    
+                    return f'"This has a "{name}" parameter, but I am set to not allow any unexpected parameters!'
+                    
+                
+            
+        
+        for parameter in self._parameters:
+            
+            if isinstance( parameter, URLClassParameterFixedName ):
+                
+                name = parameter.GetName()
+                
+                if name not in query_dict:
+                    
+                    if parameter.MustBeInOriginalURL():
+                        
+                        return f'{name} not found in {p.query}'
+                        
+                    else:
+                        
+                        continue
+                        
+                    
+                
+                value = query_dict[ name ]
+                
+                reason = parameter.GetValueStringMatch().GetMismatchReason( value )
+                
+                if reason is not None:
+                    
+                    return f'Problem with {name}: ' + reason
+                    
+                
+            
+        
+        if len( single_value_parameters ) > 0 and not self._has_single_value_parameters and self._no_more_parameters_than_this:
+            
+            return '"{}" has unexpected single-value parameters, but I am set to not allow any unexpected parameters!'.format( p.query )
+            
+        
+        if self._has_single_value_parameters:
+            
+            if len( single_value_parameters ) == 0:
+                
+                return 'Was expecting single-value parameter(s), but this URL did not seem to have any.'
+                
+            
+            for single_value_parameter in single_value_parameters:
+                
+                reason = self._single_value_parameters_string_match.GetMismatchReason( single_value_parameter )
+                
+                if reason is not None:
+                    
+                    return reason
+                    
+                
+            
+        
+        return None
+        
+    
+    def _GetPathComponentsMismatchReason( self, path: str, path_components: list[ str ] ) -> str | None:
+        
+        if self._no_more_path_components_than_this:
+            
+            if len( path_components ) > len( self._path_components ):
+                
+                return '"{}" has {} path components, but I will not allow more than my defined {}!'.format( path, len( path_components ), len( self._path_components ) )
+                
+            
+        
+        for ( index, ( string_match, default ) ) in enumerate( self._path_components ):
+            
+            if len( path_components ) > index:
+                
+                path_component = path_components[ index ]
+                
+                reason = string_match.GetMismatchReason( path_component )
+                
+                if reason is not None:
+                    
+                    return reason
+                    
+                
+            elif default is None:
+                
+                if index + 1 == len( self._path_components ):
+                    
+                    return '"{}" has {} path components, but I was expecting {}!'.format( path, len( path_components ), len( self._path_components ) )
+                    
+                else:
+                    
+                    return '"{}" has {} path components, but I was expecting at least {} and maybe as many as {}!'.format( path, len( path_components ), index + 1, len( self._path_components ) )
+                    
+                
+            
+        
+        return None
+        
+    
     def _GetSerialisableInfo( self ):
         
         serialisable_url_domain_mask = self._url_domain_mask.GetSerialisableTuple()
@@ -844,49 +1016,6 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
             
         
     
-    def _TestPathComponents( self, path: str ):
-        
-        path_components = ClientNetworkingFunctions.ConvertPathTextToList( path )
-        
-        if self._no_more_path_components_than_this:
-            
-            if len( path_components ) > len( self._path_components ):
-                
-                raise HydrusExceptions.URLClassException( '"{}" has {} path components, but I will not allow more than my defined {}!'.format( path, len( path_components ), len( self._path_components ) ) )
-                
-            
-        
-        for ( index, ( string_match, default ) ) in enumerate( self._path_components ):
-            
-            if len( path_components ) > index:
-                
-                path_component = path_components[ index ]
-                
-                try:
-                    
-                    string_match.Test( path_component )
-                    
-                except HydrusExceptions.StringMatchException as e:
-                    
-                    raise HydrusExceptions.URLClassException( str( e ) )
-                    
-                
-            elif default is None:
-                
-                if index + 1 == len( self._path_components ):
-                    
-                    message = '"{}" has {} path components, but I was expecting {}!'.format( path, len( path_components ), len( self._path_components ) )
-                    
-                else:
-                    
-                    message = '"{}" has {} path components, but I was expecting at least {} and maybe as many as {}!'.format( path, len( path_components ), index + 1, len( self._path_components ) )
-                    
-                
-                raise HydrusExceptions.URLClassException( message )
-                
-            
-        
-    
     def _UpdateSerialisableInfo( self, version, old_serialisable_info ):
         
         if version == 1:
@@ -1642,15 +1771,20 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
         
         try:
             
-            self.Test( url )
-            
-            return True
+            parsed_url = ParsedURL( url )
             
         except HydrusExceptions.URLClassException:
             
             return False
             
         
+        return self.MatchesParsedURL( parsed_url )
+        
+    
+    def MatchesParsedURL( self, parsed_url: "ParsedURL" ) -> bool:
+        
+        return self._GetMismatchReason( parsed_url ) is None
+        
     
     def Normalise( self, url, for_server = False ):
         
@@ -1766,93 +1900,203 @@ class URLClass( HydrusSerialisable.SerialisableBaseNamed ):
     
     def Test( self, url ):
         
-        url = ClientNetworkingFunctions.EnsureURLIsEncoded( url )
+        reason = self._GetMismatchReason( ParsedURL( url ) )
         
-        p = ClientNetworkingFunctions.ParseURL( url )
+        if reason is not None:
+            
+            raise HydrusExceptions.URLClassException( reason )
+            
         
-        self._url_domain_mask.Test( p.netloc )
+    
+    def UsesAPIURL( self ):
         
-        path = p.path
-        query = p.query
+        return self._api_lookup_converter.MakesChanges()
         
-        self._TestPathComponents( path )
+    
+
+HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_URL_CLASS ] = URLClass
+
+def GetFixedFirstPathComponent( url_class: URLClass ) -> str | None:
+    """
+    If every url this class matches must start with one particular path component, returns it.
+    """
+    
+    path_components = url_class.GetPathComponents()
+    
+    if len( path_components ) == 0:
         
-        ( query_dict, single_value_parameters, param_order ) = ClientNetworkingFunctions.ConvertQueryTextToDict( query )
+        return None
         
-        if self._no_more_parameters_than_this:
+    
+    ( string_match, default ) = path_components[0]
+    
+    if default is not None:
+        
+        # the component may be missing entirely
+        
+        return None
+        
+    
+    ( match_type, match_value, min_chars, max_chars, example_string ) = string_match.ToTuple()
+    
+    if match_type != ClientStrings.STRING_MATCH_FIXED:
+        
+        return None
+        
+    
+    return match_value
+    
+
+class URLClassMatcher( object ):
+    
+    # this is the precompiled version of 'try every url class on this url until one sticks'
+    # url classes are grouped by domain mask and then by their first path component, if it is fixed, so a typical booru url only gets tested against the couple of classes that could possibly match
+    # the order we test in is the same as the old brute force, so the results are the same
+    
+    def __init__( self, url_classes: collections.abc.Iterable[ URLClass ] ):
+        
+        self._lock = threading.Lock()
+        
+        url_domain_masks_to_url_classes = collections.defaultdict( list )
+        
+        for url_class in url_classes:
             
-            good_fixed_names = { parameter.GetName() for parameter in self._parameters if isinstance( parameter, URLClassParameterFixedName ) }
+            url_domain_masks_to_url_classes[ url_class.GetURLDomainMask() ].append( url_class )
             
-            for ( name, value ) in query_dict.items():
-                
-                if name not in good_fixed_names:
-                    
-                    raise HydrusExceptions.URLClassException( f'"This has a "{name}" parameter, but I am set to not allow any unexpected parameters!' )
-                    
-                
+        
+        self._url_domain_masks = list( url_domain_masks_to_url_classes.keys() )
+        
+        self._url_domain_masks.sort( key = lambda udm: udm.GetSortingComplexity(), reverse = True )
+        
+        self._url_domain_masks_to_path_indices = {}
+        
+        for ( url_domain_mask, mask_url_classes ) in url_domain_masks_to_url_classes.items():
+            
+            SortURLClassesListDescendingComplexity( mask_url_classes )
+            
+            self._url_domain_masks_to_path_indices[ url_domain_mask ] = self._GeneratePathIndex( mask_url_classes )
             
         
-        for parameter in self._parameters:
+        self._domains_to_url_domain_masks = {}
+        self._urls_to_url_classes = collections.OrderedDict()
+        
+    
+    def _GeneratePathIndex( self, url_classes: list[ URLClass ] ):
+        
+        url_classes_and_first_path_components = [ ( url_class, GetFixedFirstPathComponent( url_class ) ) for url_class in url_classes ]
+        
+        # classes with a flexible first component have to be tested against everything, so they go in every list, in their sorted place
+        
+        any_first_path_component_url_classes = [ url_class for ( url_class, first_path_component ) in url_classes_and_first_path_components if first_path_component is None ]
+        
+        first_path_components = { first_path_component for ( url_class, first_path_component ) in url_classes_and_first_path_components if first_path_component is not None }
+        
+        first_path_components_to_url_classes = {}
+        
+        for first_path_component in first_path_components:
             
-            if isinstance( parameter, URLClassParameterFixedName ):
-                
-                name = parameter.GetName()
-                
-                if name not in query_dict:
-                    
-                    if parameter.MustBeInOriginalURL():
-                        
-                        raise HydrusExceptions.URLClassException( f'{name} not found in {p.query}' )
-                        
-                    else:
-                        
-                        continue
-                        
-                    
-                
-                value = query_dict[ name ]
-                
-                try:
-                    
-                    parameter.TestValue( value )
-                    
-                except HydrusExceptions.StringMatchException as e:
-                    
-                    raise HydrusExceptions.URLClassException( f'Problem with {name}: ' + str( e ) )
-                    
-                
+            first_path_components_to_url_classes[ first_path_component ] = [ url_class for ( url_class, url_class_first_path_component ) in url_classes_and_first_path_components if url_class_first_path_component in ( None, first_path_component ) ]
             
         
-        if len( single_value_parameters ) > 0 and not self._has_single_value_parameters and self._no_more_parameters_than_this:
+        return ( first_path_components_to_url_classes, any_first_path_component_url_classes )
+        
+    
+    def _GetURLClass( self, url: str ) -> URLClass | None:
+        
+        if url in self._urls_to_url_classes:
+            
+            self._urls_to_url_classes.move_to_end( url )
             
-            raise HydrusExceptions.URLClassException( '"{}" has unexpected single-value parameters, but I am set to not allow any unexpected parameters!'.format( query ) )
+            return self._urls_to_url_classes[ url ]
             
         
-        if self._has_single_value_parameters:
+        url_class = self._MatchURL( url )
+        
+        self._urls_to_url_classes[ url ] = url_class
+        
+        if len( self._urls_to_url_classes ) > URL_CLASS_MATCHER_CACHE_SIZE:
             
-            if len( single_value_parameters ) == 0:
+            self._urls_to_url_classes.popitem( last = False )
+            
+        
+        return url_class
+        
+    
+    def _GetURLDomainMasks( self, domain: str ) -> list[ URLDomainMask ]:
+        
+        if domain not in self._domains_to_url_domain_masks:
+            
+            if len( self._domains_to_url_domain_masks ) > URL_CLASS_MATCHER_CACHE_SIZE:
                 
-                raise HydrusExceptions.URLClassException( 'Was expecting single-value parameter(s), but this URL did not seem to have any.' )
+                self._domains_to_url_domain_masks = {}
                 
             
-            for single_value_parameter in single_value_parameters:
+            self._domains_to_url_domain_masks[ domain ] = [ url_domain_mask for url_domain_mask in self._url_domain_masks if url_domain_mask.Matches( domain ) ]
+            
+        
+        return self._domains_to_url_domain_masks[ domain ]
+        
+    
+    def _MatchURL( self, url: str ) -> URLClass | None:
+        
+        try:
+            
+            domain = ClientNetworkingFunctions.ConvertURLIntoDomain( url )
+            
+        except HydrusExceptions.URLClassException:
+            
+            return None
+            
+        
+        url_domain_masks = self._GetURLDomainMasks( domain )
+        
+        if len( url_domain_masks ) == 0:
+            
+            return None
+            
+        
+        try:
+            
+            parsed_url = ParsedURL( url )
+            
+        except HydrusExceptions.URLClassException:
+            
+            return None
+            
+        
+        first_path_component = parsed_url.GetFirstPathComponent()
+        
+        for url_domain_mask in url_domain_masks:
+            
+            ( first_path_components_to_url_classes, any_first_path_component_url_classes ) = self._url_domain_masks_to_path_indices[ url_domain_mask ]
+            
+            url_classes = first_path_components_to_url_classes.get( first_path_component, any_first_path_component_url_classes )
+            
+            for url_class in url_classes:
                 
-                try:
+                if url_class.MatchesParsedURL( parsed_url ):
                     
-                    self._single_value_parameters_string_match.Test( single_value_parameter )
-                    
-                except HydrusExceptions.StringMatchException as e:
-                    
-                    raise HydrusExceptions.URLClassException( str( e ) )
+                    return url_class
                     
                 
             
         
+        return None
+        
     
-    def UsesAPIURL( self ):
+    def GetURLClass( self, url: str ) -> URLClass | None:
         
-        return self._api_lookup_converter.MakesChanges()
+        with self._lock:
+            
+            return self._GetURLClass( url )
+            
+        
+    
+    def GetURLsToURLClasses( self, urls: collections.abc.Iterable[ str ] ) -> dict[ str, URLClass | None ]:
+        
+        with self._lock:
+            
+            return { url : self._GetURLClass( url ) for url in urls }
+            
         
     
-
-HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_URL_CLASS ] = URLClass
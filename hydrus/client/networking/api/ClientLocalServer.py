@@ -103,7 +103,9 @@ class HydrusServiceClientAPI( HydrusClientService ):
         root.putChild( b'get_files', get_files )
         
         get_files.putChild( b'search_files', ClientLocalServerResourcesGetFiles.HydrusResourceClientAPIRestrictedGetFilesSearchFiles( self._service, self._client_requests_domain ) )
+        get_files.putChild( b'search_files_page', ClientLocalServerResourcesGetFiles.HydrusResourceClientAPIRestrictedGetFilesSearchFilesPage( self._service, self._client_requests_domain ) )
         get_files.putChild( b'file_metadata', ClientLocalServerResourcesGetFiles.HydrusResourceClientAPIRestrictedGetFilesFileMetadata( self._service, self._client_requests_domain ) )
+        get_files.putChild( b'file_changes', ClientLocalServerResourcesGetFiles.HydrusResourceClientAPIRestrictedGetFilesFileChanges( self._service, self._client_requests_domain ) )
         get_files.putChild( b'file_hashes', ClientLocalServerResourcesGetFiles.HydrusResourceClientAPIRestrictedGetFilesFileHashes( self._service, self._client_requests_domain ) )
         get_files.putChild( b'file', ClientLocalServerResourcesGetFiles.HydrusResourceClientAPIRestrictedGetFilesGetFile( self._service, self._client_requests_domain ) )
         get_files.putChild( b'file_path', ClientLocalServerResourcesGetFiles.HydrusResourceClientAPIRestrictedGetFilesGetFilePath( self._service, self._client_requests_domain) )
@@ -131,6 +133,7 @@ class HydrusServiceClientAPI( HydrusClientService ):
         root.putChild( b'manage_database', manage_database )
         
         manage_database.putChild( b'force_commit', ClientLocalServerResourcesManageDatabase.HydrusResourceClientAPIRestrictedManageDatabaseForceCommit( self._service, self._client_requests_domain ) )
+        manage_database.putChild( b'get_cache_stats', ClientLocalServerResourcesManageDatabase.HydrusResourceClientAPIRestrictedManageDatabaseGetCacheStats( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'get_client_options', ClientLocalServerResourcesManageDatabase.HydrusResourceClientAPIRestrictedManageDatabaseGetClientOptions( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_on', ClientLocalServerResourcesManageDatabase.HydrusResourceClientAPIRestrictedManageDatabaseLockOn( self._service, self._client_requests_domain ) )
         manage_database.putChild( b'lock_off', ClientLocalServerResourcesManageDatabase.HydrusResourceClientAPIRestrictedManageDatabaseLockOff( self._service, self._client_requests_domain ) )
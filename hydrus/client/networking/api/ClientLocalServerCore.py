@@ -23,6 +23,7 @@ from hydrus.core import HydrusTags
 from hydrus.core import HydrusTemp
 from hydrus.core.networking import HydrusNetworkVariableHandling
 from hydrus.core.networking import HydrusServerRequest
+from hydrus.core.networking import HydrusServerResources
 
 from hydrus.client import ClientConstants as CC
 from hydrus.client import ClientGlobals as CG
@@ -48,7 +49,9 @@ CLIENT_API_INT_PARAMS = {
     'width',
     'height',
     'render_format',
-    'render_quality'
+    'render_quality',
+    'limit',
+    'since'
 }
 
 CLIENT_API_BYTE_PARAMS = {
@@ -77,7 +80,9 @@ CLIENT_API_STRING_PARAMS = {
     'reason',
     'tag_display_type',
     'source_hash_type',
-    'desired_hash_type'
+    'desired_hash_type',
+    'cursor',
+    'response_format'
 }
 
 CLIENT_API_JSON_PARAMS = {
@@ -109,7 +114,10 @@ CLIENT_API_JSON_PARAMS = {
     'doublecheck_file_system',
     'only_in_view',
     'include_current_tags',
-    'include_pending_tags'
+    'include_pending_tags',
+    'return_cursor',
+    'include_metadata',
+    'fields'
 }
 
 CLIENT_API_JSON_BYTE_LIST_PARAMS = {
@@ -124,6 +132,9 @@ CLIENT_API_JSON_BYTE_DICT_PARAMS = {
     'service_keys_to_additional_tags'
 }
 
+# these are only touched from the reactor thread
+job_classes_to_worker_pools = {}
+
 LEGACY_CLIENT_API_SERVICE_NAME_STRING_PARAMS = { 'file_service_name', 'tag_service_name' }
 CLIENT_API_STRING_PARAMS.update( LEGACY_CLIENT_API_SERVICE_NAME_STRING_PARAMS )
 
@@ -166,6 +177,35 @@ def Dumps( data, mime ):
         
     
 
+def DumpsNDJSON( rows: list[ dict ] ) -> bytes:
+    
+    return bytes( ''.join( ( json.dumps( row ) + '\n' for row in rows ) ), 'utf-8' )
+    
+
+def DumpsJSONChunks( data: dict, list_key: str, rows: collections.abc.Iterable, rows_per_chunk = 256 ):
+    
+    # the same json as Dumps with data[ list_key ] = list( rows ), but given out a bit at a time so a big list never has to sit in memory as one giant string
+    # rows can be a generator, in which case they do not all have to exist at once either
+    
+    head = Dumps( dict( data ), HC.APPLICATION_JSON )
+    
+    yield bytes( '{}, {}: ['.format( head[ : -1 ], json.dumps( list_key ) ), 'utf-8' )
+    
+    for ( i, chunk_of_rows ) in enumerate( HydrusLists.SplitIteratorIntoChunks( rows, rows_per_chunk ) ):
+        
+        text = ', '.join( ( json.dumps( row ) for row in chunk_of_rows ) )
+        
+        if i > 0:
+            
+            text = ', ' + text
+            
+        
+        yield bytes( text, 'utf-8' )
+        
+    
+    yield b']}'
+    
+
 def CheckHashLength( hashes, hash_type = 'sha256' ):
     
     if len( hashes ) == 0:
@@ -510,6 +550,34 @@ def GetServiceKeyFromName( service_name: str ):
     return service_key
     
 
+def GetWorkerPool( job_class: int ) -> HydrusServerResources.ResourceWorkerPool:
+    
+    if job_class == HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY:
+        
+        num_workers = CG.client_controller.new_options.GetInteger( 'client_api_heavy_workers' )
+        max_queued = CG.client_controller.new_options.GetInteger( 'client_api_heavy_max_queued' )
+        
+    else:
+        
+        num_workers = CG.client_controller.new_options.GetInteger( 'client_api_light_workers' )
+        max_queued = CG.client_controller.new_options.GetInteger( 'client_api_light_max_queued' )
+        
+    
+    if job_class not in job_classes_to_worker_pools:
+        
+        name = 'Client API {} worker'.format( HydrusServerResources.resource_job_class_str_lookup[ job_class ] )
+        
+        job_classes_to_worker_pools[ job_class ] = HydrusServerResources.ResourceWorkerPool( name, num_workers, max_queued )
+        
+    
+    worker_pool = job_classes_to_worker_pools[ job_class ]
+    
+    # cheap to check every time, and it means options changes apply without a restart
+    worker_pool.SetLimits( num_workers, max_queued )
+    
+    return worker_pool
+    
+
 def ParseClientLegacyArgs( args: dict ):
     
     # adding this v514, so delete when appropriate
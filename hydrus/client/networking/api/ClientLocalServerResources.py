@@ -49,6 +49,11 @@ class HydrusResourceClientAPI( HydrusServerResources.HydrusResource ):
         return request
         
     
+    def _getWorkerPool( self, job_class: int ):
+        
+        return ClientLocalServerCore.GetWorkerPool( job_class )
+        
+    
     def _reportDataUsed( self, request, num_bytes ):
         
         self._service.ReportDataUsed( num_bytes )
@@ -47,6 +47,8 @@ class HydrusResourceClientAPIPermissionsRequest( ClientLocalServerResources.Hydr
 
 class HydrusResourceClientAPIVersion( ClientLocalServerResources.HydrusResourceClientAPI ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_TRIVIAL
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         body_dict = {}
@@ -72,6 +74,8 @@ class HydrusResourceClientAPIRestrictedAccount( ClientLocalServerResources.Hydru
 
 class HydrusResourceClientAPIRestrictedAccountClientInfo( HydrusResourceClientAPIRestrictedAccount ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_TRIVIAL
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         body_dict = {}
@@ -90,6 +94,8 @@ class HydrusResourceClientAPIRestrictedAccountClientInfo( HydrusResourceClientAP
 
 class HydrusResourceClientAPIRestrictedAccountSessionKey( HydrusResourceClientAPIRestrictedAccount ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_TRIVIAL
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         new_session_key = CG.client_controller.client_api_manager.GenerateSessionKey( request.client_api_permissions.GetAccessKey() )
@@ -108,6 +114,8 @@ class HydrusResourceClientAPIRestrictedAccountSessionKey( HydrusResourceClientAP
 
 class HydrusResourceClientAPIRestrictedAccountVerify( HydrusResourceClientAPIRestrictedAccount ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_TRIVIAL
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         api_permissions = request.client_api_permissions
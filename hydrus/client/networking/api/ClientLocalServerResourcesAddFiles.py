@@ -36,6 +36,8 @@ class HydrusResourceClientAPIRestrictedAddFiles( ClientLocalServerResources.Hydr
 
 class HydrusResourceClientAPIRestrictedAddFilesAddFile( HydrusResourceClientAPIRestrictedAddFiles ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         path = None
@@ -4,6 +4,8 @@ import time
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusLists
+from hydrus.core import HydrusTime
 from hydrus.core.files import HydrusFileHandling
 from hydrus.core.files.images import HydrusImageHandling
 from hydrus.core.networking import HydrusServerRequest
@@ -24,6 +26,22 @@ from hydrus.client.networking.api import ClientLocalServerResources
 from hydrus.client.search import ClientSearchFileSearchContext
 from hydrus.client.search import ClientSearchTagContext
 
+SEARCH_FILES_PAGE_DEFAULT_LIMIT = 256
+SEARCH_FILES_PAGE_MAX_LIMIT = 4096
+SEARCH_FILES_PAGE_METADATA_BATCH_SIZE = 256
+
+FILE_METADATA_NDJSON_BATCH_SIZE = 256
+
+FILE_CHANGES_DEFAULT_LIMIT = 1024
+FILE_CHANGES_MAX_LIMIT = 16384
+
+file_change_content_types_to_api_names = {
+    HC.CONTENT_TYPE_FILES : 'locations',
+    HC.CONTENT_TYPE_MAPPINGS : 'tags',
+    HC.CONTENT_TYPE_NOTES : 'notes',
+    HC.CONTENT_TYPE_RATINGS : 'ratings',
+    HC.CONTENT_TYPE_URLS : 'urls'
+}
 
 class HydrusResourceClientAPIRestrictedGetFiles( ClientLocalServerResources.HydrusResourceClientAPIRestricted ):
     
@@ -35,6 +53,8 @@ class HydrusResourceClientAPIRestrictedGetFiles( ClientLocalServerResources.Hydr
 
 class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClientAPIRestrictedGetFiles ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         location_context = ClientLocalServerCore.ParseLocationContext( request, ClientLocation.LocationContext.STATICCreateSimple( CC.COMBINED_LOCAL_FILE_DOMAINS_SERVICE_KEY ) )
@@ -52,8 +72,10 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
         tag_context = ClientSearchTagContext.TagContext( service_key = tag_service_key, include_current_tags = include_current_tags, include_pending_tags = include_pending_tags )
         predicates = ClientLocalServerCore.ParseClientAPISearchPredicates( request )
         
+        return_cursor = request.parsed_request_args.GetValue( 'return_cursor', bool, default_value = False )
+        
         return_hashes = False
-        return_file_ids = True
+        return_file_ids = not return_cursor
         
         if len( predicates ) == 0:
             
@@ -103,6 +125,14 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
         
         body_dict = {}
         
+        if return_cursor:
+            
+            cursor_key = request.client_api_permissions.CreateSearchCursor( hash_ids )
+            
+            body_dict[ 'cursor' ] = ClientAPI.ConvertSearchCursorToToken( cursor_key, 0 )
+            body_dict[ 'num_file_ids' ] = len( hash_ids )
+            
+        
         if return_hashes:
             
             hash_ids_to_hashes = CG.client_controller.Read( 'hash_ids_to_hashes', hash_ids = hash_ids )
@@ -124,6 +154,113 @@ class HydrusResourceClientAPIRestrictedGetFilesSearchFiles( HydrusResourceClient
         
     
 
+class HydrusResourceClientAPIRestrictedGetFilesSearchFilesPage( HydrusResourceClientAPIRestrictedGetFiles ):
+    
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        token = request.parsed_request_args.GetValue( 'cursor', str )
+        
+        ( cursor_key, offset ) = ClientAPI.ParseSearchCursorToken( token )
+        
+        limit = request.parsed_request_args.GetValue( 'limit', int, default_value = SEARCH_FILES_PAGE_DEFAULT_LIMIT )
+        
+        if limit < 1:
+            
+            raise HydrusExceptions.BadRequestException( 'The limit must be greater than 0!' )
+            
+        
+        limit = min( limit, SEARCH_FILES_PAGE_MAX_LIMIT )
+        
+        return_file_ids = request.parsed_request_args.GetValue( 'return_file_ids', bool, default_value = True )
+        return_hashes = request.parsed_request_args.GetValue( 'return_hashes', bool, default_value = False )
+        include_metadata = request.parsed_request_args.GetValue( 'include_metadata', bool, default_value = False )
+        
+        ( hash_ids, num_file_ids ) = request.client_api_permissions.GetSearchCursorPage( cursor_key, offset, limit )
+        
+        next_offset = offset + len( hash_ids )
+        
+        body_dict = {}
+        
+        if next_offset < num_file_ids:
+            
+            body_dict[ 'next_cursor' ] = ClientAPI.ConvertSearchCursorToToken( cursor_key, next_offset )
+            
+        else:
+            
+            body_dict[ 'next_cursor' ] = None
+            
+        
+        body_dict[ 'num_file_ids' ] = num_file_ids
+        
+        if return_file_ids:
+            
+            body_dict[ 'file_ids' ] = hash_ids
+            
+        
+        if return_hashes:
+            
+            hash_ids_to_hashes = CG.client_controller.Read( 'hash_ids_to_hashes', hash_ids = hash_ids )
+            
+            # maintain sort
+            body_dict[ 'hashes' ] = [ hash_ids_to_hashes[ hash_id ].hex() for hash_id in hash_ids ]
+            
+        
+        if include_metadata:
+            
+            hide_service_keys_tags = request.parsed_request_args.GetValue( 'hide_service_keys_tags', bool, default_value = True )
+            detailed_url_information = request.parsed_request_args.GetValue( 'detailed_url_information', bool, default_value = False )
+            include_notes = request.parsed_request_args.GetValue( 'include_notes', bool, default_value = False )
+            include_milliseconds = request.parsed_request_args.GetValue( 'include_milliseconds', bool, default_value = False )
+            
+            fields = ParseMetadataFields( request )
+            
+            def generate_metadata_rows():
+                
+                for batch_of_hash_ids in HydrusLists.SplitListIntoChunks( hash_ids, SEARCH_FILES_PAGE_METADATA_BATCH_SIZE ):
+                    
+                    media_results: list[ ClientMediaResult.MediaResult ] = CG.client_controller.Read( 'media_results_from_ids', batch_of_hash_ids )
+                    
+                    hash_ids_to_media_results = { media_result.GetHashId() : media_result for media_result in media_results }
+                    
+                    batch_of_hashes = [ hash_ids_to_media_results[ hash_id ].GetHash() for hash_id in batch_of_hash_ids if hash_id in hash_ids_to_media_results ]
+                    hashes_to_media_results = { media_result.GetHash() : media_result for media_result in media_results }
+                    
+                    metadata = []
+                    
+                    ClientMediaResultAPI.PopulateMetadataAPIDict( metadata, batch_of_hashes, hashes_to_media_results, hide_service_keys_tags = hide_service_keys_tags, detailed_url_information = detailed_url_information, include_notes = include_notes, include_milliseconds = include_milliseconds, fields = fields )
+                    
+                    yield from metadata
+                    
+                
+            
+        
+        if request.preferred_mime == HC.APPLICATION_JSON and include_metadata:
+            
+            # we fetch and send the metadata a batch at a time, so a big page never has to be in memory at once
+            # the chunks make db reads, so they are made off the reactor thread
+            
+            body_chunks = ClientLocalServerCore.DumpsJSONChunks( body_dict, 'metadata', generate_metadata_rows() )
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = request.preferred_mime, body_chunks = body_chunks, threaded_body_chunks = True )
+            
+        else:
+            
+            if include_metadata:
+                
+                body_dict[ 'metadata' ] = list( generate_metadata_rows() )
+                
+            
+            body = ClientLocalServerCore.Dumps( body_dict, request.preferred_mime )
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = request.preferred_mime, body = body )
+            
+        
+        return response_context
+        
+    
+
 def ParseAndFetchMediaResult( request: HydrusServerRequest.HydrusRequest ) -> ClientMediaResult.MediaResult:
     
     try:
@@ -157,6 +294,25 @@ def ParseAndFetchMediaResult( request: HydrusServerRequest.HydrusRequest ) -> Cl
     return media_result
     
 
+def ParseMetadataFields( request: HydrusServerRequest.HydrusRequest ):
+    
+    if 'fields' not in request.parsed_request_args:
+        
+        return None
+        
+    
+    fields = request.parsed_request_args.GetValue( 'fields', list, expected_list_type = str )
+    
+    unknown_fields = [ field for field in fields if field not in ClientMediaResultAPI.METADATA_FIELDS ]
+    
+    if len( unknown_fields ) > 0:
+        
+        raise HydrusExceptions.BadRequestException( 'Sorry, I did not understand these metadata fields: {}. I know: {}'.format( ', '.join( unknown_fields ), ', '.join( ClientMediaResultAPI.METADATA_FIELDS ) ) )
+        
+    
+    return fields
+    
+
 class HydrusResourceClientAPIRestrictedGetFilesGetFile( HydrusResourceClientAPIRestrictedGetFiles ):
     
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
@@ -195,6 +351,8 @@ class HydrusResourceClientAPIRestrictedGetFilesGetFile( HydrusResourceClientAPIR
 
 class HydrusResourceClientAPIRestrictedGetFilesGetRenderedFile( HydrusResourceClientAPIRestrictedGetFiles ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         
@@ -344,8 +502,70 @@ class HydrusResourceClientAPIRestrictedGetFilesGetRenderedFile( HydrusResourceCl
         return response_context
         
     
+class HydrusResourceClientAPIRestrictedGetFilesFileChanges( HydrusResourceClientAPIRestrictedGetFiles ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        # this lists every file in the client, so a key limited to a tag filter cannot use it
+        request.client_api_permissions.CheckCanSeeAllFiles()
+        
+        since = request.parsed_request_args.GetValue( 'since', int, default_value = 0 )
+        
+        if since < 0:
+            
+            raise HydrusExceptions.BadRequestException( 'The since sequence cannot be negative!' )
+            
+        
+        limit = request.parsed_request_args.GetValue( 'limit', int, default_value = FILE_CHANGES_DEFAULT_LIMIT )
+        
+        if limit < 1:
+            
+            raise HydrusExceptions.BadRequestException( 'The limit must be greater than 0!' )
+            
+        
+        limit = min( limit, FILE_CHANGES_MAX_LIMIT )
+        
+        ( changes, latest_sequence ) = CG.client_controller.Read( 'file_change_journal', since, limit )
+        
+        api_changes = [
+            {
+                'sequence' : sequence_id,
+                'file_id' : hash_id,
+                'hash' : hash.hex(),
+                'change_type' : file_change_content_types_to_api_names[ content_type ],
+                'time' : HydrusTime.SecondiseMSFloat( timestamp_ms )
+            }
+            for ( sequence_id, hash_id, hash, content_type, timestamp_ms ) in changes
+        ]
+        
+        if len( changes ) > 0:
+            
+            next_since = changes[-1][0]
+            
+        else:
+            
+            # if the journal got wiped somehow, we don't want to leave the caller stuck waiting for a sequence that will never come
+            next_since = min( since, latest_sequence )
+            
+        
+        body_dict = {
+            'changes' : api_changes,
+            'next_since' : next_since,
+            'latest_sequence' : latest_sequence
+        }
+        
+        body = ClientLocalServerCore.Dumps( body_dict, request.preferred_mime )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = request.preferred_mime, body = body )
+        
+        return response_context
+        
+    
+
 class HydrusResourceClientAPIRestrictedGetFilesFileHashes( HydrusResourceClientAPIRestrictedGetFiles ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         supported_hash_types = ( 'sha256', 'md5', 'sha1', 'sha512' )
@@ -405,6 +625,8 @@ class HydrusResourceClientAPIRestrictedGetFilesFileHashes( HydrusResourceClientA
 
 class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClientAPIRestrictedGetFiles ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         only_return_identifiers = request.parsed_request_args.GetValue( 'only_return_identifiers', bool, default_value = False )
@@ -417,6 +639,15 @@ class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClien
         create_new_file_ids = request.parsed_request_args.GetValue( 'create_new_file_ids', bool, default_value = False )
         include_blurhash = request.parsed_request_args.GetValue( 'include_blurhash', bool, default_value = False )
         
+        fields = ParseMetadataFields( request )
+        
+        response_format = request.parsed_request_args.GetValue( 'response_format', str, default_value = 'json' )
+        
+        if response_format not in ( 'json', 'ndjson' ):
+            
+            raise HydrusExceptions.BadRequestException( 'Sorry, the response_format has to be "json" or "ndjson"!' )
+            
+        
         hashes = ClientLocalServerCore.ParseHashes( request )
         
         hash_ids_to_hashes = CG.client_controller.Read( 'hash_ids_to_hashes', hashes = hashes, create_new_hash_ids = create_new_file_ids )
@@ -427,89 +658,114 @@ class HydrusResourceClientAPIRestrictedGetFilesFileMetadata( HydrusResourceClien
         
         request.client_api_permissions.CheckPermissionToSeeFiles( hash_ids )
         
-        body_dict = {}
-        
-        metadata = []
-        
-        if only_return_identifiers:
-            
-            for hash in hashes:
-                
-                if hash in hashes_to_hash_ids:
-                    
-                    metadata_row = {
-                        'file_id' : hashes_to_hash_ids[ hash ],
-                        'hash' : hash.hex()
-                    }
-                    
-                    metadata.append( metadata_row )
-                    
-                else:
-                    
-                    ClientMediaResultAPI.AddMissingHashToFileMetadata( metadata, hash )
-                    
-                
-            
-        elif only_return_basic_information:
+        def get_metadata_rows( batch_of_hashes ):
             
-            file_info_managers: list[ ClientMediaManagers.FileInfoManager ] = CG.client_controller.Read( 'file_info_managers_from_ids', hash_ids )
+            metadata = []
             
-            hashes_to_file_info_managers = { file_info_manager.hash : file_info_manager for file_info_manager in file_info_managers }
+            batch_of_hash_ids = [ hashes_to_hash_ids[ hash ] for hash in batch_of_hashes if hash in hashes_to_hash_ids ]
             
-            for hash in hashes:
+            if only_return_identifiers:
                 
-                if hash in hashes_to_file_info_managers:
+                for hash in batch_of_hashes:
                     
-                    file_info_manager = hashes_to_file_info_managers[ hash ]
-                    
-                    metadata_row = {
-                        'file_id' : file_info_manager.hash_id,
-                        'hash' : file_info_manager.hash.hex(),
-                        'size' : file_info_manager.size,
-                        'mime' : HC.mime_mimetype_string_lookup[ file_info_manager.mime ],
-                        'filetype_human' : HC.mime_string_lookup[ file_info_manager.mime ],
-                        'filetype_enum' : file_info_manager.mime,
-                        'ext' : HC.mime_ext_lookup[ file_info_manager.mime ],
-                        'width' : file_info_manager.width,
-                        'height' : file_info_manager.height,
-                        'duration' : file_info_manager.duration_ms,
-                        'num_frames' : file_info_manager.num_frames,
-                        'num_words' : file_info_manager.num_words,
-                        'has_audio' : file_info_manager.has_audio
-                    }
-                    
-                    filetype_forced = file_info_manager.FiletypeIsForced()
-                    
-                    metadata_row[ 'filetype_forced' ] = filetype_forced
-                    
-                    if filetype_forced:
+                    if hash in hashes_to_hash_ids:
                         
-                        metadata_row[ 'original_mime' ] = HC.mime_mimetype_string_lookup[ file_info_manager.original_mime ]
+                        metadata_row = {
+                            'file_id' : hashes_to_hash_ids[ hash ],
+                            'hash' : hash.hex()
+                        }
                         
-                    
-                    if include_blurhash:
+                        metadata.append( metadata_row )
                         
-                        metadata_row[ 'blurhash' ] = file_info_manager.blurhash
+                    else:
+                        
+                        ClientMediaResultAPI.AddMissingHashToFileMetadata( metadata, hash )
                         
                     
-                    metadata.append( metadata_row )
-                    
-                else:
+                
+            elif only_return_basic_information:
+                
+                file_info_managers: list[ ClientMediaManagers.FileInfoManager ] = CG.client_controller.Read( 'file_info_managers_from_ids', batch_of_hash_ids )
+                
+                hashes_to_file_info_managers = { file_info_manager.hash : file_info_manager for file_info_manager in file_info_managers }
+                
+                for hash in batch_of_hashes:
                     
-                    ClientMediaResultAPI.AddMissingHashToFileMetadata( metadata, hash )
+                    if hash in hashes_to_file_info_managers:
+                        
+                        file_info_manager = hashes_to_file_info_managers[ hash ]
+                        
+                        metadata_row = {
+                            'file_id' : file_info_manager.hash_id,
+                            'hash' : file_info_manager.hash.hex(),
+                            'size' : file_info_manager.size,
+                            'mime' : HC.mime_mimetype_string_lookup[ file_info_manager.mime ],
+                            'filetype_human' : HC.mime_string_lookup[ file_info_manager.mime ],
+                            'filetype_enum' : file_info_manager.mime,
+                            'ext' : HC.mime_ext_lookup[ file_info_manager.mime ],
+                            'width' : file_info_manager.width,
+                            'height' : file_info_manager.height,
+                            'duration' : file_info_manager.duration_ms,
+                            'num_frames' : file_info_manager.num_frames,
+                            'num_words' : file_info_manager.num_words,
+                            'has_audio' : file_info_manager.has_audio
+                        }
+                        
+                        filetype_forced = file_info_manager.FiletypeIsForced()
+                        
+                        metadata_row[ 'filetype_forced' ] = filetype_forced
+                        
+                        if filetype_forced:
+                            
+                            metadata_row[ 'original_mime' ] = HC.mime_mimetype_string_lookup[ file_info_manager.original_mime ]
+                            
+                        
+                        if include_blurhash:
+                            
+                            metadata_row[ 'blurhash' ] = file_info_manager.blurhash
+                            
+                        
+                        metadata.append( metadata_row )
+                        
+                    else:
+                        
+                        ClientMediaResultAPI.AddMissingHashToFileMetadata( metadata, hash )
+                        
                     
                 
+            else:
+                
+                media_results: list[ ClientMediaResult.MediaResult ] = CG.client_controller.Read( 'media_results_from_ids', batch_of_hash_ids )
+                
+                hashes_to_media_results = { media_result.GetFileInfoManager().hash : media_result for media_result in media_results }
+                
+                ClientMediaResultAPI.PopulateMetadataAPIDict( metadata, batch_of_hashes, hashes_to_media_results, hide_service_keys_tags = hide_service_keys_tags, detailed_url_information = detailed_url_information, include_notes = include_notes, include_milliseconds = include_milliseconds, fields = fields )
+                
             
-        else:
+            return metadata
             
-            media_results: list[ ClientMediaResult.MediaResult ] = CG.client_controller.Read( 'media_results_from_ids', hash_ids )
+        
+        if response_format == 'ndjson':
             
-            hashes_to_media_results = { media_result.GetFileInfoManager().hash : media_result for media_result in media_results }
+            # one file per line, and we fetch and send a batch at a time, so a million files never have to be in memory at once
+            # the chunks make db reads, so they are made off the reactor thread
             
-            ClientMediaResultAPI.PopulateMetadataAPIDict( metadata, hashes, hashes_to_media_results, hide_service_keys_tags = hide_service_keys_tags, detailed_url_information = detailed_url_information, include_notes = include_notes, include_milliseconds = include_milliseconds )
+            def generate_ndjson_chunks():
+                
+                for batch_of_hashes in HydrusLists.SplitListIntoChunks( hashes, FILE_METADATA_NDJSON_BATCH_SIZE ):
+                    
+                    yield ClientLocalServerCore.DumpsNDJSON( get_metadata_rows( batch_of_hashes ) )
+                    
+                
+            
+            response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_NDJSON, body_chunks = generate_ndjson_chunks(), threaded_body_chunks = True )
+            
+            return response_context
             
         
-        body_dict[ 'metadata' ] = metadata
+        body_dict = {}
+        
+        body_dict[ 'metadata' ] = get_metadata_rows( hashes )
         
         if include_services_object:
             
@@ -566,6 +822,8 @@ class HydrusResourceClientAPIRestrictedGetFilesGetThumbnail( HydrusResourceClien
 
 class HydrusResourceClientAPIRestrictedGetFilesGetLocalPath( HydrusResourceClientAPIRestrictedGetFilesSearchFiles ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_LIGHT
+    
     def _CheckAPIPermissions( self, request: HydrusServerRequest.HydrusRequest ):
         
         request.client_api_permissions.CheckPermission( ClientAPI.CLIENT_API_PERMISSION_SEE_LOCAL_PATHS )
@@ -92,6 +92,8 @@ class HydrusResourceClientAPIRestrictedManageDatabaseLockOn( HydrusResourceClien
 
 class HydrusResourceClientAPIRestrictedManageDatabaseMrBones( HydrusResourceClientAPIRestrictedManageDatabase ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         location_context = ClientLocalServerCore.ParseLocationContext( request, ClientLocation.LocationContext.STATICCreateSimple( CC.COMBINED_LOCAL_FILE_DOMAINS_SERVICE_KEY ) )
@@ -125,6 +127,21 @@ class HydrusResourceClientAPIRestrictedManageDatabaseMrBones( HydrusResourceClie
         
     
 
+class HydrusResourceClientAPIRestrictedManageDatabaseGetCacheStats( HydrusResourceClientAPIRestrictedManageDatabase ):
+    
+    def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        body_dict = { 'cache_stats' : CG.client_controller.GetCacheStats() }
+        
+        mime = request.preferred_mime
+        body = ClientLocalServerCore.Dumps( body_dict, mime )
+        
+        response_context = HydrusServerResources.ResponseContext( 200, mime = mime, body = body )
+        
+        return response_context
+        
+    
+
 class HydrusResourceClientAPIRestrictedManageDatabaseGetClientOptions( HydrusResourceClientAPIRestrictedManageDatabase ):
     
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
@@ -46,6 +46,8 @@ class HydrusResourceClientAPIRestrictedManageFileRelationshipsGetRelationships(
 
 class HydrusResourceClientAPIRestrictedManageFileRelationshipsGetPotentialsCount( HydrusResourceClientAPIRestrictedManageFileRelationships ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         potential_duplicates_search_context = ClientLocalServerCore.ParsePotentialDuplicatesSearchContext( request )
@@ -64,6 +66,8 @@ class HydrusResourceClientAPIRestrictedManageFileRelationshipsGetPotentialsCount
 
 class HydrusResourceClientAPIRestrictedManageFileRelationshipsGetPotentialPairs( HydrusResourceClientAPIRestrictedManageFileRelationships ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         potential_duplicates_search_context = ClientLocalServerCore.ParsePotentialDuplicatesSearchContext( request )
@@ -136,6 +140,8 @@ class HydrusResourceClientAPIRestrictedManageFileRelationshipsGetPotentialPairs(
 
 class HydrusResourceClientAPIRestrictedManageFileRelationshipsGetRandomPotentials( HydrusResourceClientAPIRestrictedManageFileRelationships ):
     
+    JOB_CLASS = HydrusServerResources.RESOURCE_JOB_CLASS_HEAVY
+    
     def _threadDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
         
         potential_duplicates_search_context = ClientLocalServerCore.ParsePotentialDuplicatesSearchContext( request )
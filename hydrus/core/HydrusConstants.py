@@ -847,6 +847,8 @@ ANIMATION_JXL = 88
 IMAGE_OPENRASTER = 89
 APPLICATION_OCTET_STREAM = 100
 APPLICATION_UNKNOWN = 101
+# api response formats only, never a file we store, so up here out of the way of new filetypes
+APPLICATION_NDJSON = 102
 
 GENERAL_FILETYPES = {
     GENERAL_APPLICATION,
@@ -1260,6 +1262,7 @@ mime_string_lookup = {
     APPLICATION_YAML : 'yaml',
     APPLICATION_JSON : 'json',
     APPLICATION_CBOR : 'cbor',
+    APPLICATION_NDJSON : 'ndjson',
     APPLICATION_PDF : 'pdf',
     APPLICATION_DOCX : 'docx',
     APPLICATION_XLSX : 'xlsx',
@@ -1356,6 +1359,7 @@ mime_mimetype_string_lookup = {
     APPLICATION_YAML : 'application/x-yaml',
     APPLICATION_JSON : 'application/json',
     APPLICATION_CBOR : 'application/cbor',
+    APPLICATION_NDJSON : 'application/x-ndjson',
     APPLICATION_PDF : 'application/pdf',
     APPLICATION_DOCX : 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
     APPLICATION_XLSX : 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -1,4 +1,5 @@
 import os
+import pathlib
 import queue
 import sqlite3
 import threading
@@ -12,10 +13,102 @@ from hydrus.core import HydrusEncryption
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusExit
 from hydrus.core import HydrusGlobals as HG
+from hydrus.core import HydrusNumbers
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusProfiling
 from hydrus.core import HydrusTime
 
+# the backup copies this many pages between checks for cancel and shutdown
+ONLINE_BACKUP_PAGES_PER_STEP = 16384
+
+def BackupDBFilesOnline( db_dir: str, db_filenames: dict[ str, str ], dest_dir: str, text_update_hook = None, is_cancelled_hook = None ):
+    """
+    Copies the db files to the dest with SQLite's online backup, from a separate read-only connection, so the live db can keep working while we go.
+    It all happens in one read transaction, so the copies are a consistent snapshot of each other even if there are writes meanwhile. Only do this in WAL, where a long reader does not block writers.
+    """
+    
+    main_db_path = os.path.join( db_dir, db_filenames[ 'main' ] )
+    
+    db = sqlite3.connect( GetReadOnlyDBURI( main_db_path ), uri = True, isolation_level = None )
+    
+    try:
+        
+        c = db.cursor()
+        
+        for ( name, filename ) in db_filenames.items():
+            
+            if name == 'main':
+                
+                continue
+                
+            
+            c.execute( 'ATTACH ? AS ' + name + ';', ( GetReadOnlyDBURI( os.path.join( db_dir, filename ) ), ) )
+            
+        
+        c.execute( 'BEGIN DEFERRED;' )
+        
+        try:
+            
+            # touch every file now so we hold one snapshot across all of them
+            for name in db_filenames.keys():
+                
+                c.execute( 'SELECT 1 FROM {}.sqlite_master;'.format( name ) ).fetchone()
+                
+            
+            for ( name, filename ) in db_filenames.items():
+                
+                dest_path = os.path.join( dest_dir, filename )
+                
+                # a stale journal next to an old backup would be read as part of the new copy
+                for suffix in ( '-wal', '-shm', '-journal' ):
+                    
+                    if os.path.exists( dest_path + suffix ):
+                        
+                        os.remove( dest_path + suffix )
+                        
+                    
+                
+                def progress_hook( status, remaining, total ):
+                    
+                    if HG.model_shutdown:
+                        
+                        raise HydrusExceptions.ShutdownException( 'Application shutting down!' )
+                        
+                    
+                    if is_cancelled_hook is not None and is_cancelled_hook():
+                        
+                        raise HydrusExceptions.CancelledException( 'Backup cancelled!' )
+                        
+                    
+                    if text_update_hook is not None:
+                        
+                        text_update_hook( 'copying {}: {}'.format( filename, HydrusNumbers.ValueRangeToPrettyString( total - remaining, total ) ) )
+                        
+                    
+                
+                dest_db = sqlite3.connect( dest_path )
+                
+                try:
+                    
+                    db.backup( dest_db, pages = ONLINE_BACKUP_PAGES_PER_STEP, progress = progress_hook, name = name )
+                    
+                finally:
+                    
+                    dest_db.close()
+                    
+                
+            
+        finally:
+            
+            c.execute( 'COMMIT;' )
+            
+        
+    finally:
+        
+        db.close()
+        
+    
+
 def CheckCanVacuum( db_path, stop_time = None ):
     
     db = sqlite3.connect( db_path, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
@@ -94,6 +187,11 @@ def CheckCanVacuumIntoData( db_path, page_size, page_count, freelist_count, stop
     HydrusDBBase.CheckHasSpaceForDBTransaction( db_dir, db_size, no_temp_needed = True )
     
 
+def GetReadOnlyDBURI( db_path ):
+    
+    return pathlib.Path( db_path ).absolute().as_uri() + '?mode=ro'
+    
+
 def GetApproxVacuumDuration( db_size ):
     
     vacuum_estimate = int( db_size * 1.2 )
@@ -297,9 +395,39 @@ def VacuumDBInto( db_path: str ):
     HydrusData.ShowText( f'Vacuumed {db_path} in {HydrusTime.TimeDeltaToPrettyTimeDelta( time_took )} ({HydrusData.ToHumanBytes(bytes_per_sec)}/s). It went from {HydrusData.ToHumanBytes( original_size )} to {HydrusData.ToHumanBytes( vacuum_size )}' )
     
 
+class ParallelReadSnapshot( object ):
+    
+    # a parallel reader's note of which main connection write it is reading after
+    # reader modules with in-memory caches have to be remade once a write starts, and anything a reader makes should only go into a shared cache if no write has started since it began
+    
+    def __init__( self, hydrus_db: "HydrusDB" ):
+        
+        self._hydrus_db = hydrus_db
+        
+        self._write_generation = self._hydrus_db.GetWriteGeneration()
+        
+    
+    def DoIfNoWriteSince( self, func ) -> bool:
+        
+        return self._hydrus_db.DoIfNoWriteSince( self._write_generation, func )
+        
+    
+    def Refresh( self ) -> bool:
+        
+        write_generation = self._hydrus_db.GetWriteGeneration()
+        
+        a_write_happened = write_generation != self._write_generation
+        
+        self._write_generation = write_generation
+        
+        return a_write_happened
+        
+    
+
 class HydrusDB( HydrusDBBase.DBBase ):
     
     READ_WRITE_ACTIONS = []
+    PARALLEL_READ_ACTIONS = []
     UPDATE_WAIT = 2
     
     def __init__( self, controller: "HG.HydrusController.HydrusController", db_dir, db_name ):
@@ -377,6 +505,17 @@ class HydrusDB( HydrusDBBase.DBBase ):
         
         self._jobs = queue.Queue()
         
+        self._num_outstanding_write_jobs = 0
+        self._num_outstanding_write_jobs_lock = threading.Lock()
+        self._write_generation = 0
+        
+        self._parallel_read_jobs = queue.Queue()
+        
+        self._num_parallel_read_workers = 0
+        self._num_parallel_read_connections_open = 0
+        self._parallel_read_connections_failed = False
+        self._parallel_read_lock = threading.Lock()
+        
         self._currently_doing_job = False
         self._current_status = ''
         self._current_job_name = ''
@@ -521,6 +660,38 @@ class HydrusDB( HydrusDBBase.DBBase ):
         self._Execute( 'ATTACH ? AS durable_temp;', ( db_path, ) )
         
     
+    def _CanDoParallelRead( self ):
+        
+        if self._num_parallel_read_workers == 0 or self._parallel_read_connections_failed or self._pause_and_disconnect:
+            
+            return False
+            
+        
+        # the parallel connections can only see what is committed, so anything queued or uncommitted on the main connection means we have to wait in line as normal
+        
+        if self._num_outstanding_write_jobs > 0:
+            
+            return False
+            
+        
+        cursor_transaction_wrapper = self._cursor_transaction_wrapper
+        
+        if cursor_transaction_wrapper is None:
+            
+            return False
+            
+        
+        if cursor_transaction_wrapper.InTransaction() and cursor_transaction_wrapper.TransactionContainsWrites():
+            
+            # in WAL a commit is cheap, so let's get the readers back in play soon
+            cursor_transaction_wrapper.DoACommitAsSoonAsPossible()
+            
+            return False
+            
+        
+        return True
+        
+    
     def _CleanAfterJobWork( self ):
         
         self._cursor_transaction_wrapper.CleanPubSubs()
@@ -577,6 +748,14 @@ class HydrusDB( HydrusDBBase.DBBase ):
         return HydrusDBBase.JobDatabase( job_type, synchronous, action, *args, **kwargs )
         
     
+    def _GetParallelReadCommandsToMethods( self, c: sqlite3.Cursor, parallel_read_snapshot: ParallelReadSnapshot ) -> dict:
+        
+        # subclasses make read-only versions of whatever they need, bound to this cursor, for the PARALLEL_READ_ACTIONS
+        # this is called again after any write, so anything with in-memory caches is fine to make here
+        
+        return {}
+        
+    
     def _GetPossibleAdditionalDBFilenames( self ):
         
         return [ self._ssl_cert_filename, self._ssl_key_filename ]
@@ -840,6 +1019,44 @@ class HydrusDB( HydrusDBBase.DBBase ):
             
         
     
+    def _InitParallelReadConnection( self ):
+        
+        db_path = os.path.join( self._db_dir, self._db_filenames[ 'main' ] )
+        
+        db = sqlite3.connect( GetReadOnlyDBURI( db_path ), uri = True, isolation_level = None, detect_types = sqlite3.PARSE_DECLTYPES )
+        
+        c = db.cursor()
+        
+        if HG.no_db_temp_files:
+            
+            c.execute( 'PRAGMA temp_store = 2;' )
+            
+        
+        # no durable_temp here. that is for the main connection's work only
+        for ( name, filename ) in self._db_filenames.items():
+            
+            if name == 'main':
+                
+                continue
+                
+            
+            c.execute( 'ATTACH ? AS ' + name + ';', ( GetReadOnlyDBURI( os.path.join( self._db_dir, filename ) ), ) )
+            
+        
+        c.execute( 'ATTACH ":memory:" AS mem;' )
+        
+        db_names = [ name for ( index, name, path ) in c.execute( 'PRAGMA database_list;' ) if name not in ( 'mem', 'temp' ) ]
+        
+        for db_name in db_names:
+            
+            c.execute( 'PRAGMA {}.cache_size = -{};'.format( db_name, HG.db_cache_size * 1024 ) )
+            
+        
+        parallel_read_snapshot = ParallelReadSnapshot( self )
+        
+        return ( db, c, db_names, parallel_read_snapshot )
+        
+    
     def _InitExternalDatabases( self ):
         
         pass
@@ -867,8 +1084,20 @@ class HydrusDB( HydrusDBBase.DBBase ):
                 
                 self._current_status = 'db writing'
                 
+                with self._num_outstanding_write_jobs_lock:
+                    
+                    # parallel readers check this to see if what they made is out of date
+                    self._write_generation += 1
+                    
+                
                 self._cursor_transaction_wrapper.NotifyWriteOccuring()
                 
+                # the transaction is now marked as containing writes, which keeps parallel reads off until the next commit
+                with self._num_outstanding_write_jobs_lock:
+                    
+                    self._num_outstanding_write_jobs -= 1
+                    
+                
             else:
                 
                 self._current_status = 'db reading'
@@ -953,6 +1182,14 @@ class HydrusDB( HydrusDBBase.DBBase ):
     
     def _PutJob( self, job ):
         
+        if job.GetType() in ( 'read_write', 'write' ):
+            
+            with self._num_outstanding_write_jobs_lock:
+                
+                self._num_outstanding_write_jobs += 1
+                
+            
+        
         self._jobs.put( job )
         
         self._i_am_idle.clear()
@@ -994,6 +1231,25 @@ class HydrusDB( HydrusDBBase.DBBase ):
         pass
         
     
+    def _StartParallelReadWorkers( self ):
+        
+        # outside of WAL, readers block the writer, so there is no point
+        if HG.db_journal_mode != 'WAL' or len( self.PARALLEL_READ_ACTIONS ) == 0:
+            
+            return
+            
+        
+        for i in range( HG.db_num_parallel_read_connections ):
+            
+            with self._parallel_read_lock:
+                
+                self._num_parallel_read_workers += 1
+                
+            
+            self._controller.CallToThreadLongRunning( self.ParallelReadLoop )
+            
+        
+    
     def _ShrinkMemory( self ):
         
         self._Execute( 'PRAGMA shrink_memory;' )
@@ -1046,6 +1302,21 @@ class HydrusDB( HydrusDBBase.DBBase ):
         return self._currently_doing_job
         
     
+    def DoIfNoWriteSince( self, write_generation: int, func ) -> bool:
+        
+        with self._num_outstanding_write_jobs_lock:
+            
+            if self._write_generation != write_generation:
+                
+                return False
+                
+            
+            func()
+            
+            return True
+            
+        
+    
     def ForceACommit( self ):
         
         if self._cursor_transaction_wrapper is None:
@@ -1124,6 +1395,14 @@ class HydrusDB( HydrusDBBase.DBBase ):
         return ( self._current_status, self._current_job_name )
         
     
+    def GetWriteGeneration( self ) -> int:
+        
+        with self._num_outstanding_write_jobs_lock:
+            
+            return self._write_generation
+            
+        
+    
     def IsConnected( self ):
         
         return self._is_connected
@@ -1166,6 +1445,8 @@ class HydrusDB( HydrusDBBase.DBBase ):
             return
             
         
+        self._StartParallelReadWorkers()
+        
         self._ready_to_serve_requests = True
         
         error_count = 0
@@ -1212,7 +1493,7 @@ class HydrusDB( HydrusDBBase.DBBase ):
                         raise
                         
                     
-                    self._jobs.put( job ) # couldn't lock db; put job back on queue
+                    self._PutJob( job ) # couldn't lock db; put job back on queue
                     
                     time.sleep( 5 )
                     
@@ -1248,6 +1529,12 @@ class HydrusDB( HydrusDBBase.DBBase ):
                 
                 self._CloseDBConnection()
                 
+                # whatever is about to happen needs the files to itself
+                while self._num_parallel_read_connections_open > 0:
+                    
+                    time.sleep( 0.1 )
+                    
+                
                 self._current_status = 'db locked'
                 
                 self.publish_status_update()
@@ -1268,6 +1555,11 @@ class HydrusDB( HydrusDBBase.DBBase ):
                 
             
         
+        while self._num_parallel_read_workers > 0:
+            
+            time.sleep( 0.1 )
+            
+        
         self._CloseDBConnection()
         
         temp_path = os.path.join( self._db_dir, self._durable_temp_db_filename )
@@ -1277,6 +1569,163 @@ class HydrusDB( HydrusDBBase.DBBase ):
         self._loop_finished = True
         
     
+    def ParallelReadLoop( self ):
+        
+        HydrusDBBase.TemporaryIntegerTableNameCache( thread_local = True )
+        
+        db = None
+        
+        while not ( ( self._local_shutdown or HG.model_shutdown ) and self._parallel_read_jobs.empty() ):
+            
+            if self._pause_and_disconnect:
+                
+                if db is not None:
+                    
+                    c.close()
+                    db.close()
+                    
+                    db = None
+                    
+                    with self._parallel_read_lock:
+                        
+                        self._num_parallel_read_connections_open -= 1
+                        
+                    
+                
+                # anything that slipped in can wait for the main connection to come back
+                while not self._parallel_read_jobs.empty():
+                    
+                    self._PutJob( self._parallel_read_jobs.get() )
+                    
+                
+                time.sleep( 0.1 )
+                
+                continue
+                
+            
+            try:
+                
+                job = self._parallel_read_jobs.get( timeout = 1 )
+                
+            except queue.Empty:
+                
+                continue
+                
+            
+            if db is None:
+                
+                if self._parallel_read_connections_failed:
+                    
+                    self._PutJob( job )
+                    
+                    continue
+                    
+                
+                try:
+                    
+                    with self._parallel_read_lock:
+                        
+                        self._num_parallel_read_connections_open += 1
+                        
+                    
+                    ( db, c, db_names, parallel_read_snapshot ) = self._InitParallelReadConnection()
+                    
+                    commands_to_methods = None
+                    
+                    HydrusDBBase.TemporaryIntegerTableNameCache.instance().Clear()
+                    
+                except Exception as e:
+                    
+                    with self._parallel_read_lock:
+                        
+                        self._num_parallel_read_connections_open -= 1
+                        
+                    
+                    if not self._parallel_read_connections_failed:
+                        
+                        self._parallel_read_connections_failed = True
+                        
+                        HydrusData.Print( 'Could not open a parallel read connection to the database, so all reads will go through the main db thread. Error follows:' )
+                        HydrusData.PrintException( e, do_wait = False )
+                        
+                    
+                    self._PutJob( job )
+                    
+                    continue
+                    
+                
+            
+            ( action, args, kwargs ) = job.GetCallableTuple()
+            
+            try:
+                
+                if HG.db_report_mode:
+                    
+                    HydrusData.ShowText( 'Running parallel db read job: ' + job.ToString() )
+                    
+                
+                a_write_happened = parallel_read_snapshot.Refresh()
+                
+                if not self._CanDoParallelRead():
+                    
+                    raise HydrusExceptions.DBException( 'A write started since this job was queued.' )
+                    
+                
+                c.execute( 'BEGIN DEFERRED;' )
+                
+                try:
+                    
+                    # touch every file now so we read one consistent snapshot across all of them
+                    for db_name in db_names:
+                        
+                        c.execute( 'SELECT 1 FROM {}.sqlite_master;'.format( db_name ) ).fetchone()
+                        
+                    
+                    if commands_to_methods is None or a_write_happened:
+                        
+                        # made inside the transaction, so any in-memory caches match what we are reading
+                        commands_to_methods = self._GetParallelReadCommandsToMethods( c, parallel_read_snapshot )
+                        
+                    
+                    result = commands_to_methods[ action ]( *args, **kwargs )
+                    
+                finally:
+                    
+                    c.execute( 'COMMIT;' )
+                    
+                
+                job.PutResult( result )
+                
+            except Exception as e:
+                
+                # the main connection can see uncommitted work and is allowed to write, so if we could not do this for any reason, it gets the final say
+                
+                if HG.db_report_mode:
+                    
+                    HydrusData.ShowText( 'Parallel db read job "{}" could not complete ({}), so it is going to the main db thread.'.format( job.ToString(), e ) )
+                    
+                
+                self._PutJob( job )
+                
+            
+        
+        if db is not None:
+            
+            c.close()
+            db.close()
+            
+            with self._parallel_read_lock:
+                
+                self._num_parallel_read_connections_open -= 1
+                
+            
+        
+        with self._parallel_read_lock:
+            
+            self._num_parallel_read_workers -= 1
+            
+        
+    
     def PauseAndDisconnect( self, pause_and_disconnect ):
         
         self._pause_and_disconnect = pause_and_disconnect
@@ -1284,6 +1733,20 @@ class HydrusDB( HydrusDBBase.DBBase ):
     
     def Read( self, action, *args, **kwargs ):
         
+        if action in self.PARALLEL_READ_ACTIONS and self._CanDoParallelRead():
+            
+            job = self._GenerateDBJob( 'read', True, action, *args, **kwargs )
+            
+            if HG.model_shutdown:
+                
+                raise HydrusExceptions.ShutdownException( 'Application has shut down!' )
+                
+            
+            self._parallel_read_jobs.put( job )
+            
+            return job.GetResult()
+            
+        
         if action in self.READ_WRITE_ACTIONS:
             
             job_type = 'read_write'
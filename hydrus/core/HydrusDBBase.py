@@ -7,6 +7,7 @@ import sqlite3
 
 from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
+from hydrus.core import HydrusLists
 from hydrus.core import HydrusPaths
 from hydrus.core import HydrusProfiling
 from hydrus.core import HydrusPSUtil
@@ -137,9 +138,19 @@ class TemporaryIntegerTableNameCache( object ):
     
     my_instance = None
     
-    def __init__( self ):
+    # parallel read connections each have their own mem db, so they get their own names
+    thread_instances = threading.local()
+    
+    def __init__( self, thread_local = False ):
         
-        TemporaryIntegerTableNameCache.my_instance = self
+        if thread_local:
+            
+            TemporaryIntegerTableNameCache.thread_instances.instance = self
+            
+        else:
+            
+            TemporaryIntegerTableNameCache.my_instance = self
+            
         
         self._column_name_tuples_to_table_names = collections.defaultdict( collections.deque )
         self._column_name_tuples_counter = collections.Counter()
@@ -148,6 +159,13 @@ class TemporaryIntegerTableNameCache( object ):
     @staticmethod
     def instance() -> 'TemporaryIntegerTableNameCache':
         
+        thread_instance = getattr( TemporaryIntegerTableNameCache.thread_instances, 'instance', None )
+        
+        if thread_instance is not None:
+            
+            return thread_instance
+            
+        
         if TemporaryIntegerTableNameCache.my_instance is None:
             
             raise Exception( 'TemporaryIntegerTableNameCache is not yet initialised!' )
@@ -208,7 +226,8 @@ class TemporaryIntegerTable( object ):
     
     def __init__( self, cursor: sqlite3.Cursor, integers_iterable, column_names ):
         
-        if not isinstance( integers_iterable, set ):
+        # a sorted set goes in in rowid order, which is a cheap append onto the end of the table's btree
+        if not isinstance( integers_iterable, ( set, HydrusLists.SortedIntegerSet ) ):
             
             integers_iterable = set( integers_iterable )
             
@@ -635,6 +654,13 @@ class DBBase( object ):
         return { item for ( item, ) in iterable_cursor }
         
     
+    def _STSortedIntegerSet( self, iterable_cursor ) -> HydrusLists.SortedIntegerSet:
+        
+        # strip singleton integer tuples to a compact sorted set, for when there may be millions of them
+        
+        return HydrusLists.SortedIntegerSet( self._STI( iterable_cursor ) )
+        
+    
     def _TableExists( self, table_name ):
         
         if '.' in table_name:
@@ -887,3 +913,8 @@ class DBCursorTransactionWrapper( DBBase ):
         return self._in_transaction and ( p1 or p2 )
         
     
+    def TransactionContainsWrites( self ) -> bool:
+        
+        return self._transaction_contains_writes
+        
+    
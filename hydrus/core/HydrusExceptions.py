@@ -98,6 +98,16 @@ class CensorshipException( NetworkInfrastructureException ): pass
 class ServerException( NetworkInfrastructureException ): pass
 class ServerBusyException( NetworkInfrastructureException ): pass
 
+class TooManyRequestsException( NetworkInfrastructureException ):
+    
+    def __init__( self, message, retry_after = 1 ):
+        
+        self.retry_after = retry_after
+        
+        super().__init__( message )
+        
+    
+
 class StreamTimeoutException( NetworkException ): pass
 
 class NetworkVersionException( NetworkException ): pass
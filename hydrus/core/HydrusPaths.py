@@ -1,7 +1,9 @@
 import collections.abc
 import errno
 import functools
+import hashlib
 import os
+import queue
 import re
 import send2trash
 import shlex
@@ -1566,6 +1568,201 @@ def MirrorTree( source: str, dest: str, text_update_hook = None, is_cancelled_ho
         
     
 
+def MirrorTreeWithManifest( source: str, dest: str, manifest: dict[ str, str ], num_threads = 4, text_update_hook = None, is_cancelled_hook = None, partial_manifest_hook = None ) -> dict[ str, str ]:
+    """
+    Does what MirrorTree does, but for a big tree that is mirrored to the same place again and again.
+    The manifest remembers a fingerprint of each source directory's listing from the last run. A directory that has not changed since is skipped without looking at the destination at all, and directories that have are mirrored several at a time.
+    
+    :param partial_manifest_hook: If a directory fails to mirror, this is called with the manifest of everything that did finish, and then the error is raised.
+    :return: The new manifest. A directory only goes in once it is completely mirrored, so a cancelled or failed run is picked up properly next time.
+    """
+    
+    if not os.path.isdir( source ):
+        
+        raise Exception( f'Cannot directory-mirror "{source}" to "{dest}"--the source does not exist or is not a directory!' )
+        
+    
+    MakeSureDirectoryExists( dest )
+    
+    new_manifest = {}
+    errors = []
+    
+    lock = threading.Lock()
+    
+    jobs = queue.Queue()
+    
+    def mirror_directory( source_root, dest_root, dirnames, filenames ):
+        
+        MakeSureDirectoryExists( dest_root )
+        
+        surplus_dest_names = set( os.listdir( dest_root ) ).difference( dirnames ).difference( filenames )
+        
+        for filename in filenames:
+            
+            source_path = os.path.join( source_root, filename )
+            dest_path = os.path.join( dest_root, filename )
+            
+            try:
+                
+                MirrorFile( source_path, dest_path )
+                
+            except Exception as e:
+                
+                raise Exception( f'While trying to mirror "{source}" into "{dest}", copying "{source_path}" to "{dest_path}" failed!' ) from e
+                
+            
+        
+        for surplus_dest_name in surplus_dest_names:
+            
+            DeletePath( os.path.join( dest_root, surplus_dest_name ) )
+            
+        
+        safe_copystat( source_root, dest_root )
+        
+    
+    def work():
+        
+        while True:
+            
+            job = jobs.get()
+            
+            if job is None:
+                
+                return
+                
+            
+            ( relative_path, source_root, dest_root, dirnames, filenames, fingerprint ) = job
+            
+            with lock:
+                
+                if len( errors ) > 0:
+                    
+                    continue
+                    
+                
+            
+            if is_cancelled_hook is not None and is_cancelled_hook():
+                
+                continue
+                
+            
+            try:
+                
+                mirror_directory( source_root, dest_root, dirnames, filenames )
+                
+                with lock:
+                    
+                    new_manifest[ relative_path ] = fingerprint
+                    
+                
+            except Exception as e:
+                
+                with lock:
+                    
+                    errors.append( e )
+                    
+                
+            
+        
+    
+    threads = [ threading.Thread( target = work, name = 'mirror tree worker', daemon = True ) for i in range( max( num_threads, 1 ) ) ]
+    
+    for thread in threads:
+        
+        thread.start()
+        
+    
+    try:
+        
+        for ( root, dirnames, filenames ) in os.walk( source ):
+            
+            if is_cancelled_hook is not None and is_cancelled_hook():
+                
+                break
+                
+            
+            with lock:
+                
+                if len( errors ) > 0:
+                    
+                    break
+                    
+                
+            
+            if text_update_hook is not None:
+                
+                text_update_hook( 'Checking ' + root + '.' )
+                
+            
+            relative_path = os.path.relpath( root, source )
+            dest_root = os.path.normpath( os.path.join( dest, relative_path ) )
+            
+            existing_filenames = []
+            fingerprint_hash = hashlib.sha256()
+            
+            for dirname in sorted( dirnames ):
+                
+                fingerprint_hash.update( f'd\t{dirname}\n'.encode( 'utf-8' ) )
+                
+            
+            for filename in sorted( filenames ):
+                
+                try:
+                    
+                    source_stat = os.stat( os.path.join( root, filename ) )
+                    
+                except FileNotFoundError:
+                    
+                    # deleted since the walk saw it
+                    continue
+                    
+                
+                existing_filenames.append( filename )
+                
+                fingerprint_hash.update( f'f\t{filename}\t{source_stat.st_size}\t{source_stat.st_mtime_ns}\n'.encode( 'utf-8' ) )
+                
+            
+            fingerprint = fingerprint_hash.hexdigest()
+            
+            if manifest.get( relative_path, None ) == fingerprint and os.path.isdir( dest_root ):
+                
+                with lock:
+                    
+                    new_manifest[ relative_path ] = fingerprint
+                    
+                
+                continue
+                
+            
+            jobs.put( ( relative_path, root, dest_root, list( dirnames ), existing_filenames, fingerprint ) )
+            
+        
+    finally:
+        
+        for thread in threads:
+            
+            jobs.put( None )
+            
+        
+        for thread in threads:
+            
+            thread.join()
+            
+        
+    
+    if len( errors ) > 0:
+        
+        if partial_manifest_hook is not None:
+            
+            partial_manifest_hook( new_manifest )
+            
+        
+        raise errors[0]
+        
+    
+    return new_manifest
+    
+
 def OpenFileLocation( path ):
     
     def do_it():
@@ -1707,6 +1904,86 @@ def ReadFileLikeAsBlocks( f ) -> collections.abc.Iterator[ bytes ]:
         
     
 
+def ReadFileLikeAsBlocksPrefetched( f, num_blocks_ahead = 4 ) -> collections.abc.Iterator[ bytes ]:
+    
+    # the reads happen on another thread, so the caller can chew on one block while the next comes off the disk
+    
+    block_queue = queue.Queue( maxsize = num_blocks_ahead )
+    
+    stop_event = threading.Event()
+    
+    def put( item ):
+        
+        while not stop_event.is_set():
+            
+            try:
+                
+                block_queue.put( item, timeout = 0.5 )
+                
+                return
+                
+            except queue.Full:
+                
+                continue
+                
+            
+        
+    
+    def do_reads():
+        
+        try:
+            
+            for block in ReadFileLikeAsBlocks( f ):
+                
+                put( block )
+                
+                if stop_event.is_set():
+                    
+                    return
+                    
+                
+            
+            put( None )
+            
+        except Exception as e:
+            
+            put( e )
+            
+        
+    
+    read_thread = threading.Thread( target = do_reads, name = 'block prefetch', daemon = True )
+    
+    read_thread.start()
+    
+    try:
+        
+        while True:
+            
+            item = block_queue.get()
+            
+            if item is None:
+                
+                break
+                
+            
+            if isinstance( item, Exception ):
+                
+                raise item
+                
+            
+            yield item
+            
+        
+    finally:
+        
+        # caller may have bailed early. the file must not close until the reader is done with it
+        
+        stop_event.set()
+        
+        read_thread.join()
+        
+    
+
 def RecyclePath( path ):
     
     if HG.file_report_mode:
@@ -7,7 +7,6 @@ from hydrus.core import HydrusData
 from hydrus.core import HydrusExceptions
 from hydrus.core import HydrusNumbers
 from hydrus.core import HydrusPaths
-from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusStaticDir
 from hydrus.core import HydrusTemp
 from hydrus.core import HydrusText
@@ -33,6 +32,12 @@ from hydrus.core.files import HydrusORAHandling
 from hydrus.core.files.images import HydrusImageHandling
 from hydrus.core.networking import HydrusNetwork
 
+# how much of the start of a file we look at to guess its filetype
+NUM_HEADER_BYTES_FOR_MIME = 256
+
+# above this, the hashing reads the next block on another thread while it hashes the current one
+PREFETCHED_HASHING_SIZE_THRESHOLD = 16 * 1024 * 1024
+
 mimes_to_default_thumbnail_paths = collections.defaultdict( lambda: HydrusStaticDir.GetStaticPath( 'hydrus.png' ) )
 
 def InitialiseMimesToDefaultThumbnailPaths():
@@ -115,15 +120,22 @@ def PrintMoreThumbErrorInfo( e: Exception, message, extra_description: str | Non
         
     
 
-def GenerateThumbnailNumPy( path, target_resolution, mime, duration_ms, num_frames, percentage_in = 35, extra_description = None ):
+def GenerateThumbnailNumPy( path, target_resolution, mime, duration_ms, num_frames, percentage_in = 35, extra_description = None, numpy_image = None ):
+    
+    # numpy_image is the already-decoded still image, if the caller has one
     
     thumbnail_numpy = None
     
     if mime in HC.IMAGES or mime == HC.ANIMATION_WEBP:
         
+        if mime not in HC.IMAGES:
+            
+            numpy_image = None
+            
+        
         try:
             
-            thumbnail_numpy = HydrusImageHandling.GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime )
+            thumbnail_numpy = HydrusImageHandling.GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime, numpy_image = numpy_image )
             
         except Exception as e:
             
@@ -451,6 +463,45 @@ def GenerateThumbnailNumPyWeirdApplicationGubbins( path, target_resolution, mime
     return thumbnail_numpy
     
 
+def GetAllHashesFromPath( path ) -> tuple[ bytes, tuple[ bytes, bytes, bytes ], bytes ]:
+    
+    # sha256, the extra hashes, and the header bytes for mime sniffing, all in one read of the file
+    # hashlib and file reads both release the GIL on big blocks, so on a big file the reading and hashing overlap
+    
+    hashers = ( hashlib.sha256(), hashlib.md5(), hashlib.sha1(), hashlib.sha512() )
+    
+    first_bytes_of_file = b''
+    
+    with open( path, 'rb' ) as f:
+        
+        if os.fstat( f.fileno() ).st_size > PREFETCHED_HASHING_SIZE_THRESHOLD:
+            
+            blocks = HydrusPaths.ReadFileLikeAsBlocksPrefetched( f )
+            
+        else:
+            
+            blocks = HydrusPaths.ReadFileLikeAsBlocks( f )
+            
+        
+        for block in blocks:
+            
+            if len( first_bytes_of_file ) < NUM_HEADER_BYTES_FOR_MIME:
+                
+                first_bytes_of_file += block[ : NUM_HEADER_BYTES_FOR_MIME - len( first_bytes_of_file ) ]
+                
+            
+            for h in hashers:
+                
+                h.update( block )
+                
+            
+        
+    
+    ( sha256, md5, sha1, sha512 ) = [ h.digest() for h in hashers ]
+    
+    return ( sha256, ( md5, sha1, sha512 ), first_bytes_of_file )
+    
+
 def GetExtraHashesFromPath( path ):
     
     h_md5 = hashlib.md5()
@@ -840,7 +891,7 @@ def passes_offsets_and_headers( offsets_and_headers, first_bytes_of_file ) -> bo
 
 ALLOW_COMIC_BOOK_ARCHIVE_INSPECTION = True
 
-def GetMime( path, ok_to_look_for_hydrus_updates = False ):
+def GetMime( path, ok_to_look_for_hydrus_updates = False, first_bytes_of_file = None ):
     
     size = os.path.getsize( path )
     
@@ -858,7 +909,7 @@ def GetMime( path, ok_to_look_for_hydrus_updates = False ):
         
         try:
             
-            update = HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+            update = HydrusNetwork.CreateUpdateFromNetworkBytes( update_network_bytes )
             
             if isinstance( update, HydrusNetwork.ContentUpdate ):
                 
@@ -875,9 +926,12 @@ def GetMime( path, ok_to_look_for_hydrus_updates = False ):
             
         
     
-    with open( path, 'rb' ) as f:
+    if first_bytes_of_file is None:
         
-        first_bytes_of_file = f.read( 256 )
+        with open( path, 'rb' ) as f:
+            
+            first_bytes_of_file = f.read( NUM_HEADER_BYTES_FOR_MIME )
+            
         
     
     for ( offsets_and_headers, mime ) in headers_and_mime:
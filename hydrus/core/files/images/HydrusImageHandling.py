@@ -443,6 +443,24 @@ def GenerateNumPyImageFromPILImage( pil_image: PILImage.Image, strip_useless_alp
     return numpy_image
     
 
+def GenerateNumPyImageFromThumbnailBytes( thumbnail_bytes: bytes ) -> numpy.ndarray:
+    
+    # our thumbnails are always plain jpegs or pngs we made ourselves, so this is the GenerateNumPyImage PIL route without the file
+    
+    pil_image = GeneratePILImage( io.BytesIO( thumbnail_bytes ) )
+    
+    try:
+        
+        numpy_image = GenerateNumPyImageFromPILImage( pil_image )
+        
+    finally:
+        
+        pil_image.close()
+        
+    
+    return numpy_image
+    
+
 def GeneratePILImage( path: str | typing.BinaryIO, dequantize = True, human_file_description = None ) -> PILImage.Image:
     
     original_pil_image = HydrusImageOpening.RawOpenPILImage( path, human_file_description = human_file_description )
@@ -608,9 +626,12 @@ def GenerateFileBytesForRenderAPI( numpy_image, format: int, quality: int ):
     return GenerateFileBytesNumPy( numpy_image, ext, params )
     
 
-def GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime ):
+def GenerateThumbnailNumPyFromStaticImagePath( path, target_resolution, mime, numpy_image = None ):
     
-    numpy_image = GenerateNumPyImage( path, mime )
+    if numpy_image is None:
+        
+        numpy_image = GenerateNumPyImage( path, mime )
+        
     
     thumbnail_numpy_image = ResizeNumPyImage( numpy_image, target_resolution )
     
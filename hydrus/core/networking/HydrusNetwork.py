@@ -12,6 +12,7 @@ from hydrus.core import HydrusNumbers
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTags
 from hydrus.core import HydrusTime
+from hydrus.core.networking import HydrusNetworkCompactUpdates
 from hydrus.core.networking import HydrusNetworking
 
 UPDATE_CHECKING_PERIOD = 240
@@ -21,6 +22,19 @@ MAX_UPDATE_PERIOD = 100000 * 100 # three months or so jej
 MIN_NULLIFICATION_PERIOD = 86400
 MAX_NULLIFICATION_PERIOD = 86400 * 365 * 5
 
+UPDATE_ENCODING_JSON = 0
+UPDATE_ENCODING_COMPACT = 1
+
+update_encoding_str_lookup = {
+    UPDATE_ENCODING_JSON : 'json',
+    UPDATE_ENCODING_COMPACT : 'compact'
+}
+
+update_encoding_enum_lookup = { value : key for ( key, value ) in update_encoding_str_lookup.items() }
+
+# clients send this on update requests so the server knows which update formats they can read
+UPDATE_ENCODINGS_HEADER = 'Hydrus-Update-Encodings'
+
 def GenerateDefaultServiceDictionary( service_type ):
     
     # don't store bytes key/value data here until ~version 537
@@ -1567,6 +1581,20 @@ class ContentUpdate( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def DumpToCompactNetworkBytes( self ) -> bytes:
+        
+        writer = HydrusNetworkCompactUpdates.CompactWriter()
+        
+        HydrusNetworkCompactUpdates.WriteContent( writer, self._content_data )
+        
+        return writer.GetBytes( HydrusNetworkCompactUpdates.COMPACT_UPDATE_TYPE_CONTENT )
+        
+    
+    def InitialiseFromCompactData( self, reader: HydrusNetworkCompactUpdates.CompactReader ):
+        
+        self._content_data = HydrusNetworkCompactUpdates.ReadContent( reader )
+        
+    
     def AddRow( self, row ):
         
         ( content_type, action, data ) = row
@@ -1913,6 +1941,20 @@ class DefinitionsUpdate( HydrusSerialisable.SerialisableBase ):
             
         
     
+    def DumpToCompactNetworkBytes( self ) -> bytes:
+        
+        writer = HydrusNetworkCompactUpdates.CompactWriter()
+        
+        HydrusNetworkCompactUpdates.WriteDefinitions( writer, self._hash_ids_to_hashes, self._tag_ids_to_tags )
+        
+        return writer.GetBytes( HydrusNetworkCompactUpdates.COMPACT_UPDATE_TYPE_DEFINITIONS )
+        
+    
+    def InitialiseFromCompactData( self, reader: HydrusNetworkCompactUpdates.CompactReader ):
+        
+        ( self._hash_ids_to_hashes, self._tag_ids_to_tags ) = HydrusNetworkCompactUpdates.ReadDefinitions( reader )
+        
+    
     def AddRow( self, row ):
         
         ( definitions_type, key, value ) = row
@@ -1944,6 +1986,54 @@ class DefinitionsUpdate( HydrusSerialisable.SerialisableBase ):
     
 HydrusSerialisable.SERIALISABLE_TYPES_TO_OBJECT_TYPES[ HydrusSerialisable.SERIALISABLE_TYPE_DEFINITIONS_UPDATE ] = DefinitionsUpdate
 
+def CreateUpdateFromNetworkBytes( update_network_bytes: bytes ):
+    
+    # update files may be the old json serialisable or the newer compact format, depending on how the server was set up when it made them
+    
+    if not HydrusNetworkCompactUpdates.IsCompactUpdateBytes( update_network_bytes ):
+        
+        return HydrusSerialisable.CreateFromNetworkBytes( update_network_bytes )
+        
+    
+    ( update_type, reader ) = HydrusNetworkCompactUpdates.ParseCompactUpdateBytes( update_network_bytes )
+    
+    if update_type == HydrusNetworkCompactUpdates.COMPACT_UPDATE_TYPE_DEFINITIONS:
+        
+        update = DefinitionsUpdate()
+        
+    elif update_type == HydrusNetworkCompactUpdates.COMPACT_UPDATE_TYPE_CONTENT:
+        
+        update = ContentUpdate()
+        
+    else:
+        
+        raise HydrusExceptions.SerialisationException( 'Did not understand compact update type {}!'.format( update_type ) )
+        
+    
+    update.InitialiseFromCompactData( reader )
+    
+    return update
+    
+
+def DumpUpdateToNetworkBytes( update: ContentUpdate | DefinitionsUpdate, update_encoding: int ) -> bytes:
+    
+    if update_encoding == UPDATE_ENCODING_COMPACT:
+        
+        try:
+            
+            return update.DumpToCompactNetworkBytes()
+            
+        except HydrusExceptions.SerialisationException:
+            
+            # some content the compact format does not know about yet. json can always do it
+            
+            pass
+            
+        
+    
+    return update.DumpToNetworkBytes()
+    
+
 class Metadata( HydrusSerialisable.SerialisableBase ):
     
     SERIALISABLE_TYPE = HydrusSerialisable.SERIALISABLE_TYPE_METADATA
@@ -2904,6 +2994,11 @@ class ServerServiceRepository( ServerServiceRestricted ):
             self._service_options[ 'update_period' ] = 100000
             
         
+        if 'update_encoding' not in self._service_options:
+            
+            self._service_options[ 'update_encoding' ] = UPDATE_ENCODING_JSON
+            
+        
         if 'nullification_period' in dictionary:
             
             default_nullification_period = dictionary[ 'nullification_period' ]
@@ -2954,6 +3049,14 @@ class ServerServiceRepository( ServerServiceRestricted ):
             
         
     
+    def GetUpdateEncoding( self ) -> int:
+        
+        with self._lock:
+            
+            return self._service_options[ 'update_encoding' ]
+            
+        
+    
     def GetUpdatePeriod( self ) -> int:
         
         with self._lock:
@@ -3080,6 +3183,16 @@ class ServerServiceRepository( ServerServiceRestricted ):
         HG.controller.pub( 'notify_new_nullification' )
         
     
+    def SetUpdateEncoding( self, update_encoding: int ):
+        
+        with self._lock:
+            
+            self._service_options[ 'update_encoding' ] = update_encoding
+            
+            self._SetDirty()
+            
+        
+    
     def SetUpdatePeriod( self, update_period: int ):
         
         with self._lock:
@@ -3124,10 +3237,11 @@ class ServerServiceRepository( ServerServiceRestricted ):
                         
                     
                     update_period = self._service_options[ 'update_period' ]
+                    update_encoding = self._service_options[ 'update_encoding' ]
                     
                     end = begin + update_period
                     
-                    update_hashes = HG.controller.WriteSynchronous( 'create_update', service_key, begin, end )
+                    update_hashes = HG.controller.WriteSynchronous( 'create_update', service_key, begin, end, update_encoding = update_encoding )
                     
                     update_created = True
                     
@@ -3316,3 +3430,14 @@ class UpdateBuilder( object ):
         return self._updates
         
     
+    def PopUpdates( self ):
+        
+        # for streaming: hand over whatever is finished so far and forget about it
+        
+        updates = self._updates
+        
+        self._updates = []
+        
+        return updates
+        
+    
@@ -0,0 +1,334 @@
+import struct
+import zlib
+
+import numpy
+
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusExceptions
+
+# repository updates are mostly big lists of integers. the json format writes them all out as decimal text, and hashes as hex, which is slow to make and slow to parse
+# this format writes them as delta-coded numpy arrays and raw bytes, with a fast zlib pass over the top
+# it starts with a magic that is not a valid zlib header, so we can always tell it apart from a normal serialised object
+
+COMPACT_UPDATE_MAGIC = b'HCUP'
+COMPACT_UPDATE_FORMAT_VERSION = 1
+
+COMPACT_UPDATE_TYPE_DEFINITIONS = 0
+COMPACT_UPDATE_TYPE_CONTENT = 1
+
+COMPACT_UPDATE_HEADER_LENGTH = len( COMPACT_UPDATE_MAGIC ) + 2
+
+# the updates are generated once and then downloaded many times, but we don't want to spend ages on level 9 for a few percent
+COMPACT_UPDATE_COMPRESSION_LEVEL = 1
+
+# service_hash_id, size, mime, timestamp, width, height, duration_ms, num_frames, num_words
+NUM_FILE_ROW_COLUMNS = 9
+
+def IsCompactUpdateBytes( network_bytes: bytes ) -> bool:
+    
+    return network_bytes[ : len( COMPACT_UPDATE_MAGIC ) ] == COMPACT_UPDATE_MAGIC
+    
+
+class CompactWriter( object ):
+    
+    def __init__( self ):
+        
+        self._chunks = []
+        
+    
+    def WriteBytesArray( self, values: list[ bytes ] ):
+        
+        self.WriteIntArray( [ len( value ) for value in values ], delta = False )
+        
+        self._chunks.append( b''.join( values ) )
+        
+    
+    def WriteInt( self, value: int ):
+        
+        self._chunks.append( struct.pack( '<q', value ) )
+        
+    
+    def WriteIntArray( self, values: list[ int ], delta = True ):
+        
+        array = numpy.array( values, dtype = '<i8' )
+        
+        if delta and len( array ) > 0:
+            
+            array = numpy.diff( array, prepend = numpy.int64( 0 ) ).astype( '<i8' )
+            
+        
+        self.WriteInt( len( array ) )
+        
+        self._chunks.append( array.tobytes() )
+        
+    
+    def WriteNoneableIntArray( self, values: list[ int | None ] ):
+        
+        mask = numpy.array( [ value is None for value in values ], dtype = numpy.uint8 )
+        
+        self.WriteInt( len( mask ) )
+        
+        self._chunks.append( mask.tobytes() )
+        
+        self.WriteIntArray( [ 0 if value is None else value for value in values ] )
+        
+    
+    def WriteStringArray( self, values: list[ str ] ):
+        
+        self.WriteBytesArray( [ value.encode( 'utf-8' ) for value in values ] )
+        
+    
+    def GetBytes( self, update_type: int ) -> bytes:
+        
+        body = zlib.compress( b''.join( self._chunks ), COMPACT_UPDATE_COMPRESSION_LEVEL )
+        
+        return COMPACT_UPDATE_MAGIC + bytes( ( COMPACT_UPDATE_FORMAT_VERSION, update_type ) ) + body
+        
+    
+
+class CompactReader( object ):
+    
+    def __init__( self, body: bytes ):
+        
+        self._body = memoryview( body )
+        self._offset = 0
+        
+    
+    def _ReadRaw( self, num_bytes: int ) -> memoryview:
+        
+        if num_bytes < 0 or self._offset + num_bytes > len( self._body ):
+            
+            raise HydrusExceptions.SerialisationException( 'Compact update was truncated!' )
+            
+        
+        chunk = self._body[ self._offset : self._offset + num_bytes ]
+        
+        self._offset += num_bytes
+        
+        return chunk
+        
+    
+    def _ReadNumPyIntArray( self, delta = True ) -> numpy.ndarray:
+        
+        num_values = self.ReadInt()
+        
+        array = numpy.frombuffer( self._ReadRaw( num_values * 8 ), dtype = '<i8' )
+        
+        if delta:
+            
+            array = numpy.cumsum( array, dtype = numpy.int64 )
+            
+        
+        return array
+        
+    
+    def ReadBytesArray( self ) -> list[ bytes ]:
+        
+        lengths = self.ReadIntArray( delta = False )
+        
+        data = self._ReadRaw( sum( lengths ) ).tobytes()
+        
+        values = []
+        
+        offset = 0
+        
+        for length in lengths:
+            
+            values.append( data[ offset : offset + length ] )
+            
+            offset += length
+            
+        
+        return values
+        
+    
+    def ReadInt( self ) -> int:
+        
+        ( value, ) = struct.unpack( '<q', self._ReadRaw( 8 ) )
+        
+        return value
+        
+    
+    def ReadIntArray( self, delta = True ) -> list[ int ]:
+        
+        return self._ReadNumPyIntArray( delta = delta ).tolist()
+        
+    
+    def ReadNoneableIntArray( self ) -> list[ int | None ]:
+        
+        num_values = self.ReadInt()
+        
+        mask = numpy.frombuffer( self._ReadRaw( num_values ), dtype = numpy.uint8 ).tolist()
+        
+        values = self.ReadIntArray()
+        
+        if len( values ) != num_values:
+            
+            raise HydrusExceptions.SerialisationException( 'Compact update had a bad noneable column!' )
+            
+        
+        return [ None if is_none else value for ( is_none, value ) in zip( mask, values ) ]
+        
+    
+    def ReadStringArray( self ) -> list[ str ]:
+        
+        return [ value.decode( 'utf-8' ) for value in self.ReadBytesArray() ]
+        
+    
+
+def ParseCompactUpdateBytes( network_bytes: bytes ) -> tuple[ int, CompactReader ]:
+    
+    if not IsCompactUpdateBytes( network_bytes ) or len( network_bytes ) < COMPACT_UPDATE_HEADER_LENGTH:
+        
+        raise HydrusExceptions.SerialisationException( 'This is not a compact update!' )
+        
+    
+    format_version = network_bytes[ len( COMPACT_UPDATE_MAGIC ) ]
+    update_type = network_bytes[ len( COMPACT_UPDATE_MAGIC ) + 1 ]
+    
+    if format_version > COMPACT_UPDATE_FORMAT_VERSION:
+        
+        raise HydrusExceptions.SerialisationException( 'This compact update is from a newer version of hydrus (format version {}), please update your client!'.format( format_version ) )
+        
+    
+    try:
+        
+        body = zlib.decompress( network_bytes[ COMPACT_UPDATE_HEADER_LENGTH : ] )
+        
+    except zlib.error as e:
+        
+        raise HydrusExceptions.SerialisationException( 'Could not decompress compact update: {}'.format( e ) )
+        
+    
+    return ( update_type, CompactReader( body ) )
+    
+
+def WriteDefinitions( writer: CompactWriter, hash_ids_to_hashes: dict[ int, bytes ], tag_ids_to_tags: dict[ int, str ] ):
+    
+    writer.WriteIntArray( list( hash_ids_to_hashes.keys() ) )
+    writer.WriteBytesArray( list( hash_ids_to_hashes.values() ) )
+    
+    writer.WriteIntArray( list( tag_ids_to_tags.keys() ) )
+    writer.WriteStringArray( list( tag_ids_to_tags.values() ) )
+    
+
+def ReadDefinitions( reader: CompactReader ) -> tuple[ dict[ int, bytes ], dict[ int, str ] ]:
+    
+    hash_ids = reader.ReadIntArray()
+    hashes = reader.ReadBytesArray()
+    
+    tag_ids = reader.ReadIntArray()
+    tags = reader.ReadStringArray()
+    
+    if len( hash_ids ) != len( hashes ) or len( tag_ids ) != len( tags ):
+        
+        raise HydrusExceptions.SerialisationException( 'Compact definitions update had mismatched columns!' )
+        
+    
+    return ( dict( zip( hash_ids, hashes ) ), dict( zip( tag_ids, tags ) ) )
+    
+
+def WriteContent( writer: CompactWriter, content_data: dict[ int, dict[ int, list ] ] ):
+    
+    sections = [ ( content_type, action, data ) for ( content_type, actions_to_datas ) in content_data.items() for ( action, data ) in actions_to_datas.items() ]
+    
+    writer.WriteInt( len( sections ) )
+    
+    for ( content_type, action, data ) in sections:
+        
+        writer.WriteInt( content_type )
+        writer.WriteInt( action )
+        
+        if content_type == HC.CONTENT_TYPE_FILES and action == HC.CONTENT_UPDATE_ADD:
+            
+            columns = list( zip( *data ) ) if len( data ) > 0 else [ () ] * NUM_FILE_ROW_COLUMNS
+            
+            for column in columns:
+                
+                writer.WriteNoneableIntArray( list( column ) )
+                
+            
+        elif content_type == HC.CONTENT_TYPE_FILES:
+            
+            writer.WriteIntArray( data )
+            
+        elif content_type == HC.CONTENT_TYPE_MAPPINGS:
+            
+            writer.WriteIntArray( [ tag_id for ( tag_id, hash_ids ) in data ] )
+            writer.WriteIntArray( [ len( hash_ids ) for ( tag_id, hash_ids ) in data ], delta = False )
+            writer.WriteIntArray( [ hash_id for ( tag_id, hash_ids ) in data for hash_id in hash_ids ] )
+            
+        elif content_type in ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_TYPE_TAG_SIBLINGS ):
+            
+            writer.WriteIntArray( [ a for ( a, b ) in data ] )
+            writer.WriteIntArray( [ b for ( a, b ) in data ] )
+            
+        else:
+            
+            raise HydrusExceptions.SerialisationException( 'Compact updates do not support content type {}!'.format( content_type ) )
+            
+        
+    
+
+def ReadContent( reader: CompactReader ) -> dict[ int, dict[ int, list ] ]:
+    
+    content_data = {}
+    
+    num_sections = reader.ReadInt()
+    
+    for i in range( num_sections ):
+        
+        content_type = reader.ReadInt()
+        action = reader.ReadInt()
+        
+        if content_type == HC.CONTENT_TYPE_FILES and action == HC.CONTENT_UPDATE_ADD:
+            
+            columns = [ reader.ReadNoneableIntArray() for j in range( NUM_FILE_ROW_COLUMNS ) ]
+            
+            data = [ tuple( row ) for row in zip( *columns ) ]
+            
+        elif content_type == HC.CONTENT_TYPE_FILES:
+            
+            data = reader.ReadIntArray()
+            
+        elif content_type == HC.CONTENT_TYPE_MAPPINGS:
+            
+            tag_ids = reader.ReadIntArray()
+            lengths = reader.ReadIntArray( delta = False )
+            flat_hash_ids = reader.ReadIntArray()
+            
+            if len( tag_ids ) != len( lengths ) or sum( lengths ) != len( flat_hash_ids ):
+                
+                raise HydrusExceptions.SerialisationException( 'Compact content update had bad mappings!' )
+                
+            
+            data = []
+            
+            offset = 0
+            
+            for ( tag_id, length ) in zip( tag_ids, lengths ):
+                
+                data.append( ( tag_id, flat_hash_ids[ offset : offset + length ] ) )
+                
+                offset += length
+                
+            
+        elif content_type in ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_TYPE_TAG_SIBLINGS ):
+            
+            data = list( zip( reader.ReadIntArray(), reader.ReadIntArray() ) )
+            
+        else:
+            
+            raise HydrusExceptions.SerialisationException( 'Compact updates do not support content type {}!'.format( content_type ) )
+            
+        
+        if content_type not in content_data:
+            
+            content_data[ content_type ] = {}
+            
+        
+        content_data[ content_type ][ action ] = data
+        
+    
+    return content_data
+    
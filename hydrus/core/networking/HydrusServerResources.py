@@ -1,10 +1,13 @@
 import json
+import math
 import os
 import time
 
 import twisted.internet.error
 from twisted.internet import reactor, defer
-from twisted.internet.threads import deferToThread
+from twisted.internet.threads import deferToThread, deferToThreadPool
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
 from twisted.web.server import NOT_DONE_YET
 from twisted.web.resource import Resource
 from twisted.web.static import NoRangeStaticProducer, SingleRangeStaticProducer
@@ -18,6 +21,17 @@ from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTemp
 from hydrus.core.networking import HydrusServerRequest
 
+# trivial jobs are done right there on the reactor. everything else goes to a thread
+RESOURCE_JOB_CLASS_TRIVIAL = 0
+RESOURCE_JOB_CLASS_LIGHT = 1
+RESOURCE_JOB_CLASS_HEAVY = 2
+
+resource_job_class_str_lookup = {
+    RESOURCE_JOB_CLASS_TRIVIAL : 'trivial',
+    RESOURCE_JOB_CLASS_LIGHT : 'light',
+    RESOURCE_JOB_CLASS_HEAVY : 'heavy'
+}
+
 def GetServerSummaryTexts( service ):
     
     name = service.GetName()
@@ -422,100 +436,268 @@ class HydrusDomain( object ):
         return self._local_only
         
     
-class HydrusResource( Resource ):
+class BodyChunksProducer( object ):
     
-    def __init__( self, service, domain ):
+    # a pull producer, so the next chunk is only made once twisted has room for it
+    # no Content-Length goes out with these, so twisted sends them with chunked transfer encoding
+    # if making a chunk is slow, like a db read, say threaded and each chunk will be made off the reactor thread, in the resource's thread pool if it has one
+    
+    def __init__( self, request: HydrusServerRequest.HydrusRequest, body_chunks, finished_callable, threaded = False, thread_pool: ThreadPool | None = None ):
         
-        super().__init__()
+        self._request = request
+        self._body_chunks = iter( body_chunks )
+        self._finished_callable = finished_callable
+        self._threaded = threaded
+        self._thread_pool = thread_pool
         
-        self._service = service
-        self._service_key = self._service.GetServiceKey()
-        self._domain = domain
+        self._fetching = False
+        self._num_bytes_written = 0
         
     
-    def _callbackCheckAccountRestrictions( self, request: HydrusServerRequest.HydrusRequest ):
+    def _ChunkFailed( self, failure: Failure ):
         
-        return request
-        
-    
-    def _callbackCheckServiceRestrictions( self, request: HydrusServerRequest.HydrusRequest ):
+        self._fetching = False
         
-        self._domain.CheckValid( request.getClientIP() )
+        HydrusData.DebugPrint( failure.getTraceback() )
         
-        self._checkService( request )
+        if self._request is None:
+            
+            return
+            
         
-        self._checkUserAgent( request )
+        request = self._Stop()
         
-        return request
+        # the headers are already out, so the only honest thing to do is hang up so the client knows it got a truncated body
+        request.loseConnection()
         
     
-    def _callbackDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+    def _ChunkReady( self, chunk ):
         
-        def wrap_thread_result( response_context ):
-            
-            request.hydrus_response_context = response_context
+        self._fetching = False
+        
+        if self._request is None:
             
-            return request
+            return
             
         
-        if HydrusProfiling.IsProfileMode( 'client_api' ):
+        if chunk is None:
             
-            d = deferToThread( self._profileJob, self._threadDoGETJob, request )
+            request = self._Stop()
             
-        else:
+            request.finish()
             
-            d = deferToThread( self._threadDoGETJob, request )
+            self._finished_callable( self._num_bytes_written )
+            
+            return
             
         
-        d.addCallback( wrap_thread_result )
+        if len( chunk ) == 0:
+            
+            # twisted only asks again once we have written something, so go straight on to the next
+            self.resumeProducing()
+            
+            return
+            
         
-        return d
+        self._num_bytes_written += len( chunk )
+        
+        # this .write may spin the reactor and call us again
+        self._request.write( chunk )
         
     
-    def _callbackDoOPTIONSJob( self, request: HydrusServerRequest.HydrusRequest ):
+    def _Stop( self ):
         
-        def wrap_thread_result( response_context ):
-            
-            request.hydrus_response_context = response_context
+        request = self._request
+        
+        self._request = None
+        
+        request.unregisterProducer()
+        
+        return request
+        
+    
+    def resumeProducing( self ):
+        
+        if self._request is None or self._fetching:
             
-            return request
+            return
             
         
-        if HydrusProfiling.IsProfileMode( 'client_api' ):
+        if self._threaded:
             
-            d = deferToThread( self._profileJob, self._threadDoOPTIONSJob, request )
+            self._fetching = True
+            
+            if self._thread_pool is None:
+                
+                d = deferToThread( next, self._body_chunks, None )
+                
+            else:
+                
+                # the headers are already out, so this cannot be turned away with a 429. it goes straight on the pool's threads without taking a queue slot
+                d = deferToThreadPool( reactor, self._thread_pool, next, self._body_chunks, None )
+                
+            
+            d.addCallbacks( self._ChunkReady, self._ChunkFailed )
             
         else:
             
-            d = deferToThread( self._threadDoOPTIONSJob, request )
+            try:
+                
+                chunk = next( self._body_chunks, None )
+                
+            except Exception:
+                
+                self._ChunkFailed( Failure() )
+                
+                return
+                
+            
+            self._ChunkReady( chunk )
             
         
-        d.addCallback( wrap_thread_result )
+    
+    def start( self ):
         
-        return d
+        self._request.registerProducer( self, False )
         
     
-    def _callbackDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
+    def stopProducing( self ):
         
-        def wrap_thread_result( response_context ):
+        self._request = None
+        
+    
+
+class ResourceWorkerPool( object ):
+    
+    # a bounded thread pool for one class of resource job, so a handful of big jobs cannot starve the little ones
+    # all the bookkeeping here happens on the reactor thread, so no lock
+    
+    def __init__( self, name: str, num_workers: int, max_queued: int ):
+        
+        self._name = name
+        self._num_workers = num_workers
+        self._max_queued = max_queued
+        
+        self._num_outstanding = 0
+        self._num_rejected = 0
+        
+        # a running average of how long a job takes, for the Retry-After estimate
+        self._average_job_time = 1.0
+        
+        self._thread_pool = None
+        
+    
+    def _JobDone( self, result, time_started ):
+        
+        self._num_outstanding -= 1
+        
+        self._average_job_time = ( self._average_job_time * 0.9 ) + ( ( time.perf_counter() - time_started ) * 0.1 )
+        
+        return result
+        
+    
+    def DeferToThread( self, func, *args, **kwargs ) -> defer.Deferred:
+        
+        if self._num_outstanding >= self._num_workers + self._max_queued:
             
-            request.hydrus_response_context = response_context
+            self._num_rejected += 1
             
-            return request
+            # about how long until the queue has drained enough to take one more
+            retry_after = math.ceil( self._average_job_time * ( 1 + self._num_outstanding - self._num_workers ) / self._num_workers )
+            
+            retry_after = min( max( retry_after, 1 ), 60 )
+            
+            raise HydrusExceptions.TooManyRequestsException( f'The {self._name} queue is full ({self._num_outstanding} jobs waiting or working). Please try again in a bit!', retry_after = retry_after )
             
         
-        if HydrusProfiling.IsProfileMode( 'client_api' ):
+        self._num_outstanding += 1
+        
+        d = deferToThreadPool( reactor, self.GetThreadPool(), func, *args, **kwargs )
+        
+        d.addBoth( self._JobDone, time.perf_counter() )
+        
+        return d
+        
+    
+    def GetStatus( self ) -> dict:
+        
+        return {
+            'num_workers' : self._num_workers,
+            'max_queued' : self._max_queued,
+            'num_outstanding' : self._num_outstanding,
+            'num_rejected' : self._num_rejected
+        }
+        
+    
+    def GetThreadPool( self ) -> ThreadPool:
+        
+        if self._thread_pool is None:
             
-            d = deferToThread( self._profileJob, self._threadDoPOSTJob, request )
+            self._thread_pool = ThreadPool( minthreads = 0, maxthreads = self._num_workers, name = self._name )
             
-        else:
+            self._thread_pool.start()
             
-            d = deferToThread( self._threadDoPOSTJob, request )
+            reactor.addSystemEventTrigger( 'during', 'shutdown', self._thread_pool.stop )
             
         
-        d.addCallback( wrap_thread_result )
+        return self._thread_pool
         
-        return d
+    
+    def SetLimits( self, num_workers: int, max_queued: int ):
+        
+        if num_workers != self._num_workers and self._thread_pool is not None:
+            
+            self._thread_pool.adjustPoolsize( minthreads = 0, maxthreads = num_workers )
+            
+        
+        self._num_workers = num_workers
+        self._max_queued = max_queued
+        
+    
+
+class HydrusResource( Resource ):
+    
+    JOB_CLASS = RESOURCE_JOB_CLASS_LIGHT
+    
+    def __init__( self, service, domain ):
+        
+        super().__init__()
+        
+        self._service = service
+        self._service_key = self._service.GetServiceKey()
+        self._domain = domain
+        
+    
+    def _callbackCheckAccountRestrictions( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        return request
+        
+    
+    def _callbackCheckServiceRestrictions( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        self._domain.CheckValid( request.getClientIP() )
+        
+        self._checkService( request )
+        
+        self._checkUserAgent( request )
+        
+        return request
+        
+    
+    def _callbackDoGETJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        return self._deferJob( self._threadDoGETJob, request, self.JOB_CLASS )
+        
+    
+    def _callbackDoOPTIONSJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        # this is just a few headers, so never worth a thread
+        return self._deferJob( self._threadDoOPTIONSJob, request, RESOURCE_JOB_CLASS_TRIVIAL )
+        
+    
+    def _callbackDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        return self._deferJob( self._threadDoPOSTJob, request, self.JOB_CLASS )
         
     
     def _callbackEstablishAccountFromHeader( self, request: HydrusServerRequest.HydrusRequest ):
@@ -670,6 +852,28 @@ class HydrusResource( Resource ):
             
             do_finish = False
             
+        elif response_context.HasBodyChunks():
+            
+            mime = response_context.GetMime()
+            
+            content_type = HC.mime_mimetype_string_lookup[ mime ]
+            
+            request.setHeader( 'Content-Type', content_type )
+            request.setHeader( 'Content-Disposition', content_disposition_type )
+            
+            # we don't know the length yet, so the producer reports it when it is done
+            content_length = 0
+            
+            worker_pool = self._getWorkerPool( self.JOB_CLASS )
+            
+            thread_pool = None if worker_pool is None else worker_pool.GetThreadPool()
+            
+            producer = BodyChunksProducer( request, response_context.GetBodyChunks(), lambda num_bytes: self._reportDataUsed( request, num_bytes ), threaded = response_context.BodyChunksAreThreaded(), thread_pool = thread_pool )
+            
+            producer.start()
+            
+            do_finish = False
+            
         elif response_context.HasBody():
             
             mime = response_context.GetMime()
@@ -770,6 +974,13 @@ class HydrusResource( Resource ):
             
         
     
+    def _getWorkerPool( self, job_class: int ) -> ResourceWorkerPool | None:
+        
+        # None means twisted's shared thread pool
+        
+        return None
+        
+    
     def _profileJob( self, call, request: HydrusServerRequest.HydrusRequest ):
         
         def do_it():
@@ -784,6 +995,47 @@ class HydrusResource( Resource ):
         return request.profile_result
         
     
+    def _deferJob( self, job_callable, request: HydrusServerRequest.HydrusRequest, job_class: int ) -> defer.Deferred:
+        
+        def wrap_thread_result( response_context ):
+            
+            request.hydrus_response_context = response_context
+            
+            return request
+            
+        
+        if HydrusProfiling.IsProfileMode( 'client_api' ):
+            
+            job_args = ( self._profileJob, job_callable, request )
+            
+        else:
+            
+            job_args = ( job_callable, request )
+            
+        
+        if job_class == RESOURCE_JOB_CLASS_TRIVIAL:
+            
+            d = defer.maybeDeferred( *job_args )
+            
+        else:
+            
+            worker_pool = self._getWorkerPool( job_class )
+            
+            if worker_pool is None:
+                
+                d = deferToThread( *job_args )
+                
+            else:
+                
+                d = worker_pool.DeferToThread( *job_args )
+                
+            
+        
+        d.addCallback( wrap_thread_result )
+        
+        return d
+        
+    
     def _DecompressionBombsOK( self, request: HydrusServerRequest.HydrusRequest ):
         
         return False
@@ -890,6 +1142,12 @@ class HydrusResource( Resource ):
                 
                 status_code = 426
                 
+            elif isinstance( e, HydrusExceptions.TooManyRequestsException ):
+                
+                status_code = 429
+                
+                request.setHeader( 'Retry-After', str( e.retry_after ) )
+                
             elif isinstance( e, ( HydrusExceptions.ServerBusyException, HydrusExceptions.ShutdownException ) ):
                 
                 status_code = 503
@@ -1298,7 +1556,7 @@ class HydrusResourceWelcome( HydrusResource ):
     
 class ResponseContext( object ):
     
-    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None, is_attachment = False, max_age = None ):
+    def __init__( self, status_code, mime = HC.APPLICATION_JSON, body = None, path = None, cookies = None, is_attachment = False, max_age = None, body_chunks = None, threaded_body_chunks = False ):
         
         if body is None:
             
@@ -1328,7 +1586,7 @@ class ResponseContext( object ):
         
         if max_age is None:
             
-            if body is not None:
+            if body is not None or body_chunks is not None:
                 
                 max_age = 4
                 
@@ -1341,17 +1599,29 @@ class ResponseContext( object ):
         self._status_code = status_code
         self._mime = mime
         self._body_bytes = body_bytes
+        self._body_chunks = body_chunks
+        self._threaded_body_chunks = threaded_body_chunks
         self._path = path
         self._cookies = cookies
         self._is_attachment = is_attachment
         self._max_age = max_age
         
     
+    def BodyChunksAreThreaded( self ):
+        
+        return self._threaded_body_chunks
+        
+    
     def GetBodyBytes( self ):
         
         return self._body_bytes
         
     
+    def GetBodyChunks( self ):
+        
+        return self._body_chunks
+        
+    
     def GetCookies( self ):
         
         return self._cookies
@@ -1387,6 +1657,11 @@ class ResponseContext( object ):
         return self._body_bytes is not None
         
     
+    def HasBodyChunks( self ):
+        
+        return self._body_chunks is not None
+        
+    
     def HasPath( self ):
         
         return self._path is not None
@@ -62,6 +62,7 @@ try:
     argparser.add_argument( '--db_cache_size', type = int, help = 'override SQLite cache_size per db file, in MB (default=256)' )
     argparser.add_argument( '--db_transaction_commit_period', type = int, help = 'override how often (in seconds) database changes are saved to disk (default=30,min=10)' )
     argparser.add_argument( '--db_synchronous_override', type = int, choices = range(4), help = 'override SQLite Synchronous PRAGMA (default=2)' )
+    argparser.add_argument( '--db_parallel_read_connections', type = int, help = 'override how many read-only db connections can serve simple reads alongside the main one, WAL only (default=2)' )
     argparser.add_argument( '--no_db_temp_files', action='store_true', help = 'run db temp operations entirely in memory' )
     argparser.add_argument( '--boot_debug', action='store_true', help = 'print additional bootup information to the log' )
     argparser.add_argument( '--no_user_static_dir', action='store_true', help = 'do not allow a static dir in the db dir to override the install static dir contents' )
@@ -106,6 +107,15 @@ try:
         HG.db_transaction_commit_period = 30
         
     
+    if result.db_parallel_read_connections is not None:
+        
+        HG.db_num_parallel_read_connections = max( 0, result.db_parallel_read_connections )
+        
+    else:
+        
+        HG.db_num_parallel_read_connections = 2
+        
+    
     if result.db_synchronous_override is not None:
         
         HG.db_synchronous = int( result.db_synchronous_override )
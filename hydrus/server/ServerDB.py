@@ -2077,7 +2077,7 @@ class DB( HydrusDB.HydrusDB ):
         self._RepositoryRegenerateServiceInfo( service_id = service_id )
         
     
-    def _RepositoryCreateUpdate( self, service_key, begin, end ):
+    def _RepositoryCreateUpdate( self, service_key, begin, end, update_encoding = HydrusNetwork.UPDATE_ENCODING_JSON ):
         
         service_id = self._GetServiceId( service_key )
         
@@ -2085,42 +2085,41 @@ class DB( HydrusDB.HydrusDB ):
         
         HydrusData.Print( 'Creating update for ' + repr( name ) + ' from ' + HydrusTime.TimestampToPrettyTime( begin, in_utc = True ) + ' to ' + HydrusTime.TimestampToPrettyTime( end, in_utc = True ) )
         
-        updates = self._RepositoryGenerateUpdates( service_id, begin, end )
-        
         update_hashes = []
         
         total_definition_rows = 0
         total_content_rows = 0
         
-        if len( updates ) > 0:
+        # each update goes to disk as soon as it is made, so we never hold more than one in memory
+        for update in self._RepositoryGenerateUpdates( service_id, begin, end ):
             
-            for update in updates:
-                
-                num_rows = update.GetNumRows()
-                
-                if isinstance( update, HydrusNetwork.DefinitionsUpdate ):
-                    
-                    total_definition_rows += num_rows
-                    
-                elif isinstance( update, HydrusNetwork.ContentUpdate ):
-                    
-                    total_content_rows += num_rows
-                    
+            num_rows = update.GetNumRows()
+            
+            if isinstance( update, HydrusNetwork.DefinitionsUpdate ):
                 
-                update_bytes = update.DumpToNetworkBytes()
+                total_definition_rows += num_rows
                 
-                update_hash = hashlib.sha256( update_bytes ).digest()
+            elif isinstance( update, HydrusNetwork.ContentUpdate ):
                 
-                dest_path = ServerFiles.GetExpectedFilePath( update_hash )
+                total_content_rows += num_rows
                 
-                with open( dest_path, 'wb' ) as f:
-                    
-                    f.write( update_bytes )
-                    
+            
+            update_bytes = HydrusNetwork.DumpUpdateToNetworkBytes( update, update_encoding )
+            
+            update_hash = hashlib.sha256( update_bytes ).digest()
+            
+            dest_path = ServerFiles.GetExpectedFilePath( update_hash )
+            
+            with open( dest_path, 'wb' ) as f:
                 
-                update_hashes.append( update_hash )
+                f.write( update_bytes )
                 
             
+            update_hashes.append( update_hash )
+            
+        
+        if len( update_hashes ) > 0:
+            
             update_table_name = GenerateRepositoryUpdateTableName( service_id )
             
             master_hash_ids = self._GetMasterHashIds( update_hashes )
@@ -2133,7 +2132,7 @@ class DB( HydrusDB.HydrusDB ):
                 
             
         
-        HydrusData.Print( 'Update OK. ' + HydrusNumbers.ToHumanInt( total_definition_rows ) + ' definition rows and ' + HydrusNumbers.ToHumanInt( total_content_rows ) + ' content rows in ' + HydrusNumbers.ToHumanInt( len( updates ) ) + ' update files.' )
+        HydrusData.Print( 'Update OK. ' + HydrusNumbers.ToHumanInt( total_definition_rows ) + ' definition rows and ' + HydrusNumbers.ToHumanInt( total_content_rows ) + ' content rows in ' + HydrusNumbers.ToHumanInt( len( update_hashes ) ) + ' update files.' )
         
         return update_hashes
         
@@ -2524,20 +2523,21 @@ class DB( HydrusDB.HydrusDB ):
         
         service_id = self._GetServiceId( service_key )
         
-        updates = self._RepositoryGenerateUpdates( service_id, begin, end )
+        updates = list( self._RepositoryGenerateUpdates( service_id, begin, end ) )
         
         return updates
         
     
     def _RepositoryGenerateUpdates( self, service_id, begin, end ):
         
+        # this is a generator that yields each update as soon as it fills up, so peak memory is about one update, not the whole period
+        # it reads from db cursors as it goes, so do not touch the db while consuming it!
+        
         MAX_DEFINITIONS_ROWS = 50000
         MAX_CONTENT_ROWS = 250000
         
         MAX_CONTENT_CHUNK = 25000
         
-        updates = []
-        
         definitions_update_builder = HydrusNetwork.UpdateBuilder( HydrusNetwork.DefinitionsUpdate, MAX_DEFINITIONS_ROWS )
         content_update_builder = HydrusNetwork.UpdateBuilder( HydrusNetwork.ContentUpdate, MAX_CONTENT_ROWS )
         
@@ -2549,6 +2549,8 @@ class DB( HydrusDB.HydrusDB ):
             
             definitions_update_builder.AddRow( row )
             
+            yield from definitions_update_builder.PopUpdates()
+            
         
         for ( service_tag_id, tag ) in self._Execute( 'SELECT service_tag_id, tag FROM ' + service_tag_ids_table_name + ' NATURAL JOIN tags WHERE tag_id_timestamp BETWEEN ? AND ?;', ( begin, end ) ):
             
@@ -2556,10 +2558,12 @@ class DB( HydrusDB.HydrusDB ):
             
             definitions_update_builder.AddRow( row )
             
+            yield from definitions_update_builder.PopUpdates()
+            
         
         definitions_update_builder.Finish()
         
-        updates.extend( definitions_update_builder.GetUpdates() )
+        yield from definitions_update_builder.PopUpdates()
         
         #
         
@@ -2573,39 +2577,29 @@ class DB( HydrusDB.HydrusDB ):
             
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, file_row ) )
             
+            yield from content_update_builder.PopUpdates()
+            
         
-        service_hash_ids = [ service_hash_id for ( service_hash_id, ) in self._Execute( 'SELECT service_hash_id FROM ' + deleted_files_table_name + ' WHERE file_timestamp BETWEEN ? AND ?;', ( begin, end ) ) ]
-        
-        for service_hash_id in service_hash_ids:
+        for ( service_hash_id, ) in self._Execute( 'SELECT service_hash_id FROM ' + deleted_files_table_name + ' WHERE file_timestamp BETWEEN ? AND ?;', ( begin, end ) ):
             
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, service_hash_id ) )
             
+            yield from content_update_builder.PopUpdates()
+            
         
         #
         
         ( current_mappings_table_name, deleted_mappings_table_name, pending_mappings_table_name, petitioned_mappings_table_name ) = GenerateRepositoryMappingsTableNames( service_id )
         
-        service_tag_ids_to_service_hash_ids = HydrusData.BuildKeyToListDict( self._Execute( 'SELECT service_tag_id, service_hash_id FROM ' + current_mappings_table_name + ' WHERE mapping_timestamp BETWEEN ? AND ?;', ( begin, end ) ) )
-        
-        for ( service_tag_id, service_hash_ids ) in list(service_tag_ids_to_service_hash_ids.items()):
+        for ( mappings_table_name, action ) in ( ( current_mappings_table_name, HC.CONTENT_UPDATE_ADD ), ( deleted_mappings_table_name, HC.CONTENT_UPDATE_DELETE ) ):
             
-            for block_of_service_hash_ids in HydrusLists.SplitListIntoChunks( service_hash_ids, MAX_CONTENT_CHUNK ):
+            for ( service_tag_id, block_of_service_hash_ids ) in self._RepositoryIterateMappingBlocks( mappings_table_name, begin, end, MAX_CONTENT_CHUNK ):
                 
                 row_weight = len( block_of_service_hash_ids )
                 
-                content_update_builder.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( service_tag_id, block_of_service_hash_ids ) ), row_weight )
+                content_update_builder.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, action, ( service_tag_id, block_of_service_hash_ids ) ), row_weight )
                 
-            
-        
-        service_tag_ids_to_service_hash_ids = HydrusData.BuildKeyToListDict( self._Execute( 'SELECT service_tag_id, service_hash_id FROM ' + deleted_mappings_table_name + ' WHERE mapping_timestamp BETWEEN ? AND ?;', ( begin, end ) ) )
-        
-        for ( service_tag_id, service_hash_ids ) in list(service_tag_ids_to_service_hash_ids.items()):
-            
-            for block_of_service_hash_ids in HydrusLists.SplitListIntoChunks( service_hash_ids, MAX_CONTENT_CHUNK ):
-                
-                row_weight = len( block_of_service_hash_ids )
-                
-                content_update_builder.AddRow( ( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_DELETE, ( service_tag_id, block_of_service_hash_ids ) ), row_weight )
+                yield from content_update_builder.PopUpdates()
                 
             
         
@@ -2627,6 +2621,8 @@ class DB( HydrusDB.HydrusDB ):
             content_update_builder.AddRow( ( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_DELETE, pair ) )
             
         
+        yield from content_update_builder.PopUpdates()
+        
         #
         
         ( current_tag_siblings_table_name, deleted_tag_siblings_table_name, pending_tag_siblings_table_name, petitioned_tag_siblings_table_name ) = GenerateRepositoryTagSiblingsTableNames( service_id )
@@ -2649,9 +2645,7 @@ class DB( HydrusDB.HydrusDB ):
         
         content_update_builder.Finish()
         
-        updates.extend( content_update_builder.GetUpdates() )
-        
-        return updates
+        yield from content_update_builder.PopUpdates()
         
     
     def _RepositoryGetAccountIdsWithProbableActionableAddTagSiblingPetitions( self, service_id: int, bad_master_tag_id: int, good_master_tag_id: int ):
@@ -3912,6 +3906,36 @@ class DB( HydrusDB.HydrusDB ):
         return ( True, mime )
         
     
+    def _RepositoryIterateMappingBlocks( self, mappings_table_name, begin, end, block_size ):
+        
+        # sorted by tag, so we only ever hold one block of one tag's hashes, however big the period is
+        # sqlite does the sort on disk if it has to
+        
+        current_service_tag_id = None
+        block_of_service_hash_ids = []
+        
+        for ( service_tag_id, service_hash_id ) in self._Execute( 'SELECT service_tag_id, service_hash_id FROM ' + mappings_table_name + ' WHERE mapping_timestamp BETWEEN ? AND ? ORDER BY service_tag_id;', ( begin, end ) ):
+            
+            if service_tag_id != current_service_tag_id or len( block_of_service_hash_ids ) >= block_size:
+                
+                if len( block_of_service_hash_ids ) > 0:
+                    
+                    yield ( current_service_tag_id, block_of_service_hash_ids )
+                    
+                
+                current_service_tag_id = service_tag_id
+                block_of_service_hash_ids = []
+                
+            
+            block_of_service_hash_ids.append( service_hash_id )
+            
+        
+        if len( block_of_service_hash_ids ) > 0:
+            
+            yield ( current_service_tag_id, block_of_service_hash_ids )
+            
+        
+    
     def _RepositoryNullifyHistory( self, service_key, begin, end ):
         
         service_id = self._GetServiceId( service_key )
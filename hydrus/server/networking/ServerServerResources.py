@@ -11,6 +11,7 @@ from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusTemp
 from hydrus.core import HydrusTime
 from hydrus.core.networking import HydrusNetwork
+from hydrus.core.networking import HydrusNetworkCompactUpdates
 from hydrus.core.networking import HydrusNetworkVariableHandling
 from hydrus.core.networking import HydrusServerRequest
 from hydrus.core.networking import HydrusServerResources
@@ -376,7 +377,8 @@ class HydrusResourceRestrictedOptions( HydrusResourceRestricted ):
             
             service_options = {
                 'update_period' : self._service.GetUpdatePeriod(),
-                'nullification_period' : self._service.GetNullificationPeriod()
+                'nullification_period' : self._service.GetNullificationPeriod(),
+                'update_encoding' : self._service.GetUpdateEncoding()
             }
             
         else:
@@ -437,6 +439,40 @@ class HydrusResourceRestrictedOptionsModifyNullificationPeriod( HydrusResourceRe
         
     
 
+class HydrusResourceRestrictedOptionsModifyUpdateEncoding( HydrusResourceRestrictedOptionsModify ):
+    
+    def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
+        
+        update_encoding = request.parsed_request_args[ 'update_encoding' ]
+        
+        if update_encoding not in HydrusNetwork.update_encoding_str_lookup:
+            
+            raise HydrusExceptions.BadRequestException( 'Did not understand that update encoding!' )
+            
+        
+        old_update_encoding = self._service.GetUpdateEncoding()
+        
+        if old_update_encoding != update_encoding:
+            
+            # this only affects updates made from now on. old update files stay as they are, since clients know them by their hash
+            
+            self._service.SetUpdateEncoding( update_encoding )
+            
+            HydrusData.Print(
+                'Account {} changed the update encoding from "{}" to "{}".'.format(
+                    request.hydrus_account.GetAccountKey().hex(),
+                    HydrusNetwork.update_encoding_str_lookup[ old_update_encoding ],
+                    HydrusNetwork.update_encoding_str_lookup[ update_encoding ]
+                )
+            )
+            
+        
+        response_context = HydrusServerResources.ResponseContext( 200 )
+        
+        return response_context
+        
+    
+
 class HydrusResourceRestrictedOptionsModifyUpdatePeriod( HydrusResourceRestrictedOptionsModify ):
     
     def _threadDoPOSTJob( self, request: HydrusServerRequest.HydrusRequest ):
@@ -1287,6 +1323,29 @@ class HydrusResourceRestrictedUpdate( HydrusResourceRestricted ):
         
         path = ServerFiles.GetFilePath( update_hash )
         
+        with open( path, 'rb' ) as f:
+            
+            update_is_compact = HydrusNetworkCompactUpdates.IsCompactUpdateBytes( f.read( len( HydrusNetworkCompactUpdates.COMPACT_UPDATE_MAGIC ) ) )
+            
+        
+        if update_is_compact:
+            
+            client_update_encodings = set()
+            
+            if request.requestHeaders.hasHeader( HydrusNetwork.UPDATE_ENCODINGS_HEADER ):
+                
+                for header_text in request.requestHeaders.getRawHeaders( HydrusNetwork.UPDATE_ENCODINGS_HEADER ):
+                    
+                    client_update_encodings.update( ( encoding.strip() for encoding in header_text.split( ',' ) ) )
+                    
+                
+            
+            if HydrusNetwork.update_encoding_str_lookup[ HydrusNetwork.UPDATE_ENCODING_COMPACT ] not in client_update_encodings:
+                
+                raise HydrusExceptions.NetworkVersionException( 'This update is in the compact update format, which your client does not understand. Please update your client!' )
+                
+            
+        
         response_context = HydrusServerResources.ResponseContext( 200, mime = HC.APPLICATION_OCTET_STREAM, path = path )
         
         return response_context
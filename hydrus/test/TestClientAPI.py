@@ -3,6 +3,7 @@ import http.client
 import json
 import os
 import random
+import threading
 import time
 import typing
 import unittest
@@ -12,6 +13,7 @@ import urllib.parse
 from unittest import mock
 
 from twisted.internet import reactor
+from twisted.internet.threads import blockingCallFromThread
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
@@ -24,6 +26,7 @@ from hydrus.core import HydrusText
 from hydrus.core import HydrusTime
 from hydrus.core.files import HydrusFilesPhysicalStorage
 from hydrus.core.files.images import HydrusImageHandling
+from hydrus.core.networking import HydrusServerResources
 
 from hydrus.client import ClientAPI
 from hydrus.client import ClientConstants as CC
@@ -5392,6 +5395,34 @@ class TestClientAPI( unittest.TestCase ):
         
         self.assertEqual( len( file_search_context.GetPredicates() ), 2 )
         
+        #
+        
+        path = '/manage_database/get_cache_stats'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        cache_stats = d[ 'cache_stats' ]
+        
+        self.assertEqual( set( cache_stats.keys() ), { 'image_cache', 'image_tile_cache', 'thumbnail_cache' } )
+        
+        for stats in cache_stats.values():
+            
+            for key in ( 'num_items', 'size_bytes', 'size_limit_bytes', 'hits', 'misses', 'evictions', 'evicted_bytes' ):
+                
+                self.assertIn( key, stats )
+                
+            
+        
     
     def _test_manage_duplicates( self, connection, set_up_permissions ):
         
@@ -7535,6 +7566,135 @@ class TestClientAPI( unittest.TestCase ):
         self.assertEqual( response.status, 200 )
         
     
+    def _test_search_files_cursor( self, connection, set_up_permissions ):
+        
+        api_permissions = set_up_permissions[ 'everything' ]
+        
+        access_key_hex = api_permissions.GetAccessKey().hex()
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex }
+        
+        media_results = [ HF.GetFakeMediaResult( os.urandom( 32 ) ) for i in range( 5 ) ]
+        
+        hash_ids = [ media_result.GetHashId() for media_result in media_results ]
+        
+        # make the cursor
+        
+        TG.test_controller.ClearReads( 'file_query_ids' )
+        
+        TG.test_controller.SetRead( 'file_query_ids', list( hash_ids ) )
+        
+        tags = [ 'kino' ]
+        
+        path = '/get_files/search_files?tags={}&return_cursor=true'.format( urllib.parse.quote( json.dumps( tags ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( str( data, 'utf-8' ) )
+        
+        self.assertEqual( d[ 'num_file_ids' ], 5 )
+        self.assertNotIn( 'file_ids', d )
+        
+        cursor = d[ 'cursor' ]
+        
+        # first page
+        
+        path = '/get_files/search_files_page?cursor={}&limit=2'.format( cursor )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( str( data, 'utf-8' ) )
+        
+        self.assertEqual( d[ 'file_ids' ], hash_ids[ : 2 ] )
+        self.assertEqual( d[ 'num_file_ids' ], 5 )
+        self.assertIsNotNone( d[ 'next_cursor' ] )
+        
+        # second page, with metadata, which streams a batch at a time
+        
+        with mock.patch( 'hydrus.client.networking.api.ClientLocalServerResourcesGetFiles.SEARCH_FILES_PAGE_METADATA_BATCH_SIZE', 1 ):
+            
+            TG.test_controller.ClearReads( 'media_results_from_ids' )
+            
+            TG.test_controller.SetRead( 'media_results_from_ids', media_results[ 2 : 4 ] )
+            
+            path = '/get_files/search_files_page?cursor={}&limit=2&include_metadata=true'.format( d[ 'next_cursor' ] )
+            
+            connection.request( 'GET', path, headers = headers )
+            
+            response = connection.getresponse()
+            
+            data = response.read()
+            
+            self.assertEqual( response.status, 200 )
+            self.assertEqual( response.getheader( 'Transfer-Encoding' ), 'chunked' )
+            
+            d = json.loads( str( data, 'utf-8' ) )
+            
+            self.assertEqual( d[ 'file_ids' ], hash_ids[ 2 : 4 ] )
+            self.assertEqual( [ row[ 'file_id' ] for row in d[ 'metadata' ] ], hash_ids[ 2 : 4 ] )
+            self.assertEqual( [ row[ 'hash' ] for row in d[ 'metadata' ] ], [ media_result.GetHash().hex() for media_result in media_results[ 2 : 4 ] ] )
+            self.assertIn( 'version', d )
+            
+            self.assertEqual( [ args for ( args, kwargs ) in TG.test_controller.GetRead( 'media_results_from_ids' ) ], [ ( [ hash_ids[2] ], ), ( [ hash_ids[3] ], ) ] )
+            
+        
+        # last page
+        
+        path = '/get_files/search_files_page?cursor={}&limit=2&return_hashes=true'.format( d[ 'next_cursor' ] )
+        
+        TG.test_controller.SetRead( 'hash_ids_to_hashes', { hash_ids[4] : media_results[4].GetHash() } )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( str( data, 'utf-8' ) )
+        
+        self.assertEqual( d[ 'file_ids' ], hash_ids[ 4 : ] )
+        self.assertEqual( d[ 'hashes' ], [ media_results[4].GetHash().hex() ] )
+        self.assertIsNone( d[ 'next_cursor' ] )
+        
+        # an unknown cursor
+        
+        path = '/get_files/search_files_page?cursor={}'.format( ClientAPI.ConvertSearchCursorToToken( os.urandom( 32 ), 0 ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 404 )
+        
+        # a garbage cursor
+        
+        path = '/get_files/search_files_page?cursor=abcdef'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 400 )
+        
+    
     def _test_search_files_predicate_parsing( self, connection, set_up_permissions ):
         
         # some file search param parsing
@@ -7688,6 +7848,119 @@ class TestClientAPI( unittest.TestCase ):
             
         
     
+    def _test_file_changes( self, connection, set_up_permissions ):
+        
+        api_permissions = set_up_permissions[ 'everything' ]
+        
+        access_key_hex = api_permissions.GetAccessKey().hex()
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex }
+        
+        hash_1 = os.urandom( 32 )
+        hash_2 = os.urandom( 32 )
+        
+        changes = [
+            ( 5, 11, hash_1, HC.CONTENT_TYPE_MAPPINGS, 1700000000123 ),
+            ( 8, 12, hash_2, HC.CONTENT_TYPE_FILES, 1700000001000 )
+        ]
+        
+        TG.test_controller.SetRead( 'file_change_journal', ( changes, 9 ) )
+        
+        path = '/get_files/file_changes?since=4&limit=2'
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        text = str( data, 'utf-8' )
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( text )
+        
+        expected_result = {
+            'changes' : [
+                {
+                    'sequence' : 5,
+                    'file_id' : 11,
+                    'hash' : hash_1.hex(),
+                    'change_type' : 'tags',
+                    'time' : 1700000000.123
+                },
+                {
+                    'sequence' : 8,
+                    'file_id' : 12,
+                    'hash' : hash_2.hex(),
+                    'change_type' : 'locations',
+                    'time' : 1700000001.0
+                }
+            ],
+            'next_since' : 8,
+            'latest_sequence' : 9
+        }
+        
+        wash_example_json_response( expected_result )
+        
+        self.assertEqual( d, expected_result )
+        
+        [ ( args, kwargs ) ] = TG.test_controller.GetRead( 'file_change_journal' )
+        
+        self.assertEqual( args, ( 4, 2 ) )
+        
+        # nothing new
+        
+        TG.test_controller.SetRead( 'file_change_journal', ( [], 9 ) )
+        
+        connection.request( 'GET', '/get_files/file_changes?since=9', headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( str( data, 'utf-8' ) )
+        
+        self.assertEqual( d[ 'changes' ], [] )
+        self.assertEqual( d[ 'next_since' ], 9 )
+        
+        [ ( args, kwargs ) ] = TG.test_controller.GetRead( 'file_change_journal' )
+        
+        self.assertEqual( args, ( 9, 1024 ) )
+        
+        # bad args
+        
+        connection.request( 'GET', '/get_files/file_changes?since=-1', headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 400 )
+        
+        # a key that can only see some files cannot list them all
+        
+        api_permissions = set_up_permissions[ 'search_green_files' ]
+        
+        access_key_hex = api_permissions.GetAccessKey().hex()
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex }
+        
+        TG.test_controller.SetRead( 'file_change_journal', ( changes, 9 ) )
+        
+        connection.request( 'GET', '/get_files/file_changes?since=4', headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 403 )
+        
+        self.assertEqual( TG.test_controller.GetRead( 'file_change_journal' ), [] )
+        
+    
     def _test_file_hashes( self, connection, set_up_permissions ):
         
         api_permissions = set_up_permissions[ 'everything' ]
@@ -8589,6 +8862,82 @@ class TestClientAPI( unittest.TestCase ):
         self.assertEqual( d, expected_result )
         
     
+    def _test_file_metadata_fields_and_ndjson( self, connection, set_up_permissions ):
+        
+        api_permissions = set_up_permissions[ 'everything' ]
+        
+        access_key_hex = api_permissions.GetAccessKey().hex()
+        
+        headers = { 'Hydrus-Client-API-Access-Key' : access_key_hex }
+        
+        media_results = [ HF.GetFakeMediaResult( os.urandom( 32 ) ) for i in range( 5 ) ]
+        
+        hashes = [ media_result.GetHash() for media_result in media_results ]
+        
+        TG.test_controller.SetRead( 'hash_ids_to_hashes', { media_result.GetHashId() : media_result.GetHash() for media_result in media_results } )
+        TG.test_controller.SetRead( 'media_results_from_ids', media_results )
+        
+        # fields
+        
+        path = '/get_files/file_metadata?hashes={}&fields={}'.format( urllib.parse.quote( json.dumps( [ hash.hex() for hash in hashes ] ) ), urllib.parse.quote( json.dumps( [ 'status', 'urls' ] ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 200 )
+        
+        d = json.loads( str( data, 'utf-8' ) )
+        
+        self.assertEqual( [ row[ 'hash' ] for row in d[ 'metadata' ] ], [ hash.hex() for hash in hashes ] )
+        
+        for row in d[ 'metadata' ]:
+            
+            self.assertEqual( set( row.keys() ), { 'file_id', 'hash', 'is_inbox', 'is_local', 'is_trashed', 'is_deleted', 'known_urls', 'ipfs_multihashes' } )
+            
+        
+        # bad fields
+        
+        path = '/get_files/file_metadata?hashes={}&fields={}'.format( urllib.parse.quote( json.dumps( [ hash.hex() for hash in hashes ] ) ), urllib.parse.quote( json.dumps( [ 'status', 'pony' ] ) ) )
+        
+        connection.request( 'GET', path, headers = headers )
+        
+        response = connection.getresponse()
+        
+        data = response.read()
+        
+        self.assertEqual( response.status, 400 )
+        
+        # ndjson, in batches
+        
+        with mock.patch( 'hydrus.client.networking.api.ClientLocalServerResourcesGetFiles.FILE_METADATA_NDJSON_BATCH_SIZE', 2 ):
+            
+            TG.test_controller.ClearReads( 'media_results_from_ids' )
+            
+            path = '/get_files/file_metadata?hashes={}&fields={}&response_format=ndjson'.format( urllib.parse.quote( json.dumps( [ hash.hex() for hash in hashes ] ) ), urllib.parse.quote( json.dumps( [ 'file_info' ] ) ) )
+            
+            connection.request( 'GET', path, headers = headers )
+            
+            response = connection.getresponse()
+            
+            data = response.read()
+            
+            self.assertEqual( response.status, 200 )
+            self.assertEqual( response.getheader( 'Content-Type' ), 'application/x-ndjson' )
+            self.assertEqual( response.getheader( 'Transfer-Encoding' ), 'chunked' )
+            
+            rows = [ json.loads( line ) for line in str( data, 'utf-8' ).splitlines() ]
+            
+            self.assertEqual( [ row[ 'hash' ] for row in rows ], [ hash.hex() for hash in hashes ] )
+            self.assertEqual( [ row[ 'size' ] for row in rows ], [ media_result.GetFileInfoManager().size for media_result in media_results ] )
+            self.assertNotIn( 'tags', rows[0] )
+            
+            self.assertEqual( len( TG.test_controller.GetRead( 'media_results_from_ids' ) ), 3 )
+            
+        
+    
     def _test_get_files( self, connection, set_up_permissions ):
         
         # files and thumbs
@@ -9041,14 +9390,18 @@ class TestClientAPI( unittest.TestCase ):
         self._test_manage_pages( connection, set_up_permissions )
         self._test_search_files( connection, set_up_permissions )
         
+        self._test_search_files_cursor( connection, set_up_permissions )
+        
         if CBOR_AVAILABLE:
             
             self._test_cbor( connection, set_up_permissions )
             
         
         self._test_search_files_predicate_parsing( connection, set_up_permissions )
+        self._test_file_changes( connection, set_up_permissions )
         self._test_file_hashes( connection, set_up_permissions )
         self._test_file_metadata( connection, set_up_permissions )
+        self._test_file_metadata_fields_and_ndjson( connection, set_up_permissions )
         self._test_get_files( connection, set_up_permissions )
         self._test_permission_failures( connection, set_up_permissions )
         self._test_cors_fails( connection )
@@ -9064,3 +9417,51 @@ class TestClientAPI( unittest.TestCase ):
         self._test_cors_succeeds( connection )
         
     
+    def test_worker_pool( self ):
+        
+        worker_pool = HydrusServerResources.ResourceWorkerPool( 'test worker', 1, 1 )
+        
+        release_event = threading.Event()
+        
+        def work():
+            
+            release_event.wait( 10 )
+            
+            return 'done'
+            
+        
+        def queue_up():
+            
+            return [ worker_pool.DeferToThread( work ) for i in range( 2 ) ]
+            
+        
+        # one working, one waiting
+        blockingCallFromThread( reactor, queue_up )
+        
+        self.assertEqual( worker_pool.GetStatus()[ 'num_outstanding' ], 2 )
+        
+        with self.assertRaises( HydrusExceptions.TooManyRequestsException ) as context:
+            
+            blockingCallFromThread( reactor, worker_pool.DeferToThread, work )
+            
+        
+        self.assertTrue( 1 <= context.exception.retry_after <= 60 )
+        self.assertEqual( worker_pool.GetStatus()[ 'num_rejected' ], 1 )
+        
+        release_event.set()
+        
+        for i in range( 100 ):
+            
+            if worker_pool.GetStatus()[ 'num_outstanding' ] == 0:
+                
+                break
+                
+            
+            time.sleep( 0.05 )
+            
+        
+        self.assertEqual( worker_pool.GetStatus()[ 'num_outstanding' ], 0 )
+        
+        self.assertEqual( blockingCallFromThread( reactor, worker_pool.DeferToThread, work ), 'done' )
+        
+    
@@ -0,0 +1,380 @@
+import os
+import tempfile
+import time
+import unittest
+
+from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+from hydrus.core import HydrusPaths
+
+from hydrus.client.caches import ClientCachesBase
+from hydrus.client.caches import ClientThumbnailPacks
+
+from hydrus.test import TestGlobals as TG
+
+class FakeCacheableObject( ClientCachesBase.CacheableObject ):
+    
+    def __init__( self, size ):
+        
+        self._size = size
+        
+    
+    def GetEstimatedMemoryFootprint( self ) -> int:
+        
+        return self._size
+        
+    
+    def IsFinishedLoading( self ):
+        
+        return True
+        
+    
+
+class FakeMediaResult( object ):
+    
+    def __init__( self ):
+        
+        self._hash = HydrusData.GenerateKey()
+        
+    
+    def GetHash( self ):
+        
+        return self._hash
+        
+    
+    def GetMime( self ):
+        
+        return HC.IMAGE_JPEG
+        
+    
+
+class FakeMedia( object ):
+    
+    def __init__( self ):
+        
+        self._media_result = FakeMediaResult()
+        
+    
+    def GetDisplayMediaResult( self ):
+        
+        return self._media_result
+        
+    
+
+class TestDataCache( unittest.TestCase ):
+    
+    def _do_scan( self, eviction_policy ):
+        
+        data_cache = ClientCachesBase.DataCache( TG.test_controller, 'test cache', 100, eviction_policy = eviction_policy )
+        
+        working_set = [ 'working {}'.format( i ) for i in range( 5 ) ]
+        
+        for key in working_set:
+            
+            data_cache.AddData( key, FakeCacheableObject( 10 ) )
+            
+        
+        # a separate, later access
+        
+        for key in working_set:
+            
+            data_cache.GetData( key )
+            
+        
+        # now a big one-off scan, much bigger than the cache
+        
+        for i in range( 100 ):
+            
+            key = 'scan {}'.format( i )
+            
+            data_cache.AddData( key, FakeCacheableObject( 10 ) )
+            
+            data_cache.GetData( key )
+            
+        
+        return ( data_cache, working_set )
+        
+    
+    def test_lru( self ):
+        
+        ( data_cache, working_set ) = self._do_scan( ClientCachesBase.CACHE_EVICTION_POLICY_LRU )
+        
+        self.assertFalse( any( data_cache.HasData( key ) for key in working_set ) )
+        
+        stats = data_cache.GetStats()
+        
+        self.assertEqual( stats[ 'adds' ], 105 )
+        self.assertEqual( stats[ 'hits' ], 105 )
+        self.assertEqual( stats[ 'misses' ], 0 )
+        self.assertEqual( stats[ 'evictions' ], 105 - stats[ 'num_items' ] )
+        self.assertEqual( stats[ 'evicted_bytes' ], stats[ 'evictions' ] * 10 )
+        self.assertLessEqual( stats[ 'size_bytes' ], 110 )
+        
+        self.assertIsNone( data_cache.GetIfHasData( 'working 0' ) )
+        
+        self.assertEqual( data_cache.GetStats()[ 'misses' ], 1 )
+        
+    
+    def test_segmented_lru( self ):
+        
+        correlated_access_period = ClientCachesBase.DataCacheEvictionPolicySegmentedLRU.CORRELATED_ACCESS_PERIOD
+        
+        ClientCachesBase.DataCacheEvictionPolicySegmentedLRU.CORRELATED_ACCESS_PERIOD = 0.0
+        
+        try:
+            
+            ( data_cache, working_set ) = self._do_scan( ClientCachesBase.CACHE_EVICTION_POLICY_SEGMENTED_LRU )
+            
+        finally:
+            
+            ClientCachesBase.DataCacheEvictionPolicySegmentedLRU.CORRELATED_ACCESS_PERIOD = correlated_access_period
+            
+        
+        # the scan items were promoted too, since we turned off the correlated period, but the protected segment is bounded, so the scan churns through it in order
+        # what matters is the cache never grew past its limit and the counters add up
+        
+        stats = data_cache.GetStats()
+        
+        self.assertLessEqual( stats[ 'size_bytes' ], 110 )
+        self.assertLessEqual( stats[ 'protected_bytes' ], stats[ 'protected_bytes_limit' ] )
+        self.assertEqual( stats[ 'num_probationary' ] + stats[ 'num_protected' ], stats[ 'num_items' ] )
+        self.assertEqual( stats[ 'evictions' ], 105 - stats[ 'num_items' ] )
+        
+        # and now the normal case, where the scan's add-then-paint is one correlated use and does not promote
+        
+        ( data_cache, working_set ) = self._do_scan( ClientCachesBase.CACHE_EVICTION_POLICY_SEGMENTED_LRU )
+        
+        stats = data_cache.GetStats()
+        
+        self.assertLessEqual( stats[ 'size_bytes' ], 110 )
+        self.assertEqual( stats[ 'promotions' ], 0 )
+        
+    
+    def test_segmented_lru_protects_working_set( self ):
+        
+        data_cache = ClientCachesBase.DataCache( TG.test_controller, 'test cache', 100, eviction_policy = ClientCachesBase.CACHE_EVICTION_POLICY_SEGMENTED_LRU )
+        
+        working_set = [ 'working {}'.format( i ) for i in range( 5 ) ]
+        
+        for key in working_set:
+            
+            data_cache.AddData( key, FakeCacheableObject( 10 ) )
+            
+        
+        correlated_access_period = ClientCachesBase.DataCacheEvictionPolicySegmentedLRU.CORRELATED_ACCESS_PERIOD
+        
+        ClientCachesBase.DataCacheEvictionPolicySegmentedLRU.CORRELATED_ACCESS_PERIOD = 0.0
+        
+        try:
+            
+            for key in working_set:
+                
+                data_cache.GetData( key )
+                
+            
+        finally:
+            
+            ClientCachesBase.DataCacheEvictionPolicySegmentedLRU.CORRELATED_ACCESS_PERIOD = correlated_access_period
+            
+        
+        self.assertEqual( data_cache.GetStats()[ 'promotions' ], 5 )
+        
+        for i in range( 100 ):
+            
+            key = 'scan {}'.format( i )
+            
+            data_cache.AddData( key, FakeCacheableObject( 10 ) )
+            
+            data_cache.GetData( key )
+            
+        
+        self.assertTrue( all( data_cache.HasData( key ) for key in working_set ) )
+        
+        # switching policy keeps everything we have
+        
+        num_items = data_cache.GetStats()[ 'num_items' ]
+        
+        data_cache.SetEvictionPolicy( ClientCachesBase.CACHE_EVICTION_POLICY_LRU )
+        
+        self.assertEqual( data_cache.GetStats()[ 'num_items' ], num_items )
+        self.assertEqual( data_cache.GetStats()[ 'eviction_policy' ], ClientCachesBase.cache_eviction_policy_str_lookup[ ClientCachesBase.CACHE_EVICTION_POLICY_LRU ] )
+        
+        data_cache.MaintainCache()
+        
+        self.assertTrue( all( data_cache.HasData( key ) for key in working_set ) )
+        
+    
+
+class TestThumbnailPackStore( unittest.TestCase ):
+    
+    def test_pack_store( self ):
+        
+        directory = tempfile.mkdtemp()
+        
+        try:
+            
+            pack_directory = os.path.join( directory, 'client_thumbnail_packs' )
+            
+            thumbnail_pack_store = ClientThumbnailPacks.ThumbnailPackStore( pack_directory )
+            
+            hashes_to_bytes = { os.urandom( 32 ) : os.urandom( 1000 + i ) for i in range( 20 ) }
+            
+            for ( hash, thumbnail_bytes ) in hashes_to_bytes.items():
+                
+                thumbnail_pack_store.AddThumbnailBytes( hash, thumbnail_bytes )
+                
+            
+            thumbnail_pack_store.WillNeed( list( hashes_to_bytes.keys() ) )
+            
+            for ( hash, thumbnail_bytes ) in hashes_to_bytes.items():
+                
+                self.assertEqual( thumbnail_pack_store.GetThumbnailBytes( hash ), thumbnail_bytes )
+                
+            
+            self.assertIsNone( thumbnail_pack_store.GetThumbnailBytes( os.urandom( 32 ) ) )
+            
+            ( deleted_hash, replaced_hash ) = list( hashes_to_bytes.keys() )[ : 2 ]
+            
+            thumbnail_pack_store.DeleteThumbnails( ( deleted_hash, ) )
+            
+            del hashes_to_bytes[ deleted_hash ]
+            
+            hashes_to_bytes[ replaced_hash ] = b'new thumbnail'
+            
+            thumbnail_pack_store.AddThumbnailBytes( replaced_hash, hashes_to_bytes[ replaced_hash ] )
+            
+            self.assertIsNone( thumbnail_pack_store.GetThumbnailBytes( deleted_hash ) )
+            self.assertEqual( thumbnail_pack_store.GetThumbnailBytes( replaced_hash ), b'new thumbnail' )
+            
+            # a reader still copying out of an mmap keeps it open while the pack is remapped
+            
+            ( pack_num, offset, length ) = thumbnail_pack_store._hashes_to_locations[ replaced_hash ]
+            
+            old_mm = thumbnail_pack_store._GetMMap( pack_num, offset + length )
+            
+            thumbnail_pack_store._mmap_ids_to_num_readers[ id( old_mm ) ] += 1
+            
+            new_hash = os.urandom( 32 )
+            
+            hashes_to_bytes[ new_hash ] = os.urandom( 2000 )
+            
+            thumbnail_pack_store.AddThumbnailBytes( new_hash, hashes_to_bytes[ new_hash ] )
+            
+            self.assertEqual( thumbnail_pack_store.GetThumbnailBytes( new_hash ), hashes_to_bytes[ new_hash ] )
+            
+            self.assertFalse( old_mm.closed )
+            self.assertEqual( old_mm[ offset : offset + length ], b'new thumbnail' )
+            
+            thumbnail_pack_store._ReleaseMMap( old_mm )
+            
+            self.assertTrue( old_mm.closed )
+            
+            thumbnail_pack_store.Close()
+            
+            # a crash halfway through an index write
+            
+            with open( os.path.join( pack_directory, ClientThumbnailPacks.INDEX_FILENAME ), 'ab' ) as f:
+                
+                f.write( b'abc' )
+                
+            
+            thumbnail_pack_store = ClientThumbnailPacks.ThumbnailPackStore( pack_directory )
+            
+            self.assertEqual( thumbnail_pack_store.GetStats()[ 'num_thumbnails' ], len( hashes_to_bytes ) )
+            
+            self.assertFalse( thumbnail_pack_store.HasThumbnail( deleted_hash ) )
+            
+            for ( hash, thumbnail_bytes ) in hashes_to_bytes.items():
+                
+                self.assertEqual( thumbnail_pack_store.GetThumbnailBytes( hash ), thumbnail_bytes )
+                
+            
+            thumbnail_pack_store.Close()
+            
+            self.assertIsNone( thumbnail_pack_store.GetThumbnailBytes( replaced_hash ) )
+            
+            ClientThumbnailPacks.DeleteThumbnailPackStore( pack_directory )
+            
+            self.assertFalse( os.path.exists( pack_directory ) )
+            
+        finally:
+            
+            HydrusPaths.DeletePath( directory )
+            
+        
+    
+
+class TestThumbnailWaterfall( unittest.TestCase ):
+    
+    def _do_waterfall_test( self, work_time, cancel ):
+        
+        thumbnail_cache = TG.test_controller.thumbnails_cache
+        
+        published = []
+        
+        def pub( topic, *args, **kwargs ):
+            
+            if topic == 'waterfall_thumbnails':
+                
+                published.append( args )
+                
+            
+        
+        def get_thumbnail( media_result ):
+            
+            time.sleep( work_time )
+            
+        
+        page_key = HydrusData.GenerateKey()
+        
+        medias = [ FakeMedia() for i in range( 40 ) ]
+        
+        TG.test_controller.pub = pub
+        thumbnail_cache.GetThumbnail = get_thumbnail
+        
+        try:
+            
+            thumbnail_cache.Waterfall( page_key, medias )
+            
+            if cancel:
+                
+                thumbnail_cache.CancelWaterfall( page_key, medias )
+                
+            
+            thumbnail_cache.WaitUntilFree()
+            
+            time.sleep( work_time * 10 + 0.5 )
+            
+        finally:
+            
+            del TG.test_controller.pub
+            del thumbnail_cache.GetThumbnail
+            
+        
+        return ( medias, published )
+        
+    
+    def test_cancel( self ):
+        
+        ( medias, published ) = self._do_waterfall_test( 0.05, True )
+        
+        self.assertEqual( published, [] )
+        
+    
+    def test_page_order( self ):
+        
+        ( medias, published ) = self._do_waterfall_test( 0.001, False )
+        
+        self.assertGreater( len( published ), 1 )
+        
+        published_medias = []
+        
+        for ( page_key, rendered_medias ) in published:
+            
+            published_medias.extend( rendered_medias )
+            
+        
+        # in order within each batch and across them
+        self.assertEqual( [ medias.index( media ) for media in published_medias ], list( range( len( medias ) ) ) )
+        
+    
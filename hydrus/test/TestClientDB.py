@@ -1,13 +1,20 @@
+import hashlib
 import os
+import sqlite3
 import time
 import typing
 import unittest
+from unittest import mock
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusData
+from hydrus.core import HydrusDB
+from hydrus.core import HydrusGlobals as HG
 from hydrus.core import HydrusNumbers
+from hydrus.core import HydrusPaths
 from hydrus.core import HydrusSerialisable
 from hydrus.core import HydrusStaticDir
+from hydrus.core import HydrusTemp
 from hydrus.core import HydrusTime
 from hydrus.core.files import HydrusFilesPhysicalStorage
 from hydrus.core.files.images import HydrusImageHandling
@@ -18,7 +25,9 @@ from hydrus.client import ClientDefaults
 from hydrus.client import ClientLocation
 from hydrus.client import ClientServices
 from hydrus.client.db import ClientDB
+from hydrus.client.db import ClientDBFilesSearch
 from hydrus.client.exporting import ClientExportingFiles
+from hydrus.client.files import ClientFilesMaintenance
 from hydrus.client.files import ClientFilesPhysical
 from hydrus.client.files.images import ClientImagePerceptualHashes
 from hydrus.client.gui.pages import ClientGUIPageManager
@@ -28,6 +37,8 @@ from hydrus.client.importing import ClientImportFiles
 from hydrus.client.importing.options import ImportOptionsConstants as IOC
 from hydrus.client.importing.options import ImportOptionsContainer
 from hydrus.client.importing.options import ImportOptionsManager
+from hydrus.client.media import ClientMediaResultCache
+from hydrus.client.networking import ClientNetworkingDomain
 from hydrus.client.metadata import ClientContentUpdates
 from hydrus.client.metadata import ClientTags
 from hydrus.client.search import ClientNumberTest
@@ -259,6 +270,91 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( result.GetName(), export_folder.GetName() )
         
     
+    def test_file_change_journal( self ):
+        
+        TestClientDB._clear_db()
+        
+        self.assertEqual( self._read( 'file_change_journal', 0, 100 ), ( [], 0 ) )
+        
+        path = HydrusStaticDir.GetStaticPath( 'hydrus.png' )
+        
+        full_import_options_container = ImportOptionsManager.ImportOptionsManager.STATICGetDefaultInitialisedManager().GetDefaultImportOptionsContainerForCallerType( IOC.IMPORT_OPTIONS_CALLER_TYPE_GLOBAL )
+        
+        file_import_job = ClientImportFiles.FileImportJob( path, full_import_options_container )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        ( changes, latest_sequence ) = self._read( 'file_change_journal', 0, 100 )
+        
+        # several file domains changed, but the journal only holds one row per file per content type
+        self.assertEqual( [ ( change_hash, content_type ) for ( sequence_id, hash_id, change_hash, content_type, timestamp_ms ) in changes ], [ ( hash, HC.CONTENT_TYPE_FILES ) ] )
+        self.assertEqual( changes[0][0], latest_sequence )
+        
+        files_sequence = latest_sequence
+        
+        content_update_package = ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdate( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', content_update_package )
+        
+        ( changes, latest_sequence ) = self._read( 'file_change_journal', files_sequence, 100 )
+        
+        self.assertEqual( [ ( change_hash, content_type ) for ( sequence_id, hash_id, change_hash, content_type, timestamp_ms ) in changes ], [ ( hash, HC.CONTENT_TYPE_MAPPINGS ) ] )
+        self.assertGreater( latest_sequence, files_sequence )
+        
+        # a second change moves the file to the end
+        
+        content_update_package = ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdate( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'bus', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', content_update_package )
+        
+        ( changes, new_latest_sequence ) = self._read( 'file_change_journal', 0, 100 )
+        
+        self.assertEqual( [ ( change_hash, content_type ) for ( sequence_id, hash_id, change_hash, content_type, timestamp_ms ) in changes ], [ ( hash, HC.CONTENT_TYPE_FILES ), ( hash, HC.CONTENT_TYPE_MAPPINGS ) ] )
+        self.assertGreater( new_latest_sequence, latest_sequence )
+        
+        self.assertEqual( self._read( 'file_change_journal', new_latest_sequence, 100 ), ( [], new_latest_sequence ) )
+        
+        # and the limit works
+        
+        ( changes, latest_sequence ) = self._read( 'file_change_journal', 0, 1 )
+        
+        self.assertEqual( len( changes ), 1 )
+        self.assertEqual( changes[0][0], files_sequence )
+        
+    
+    def test_file_maintenance_jobs( self ):
+        
+        TestClientDB._clear_db()
+        
+        hash = HydrusData.GenerateKey()
+        
+        job_types = [
+            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_BLURHASH,
+            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_FILE_MODIFIED_TIMESTAMP,
+            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_OTHER_HASHES,
+            ClientFilesMaintenance.REGENERATE_FILE_DATA_JOB_PIXEL_HASH
+        ]
+        
+        for job_type in reversed( job_types ):
+            
+            self._write( 'file_maintenance_add_jobs_hashes', { hash }, job_type )
+            
+        
+        # all of a file's jobs come together, in run order
+        
+        self.assertEqual( self._read( 'file_maintenance_get_jobs' ), { hash : job_types } )
+        
+        self._write( 'file_maintenance_clear_jobs', [ ( hash, job_type, None ) for job_type in job_types ] )
+        
+        self.assertEqual( self._read( 'file_maintenance_get_jobs' ), {} )
+        
+    
     def test_file_query_ids( self ):
         
         TestClientDB._clear_db()
@@ -795,6 +891,107 @@ class TestClientDB( unittest.TestCase ):
         run_system_predicate_tests( tests )
         
     
+    def test_file_query_ids_cache( self ):
+        
+        TestClientDB._clear_db()
+        
+        search_result_cache = self._db.modules_files_query._search_result_cache
+        
+        location_context = ClientLocation.LocationContext.STATICCreateSimple( CC.LOCAL_FILE_SERVICE_KEY )
+        tag_context = ClientSearchTagContext.TagContext( service_key = CC.DEFAULT_LOCAL_TAG_SERVICE_KEY )
+        
+        tag_search_context = ClientSearchFileSearchContext.FileSearchContext( location_context = location_context, tag_context = tag_context, predicates = [ ClientSearchPredicate.Predicate( ClientSearchPredicate.PREDICATE_TYPE_TAG, 'car' ) ] )
+        inbox_search_context = ClientSearchFileSearchContext.FileSearchContext( location_context = location_context, tag_context = tag_context, predicates = [ ClientSearchPredicate.Predicate( ClientSearchPredicate.PREDICATE_TYPE_SYSTEM_INBOX ) ] )
+        
+        full_import_options_container = ImportOptionsManager.ImportOptionsManager.STATICGetDefaultInitialisedManager().GetDefaultImportOptionsContainerForCallerType( IOC.IMPORT_OPTIONS_CALLER_TYPE_GLOBAL )
+        
+        file_import_job = ClientImportFiles.FileImportJob( HydrusStaticDir.GetStaticPath( 'hydrus.png' ), full_import_options_container )
+        
+        file_import_job.GeneratePreImportHashAndStatus()
+        
+        file_import_job.GenerateInfo()
+        
+        self._write( 'import_file', file_import_job )
+        
+        hash = file_import_job.GetHash()
+        
+        ( hash_id, ) = self._read( 'hash_ids_to_hashes', hashes = [ hash ] ).keys()
+        
+        self.assertEqual( self._read( 'file_query_ids', tag_search_context ), [] )
+        self.assertEqual( self._read( 'file_query_ids', inbox_search_context ), [ hash_id ] )
+        
+        self.assertEqual( len( search_result_cache ), 2 )
+        
+        # archiving only knocks out the inbox search, and searching again sees the change
+        
+        content_update_package = ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdate( CC.HYDRUS_LOCAL_FILE_STORAGE_SERVICE_KEY, ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ARCHIVE, ( hash, ) ) )
+        
+        self._write( 'content_updates', content_update_package )
+        
+        self.assertEqual( len( search_result_cache ), 1 )
+        self.assertIsNotNone( search_result_cache.GetResult( tag_search_context.DumpToString() ) )
+        
+        self.assertEqual( self._read( 'file_query_ids', inbox_search_context ), [] )
+        
+        # tags on another service don't matter
+        
+        content_update_package = ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdate( HydrusData.GenerateKey(), ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ) )
+        
+        search_result_cache.NotifyContentUpdatePackage( content_update_package )
+        
+        self.assertEqual( len( search_result_cache ), 2 )
+        
+        # but tags on ours do
+        
+        content_update_package = ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdate( CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'car', ( hash, ) ) ) )
+        
+        self._write( 'content_updates', content_update_package )
+        
+        self.assertIsNone( search_result_cache.GetResult( tag_search_context.DumpToString() ) )
+        
+        self.assertEqual( self._read( 'file_query_ids', tag_search_context ), [ hash_id ] )
+        
+        # url classes live in the domain manager, and system:known url matches against them
+        
+        self.assertIsNotNone( search_result_cache.GetResult( tag_search_context.DumpToString() ) )
+        
+        self._write( 'serialisable', ClientNetworkingDomain.NetworkDomainManager() )
+        
+        self.assertEqual( len( search_result_cache ), 0 )
+        
+        # and anything we can't reason about wipes the lot
+        
+        self._read( 'file_query_ids', tag_search_context )
+        
+        self.assertEqual( len( search_result_cache ), 1 )
+        
+        self._write( 'push_recent_tags', CC.DEFAULT_LOCAL_TAG_SERVICE_KEY, [ 'car' ] )
+        
+        self.assertEqual( len( search_result_cache ), 1 )
+        
+        self._write( 'regenerate_tag_siblings_and_parents_cache' )
+        
+        self.assertEqual( len( search_result_cache ), 0 )
+        
+    
+    def test_file_query_ids_compact_sets( self ):
+        
+        # force every search down the compact hash_id set route and check we get the same answers
+        
+        old_threshold = ClientDBFilesSearch.COMPACT_QUERY_HASH_IDS_THRESHOLD
+        
+        ClientDBFilesSearch.COMPACT_QUERY_HASH_IDS_THRESHOLD = 0
+        
+        try:
+            
+            self.test_file_query_ids()
+            
+        finally:
+            
+            ClientDBFilesSearch.COMPACT_QUERY_HASH_IDS_THRESHOLD = old_threshold
+            
+        
+    
     def test_file_system_predicates( self ):
         
         TestClientDB._clear_db()
@@ -1317,6 +1514,13 @@ class TestClientDB( unittest.TestCase ):
             self.assertEqual( written_note, '' )
             self.assertEqual( file_import_job.GetHash(), hash )
             
+            with open( path, 'rb' ) as f:
+                
+                file_bytes = f.read()
+                
+            
+            self.assertEqual( file_import_job.GetExtraHashes(), ( hashlib.md5( file_bytes ).digest(), hashlib.sha1( file_bytes ).digest(), hashlib.sha512( file_bytes ).digest() ) )
+            
             media_result = self._read( 'media_result', written_hash )
             
             ( mr_file_info_manager, mr_tags_manager, mr_locations_manager, mr_ratings_manager ) = media_result.ToTuple()
@@ -1949,6 +2153,117 @@ class TestClientDB( unittest.TestCase ):
         self.assertEqual( result, expected_result )
         
     
+    def test_online_backup( self ):
+        
+        TestClientDB._clear_db()
+        
+        backup_dir = HydrusTemp.GetSubTempDir( 'online_backup_test' )
+        
+        try:
+            
+            # the live db keeps its connection open the whole time
+            HydrusDB.BackupDBFilesOnline( TestController.DB_DIR, TestClientDB._db._db_filenames, backup_dir )
+            
+            self.assertEqual( set( os.listdir( backup_dir ) ), set( TestClientDB._db._db_filenames.values() ) )
+            
+            db = sqlite3.connect( os.path.join( backup_dir, TestClientDB._db._db_filenames[ 'main' ] ) )
+            
+            try:
+                
+                for ( name, filename ) in TestClientDB._db._db_filenames.items():
+                    
+                    if name != 'main':
+                        
+                        db.execute( 'ATTACH ? AS ' + name + ';', ( os.path.join( backup_dir, filename ), ) )
+                        
+                    
+                    self.assertEqual( db.execute( 'PRAGMA {}.integrity_check;'.format( name ) ).fetchone(), ( 'ok', ) )
+                    
+                
+                ( num_services, ) = db.execute( 'SELECT COUNT( * ) FROM services;' ).fetchone()
+                
+                self.assertEqual( num_services, len( self._read( 'services' ) ) )
+                
+            finally:
+                
+                db.close()
+                
+            
+        finally:
+            
+            HydrusPaths.DeletePath( backup_dir )
+            
+        
+    
+    def test_parallel_reads( self ):
+        
+        original_num_parallel_read_connections = HG.db_num_parallel_read_connections
+        
+        try:
+            
+            HG.db_num_parallel_read_connections = 2
+            
+            TestClientDB._clear_db()
+            
+            self.assertEqual( TestClientDB._db._num_parallel_read_workers, 2 )
+            
+            hashes = [ os.urandom( 32 ) for i in range( 5 ) ]
+            
+            # not defined yet, so the parallel read has to fall back to the main connection to make them
+            hash_ids_to_hashes = self._read( 'hash_ids_to_hashes', hashes = hashes )
+            
+            self.assertEqual( set( hash_ids_to_hashes.values() ), set( hashes ) )
+            
+            hash_ids = list( hash_ids_to_hashes.keys() )
+            
+            # not committed yet, so the parallel connections can't see them and the main connection does it
+            self.assertEqual( self._read( 'hash_ids_to_hashes', hash_ids = hash_ids ), hash_ids_to_hashes )
+            
+            TestClientDB._db.ForceACommit()
+            
+            self.assertEqual( self._read( 'hash_ids_to_hashes', hash_ids = hash_ids, error_on_missing_hash_ids = True ), hash_ids_to_hashes )
+            self.assertEqual( self._read( 'hash_ids_to_hashes', hashes = hashes, create_new_hash_ids = False ), hash_ids_to_hashes )
+            
+            self.assertEqual( self._read( 'file_hashes', hashes, 'sha256', 'sha256' ), { hash : hash for hash in hashes } )
+            self.assertEqual( self._read( 'file_hashes', [ os.urandom( 32 ) ], 'sha256', 'sha256' ), {} )
+            
+            with self.assertRaises( Exception ):
+                
+                self._read( 'hash_ids_to_hashes', hash_ids = [ -5 ], error_on_missing_hash_ids = True )
+                
+            
+            ClientMediaResultCache.MediaResultCache.instance().Clear()
+            
+            # nothing should fall back to the main thread here
+            with mock.patch.object( TestClientDB._db, '_PutJob' ) as put_job:
+                
+                media_results = self._read( 'media_results_from_ids', hash_ids, sorted = True )
+                
+                self.assertEqual( [ media_result.GetHash() for media_result in media_results ], hashes )
+                
+                # the reader put them in the cache, so we get the same objects back
+                self.assertEqual( [ id( media_result ) for media_result in self._read( 'media_results', hashes, sorted = True ) ], [ id( media_result ) for media_result in media_results ] )
+                
+                put_job.assert_not_called()
+                
+            
+            # a write starting since the reader began means what it read cannot go in the cache
+            write_generation = TestClientDB._db.GetWriteGeneration()
+            
+            self.assertTrue( TestClientDB._db.DoIfNoWriteSince( write_generation, lambda: None ) )
+            
+            self._write( 'content_updates', ClientContentUpdates.ContentUpdatePackage() )
+            
+            self.assertFalse( TestClientDB._db.DoIfNoWriteSince( write_generation, lambda: None ) )
+            
+        finally:
+            
+            HG.db_num_parallel_read_connections = original_num_parallel_read_connections
+            
+            TestClientDB._clear_db()
+            
+        
+    
     def test_pending( self ):
         
         TestClientDB._clear_db()
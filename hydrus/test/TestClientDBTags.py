@@ -976,6 +976,202 @@ class TestClientDBTags( unittest.TestCase ):
             
         
     
+    def test_display_parents_sync_many_chains( self ):
+        
+        # the display sync does every chain a row touches in one set-based pass, so let's make sure unrelated chains and chains that share a child don't get mixed up
+        
+        self._clear_db()
+        
+        full_import_options_container = ImportOptionsManager.ImportOptionsManager.STATICGetDefaultInitialisedManager().GetDefaultImportOptionsContainerForCallerType( IOC.IMPORT_OPTIONS_CALLER_TYPE_GLOBAL )
+        
+        local_hashes = []
+        
+        for filename in ( 'muh_jpg.jpg', 'muh_png.png', 'muh_gif.gif' ):
+            
+            TG.test_controller.SetRead( 'hash_status', ClientImportFiles.FileImportStatus.STATICGetUnknownStatus() )
+            
+            path = HydrusStaticDir.GetStaticPath( os.path.join( 'testing', filename ) )
+            
+            file_import_job = ClientImportFiles.FileImportJob( path, full_import_options_container )
+            
+            file_import_job.GeneratePreImportHashAndStatus()
+            
+            file_import_job.GenerateInfo()
+            
+            self._write( 'import_file', file_import_job )
+            
+            local_hashes.append( file_import_job.GetHash() )
+            
+        
+        ( local_hash_1, local_hash_2, local_hash_3 ) = local_hashes
+        
+        # this one is only in the combined file domain
+        remote_hash = os.urandom( 32 )
+        
+        content_updates = []
+        
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'character:alpha', ( local_hash_1, ) ) ) )
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_PEND, ( 'character:beta', ( local_hash_2, ) ) ) )
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'character:gamma', ( remote_hash, ) ) ) )
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'character:shared', ( local_hash_1, local_hash_3, remote_hash ) ) ) )
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'shared_char', ( local_hash_2, ) ) ) )
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_MAPPINGS, HC.CONTENT_UPDATE_ADD, ( 'character:delta dog', ( local_hash_3, ) ) ) )
+        
+        self._write( 'content_updates', ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdates( self._public_service_key, content_updates ) )
+        
+        # character:shared is the child of two parents, and series:delta has a second child that stays put
+        
+        parent_pairs = [
+            ( 'character:alpha', 'series:alpha' ),
+            ( 'character:beta', 'series:beta' ),
+            ( 'character:gamma', 'series:gamma' ),
+            ( 'character:shared', 'series:delta' ),
+            ( 'character:shared', 'studio:delta house' ),
+            ( 'character:delta dog', 'series:delta' )
+        ]
+        
+        sibling_pair = ( 'shared_char', 'character:shared' )
+        
+        def check( hashes_to_current, hashes_to_pending, search_texts_to_expected_counts ):
+            
+            media_results = self._read( 'media_results', ( local_hash_1, local_hash_2, local_hash_3, remote_hash ) )
+            
+            hash_ids_to_hashes = { media_result.GetHashId() : media_result.GetHash() for media_result in media_results }
+            
+            # the local files get their tags from the specific display cache, the remote one is calculated from the combined domain
+            
+            hash_ids_to_tags_managers = self._read( 'force_refresh_tags_managers', list( hash_ids_to_hashes.keys() ) )
+            
+            for ( hash_id, tags_manager ) in hash_ids_to_tags_managers.items():
+                
+                hash = hash_ids_to_hashes[ hash_id ]
+                
+                self.assertEqual( tags_manager.GetCurrent( self._public_service_key, ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL ), hashes_to_current[ hash ] )
+                self.assertEqual( tags_manager.GetPending( self._public_service_key, ClientTags.TAG_DISPLAY_DISPLAY_ACTUAL ), hashes_to_pending.get( hash, set() ) )
+                
+            
+            for ( search_text, ( storage_combined, display_combined, storage_local, display_local ) ) in search_texts_to_expected_counts.items():
+                
+                self._test_ac( search_text, self._public_service_key, CC.COMBINED_FILE_SERVICE_KEY, storage_combined, display_combined )
+                self._test_ac( search_text, self._public_service_key, CC.LOCAL_FILE_SERVICE_KEY, storage_local, display_local )
+                
+            
+        
+        def c( num_current, num_pending = 0 ):
+            
+            return ClientSearchPredicate.PredicateCount.STATICCreateStaticCount( num_current, num_pending )
+            
+        
+        # add them all in one go
+        
+        content_updates = [ ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_ADD, pair ) for pair in parent_pairs ]
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, sibling_pair ) )
+        
+        self._write( 'content_updates', ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdates( self._public_service_key, content_updates ) )
+        
+        self._sync_display()
+        
+        hashes_to_current = {
+            local_hash_1 : { 'character:alpha', 'series:alpha', 'character:shared', 'series:delta', 'studio:delta house' },
+            local_hash_2 : { 'character:shared', 'series:delta', 'studio:delta house' },
+            local_hash_3 : { 'character:shared', 'character:delta dog', 'series:delta', 'studio:delta house' },
+            remote_hash : { 'character:gamma', 'series:gamma', 'character:shared', 'series:delta', 'studio:delta house' }
+        }
+        
+        hashes_to_pending = {
+            local_hash_2 : { 'character:beta', 'series:beta' }
+        }
+        
+        search_texts_to_expected_counts = {
+            'alpha*' : (
+                { 'character:alpha' : c( 1 ) },
+                { 'character:alpha' : c( 1 ), 'series:alpha' : c( 1 ) },
+                { 'character:alpha' : c( 1 ) },
+                { 'character:alpha' : c( 1 ), 'series:alpha' : c( 1 ) }
+            ),
+            'beta*' : (
+                { 'character:beta' : c( 0, 1 ) },
+                { 'character:beta' : c( 0, 1 ), 'series:beta' : c( 0, 1 ) },
+                { 'character:beta' : c( 0, 1 ) },
+                { 'character:beta' : c( 0, 1 ), 'series:beta' : c( 0, 1 ) }
+            ),
+            'gamma*' : (
+                { 'character:gamma' : c( 1 ) },
+                { 'character:gamma' : c( 1 ), 'series:gamma' : c( 1 ) },
+                {},
+                {}
+            ),
+            'delta*' : (
+                { 'character:delta dog' : c( 1 ) },
+                { 'character:delta dog' : c( 1 ), 'series:delta' : c( 4 ), 'studio:delta house' : c( 4 ) },
+                { 'character:delta dog' : c( 1 ) },
+                { 'character:delta dog' : c( 1 ), 'series:delta' : c( 3 ), 'studio:delta house' : c( 3 ) }
+            ),
+            'shared*' : (
+                { 'character:shared' : c( 3 ), 'shared_char' : c( 1 ) },
+                { 'character:shared' : c( 4 ) },
+                { 'character:shared' : c( 2 ), 'shared_char' : c( 1 ) },
+                { 'character:shared' : c( 3 ) }
+            )
+        }
+        
+        check( hashes_to_current, hashes_to_pending, search_texts_to_expected_counts )
+        
+        # now take some away in one go. series:delta loses one child but keeps the other, and the shared child keeps its other parent
+        
+        content_updates = [ ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_TAG_PARENTS, HC.CONTENT_UPDATE_DELETE, pair ) for pair in ( ( 'character:alpha', 'series:alpha' ), ( 'character:gamma', 'series:gamma' ), ( 'character:shared', 'series:delta' ) ) ]
+        content_updates.append( ClientContentUpdates.ContentUpdate( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_DELETE, sibling_pair ) )
+        
+        self._write( 'content_updates', ClientContentUpdates.ContentUpdatePackage.STATICCreateFromContentUpdates( self._public_service_key, content_updates ) )
+        
+        self._sync_display()
+        
+        hashes_to_current = {
+            local_hash_1 : { 'character:alpha', 'character:shared', 'studio:delta house' },
+            local_hash_2 : { 'shared_char' },
+            local_hash_3 : { 'character:shared', 'character:delta dog', 'series:delta', 'studio:delta house' },
+            remote_hash : { 'character:gamma', 'character:shared', 'studio:delta house' }
+        }
+        
+        search_texts_to_expected_counts[ 'alpha*' ] = (
+            { 'character:alpha' : c( 1 ) },
+            { 'character:alpha' : c( 1 ) },
+            { 'character:alpha' : c( 1 ) },
+            { 'character:alpha' : c( 1 ) }
+        )
+        
+        search_texts_to_expected_counts[ 'gamma*' ] = (
+            { 'character:gamma' : c( 1 ) },
+            { 'character:gamma' : c( 1 ) },
+            {},
+            {}
+        )
+        
+        search_texts_to_expected_counts[ 'delta*' ] = (
+            { 'character:delta dog' : c( 1 ) },
+            { 'character:delta dog' : c( 1 ), 'series:delta' : c( 1 ), 'studio:delta house' : c( 3 ) },
+            { 'character:delta dog' : c( 1 ) },
+            { 'character:delta dog' : c( 1 ), 'series:delta' : c( 1 ), 'studio:delta house' : c( 2 ) }
+        )
+        
+        search_texts_to_expected_counts[ 'shared*' ] = (
+            { 'character:shared' : c( 3 ), 'shared_char' : c( 1 ) },
+            { 'character:shared' : c( 3 ), 'shared_char' : c( 1 ) },
+            { 'character:shared' : c( 2 ), 'shared_char' : c( 1 ) },
+            { 'character:shared' : c( 2 ), 'shared_char' : c( 1 ) }
+        )
+        
+        check( hashes_to_current, hashes_to_pending, search_texts_to_expected_counts )
+        
+        # and a full regen, which fills in every chain at once, should land in the same place
+        
+        self._write( 'regenerate_tag_display_mappings_cache' )
+        
+        self._sync_display()
+        
+        check( hashes_to_current, hashes_to_pending, search_texts_to_expected_counts )
+        
+    
     def test_display_pairs_lookup_bonkers( self ):
         
         self._clear_db()
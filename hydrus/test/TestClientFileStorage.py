@@ -1,3 +1,4 @@
+import hashlib
 import os
 import unittest
 
@@ -7,6 +8,7 @@ from hydrus.core import HydrusTemp
 from hydrus.core.files import HydrusFilesPhysicalStorage
 
 from hydrus.client import ClientThreading
+from hydrus.client.files import ClientFilesMigration
 from hydrus.client.files import ClientFilesPhysical
 
 from hydrus.test import TestGlobals as TG
@@ -434,3 +436,107 @@ class TestClientGranularisation( unittest.TestCase ):
         HydrusPaths.DeletePath( test_dir )
         
     
+
+class TestClientFilesMigration( unittest.TestCase ):
+    
+    def test_copy_and_verify( self ):
+        
+        test_dir = HydrusTemp.GetSubTempDir( 'test_files_migration' )
+        
+        source_subfolder = ClientFilesPhysical.FilesStorageSubfolder( 'f83', ClientFilesPhysical.FilesStorageBaseLocation( os.path.join( test_dir, 'source' ), 1 ) )
+        dest_subfolder = ClientFilesPhysical.FilesStorageSubfolder( 'f83', ClientFilesPhysical.FilesStorageBaseLocation( os.path.join( test_dir, 'dest' ), 1 ) )
+        
+        source_dir = source_subfolder.path
+        dest_dir = dest_subfolder.path
+        
+        HydrusPaths.MakeSureDirectoryExists( source_dir )
+        
+        def write_file():
+            
+            file_bytes = os.urandom( 256 )
+            
+            filename = hashlib.sha256( file_bytes ).hexdigest() + '.jpg'
+            
+            with open( os.path.join( source_dir, filename ), 'wb' ) as f:
+                
+                f.write( file_bytes )
+                
+            
+            return filename
+            
+        
+        filenames = [ write_file() for i in range( 5 ) ]
+        
+        move = ClientFilesMigration.MigrationMove( source_subfolder, dest_subfolder )
+        
+        self.assertEqual( move.ToJournalRow(), ( 'f83', source_subfolder.base_location.path, dest_subfolder.base_location.path ) )
+        self.assertFalse( move.LocationsAreSecretlyTheSame() )
+        
+        # cancel
+        
+        throughput = ClientFilesMigration.MigrationThroughput()
+        
+        self.assertFalse( ClientFilesMigration.CopySubfolderFiles( source_dir, dest_dir, throughput = throughput, is_cancelled_hook = lambda: True ) )
+        
+        self.assertEqual( ClientFilesMigration.ListSubfolderFilenames( dest_dir ), [] )
+        
+        # copy
+        
+        self.assertTrue( ClientFilesMigration.CopySubfolderFiles( source_dir, dest_dir, throughput = throughput ) )
+        
+        self.assertEqual( set( ClientFilesMigration.ListSubfolderFilenames( dest_dir ) ), set( filenames ) )
+        self.assertIn( '5 files', throughput.GetStatusText() )
+        
+        # resuming does not copy anything again
+        
+        throughput = ClientFilesMigration.MigrationThroughput()
+        
+        self.assertTrue( ClientFilesMigration.CopySubfolderFiles( source_dir, dest_dir, throughput = throughput ) )
+        
+        self.assertIn( '0 files', throughput.GetStatusText() )
+        
+        # the source changes while we work, and the final sync catches it
+        
+        os.remove( os.path.join( source_dir, filenames.pop( 0 ) ) )
+        
+        filenames.append( write_file() )
+        
+        ClientFilesMigration.SyncAndVerifySubfolderCopy( source_dir, dest_dir )
+        
+        self.assertEqual( set( ClientFilesMigration.ListSubfolderFilenames( dest_dir ) ), set( filenames ) )
+        
+        self.assertTrue( ClientFilesMigration.VerifySubfolderCopyHashes( source_dir, dest_dir ) )
+        self.assertFalse( ClientFilesMigration.VerifySubfolderCopyHashes( source_dir, dest_dir, is_cancelled_hook = lambda: True ) )
+        
+        # a bad copy with the right size and date gets caught and cleared out
+        
+        bad_path = os.path.join( dest_dir, filenames[0] )
+        
+        with open( bad_path, 'wb' ) as f:
+            
+            f.write( os.urandom( 256 ) )
+            
+        
+        HydrusPaths.CopyTimes( os.path.join( source_dir, filenames[0] ), bad_path )
+        
+        ClientFilesMigration.SyncAndVerifySubfolderCopy( source_dir, dest_dir )
+        
+        self.assertTrue( os.path.exists( bad_path ) )
+        
+        with self.assertRaises( Exception ):
+            
+            ClientFilesMigration.VerifySubfolderCopyHashes( source_dir, dest_dir )
+            
+        
+        self.assertFalse( os.path.exists( bad_path ) )
+        
+        # the final sync fills the gap back in
+        
+        ClientFilesMigration.SyncAndVerifySubfolderCopy( source_dir, dest_dir )
+        
+        self.assertTrue( os.path.exists( bad_path ) )
+        self.assertTrue( ClientFilesMigration.VerifySubfolderCopyHashes( source_dir, dest_dir ) )
+        
+        HydrusPaths.DeletePath( test_dir )
+        
+    
@@ -1,9 +1,15 @@
+import os
 import unittest
 
+from unittest import mock
+
 from hydrus.core import HydrusConstants as HC
+from hydrus.core import HydrusData
+from hydrus.core import HydrusPSUtil
 from hydrus.core import HydrusStaticDir
 
 from hydrus.client import ClientConstants as CC
+from hydrus.client.files.images import ClientImagePerceptualHashIndex
 from hydrus.client.files.images import ClientImagePerceptualHashes
 
 class TestImageHandling( unittest.TestCase ):
@@ -23,3 +29,95 @@ class TestImageHandling( unittest.TestCase ):
         self.assertEqual( perceptual_hashes, set( [ b'\xb4M\xc7\xb2M\xcb8\x1c' ] ) )
         
     
+    def test_perceptual_hash_index( self ):
+        
+        rows = [ ( perceptual_hash_id, os.urandom( 8 ) ) for perceptual_hash_id in range( 1, 2001 ) ]
+        
+        perceptual_hash_index = ClientImagePerceptualHashIndex.PerceptualHashIndex()
+        
+        perceptual_hash_index.SetPerceptualHashes( iter( rows ) )
+        
+        self.assertEqual( len( perceptual_hash_index ), 2000 )
+        
+        search_perceptual_hashes = [ rows[10][1], os.urandom( 8 ) ]
+        
+        def get_expected( rows, max_hamming_distance ):
+            
+            expected = {}
+            
+            for ( perceptual_hash_id, perceptual_hash ) in rows:
+                
+                distance = min( ( HydrusData.Get64BitHammingDistance( search_perceptual_hash, perceptual_hash ) for search_perceptual_hash in search_perceptual_hashes ) )
+                
+                if distance <= max_hamming_distance:
+                    
+                    expected[ perceptual_hash_id ] = distance
+                    
+                
+            
+            return expected
+            
+        
+        for max_hamming_distance in ( 0, 4, 12, 20 ):
+            
+            self.assertEqual( perceptual_hash_index.Search( search_perceptual_hashes, max_hamming_distance ), get_expected( rows, max_hamming_distance ) )
+            
+            results = perceptual_hash_index.SearchMany( search_perceptual_hashes + [ b'bad' ], max_hamming_distance )
+            
+            self.assertEqual( len( results ), 3 )
+            self.assertEqual( results[2], {} )
+            
+            merged = {}
+            
+            for result in results:
+                
+                for ( perceptual_hash_id, distance ) in result.items():
+                    
+                    merged[ perceptual_hash_id ] = min( distance, merged.get( perceptual_hash_id, distance ) )
+                    
+                
+            
+            self.assertEqual( merged, get_expected( rows, max_hamming_distance ) )
+            
+        
+        #
+        
+        perceptual_hash_index.RemovePerceptualHashIds( [ 11 ] )
+        
+        self.assertEqual( perceptual_hash_index.Search( [ rows[10][1] ], 0 ), {} )
+        
+        perceptual_hash_index.AddPerceptualHashes( [ ( 11, rows[10][1] ), ( 5000, rows[10][1] ), ( 5001, b'bad' ) ] )
+        
+        self.assertEqual( perceptual_hash_index.Search( [ rows[10][1] ], 0 ), { 11 : 0, 5000 : 0 } )
+        
+        self.assertEqual( len( perceptual_hash_index ), 2001 )
+        
+    
+    def test_perceptual_hash_index_memory_estimate( self ):
+        
+        if not HydrusPSUtil.PSUTIL_OK:
+            
+            return
+            
+        
+        search_block_bytes = ClientImagePerceptualHashIndex.MAX_SEARCH_BLOCK_CELLS * ClientImagePerceptualHashIndex.SEARCH_BLOCK_BYTES_PER_CELL
+        
+        # the xor scratch alone is eight bytes a cell
+        self.assertGreaterEqual( search_block_bytes, ClientImagePerceptualHashIndex.MAX_SEARCH_BLOCK_CELLS * 8 )
+        
+        num_perceptual_hashes = 10 * 1000 * 1000
+        
+        index_bytes = num_perceptual_hashes * 16 * 2
+        
+        for ( available, expected_result ) in [
+            ( ( index_bytes + search_block_bytes ) * 4 + 1024, True ),
+            ( ( index_bytes + ClientImagePerceptualHashIndex.MAX_SEARCH_BLOCK_CELLS ) * 4 + 1024, False )
+        ]:
+            
+            with mock.patch.object( HydrusPSUtil.psutil, 'virtual_memory', return_value = mock.Mock( available = available ) ):
+                
+                self.assertEqual( ClientImagePerceptualHashIndex.IndexWouldFitInMemory( num_perceptual_hashes ), expected_result )
+                
+            
+        
+    
@@ -260,6 +260,35 @@ class TestFileSeedCache( unittest.TestCase ):
             
         
     
+    def test_next_file_seeds( self ):
+        
+        file_seed_cache = ClientImportFileSeeds.FileSeedCache()
+        
+        file_seeds = [ ClientImportFileSeeds.FileSeed( ClientImportFileSeeds.FILE_SEED_TYPE_HDD, f'/import/{i}.jpg' ) for i in range( 10 ) ]
+        
+        file_seed_cache.AddFileSeeds( file_seeds )
+        
+        for i in ( 0, 1, 4 ):
+            
+            file_seeds[ i ].SetStatus( CC.STATUS_SUCCESSFUL_AND_NEW )
+            
+        
+        file_seed_cache.NotifyFileSeedsUpdated( [ file_seeds[ i ] for i in ( 0, 1, 4 ) ] )
+        
+        self.assertEqual( file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, 1 ), [ file_seeds[2] ] )
+        self.assertEqual( file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, 3 ), [ file_seeds[2], file_seeds[3], file_seeds[5] ] )
+        self.assertEqual( file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, 100 ), [ file_seeds[ i ] for i in ( 2, 3, 5, 6, 7, 8, 9 ) ] )
+        
+        for file_seed in file_seeds:
+            
+            file_seed.SetStatus( CC.STATUS_SUCCESSFUL_AND_NEW )
+            
+        
+        file_seed_cache.NotifyFileSeedsUpdated( file_seeds )
+        
+        self.assertEqual( file_seed_cache.GetNextFileSeeds( CC.STATUS_UNKNOWN, 3 ), [] )
+        
+    
     def test_renormalise( self ):
         
         file_seed_cache = ClientImportFileSeeds.FileSeedCache()
@@ -1,3 +1,5 @@
+import http.server
+import threading
 import time
 import unittest
 
@@ -1134,6 +1136,122 @@ class TestURLClasses( unittest.TestCase ):
         self.assertTrue( url_class.Matches( good_url ) )
         
     
+    def test_url_class_matcher( self ):
+        
+        def fixed( value ):
+            
+            return ClientStrings.StringMatch( match_type = ClientStrings.STRING_MATCH_FIXED, match_value = value, example_string = value )
+            
+        
+        numeric = ClientStrings.StringMatch( match_type = ClientStrings.STRING_MATCH_FLEXIBLE, match_value = ClientStrings.FLEXIBLE_MATCH_NUMERIC, example_string = '123456' )
+        anything = ClientStrings.StringMatch( example_string = 'hello' )
+        
+        def make_url_class( name, url_type, raw_domain, path_components, parameters, example_url, match_subdomains = False ):
+            
+            url_domain_mask = ClientNetworkingURLClass.URLDomainMask( raw_domains = [ raw_domain ], match_subdomains = match_subdomains )
+            
+            return ClientNetworkingURLClass.URLClass( name, url_type = url_type, url_domain_mask = url_domain_mask, path_components = path_components, parameters = parameters, example_url = example_url )
+            
+        
+        url_classes = [
+            make_url_class( 'post', HC.URL_TYPE_POST, 'testbooru.cx', [ ( fixed( 'post' ), None ), ( numeric, None ) ], [], 'https://testbooru.cx/post/123456' ),
+            make_url_class( 'post page', HC.URL_TYPE_POST, 'testbooru.cx', [ ( fixed( 'post' ), None ), ( fixed( 'page.php' ), None ) ], [ ClientNetworkingURLClass.URLClassParameterFixedName( name = 'id', value_string_match = numeric ) ], 'https://testbooru.cx/post/page.php?id=123456' ),
+            make_url_class( 'gallery', HC.URL_TYPE_GALLERY, 'testbooru.cx', [ ( fixed( 'posts' ), None ) ], [ ClientNetworkingURLClass.URLClassParameterFixedName( name = 'tags', value_string_match = anything ) ], 'https://testbooru.cx/posts?tags=hello' ),
+            make_url_class( 'user', HC.URL_TYPE_GALLERY, 'testbooru.cx', [ ( anything, None ) ], [], 'https://testbooru.cx/someone' ),
+            make_url_class( 'optional', HC.URL_TYPE_GALLERY, 'testbooru.cx', [ ( fixed( 'index' ), 'index' ) ], [], 'https://testbooru.cx/index' ),
+            make_url_class( 'file', HC.URL_TYPE_FILE, 'cdn.testbooru.cx', [ ( fixed( 'images' ), None ), ( anything, None ) ], [], 'https://cdn.testbooru.cx/images/abcdef.jpg' ),
+            make_url_class( 'thread', HC.URL_TYPE_WATCHABLE, 'chan.org', [ ( anything, None ), ( fixed( 'thread' ), None ), ( numeric, None ) ], [], 'https://chan.org/b/thread/123456', match_subdomains = True )
+        ]
+        
+        # the old brute force, which the matcher has to agree with
+        
+        url_domain_masks_to_url_classes = {}
+        
+        for url_class in url_classes:
+            
+            url_domain_masks_to_url_classes.setdefault( url_class.GetURLDomainMask(), [] ).append( url_class )
+            
+        
+        url_domain_masks = sorted( url_domain_masks_to_url_classes.keys(), key = lambda udm: udm.GetSortingComplexity(), reverse = True )
+        
+        for mask_url_classes in url_domain_masks_to_url_classes.values():
+            
+            ClientNetworkingURLClass.SortURLClassesListDescendingComplexity( mask_url_classes )
+            
+        
+        def brute_force( url ):
+            
+            try:
+                
+                domain = ClientNetworkingFunctions.ConvertURLIntoDomain( url )
+                
+            except HydrusExceptions.URLClassException:
+                
+                return None
+                
+            
+            for url_domain_mask in url_domain_masks:
+                
+                if not url_domain_mask.Matches( domain ):
+                    
+                    continue
+                    
+                
+                for url_class in url_domain_masks_to_url_classes[ url_domain_mask ]:
+                    
+                    try:
+                        
+                        url_class.Test( url )
+                        
+                        return url_class
+                        
+                    except HydrusExceptions.URLClassException:
+                        
+                        continue
+                        
+                    
+                
+            
+            return None
+            
+        
+        urls = [ 'https://wew.lad/123456', 'not a url' ]
+        
+        for url_class in url_classes:
+            
+            example_url = url_class.GetExampleURL()
+            
+            p = ClientNetworkingFunctions.ParseURL( example_url )
+            
+            urls.append( example_url )
+            urls.append( example_url + ( '&' if p.query != '' else '?' ) + 'extra=1' )
+            urls.append( f'{p.scheme}://{p.netloc}/zzz{p.path}' )
+            urls.append( f'{p.scheme}://www.{p.netloc}{p.path}' )
+            urls.append( f'{p.scheme}://{p.netloc}/' )
+            
+        
+        url_class_matcher = ClientNetworkingURLClass.URLClassMatcher( url_classes )
+        
+        urls_to_url_classes = url_class_matcher.GetURLsToURLClasses( urls )
+        
+        self.assertEqual( set( urls_to_url_classes.keys() ), set( urls ) )
+        
+        for url in urls:
+            
+            expected_url_class = brute_force( url )
+            
+            self.assertIs( urls_to_url_classes[ url ], expected_url_class, url )
+            
+            # second go comes from the cache
+            self.assertIs( url_class_matcher.GetURLClass( url ), expected_url_class, url )
+            
+        
+        for url_class in url_classes:
+            
+            self.assertIsNotNone( url_class_matcher.GetURLClass( url_class.GetExampleURL() ) )
+            
+        
+    
 
 class TestNetworkingEngine( unittest.TestCase ):
     
@@ -1226,6 +1344,18 @@ class TestNetworkingEngine( unittest.TestCase ):
                 self.assertEqual( len( engine._jobs_awaiting_slot ), 0 )
                 self.assertEqual( len( engine._jobs_running ), 0 )
                 
+                statuses_to_metrics = engine.GetStatusMetrics()
+                
+                for status in ( ClientNetworking.JOB_STATUS_AWAITING_VALIDITY, ClientNetworking.JOB_STATUS_AWAITING_BANDWIDTH, ClientNetworking.JOB_STATUS_AWAITING_LOGIN, ClientNetworking.JOB_STATUS_AWAITING_SLOT, ClientNetworking.JOB_STATUS_RUNNING ):
+                    
+                    ( num_jobs, num_jobs_passed_through, average_time_spent ) = statuses_to_metrics[ status ]
+                    
+                    self.assertEqual( num_jobs, 0 )
+                    self.assertEqual( num_jobs_passed_through, 1 )
+                    
+                
+                self.assertEqual( engine.GetJobsSnapshot(), [] )
+                
             
         
         #
@@ -1233,6 +1363,42 @@ class TestNetworkingEngine( unittest.TestCase ):
         engine.Shutdown()
         
     
+    def test_engine_domain_queues( self ):
+        
+        job_1 = ClientNetworkingJobs.NetworkJob( 'GET', 'https://example.com/1' )
+        job_2 = ClientNetworkingJobs.NetworkJob( 'GET', 'https://example.com/2' )
+        job_3 = ClientNetworkingJobs.NetworkJob( 'GET', 'https://somewhere.net/3' )
+        
+        queues = ClientNetworking.NetworkJobDomainQueues()
+        
+        queues.Add( job_1, 0 )
+        queues.Add( job_2, 1 )
+        queues.Add( job_3, 2 )
+        
+        now = time.time()
+        
+        self.assertEqual( len( queues ), 3 )
+        
+        self.assertIs( queues.PopReady( now, { 'example.com' } ), job_3 )
+        self.assertIsNone( queues.PopReady( now, { 'example.com' } ) )
+        
+        queues.AddSleeping( job_3, 2, now + 60 )
+        
+        self.assertEqual( queues.GetNextWakeTime( now, { 'example.com' } ), now + 60 )
+        
+        queues.Wake( job_3 )
+        
+        self.assertEqual( queues.GetNextWakeTime( now, { 'example.com' } ), now )
+        
+        self.assertIs( queues.PopReady( now, set() ), job_1 )
+        self.assertIs( queues.PopReady( now, set() ), job_2 )
+        self.assertIs( queues.PopReady( now, set() ), job_3 )
+        self.assertIsNone( queues.PopReady( now, set() ) )
+        
+        self.assertEqual( len( queues ), 0 )
+        
+    
+
 class TestNetworkingJob( unittest.TestCase ):
     
     def _GetJob( self, for_login = False ):
@@ -1604,3 +1770,63 @@ class TestNetworkingJobHydrus( unittest.TestCase ):
         pass
         
     
+
+class TestNetworkingSessions( unittest.TestCase ):
+    
+    def test_connection_pool( self ):
+        
+        class KeepAliveHandler( http.server.BaseHTTPRequestHandler ):
+            
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET( self ):
+                
+                self.send_response( 200 )
+                self.send_header( 'Content-Length', str( len( GOOD_RESPONSE ) ) )
+                self.end_headers()
+                
+                self.wfile.write( GOOD_RESPONSE )
+                
+            
+            def log_message( self, *args ):
+                
+                pass
+                
+            
+        
+        server = http.server.ThreadingHTTPServer( ( '127.0.0.1', 0 ), KeepAliveHandler )
+        
+        threading.Thread( target = server.serve_forever, daemon = True ).start()
+        
+        try:
+            
+            session_manager = ClientNetworkingSessions.NetworkSessionManager()
+            
+            network_context = ClientNetworkingContexts.NetworkContext( CC.NETWORK_CONTEXT_DOMAIN, '127.0.0.1' )
+            
+            self.assertEqual( session_manager.GetConnectionPoolStats( network_context ), ( 0, 0, 0.0 ) )
+            
+            session = session_manager.GetSession( network_context )
+            
+            self.assertIsInstance( session.get_adapter( 'https://example.com' ), ClientNetworkingSessions.NetworkHTTPAdapter )
+            
+            for i in range( 5 ):
+                
+                response = session.get( f'http://127.0.0.1:{server.server_port}/', stream = True )
+                
+                self.assertEqual( response.content, GOOD_RESPONSE )
+                
+            
+            ( num_new_connections, num_reused_connections, average_connect_time ) = session_manager.GetConnectionPoolStats( network_context )
+            
+            self.assertEqual( num_new_connections, 1 )
+            self.assertEqual( num_reused_connections, 4 )
+            self.assertGreater( average_connect_time, 0.0 )
+            
+        finally:
+            
+            server.shutdown()
+            server.server_close()
+            
+        
+    
@@ -55,6 +55,7 @@ from hydrus.client.networking import ClientNetworkingURLClass
 from hydrus.server import ServerGlobals as SG
 
 from hydrus.test import TestClientAPI
+from hydrus.test import TestClientCaches
 from hydrus.test import TestClientConstants
 from hydrus.test import TestClientDaemons
 from hydrus.test import TestClientDB
@@ -689,6 +690,15 @@ class Controller( object ):
         return self._boot_id
         
     
+    def GetCacheStats( self ) -> dict:
+        
+        return {
+            'image_cache' : self.images_cache.GetCacheStats(),
+            'image_tile_cache' : self.image_tiles_cache.GetCacheStats(),
+            'thumbnail_cache' : self.thumbnails_cache.GetCacheStats()
+        }
+        
+    
     def GetCurrentSessionPageAPIInfoDict( self ):
         
         return {
@@ -733,6 +743,11 @@ class Controller( object ):
         }
         
     
+    def GetDBDir( self ):
+        
+        return self.db_dir
+        
+    
     def GetFilesDir( self ):
         
         return self._server_files_dir
@@ -964,6 +979,7 @@ class Controller( object ):
         
         module_lookup[ 'data' ] = [
             TestHydrusPaths,
+            TestClientCaches,
             TestClientConstants,
             TestClientFileStorage,
             TestClientImportObjects,
@@ -1,4 +1,5 @@
 import random
+import time
 import unittest
 
 from hydrus.core import HydrusLists
@@ -24,6 +25,74 @@ class TestHydrusNumbers( unittest.TestCase ):
 
 class TestHydrusLists( unittest.TestCase ):
     
+    def test_sorted_integer_set( self ):
+        
+        for i in range( 20 ):
+            
+            a = set( random.sample( range( 1000 ), random.randint( 0, 500 ) ) )
+            b = set( random.sample( range( 1000 ), random.randint( 0, 500 ) ) )
+            
+            s = HydrusLists.SortedIntegerSet( a )
+            
+            self.assertEqual( s, a )
+            self.assertEqual( len( s ), len( a ) )
+            self.assertEqual( list( s ), sorted( a ) )
+            
+            self.assertEqual( s.intersection( b ), a.intersection( b ) )
+            self.assertEqual( s.intersection( HydrusLists.SortedIntegerSet( b ) ), a.intersection( b ) )
+            self.assertEqual( s.difference( b ), a.difference( b ) )
+            self.assertEqual( s.union( b ), a.union( b ) )
+            self.assertEqual( s & b, a & b )
+            self.assertEqual( b - s, b - a )
+            
+            for n in range( -5, 1005 ):
+                
+                self.assertEqual( n in s, n in a )
+                
+            
+        
+        s = HydrusLists.SortedIntegerSet( [ 5, 1, 3, 3 ] )
+        
+        self.assertEqual( list( s ), [ 1, 3, 5 ] )
+        
+        for n in s:
+            
+            self.assertEqual( type( n ), int )
+            
+        
+        s_copy = s.copy()
+        
+        s.intersection_update( ( i for i in [ 3, 5, 7 ] ) )
+        
+        self.assertEqual( list( s ), [ 3, 5 ] )
+        self.assertEqual( list( s_copy ), [ 1, 3, 5 ] )
+        
+        s.add( 4 )
+        s.discard( 5 )
+        s.difference_update( [ 3 ] )
+        s.update( [ 10, 2 ] )
+        
+        self.assertEqual( list( s ), [ 2, 4, 10 ] )
+        self.assertNotIn( 'a string', s )
+        
+        # in-place operators on big sets should be vectorised, not one element at a time
+        
+        s = HydrusLists.SortedIntegerSet( range( 200000 ) )
+        
+        original_s = s
+        
+        time_started = time.perf_counter()
+        
+        s -= set( range( 0, 200000, 2 ) )
+        s &= HydrusLists.SortedIntegerSet( range( 100000, 300000 ) )
+        s |= range( 300000, 400000 )
+        
+        self.assertLess( time.perf_counter() - time_started, 5 )
+        
+        self.assertIs( s, original_s )
+        self.assertEqual( s, set( range( 100001, 200000, 2 ) ).union( range( 300000, 400000 ) ) )
+        
+    
     def test_unique_fast_list( self ):
         
         def test_list_indices( some_list: HydrusLists.FastIndexUniqueList ):
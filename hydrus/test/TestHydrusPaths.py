@@ -2,10 +2,12 @@ from unittest import mock
 import unittest
 
 import ntpath
+import os
 import posixpath
 
 from hydrus.core import HydrusConstants as HC
 from hydrus.core import HydrusPaths
+from hydrus.core import HydrusTemp
 
 # I pad these in the actual code
 MAGIC_WINDOWS_TOTAL_PATH_LIMIT = 260 - 10
@@ -619,3 +621,88 @@ class TestHydrusPaths( unittest.TestCase ):
             
         
     
+    def test_8_mirror_tree_with_manifest( self ):
+        
+        test_dir = HydrusTemp.GetSubTempDir( 'mirror_tree_test' )
+        
+        try:
+            
+            source = os.path.join( test_dir, 'source' )
+            dest = os.path.join( test_dir, 'dest' )
+            
+            for subdir in ( 'f00', 'f01' ):
+                
+                HydrusPaths.MakeSureDirectoryExists( os.path.join( source, subdir ) )
+                
+                for i in range( 3 ):
+                    
+                    with open( os.path.join( source, subdir, f'{i}.jpg' ), 'wb' ) as f:
+                        
+                        f.write( os.urandom( 64 ) )
+                        
+                    
+                
+            
+            manifest = HydrusPaths.MirrorTreeWithManifest( source, dest, {} )
+            
+            self.assertEqual( set( manifest.keys() ), { '.', 'f00', 'f01' } )
+            self.assertEqual( sorted( os.listdir( os.path.join( dest, 'f01' ) ) ), [ '0.jpg', '1.jpg', '2.jpg' ] )
+            
+            # unchanged folders are not looked at, so a surplus dest file there survives
+            
+            with open( os.path.join( dest, 'f00', 'surplus.jpg' ), 'wb' ) as f:
+                
+                f.write( b'hello' )
+                
+            
+            os.remove( os.path.join( source, 'f01', '0.jpg' ) )
+            
+            with open( os.path.join( source, 'f01', '3.jpg' ), 'wb' ) as f:
+                
+                f.write( os.urandom( 64 ) )
+                
+            
+            new_manifest = HydrusPaths.MirrorTreeWithManifest( source, dest, manifest )
+            
+            self.assertEqual( new_manifest[ 'f00' ], manifest[ 'f00' ] )
+            self.assertNotEqual( new_manifest[ 'f01' ], manifest[ 'f01' ] )
+            
+            self.assertTrue( os.path.exists( os.path.join( dest, 'f00', 'surplus.jpg' ) ) )
+            self.assertEqual( sorted( os.listdir( os.path.join( dest, 'f01' ) ) ), [ '1.jpg', '2.jpg', '3.jpg' ] )
+            
+            # no manifest means a full check
+            
+            HydrusPaths.MirrorTreeWithManifest( source, dest, {} )
+            
+            self.assertFalse( os.path.exists( os.path.join( dest, 'f00', 'surplus.jpg' ) ) )
+            
+            # cancelled runs only remember what they finished
+            
+            self.assertEqual( HydrusPaths.MirrorTreeWithManifest( source, dest, {}, is_cancelled_hook = lambda: True ), {} )
+            
+            # failed runs hand over what they finished before raising, so it can be saved
+            
+            HydrusPaths.DeletePath( os.path.join( dest, 'f01' ) )
+            
+            with open( os.path.join( dest, 'f01' ), 'wb' ) as f:
+                
+                f.write( b'in the way' )
+                
+            
+            partial_manifests = []
+            
+            with self.assertRaises( Exception ):
+                
+                HydrusPaths.MirrorTreeWithManifest( source, dest, {}, num_threads = 1, partial_manifest_hook = partial_manifests.append )
+                
+            
+            self.assertEqual( len( partial_manifests ), 1 )
+            self.assertIn( '.', partial_manifests[0] )
+            self.assertNotIn( 'f01', partial_manifests[0] )
+            
+        finally:
+            
+            HydrusPaths.DeletePath( test_dir )
+            
+        
+    
@@ -1063,6 +1063,75 @@ class TestServerDB( unittest.TestCase ):
         self._admin_account = result
         
     
+    def _test_repository_update_generation( self ):
+        
+        service_info = self._read( 'service_info', self._tag_service_key )
+        
+        updates = self._read( 'immediate_update', self._tag_service_key, self._tag_service_account, 0, HydrusTime.GetNow() + 10 )
+        
+        definitions_updates = [ update for update in updates if isinstance( update, HydrusNetwork.DefinitionsUpdate ) ]
+        content_updates = [ update for update in updates if isinstance( update, HydrusNetwork.ContentUpdate ) ]
+        
+        # definitions come first, so a client can process in order
+        self.assertEqual( updates, definitions_updates + content_updates )
+        
+        service_hash_ids = set()
+        service_tag_ids = set()
+        
+        for update in definitions_updates:
+            
+            service_hash_ids.update( update.GetHashIdsToHashes().keys() )
+            service_tag_ids.update( update.GetTagIdsToTags().keys() )
+            
+        
+        new_mappings = set()
+        deleted_mappings = set()
+        
+        for update in content_updates:
+            
+            for ( mappings, rows ) in ( ( new_mappings, update.GetNewMappings() ), ( deleted_mappings, update.GetDeletedMappings() ) ):
+                
+                for ( service_tag_id, block_of_service_hash_ids ) in rows:
+                    
+                    self.assertIn( service_tag_id, service_tag_ids )
+                    self.assertTrue( service_hash_ids.issuperset( block_of_service_hash_ids ) )
+                    
+                    mappings.update( ( ( service_tag_id, service_hash_id ) for service_hash_id in block_of_service_hash_ids ) )
+                    
+                
+            
+        
+        self.assertEqual( len( new_mappings ), service_info[ HC.SERVICE_INFO_NUM_MAPPINGS ] )
+        self.assertEqual( len( deleted_mappings ), service_info[ HC.SERVICE_INFO_NUM_DELETED_MAPPINGS ] )
+        
+        # compact encoding
+        
+        file_content_update = HydrusNetwork.ContentUpdate()
+        
+        file_content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( 5, 1024, HC.IMAGE_PNG, 1234567890, 640, 480, None, None, None ) ) )
+        file_content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_ADD, ( 3, 2048, HC.VIDEO_WEBM, 1234567891, 1920, 1080, 12345, 300, None ) ) )
+        file_content_update.AddRow( ( HC.CONTENT_TYPE_FILES, HC.CONTENT_UPDATE_DELETE, 7 ) )
+        file_content_update.AddRow( ( HC.CONTENT_TYPE_TAG_SIBLINGS, HC.CONTENT_UPDATE_ADD, ( 9, 4 ) ) )
+        
+        for update in updates + [ file_content_update ]:
+            
+            json_network_bytes = HydrusNetwork.DumpUpdateToNetworkBytes( update, HydrusNetwork.UPDATE_ENCODING_JSON )
+            compact_network_bytes = HydrusNetwork.DumpUpdateToNetworkBytes( update, HydrusNetwork.UPDATE_ENCODING_COMPACT )
+            
+            self.assertEqual( json_network_bytes, update.DumpToNetworkBytes() )
+            self.assertNotEqual( compact_network_bytes, json_network_bytes )
+            
+            from_json = HydrusNetwork.CreateUpdateFromNetworkBytes( json_network_bytes )
+            from_compact = HydrusNetwork.CreateUpdateFromNetworkBytes( compact_network_bytes )
+            
+            self.assertIs( type( from_compact ), type( update ) )
+            self.assertEqual( from_compact.GetNumRows(), update.GetNumRows() )
+            self.assertEqual( from_compact.DumpToString(), from_json.DumpToString() )
+            
+        
+        self.assertEqual( HydrusNetwork.CreateUpdateFromNetworkBytes( file_content_update.DumpToCompactNetworkBytes() ).GetNewFiles()[0], ( 5, 1024, HC.IMAGE_PNG, 1234567890, 640, 480, None, None, None ) )
+        
+    
     def _test_service_creation( self ):
         
         self._tag_service_key = HydrusData.GenerateKey()
@@ -1109,6 +1178,8 @@ class TestServerDB( unittest.TestCase ):
         self._test_content_creation_and_service_info_counts_tag_parents()
         self._test_content_creation_and_service_info_counts_tag_siblings()
         
+        self._test_repository_update_generation()
+        
         self._test_account_fetching_from_content()
         
         self._test_delete_all_content()